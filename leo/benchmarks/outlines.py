@@ -0,0 +1,115 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261018130000.1: * @file ../benchmarks/outlines.py
+"""
+outlines.py: Create synthetic outlines for Leo's benchmarks.
+
+make_outline creates an outline of a given size, clone density and number
+of @file nodes. The outline depends only on its arguments.
+"""
+#@+<< outlines.py imports & annotations >>
+#@+node:ekr.20261018130000.2: ** << outlines.py imports & annotations >>
+from __future__ import annotations
+import random
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from leo.core.leoCommands import Commands as Cmdr
+    from leo.core.leoNodes import Position
+#@-<< outlines.py imports & annotations >>
+
+# Words used in bodies and headlines. Searches for these words always succeed.
+words = (
+    'alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta',
+    'iota', 'kappa', 'lambda', 'omicron', 'sigma', 'tau', 'upsilon', 'omega',
+)
+
+#@+others
+#@+node:ekr.20261018130000.3: ** function: make_body
+def make_body(n: int, rng: random.Random) -> str:
+    """Return the body text of synthetic node n: a python function."""
+    word1, word2 = rng.choice(words), rng.choice(words)
+    lines = [
+        f"def {word1}_{n}(x, y):\n",
+        f'    """Return the {word2} of x and y."""\n',
+    ]
+    for i in range(rng.randint(2, 12)):
+        word = rng.choice(words)
+        lines.append(f"    {word}_{i} = x * {i} + y  # {word} {n}.{i}\n")
+    lines.append(f"    return {word1}_{n} == {n}\n")
+    return ''.join(lines)
+#@+node:ekr.20261018130000.4: ** function: make_outline
+def make_outline(
+    c: Cmdr,
+    nodes: int = 5000,
+    clones: float = 0.1,
+    files: int = 50,
+    seed: int = 1,
+) -> list[Position]:
+    """
+    Replace c's outline with a synthetic outline.
+
+    nodes:  The number of nodes in all @file trees.
+    clones: The number of clones, as a fraction of nodes.
+    files:  The number of @file nodes.
+    seed:   The seed of the random number generator.
+
+    Return the list of @file nodes.
+    """
+    rng = random.Random(seed)
+    files = max(1, files)
+    # Remove the previous outline.
+    root = c.rootPosition()
+    while root.hasNext():
+        root.next().doDelete()
+    while root.hasChildren():
+        root.firstChild().doDelete()
+    root.h = 'Benchmark outline'
+    root.b = f"Synthetic outline: nodes: {nodes} clones: {clones} files: {files} seed: {seed}\n"
+    # Create the @file trees. Nodes are added breadth first to random parents.
+    at_files: list[Position] = []
+    leaves: list[Position] = []
+    last = root
+    per_file, extra = divmod(max(0, nodes - files), files)
+    n = 0
+    for i in range(files):
+        last = file_p = last.insertAfter()
+        file_p.h = f"@file benchmark_{i}.py"
+        file_p.b = f"@language python\n@tabwidth -4\n# benchmark_{i}.py\n@others\n"
+        at_files.append(file_p)
+        parents = [file_p]
+        for j in range(per_file + (1 if i < extra else 0)):
+            parent = rng.choice(parents)
+            if parent.numberOfChildren() == 0 and parent != file_p:
+                parent.b = parent.b + '@others\n'
+            p = parent.insertAsLastChild()
+            n += 1
+            p.h = f"{rng.choice(words)}_{n}"
+            p.b = make_body(n, rng)
+            parents.append(p)
+        leaves.extend(z for z in parents[1:] if not z.hasChildren())
+    # Clone random leaves into an organizer node outside all @file trees.
+    n_clones = min(len(leaves), int(nodes * clones))
+    if n_clones:
+        organizer = last.insertAfter()
+        organizer.h = 'Clones'
+        for p in rng.sample(leaves, n_clones):
+            clone = p.clone()
+            clone.moveToLastChildOf(organizer)
+    c.selectPosition(c.rootPosition())
+    return at_files
+#@+node:ekr.20261018130000.5: ** function: make_python_source
+def make_python_source(n_functions: int, seed: int = 1) -> str:
+    """Return the text of a python module, for importer benchmarks."""
+    rng = random.Random(seed)
+    classes = []
+    for i in range(max(1, n_functions // 10)):
+        methods = []
+        for j in range(10):
+            body = make_body(10 * i + j, rng)
+            methods.append(''.join(f"    {z}" if z.strip() else z for z in body.splitlines(True)))
+        classes.append(f"class {rng.choice(words).title()}_{i}:\n\n" + '\n'.join(methods))
+    return '"""A synthetic module."""\n\nimport os\n\n' + '\n\n'.join(classes)
+#@-others
+#@@language python
+#@@tabwidth -4
+#@-leo
@@ -0,0 +1,365 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261018130000.10: * @file ../benchmarks/run_benchmarks.py
+"""
+run_benchmarks.py: Time Leo's core load, save and search operations.
+
+Usage: python -m leo.benchmarks.run_benchmarks [options] [benchmark names]
+
+The benchmarks run headlessly via leoBridge on a synthetic outline. See
+outlines.py. Use --output to save the results as JSON. Use --baseline to
+compare the results with saved results. The exit status is 1 if any
+benchmark is slower than the baseline by more than --threshold.
+"""
+#@+<< run_benchmarks.py imports & annotations >>
+#@+node:ekr.20261018130000.11: ** << run_benchmarks.py imports & annotations >>
+from __future__ import annotations
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+# Leo imports are deferred until leoBridge has initialized Leo.
+
+if TYPE_CHECKING:  # pragma: no cover
+    from leo.core.leoCommands import Commands as Cmdr
+#@-<< run_benchmarks.py imports & annotations >>
+
+#@+others
+#@+node:ekr.20261018130000.12: ** class Benchmarks
+class Benchmarks:
+    """
+    Time Leo's core operations on a synthetic outline in a directory.
+
+    Each bench_* method times one operation. Setup is never timed.
+    """
+    #@+others
+    #@+node:ekr.20261018130000.13: *3* Benchmarks.__init__
+    def __init__(self,
+        directory: str,
+        nodes: int = 5000,
+        clones: float = 0.1,
+        files: int = 50,
+        repeat: int = 5,
+        seed: int = 1,
+    ) -> None:
+        from leo.core import leoGlobals as g
+        self.g = g
+        self.directory = directory
+        self.nodes = nodes
+        self.clones = clones
+        self.files = files
+        self.repeat = max(1, repeat)
+        self.seed = seed
+        self.leo_path = os.path.join(directory, 'benchmark.leo')
+        self.leojs_path = os.path.join(directory, 'benchmark.leojs')
+        self.created = False
+    #@+node:ekr.20261018130000.14: *3* Benchmarks.names
+    @classmethod
+    def names(cls) -> list[str]:
+        """Return the names of all benchmarks."""
+        return sorted(z[len('bench_') :] for z in dir(cls) if z.startswith('bench_'))
+    #@+node:ekr.20261018130000.15: *3* Benchmarks.run
+    def run(self, names: list[str] = None) -> dict[str, dict[str, Any]]:
+        """
+        Run the given benchmarks, or all benchmarks.
+        Return a dict whose keys are names and whose values are timing dicts.
+        """
+        all_names = self.names()
+        for name in names or []:
+            if name not in all_names:
+                raise ValueError(f"unknown benchmark: {name!r}")
+        if not self.created:
+            self.create_files()
+        results = {}
+        for name in names or all_names:
+            times = getattr(self, f"bench_{name}")()
+            results[name] = {
+                'min': min(times),
+                'median': statistics.median(times),
+                'mean': statistics.mean(times),
+                'runs': times,
+            }
+        return results
+    #@+node:ekr.20261018130000.16: *3* Benchmarks.utils
+    #@+node:ekr.20261018130000.17: *4* Benchmarks.create_files
+    def create_files(self) -> None:
+        """Create the .leo, .leojs and external files of the synthetic outline."""
+        from leo.benchmarks.outlines import make_outline
+        c = self.new_commander(self.leo_path)
+        make_outline(c, nodes=self.nodes, clones=self.clones, files=self.files, seed=self.seed)
+        c.atFileCommands.writeAll()  # All new nodes are dirty.
+        fc = c.fileCommands
+        if not (fc.writeOutline(self.leo_path) and fc.writeOutline(self.leojs_path)):
+            raise OSError(f"can not write {self.leo_path}")
+        self.created = True
+    #@+node:ekr.20261018130000.18: *4* Benchmarks.load_outline
+    def load_outline(self, read_at_file_nodes: bool = True) -> Cmdr:
+        """Return a new commander containing the synthetic outline."""
+        c = self.new_commander(self.leo_path)
+        v = c.fileCommands.getAnyLeoFileByName(
+            self.leo_path,
+            checkOpenFiles=False,
+            readAtFileNodesFlag=read_at_file_nodes,
+        )
+        if not v:
+            raise OSError(f"can not read {self.leo_path}")
+        c.selectPosition(c.rootPosition())
+        return c
+    #@+node:ekr.20261018130000.19: *4* Benchmarks.new_commander
+    def new_commander(self, path: str = None) -> Cmdr:
+        """Return a new commander for the given path."""
+        from leo.core import leoCommands
+        g = self.g
+        c = leoCommands.Commands(fileName=path, gui=g.app.gui)
+        c.db = g.NullObject()  # Don't use or change Leo's caches.
+        c.frame.log.enabled = False
+        return c
+    #@+node:ekr.20261018130000.20: *4* Benchmarks.time_function
+    def time_function(self, setup: Callable[[], Any], f: Callable[[Any], Any]) -> list[float]:
+        """
+        Call f(setup()) self.repeat times.
+        Return the list of times spent in f, in seconds.
+        """
+        times = []
+        for i in range(self.repeat):
+            data = setup()
+            t1 = time.perf_counter()
+            f(data)
+            times.append(time.perf_counter() - t1)
+        return times
+    #@+node:ekr.20261018130000.21: *3* Benchmarks.bench_*
+    #@+node:ekr.20261018130000.22: *4* Benchmarks.bench_all_positions
+    def bench_all_positions(self) -> list[float]:
+        """Time c.all_positions."""
+        c = self.load_outline()
+
+        def f(c: Cmdr) -> None:
+            for p in c.all_positions(copy=False):
+                pass
+
+        return self.time_function(lambda: c, f)
+    #@+node:ekr.20261018130000.23: *4* Benchmarks.bench_change_all
+    def bench_change_all(self) -> list[float]:
+        """Time LeoFind.do_change_all."""
+        from leo.core.leoGui import StringFindTabManager
+
+        def setup() -> tuple:
+            c = self.load_outline()
+            find = c.findCommands
+            find.ftm = StringFindTabManager(c)  # type:ignore
+            settings = find.default_settings()
+            settings.find_text = 'gamma'
+            settings.change_text = 'GAMMA'
+            return find, settings
+
+        return self.time_function(setup, lambda data: data[0].do_change_all(data[1]))
+    #@+node:ekr.20261018130000.24: *4* Benchmarks.bench_fast_read
+    def bench_fast_read(self) -> list[float]:
+        """Time FastRead.readFile."""
+        from leo.core.leoFileCommands import FastRead
+
+        def f(c: Cmdr) -> None:
+            with open(self.leo_path, 'rb') as theFile:
+                FastRead(c, {}).readFile(theFile, self.leo_path)
+
+        return self.time_function(self.new_commander, f)
+    #@+node:ekr.20261018130000.25: *4* Benchmarks.bench_find_all
+    def bench_find_all(self) -> list[float]:
+        """Time LeoFind.do_find_all."""
+        from leo.core.leoGui import StringFindTabManager
+
+        def setup() -> tuple:
+            c = self.load_outline()
+            find = c.findCommands
+            find.ftm = StringFindTabManager(c)  # type:ignore
+            settings = find.default_settings()
+            settings.find_text = 'delta_1'
+            return find, settings
+
+        return self.time_function(setup, lambda data: data[0].do_find_all(data[1]))
+    #@+node:ekr.20261018130000.26: *4* Benchmarks.bench_import_python
+    def bench_import_python(self) -> list[float]:
+        """Time the python importer."""
+        from leo.benchmarks.outlines import make_python_source
+        s = make_python_source(max(10, self.nodes // 10), seed=self.seed)
+
+        def setup() -> Cmdr:
+            c = self.new_commander()
+            c.rootPosition().h = '@clean benchmark_import.py'
+            return c
+
+        return self.time_function(
+            setup, lambda c: c.importCommands.createOutline(c.rootPosition(), '.py', s))
+    #@+node:ekr.20261018130000.27: *4* Benchmarks.bench_read_all
+    def bench_read_all(self) -> list[float]:
+        """Time AtFile.readAll."""
+
+        def f(c: Cmdr) -> None:
+            c.atFileCommands.readAll(c.rootPosition())
+
+        return self.time_function(lambda: self.load_outline(read_at_file_nodes=False), f)
+    #@+node:ekr.20261018130000.28: *4* Benchmarks.bench_read_json
+    def bench_read_json(self) -> list[float]:
+        """Time FastRead.readWithJsonTree."""
+        from leo.core.leoFileCommands import FastRead
+        with open(self.leojs_path, 'r', encoding='utf-8') as theFile:
+            s = theFile.read()
+
+        def f(c: Cmdr) -> None:
+            FastRead(c, {}).readWithJsonTree(self.leojs_path, s)
+
+        return self.time_function(self.new_commander, f)
+    #@+node:ekr.20261018130000.29: *4* Benchmarks.bench_undo
+    def bench_undo(self) -> list[float]:
+        """Time changing bodies, then undoing and redoing all the changes."""
+
+        def f(c: Cmdr) -> None:
+            u = c.undoer
+            positions = [p.copy() for p in c.all_unique_positions()][:100]
+            for p in positions:
+                c.selectPosition(p)
+                bunch = u.beforeChangeBody(p)
+                p.b = p.b + '# changed\n'
+                u.afterChangeBody(p, 'Change Body', bunch)
+            while u.canUndo():
+                u.undo()
+            while u.canRedo():
+                u.redo()
+
+        return self.time_function(self.load_outline, f)
+    #@+node:ekr.20261018130000.30: *4* Benchmarks.bench_write_all
+    def bench_write_all(self) -> list[float]:
+        """Time AtFile.writeAll, writing all @file nodes."""
+
+        def setup() -> Cmdr:
+            c = self.load_outline()
+            c.atFileCommands.write_fingerprints.clear()
+            for p in c.all_unique_positions():
+                if p.isAtFileNode():
+                    p.setDirty()
+            return c
+
+        return self.time_function(setup, lambda c: c.atFileCommands.writeAll())
+    #@-others
+#@+node:ekr.20261018130000.31: ** function: compare_results
+def compare_results(
+    baseline: dict[str, Any],
+    results: dict[str, Any],
+    threshold: float = 0.1,
+) -> list[tuple[str, float, float, bool]]:
+    """
+    Compare the minimum times of all benchmarks in both results dicts.
+
+    Return a list of tuples (name, baseline time, new time, regressed),
+    where regressed is True if the new time exceeds the baseline time
+    by more than the given fraction.
+    """
+    old_d, new_d = baseline.get('results', {}), results.get('results', {})
+    result = []
+    for name in sorted(set(old_d) & set(new_d)):
+        old_t, new_t = old_d[name]['min'], new_d[name]['min']
+        result.append((name, old_t, new_t, new_t > old_t * (1.0 + threshold)))
+    return result
+#@+node:ekr.20261018130000.32: ** function: report
+def report(results: dict[str, Any], comparisons: Optional[list] = None) -> None:
+    """Print the results, and the comparisons with a baseline if given."""
+    print(f"Leo {results['leo_version']} Python {results['python']} options: {results['options']}")
+    if comparisons is None:
+        for name, d in results['results'].items():
+            print(f"{name:>15}: min {d['min']:8.4f} median {d['median']:8.4f} sec.")
+        return
+    for name, old_t, new_t, regressed in comparisons:
+        change = 100.0 * (new_t - old_t) / old_t if old_t else 0.0
+        tag = 'REGRESSION' if regressed else ''
+        print(f"{name:>15}: baseline {old_t:8.4f} now {new_t:8.4f} sec. {change:+6.1f}% {tag}")
+#@+node:ekr.20261018130000.33: ** function: run_benchmarks
+def run_benchmarks(
+    names: list[str] = None,
+    nodes: int = 5000,
+    clones: float = 0.1,
+    files: int = 50,
+    repeat: int = 5,
+    seed: int = 1,
+) -> dict[str, Any]:
+    """Run the benchmarks via leoBridge and return a JSON-compatible dict."""
+    from leo.core import leoBridge
+    from leo.core import leoVersion
+    controller = leoBridge.controller(
+        gui='nullGui',
+        loadPlugins=False,
+        readSettings=False,
+        silent=True,
+        useCaches=False,
+    )
+    g = controller.globals()
+    g.app.silentMode = True
+    options: dict[str, Any] = {
+        'nodes': nodes, 'clones': clones, 'files': files, 'repeat': repeat, 'seed': seed,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        benchmarks = Benchmarks(directory, **options)
+        timings = benchmarks.run(names)
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'leo_version': leoVersion.version,
+        'options': options,
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'results': timings,
+    }
+#@+node:ekr.20261018130000.34: ** function: main
+def main(args: list[str] = None) -> int:
+    """Run the benchmarks from the command line. Return the exit status."""
+    parser = argparse.ArgumentParser(
+        prog='python -m leo.benchmarks.run_benchmarks',
+        description="Time Leo's core operations on a synthetic outline.")
+    add = parser.add_argument
+    add('names', nargs='*', metavar='NAME',
+        help=f"benchmarks to run (default: all): {', '.join(Benchmarks.names())}")
+    add('--baseline', metavar='PATH', help='compare with results saved in PATH')
+    add('--clones', type=float, default=0.1, help='clones, as a fraction of nodes (default: 0.1)')
+    add('--files', type=int, default=50, help='number of @file nodes (default: 50)')
+    add('--nodes', type=int, default=5000, help='number of nodes (default: 5000)')
+    add('--output', metavar='PATH', help='save the results as JSON in PATH')
+    add('--repeat', type=int, default=5, help='runs of each benchmark (default: 5)')
+    add('--seed', type=int, default=1, help='random seed (default: 1)')
+    add('--threshold', type=float, default=0.1,
+        help='slowdown, as a fraction, that is a regression (default: 0.1)')
+    options = parser.parse_args(args)
+    baseline = None
+    if options.baseline:
+        with open(options.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    results = run_benchmarks(
+        names=options.names,
+        nodes=options.nodes,
+        clones=options.clones,
+        files=options.files,
+        repeat=options.repeat,
+        seed=options.seed,
+    )
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if baseline is None:
+        report(results)
+        return 0
+    if baseline.get('options') != results['options']:
+        print(f"Warning: baseline options differ: {baseline.get('options')}")
+    comparisons = compare_results(baseline, results, options.threshold)
+    report(results, comparisons)
+    return 1 if any(z[3] for z in comparisons) else 0
+#@-others
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+#@@language python
+#@@tabwidth -4
+#@-leo
@@ -362,6 +362,7 @@ class CheckNodes:
             p2._linkCopiedAsNthChild(dubious, n)
         # Sort the clones in place, without undo.
         dubious.v.children.sort(key=lambda v: v.h.lower())
+        dubious.v.noteOutlineChange('children')
         u.afterInsertNode(dubious, 'check-nodes', undoData)
         return dubious
     #@+node:ekr.20230104142418.1: *3* CheckNodes.get_data
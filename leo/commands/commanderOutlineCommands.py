@@ -283,6 +283,7 @@ def pasteAsTemplate(self: Cmdr, event: LeoKeyEvent = None) -> None:
         # and finally insert it at the given index
         vpar.children.insert(index, v)
         v.parents.append(vpar)
+        v.noteOutlineChange('insert', vpar, index)
 
         pasted = v  # remember the first node as a return value
 
@@ -309,11 +310,13 @@ def pasteAsTemplate(self: Cmdr, event: LeoKeyEvent = None) -> None:
     def undoHelper() -> None:
         v = vpar.children.pop(index)
         v.parents.remove(vpar)
+        v.noteOutlineChange('delete', vpar, index)
         c.redraw(bunch.p)
     #@+node:vitalije.20200529120537.1: *4* redoHelper
     def redoHelper() -> None:
         vpar.children.insert(index, pasted)
         pasted.parents.append(vpar)
+        pasted.noteOutlineChange('insert', vpar, index)
         c.redraw(newp)
     #@-others
 
@@ -659,6 +662,25 @@ def fullCheckOutline(self: Cmdr, event: LeoKeyEvent = None) -> None:
     errors = c.checkOutline()
     t2 = time.process_time()
     g.es_print(f"check-outline: {errors} error{g.plural(errors)} in {t2 - t1:4.2f} sec.")
+#@+node:ekr.20261018200000.3: ** c_oc.outlineStats
+@g.commander_command('outline-stats')
+def outlineStats(self: Cmdr, event: LeoKeyEvent = None) -> None:
+    """Print statistics about the outline: nodes, positions, clones and depths."""
+    c = self
+    t1 = time.process_time()
+    d = c.getOutlineStats()
+    t2 = time.process_time()
+    fan_out = ', '.join(f"{k}: {v}" for k, v in d['fan_out'].items())
+    depths = ', '.join(f"{k}: {v}" for k, v in d['depths'].items())
+    g.es_print(
+        f"outline-stats: {c.shortFileName()} in {t2 - t1:4.2f} sec.\n"
+        f"     nodes: {d['nodes']}\n"
+        f" positions: {d['positions']}\n"
+        f"    clones: {d['clones']}\n"
+        f"   fan-out: {fan_out or 'none'}\n"
+        f"body bytes: {d['body_bytes']}\n"
+        f"    depths: {depths}"
+    )
 #@+node:ekr.20031218072017.2913: ** c_oc.Goto commands
 #@+node:ekr.20071213123942: *3* c_oc.findNextClone
 @g.commander_command('find-next-clone')
@@ -1505,6 +1527,8 @@ def demote(self: Cmdr, event: LeoKeyEvent = None) -> None:
     for child in followingSibs:
         child.parents.remove(parent_v)
         child.parents.append(p.v)
+    parent_v.noteOutlineChange('children')
+    p.v.noteOutlineChange('children')
     p.expand()
     p.setDirty()
     c.setChanged()
@@ -1839,6 +1863,7 @@ def sortSiblings(
     bunch = u.beforeSort(p, undoType, oldChildren, newChildren, sortChildren)
     # A copy, so its not the undo bead's oldChildren. Fixes #3205
     parent_v.children = newChildren[:]
+    parent_v.noteOutlineChange('children')
     u.afterSort(p, bunch)
     # Sorting destroys position p, and possibly the root position.
     # Only the child index of new position changes!
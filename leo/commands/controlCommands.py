@@ -65,6 +65,11 @@ class ControlCommandsClass(BaseEditCommandsClass):
         """
         g.app.pluginsController.printPlugins(self.c)
 
+    @cmd('show-plugin-import-times')
+    def printPluginImportTimes(self, event: LeoKeyEvent = None) -> None:
+        """Print the time taken to import each plugin."""
+        g.app.pluginsController.printImportTimes(self.c)
+
     @cmd('show-plugins-info')
     def printPluginsInfo(self, event: LeoKeyEvent = None) -> None:
         """
@@ -1333,6 +1333,7 @@ class EditCommandsClass(BaseEditCommandsClass):
                 if 'icons' in v.unknownAttributes:
                     del v.unknownAttributes['icons']
                     v._p_changed = True
+        v.noteOutlineChange('node')
     #@+node:ekr.20150514063305.236: *4* ec.deleteFirstIcon
     @cmd('delete-first-icon')
     def deleteFirstIcon(self, event: LeoKeyEvent = None) -> None:
@@ -4,14 +4,15 @@
 #@+<< gotoCommands imports & annotations >>
 #@+node:ekr.20220827065126.1: ** << gotoCommands imports & annotations >>
 from __future__ import annotations
+import bisect
 import re
-from typing import Optional, TYPE_CHECKING
+from typing import Generator, Iterable, Optional, Union, TYPE_CHECKING
 from leo.core import leoGlobals as g
 
 if TYPE_CHECKING:  # pragma: no cover
     from leo.core.leoCommands import Commands as Cmdr
     from leo.core.leoGui import LeoKeyEvent
-    from leo.core.leoNodes import Position
+    from leo.core.leoNodes import Position, VNode
 #@-<< gotoCommands imports & annotations >>
 
 #@+others
@@ -19,9 +20,17 @@ if TYPE_CHECKING:  # pragma: no cover
 class GoToCommands:
     """A class implementing goto-global-line."""
 
+    # The maximum number of @<file> trees in self.line_maps.
+    max_line_maps = 50
+
     def __init__(self, c: Cmdr) -> None:
         """Ctor for GoToCommands class."""
         self.c = c
+        # Keys are the vnodes of @<file> nodes, in LRU order.
+        # Values are g.Bunch(delims, contents, line_map).
+        self.line_maps: dict[VNode, g.Bunch] = {}
+        # Vnodes whose entire subtrees may have changed. See note_change.
+        self.stale_trees: set[VNode] = set()
 
     #@+others
     #@+node:ekr.20100216141722.5622: *3* goto.find_file_line & helper
@@ -53,27 +62,17 @@ class GoToCommands:
         root, fileName = self.find_root(p)
         if not root:
             return self.find_script_line(n, p)
-        # Step 1: Get the lines of external files *with* sentinels,
-        #         even if the actual external file actually contains no sentinels.
-        sentinels = root.isAtFileNode()
-        s = self.get_external_file_with_sentinels(root)
+        line_map = self.get_line_map(root)
         # Special case empty files.
-        if not s.strip():
+        if line_map.empty:
             return p, 0
-        lines = g.splitLines(s)
-        # Step 2: scan the lines for line n.
-        if sentinels:
-            # All sentinels count as real lines.
-            gnx, h, offset = self.scan_sentinel_lines(lines, n, root)
-        else:
-            # Not all sentinels count as real lines.
-            gnx, h, offset = self.scan_nonsentinel_lines(lines, n, root)
+        gnx, h, offset = line_map.find(n)
         if gnx:
             p = self.find_gnx2(gnx)
             if p:
                 self.success(n, offset, p)
                 return p, offset
-        self.fail(lines, n, root)
+        self.fail(line_map, n, root)
         return None, -1
     #@+node:ekr.20160921210529.1: *3* goto.find_node_start & helper
     def find_node_start(self, p: Position, s: str = None) -> Optional[int]:
@@ -195,6 +194,92 @@ class GoToCommands:
                     node_offset += 1
         g.trace('\nNot found', target_offset, target_gnx)
         return None
+    #@+node:ekr.20261018160000.1: *3* goto.Line maps
+    #@+node:ekr.20261018160000.2: *4* goto.get_line_map
+    def get_line_map(self, root: Position) -> LineMap:
+        """
+        Return the LineMap of root's external file *with* sentinels,
+        even if the actual external file contains no sentinels.
+
+        Recompute the map only if root's tree has changed.
+        """
+        self.forget_stale_trees()
+        # note_change doesn't track the ancestors that set root's delims.
+        delims = self.get_delims(root)
+        bunch = self.line_maps.pop(root.v, None)
+        if not bunch or bunch.delims != delims:
+            bunch = g.Bunch(delims=delims, contents=None, line_map=None)
+        if bunch.line_map is None:
+            s = bunch.contents
+            if s is None:
+                s = self.get_external_file_with_sentinels(root)
+            bunch.line_map = LineMap(self.scan_lines(g.splitLines(s), root), empty=not s.strip())
+            bunch.contents = None
+        self.remember_line_map(root, bunch)
+        return bunch.line_map
+    #@+node:ekr.20261018160000.3: *4* goto.remember_file_contents
+    def remember_file_contents(self, root: Position, contents: str) -> None:
+        """
+        Called after reading or writing root's external file *with* sentinels.
+
+        get_line_map will compute root's map from contents if root's tree has
+        not changed.
+        """
+        self.forget_stale_trees()
+        bunch = g.Bunch(delims=self.get_delims(root), contents=contents, line_map=None)
+        self.line_maps.pop(root.v, None)
+        self.remember_line_map(root, bunch)
+
+    def remember_line_map(self, root: Position, bunch: g.Bunch) -> None:
+        """Make bunch the most recently used entry of self.line_maps."""
+        c, d = self.c, self.line_maps
+        d[root.v] = bunch
+        while len(d) > self.max_line_maps:
+            del d[next(iter(d))]
+        if self not in c.outlineTrackers:
+            c.outlineTrackers.append(self)
+    #@+node:ekr.20261018280000.24: *4* goto.note_change & helpers
+    def note_change(self, kind: str, v: VNode, parent_v: VNode, childIndex: int) -> None:
+        """
+        Called by v.noteOutlineChange.
+
+        Forget the line maps of all @<file> trees that contain the changed vnode.
+        Scripts that set v._bodyString directly must call v.noteOutlineChange('text').
+        """
+        if kind == 'node' or not self.line_maps:
+            return
+        if kind == 'tree':
+            # v's new subtree doesn't exist yet.
+            self.stale_trees.add(v)
+        self.forget_line_maps([parent_v if parent_v and kind in ('insert', 'delete') else v])
+
+    def forget_line_maps(self, vnodes: list[VNode]) -> None:
+        """Forget the line maps of the given vnodes and all their ancestors."""
+        seen = set(vnodes)
+        stack = list(vnodes)
+        while stack:
+            v = stack.pop()
+            self.line_maps.pop(v, None)
+            for parent_v in v.parents:
+                if parent_v not in seen:
+                    seen.add(parent_v)
+                    stack.append(parent_v)
+
+    def forget_stale_trees(self) -> None:
+        """
+        Forget the line maps of all @<file> trees containing any vnode of the
+        subtrees in self.stale_trees.
+        """
+        if not self.stale_trees:
+            return
+        stack, self.stale_trees = list(self.stale_trees), set()
+        seen: set[VNode] = set()
+        while stack:
+            v = stack.pop()
+            if v not in seen:
+                seen.add(v)
+                stack.extend(v.children)
+        self.forget_line_maps(list(seen))
     #@+node:ekr.20150624085605.1: *3* goto.scan_nonsentinel_lines
     def scan_nonsentinel_lines(self, lines: list[str], n: int, root: Position) -> tuple[str, str, int]:
         """
@@ -209,47 +294,10 @@ class GoToCommands:
         h:      the headline of the #@+node
         offset: the offset of line n within the node.
         """
-        delim1, delim2 = self.get_delims(root)
-        count, gnx, h, offset = 0, root.gnx, root.h, 0
-        stack = [(gnx, h, offset),]
-        for s in lines:
-            is_sentinel = self.is_sentinel(delim1, delim2, s)
-            # print(f"count: {count:2} offset: {offset} {s!r}")
-            if is_sentinel:
-                # Handle blackened sentinels.
-                s2 = s.strip()[len(delim1) :]
-                if s2.startswith(' '):
-                    s2 = s2[1:]
-                if s2.startswith('@+node'):
-                    # Invisible, but resets the offset.
-                    offset = 0
-                    gnx, h = self.get_script_node_info(s, delim2)
-                elif s2.startswith('@+others') or s2.startswith('@+<<'):
-                    stack.append((gnx, h, offset),)
-                    #@verbatim
-                    # @others is visible in the outline, but *not* in the file.
-                    offset += 1
-                elif s2.startswith('@-others') or s2.startswith('@-<<'):
-                    gnx, h, offset = stack.pop()
-                    #@verbatim
-                    # @-others is invisible.
-                    offset += 1
-                elif s2.startswith('@@'):
-                    # Directives are visible in the outline, but *not* in the file.
-                    offset += 1
-                else:
-                    # All other sentinels are invisible to the user.
-                    offset += 1
-            else:
-                # Non-sentinel lines are visible both in the outline and the file.
-                count += 1
-                offset += 1
+        for count, gnx, h, offset in self.scan_lines(lines, root, sentinels=False):
             if count == n:
-                # Count is the real, one-based count.
-                break
-        else:
-            gnx, h, offset = None, None, -1
-        return gnx, h, offset
+                return gnx, h, offset
+        return None, None, -1
     #@+node:ekr.20150623175314.1: *3* goto.scan_sentinel_lines
     def scan_sentinel_lines(self, lines: list[str], n: int, root: Position) -> tuple[str, str, int]:
         """
@@ -261,36 +309,67 @@ class GoToCommands:
         h:      the headline of the #@+node
         offset: the offset of line n within the node.
         """
+        for count, gnx, h, offset in self.scan_lines(lines, root, sentinels=True):
+            if count == n:
+                return gnx, h, offset
+        return None, None, -1
+    #@+node:ekr.20261018160000.5: *3* goto.scan_lines
+    def scan_lines(self,
+        lines: list[str],
+        root: Position,
+        sentinels: bool = None,
+    ) -> Generator[tuple[int, str, str, int], None, None]:
+        """
+        Scan a list of lines containing sentinels.
+
+        After each line, yield (count, gnx, h, offset):
+        count:  the one-based global line count.
+        gnx:    the gnx of the #@+node
+        h:      the headline of the #@+node
+        offset: the offset of the line within the node.
+
+        sentinels: True if all sentinels count as real lines.
+                   The default is True for @file nodes.
+        """
+        if sentinels is None:
+            sentinels = root.isAtFileNode()
         delim1, delim2 = self.get_delims(root)
-        gnx, h, offset = root.gnx, root.h, 0
+        count, gnx, h, offset = 0, root.gnx, root.h, 0
         stack = [(gnx, h, offset),]
-        for i, s in enumerate(lines):
+        for s in lines:
             if self.is_sentinel(delim1, delim2, s):
                 # Handle blackened sentinels.
                 s2 = s.strip()[len(delim1) :]
                 if s2.startswith(' '):
                     s2 = s2[1:]
                 if s2.startswith('@+node'):
+                    # Invisible, but resets the offset.
                     offset = 0
                     gnx, h = self.get_script_node_info(s, delim2)
                 elif s2.startswith('@+others') or s2.startswith('@+<<'):
                     stack.append((gnx, h, offset),)
+                    #@verbatim
+                    # @others is visible in the outline, but *not* in the file.
                     offset += 1
                 elif s2.startswith('@-others') or s2.startswith('@-<<'):
                     gnx, h, offset = stack.pop()
+                    #@verbatim
+                    # @-others is invisible.
                     offset += 1
                 else:
+                    # Directives are visible in the outline, but *not* in the file.
+                    # All other sentinels are invisible to the user.
                     offset += 1
+                if sentinels:
+                    count += 1
             else:
+                # Non-sentinel lines are visible both in the outline and the file.
+                count += 1
                 offset += 1
-            if i + 1 == n:  # Bug fix 2017/04/01: n is one based.
-                break
-        else:
-            gnx, h, offset = None, None, -1
-        return gnx, h, offset
+            yield count, gnx, h, offset
     #@+node:ekr.20150624142449.1: *3* goto.Utils
     #@+node:ekr.20150625133523.1: *4* goto.fail
-    def fail(self, lines: list[str], n: int, root: Position) -> None:
+    def fail(self, lines: Union[list[str], LineMap], n: int, root: Position) -> None:
         """Select the last line of the last node of root's tree."""
         c = self.c
         w = c.frame.body.wrapper
@@ -467,6 +546,47 @@ class GoToCommands:
         c.bodyWantsFocus()
         w.seeInsertPoint()
     #@-others
+#@+node:ekr.20261018160000.6: ** class LineMap
+class LineMap:
+    """
+    A map from the lines of an external file to (gnx, h, offset) tuples.
+
+    The map contains one entry for each run of consecutive lines of a node.
+    find uses a binary search.
+    """
+
+    def __init__(self, scan: Iterable[tuple[int, str, str, int]], empty: bool = False) -> None:
+        """
+        scan: the results of goto.scan_lines.
+        empty: True if the file contains only whitespace.
+        """
+        self.empty = empty
+        self.entries: list[tuple[str, str, int]] = []  # (gnx, h, offset)
+        self.starts: list[int] = []  # The first line of each entry.
+        self.first, self.last = 0, -1
+        prev: tuple[str, str, int] = None
+        for count, gnx, h, offset in scan:
+            if count <= self.last:
+                continue  # Only the first line with each count matters.
+            if not prev or prev[:2] != (gnx, h) or prev[2] + 1 != offset:
+                # Start a new entry.
+                self.starts.append(count)
+                self.entries.append((gnx, h, offset))
+            prev, self.last = (gnx, h, offset), count
+        if self.starts:
+            self.first = self.starts[0]
+
+    def __len__(self) -> int:
+        """Return the number of lines."""
+        return max(0, self.last)
+
+    def find(self, n: int) -> tuple[str, str, int]:
+        """Return gnx, h, offset for line n, or (None, None, -1)."""
+        if not self.first <= n <= self.last:
+            return None, None, -1
+        i = bisect.bisect_right(self.starts, n) - 1
+        gnx, h, offset = self.entries[i]
+        return gnx, h, offset + n - self.starts[i]
 #@+node:ekr.20180517041303.1: ** show-file-line
 @g.command('show-file-line')
 def show_file_line(event: LeoKeyEvent) -> None:
@@ -5,8 +5,10 @@
 from __future__ import annotations
 from collections.abc import Callable
 import importlib
+import hashlib
 import io
 import os
+import pickle
 import subprocess
 import string
 import sys
@@ -1278,6 +1280,9 @@ class LeoApp:
         else:
             # #69.
             g.app.forgetOpenFile(fn=c.fileName())
+        # Close the .db file from which lazy vnodes read their bodies.
+        if c.fileCommands.lazy_loader:
+            c.fileCommands.lazy_loader.close()
         if g.app.windowList:
             c2 = new_c or g.app.windowList[0].c
             g.app.selectLeoWindow(c2)
@@ -2143,12 +2148,16 @@ class LoadManager:
             # Never put a return in a finally clause.
             g.app.unlockLog()
             g.app.gui = oldGui
-    #@+node:ekr.20120213081706.10382: *4* LM.readGlobalSettingsFiles
-    def readGlobalSettingsFiles(self) -> None:
+    #@+node:ekr.20120213081706.10382: *4* LM.readGlobalSettingsFiles & helpers
+    def readGlobalSettingsFiles(self, use_cache: bool = True) -> None:
         """
         Read leoSettings.leo and myLeoSettings.leo using a null gui.
 
         New in Leo 6.1: this sets ivars for the ActiveSettingsOutline class.
+
+        Unless use_cache is False, this method uses the merged settings in
+        g.app.db when the settings files have not changed. In that case,
+        lm.leo_settings_c, lm.my_settings_c and lm.theme_c are None.
         """
         trace = 'themes' in g.app.debug
         lm = self
@@ -2157,29 +2166,48 @@ class LoadManager:
         old_commanders = g.app.commanders()
         lm.leo_settings_path = lm.computeLeoSettingsPath()
         lm.my_settings_path = lm.computeMyLeoSettingsPath()
-        lm.leo_settings_c = lm.openSettingsFile(self.leo_settings_path)
-        lm.my_settings_c = lm.openSettingsFile(self.my_settings_path)
-        commanders = [lm.leo_settings_c, lm.my_settings_c]
-        commanders = [z for z in commanders if z]
-        settings_d, bindings_d = lm.createDefaultSettingsDicts()
-        for c in commanders:
-            # Merge the settings dicts from c's outline into
-            # *new copies of* settings_d and bindings_d.
-            settings_d, bindings_d = lm.computeLocalSettings(
-                c, settings_d, bindings_d, localFlag=False)
-        # Adjust the name.
-        bindings_d.setName('lm.globalBindingsDict')
+        lm.leo_settings_c = lm.my_settings_c = lm.theme_c = None
+        paths = [lm.leo_settings_path, lm.my_settings_path]
+        key = lm.computeSettingsCacheKey(paths) if use_cache else None
+        cached = lm.getCachedSettings('lm.global-settings', key)
+        if cached:
+            settings_d, bindings_d = cached
+        else:
+            state = lm.getSettingsConfigState()
+            lm.leo_settings_c = lm.openSettingsFile(self.leo_settings_path)
+            lm.my_settings_c = lm.openSettingsFile(self.my_settings_path)
+            settings_d, bindings_d = lm.createDefaultSettingsDicts()
+            for c in (lm.leo_settings_c, lm.my_settings_c):
+                if c:
+                    # Merge the settings dicts from c's outline into
+                    # *new copies of* settings_d and bindings_d.
+                    settings_d, bindings_d = lm.computeLocalSettings(
+                        c, settings_d, bindings_d, localFlag=False)
+            # Adjust the name.
+            bindings_d.setName('lm.globalBindingsDict')
+            lm.putCachedSettings('lm.global-settings', key, state, settings_d, bindings_d)
         lm.globalSettingsDict = settings_d
         lm.globalBindingsDict = bindings_d
         # Add settings from --theme or @string theme-name files.
         # This must be done *after* reading myLeoSettings.leo.
         lm.theme_path = lm.computeThemeFilePath()
         if lm.theme_path and lm.theme_path != LoadManager.LM_NOTHEME_FLAG:
-            lm.theme_c = lm.openSettingsFile(lm.theme_path)
-            if lm.theme_c:
-                # Merge theme_c's settings into globalSettingsDict.
-                settings_d, junk_shortcuts_d = lm.computeLocalSettings(
-                    lm.theme_c, settings_d, bindings_d, localFlag=False)
+            theme_key = lm.computeSettingsCacheKey(paths + [lm.theme_path]) if key else None
+            cached = lm.getCachedSettings('lm.theme-settings', theme_key)
+            if cached:
+                settings_d = cached[0]
+            else:
+                state = lm.getSettingsConfigState()
+                lm.theme_c = lm.openSettingsFile(lm.theme_path)
+                if lm.theme_c:
+                    # Merge theme_c's settings into globalSettingsDict.
+                    settings_d, junk_shortcuts_d = lm.computeLocalSettings(
+                        lm.theme_c, settings_d, bindings_d, localFlag=False)
+                    # Cache only themes that contain nothing but settings.
+                    if lm.getSettingsConfigState() == state:
+                        lm.putCachedSettings('lm.theme-settings', theme_key, state,
+                            settings_d, bindings_d, config_ivars=())
+            if cached or lm.theme_c:
                 lm.globalSettingsDict = settings_d
                 # Set global var used by the StyleSheetManager.
                 g.app.theme_directory = g.os_path_dirname(lm.theme_path)
@@ -2187,9 +2215,98 @@ class LoadManager:
                     g.trace('g.app.theme_directory', g.app.theme_directory)
         # Clear the cache entries for the commanders.
         # This allows this method to be called outside the startup logic.
-        for c in commanders:
-            if c not in old_commanders:
+        for c in (lm.leo_settings_c, lm.my_settings_c, lm.theme_c):
+            if c and c not in old_commanders:
                 g.app.forgetOpenFile(c.fileName())
+    #@+node:ekr.20261018160000.1: *5* LM.computeSettingsCacheKey
+    def computeSettingsCacheKey(self, paths: list[str]) -> str:
+        """
+        Return the key of the cached settings for the given settings files.
+
+        The key depends on the paths, mtimes, sizes and contents of the
+        files and on everything else that affects the parsing of @settings
+        trees.
+        """
+        from leo.core import leoVersion
+        lm = self
+        config_path = os.path.join(g.app.loadDir, 'leoConfig.py')
+        parts: list[Any] = [
+            leoVersion.version,
+            os.path.getmtime(config_path) if os.path.exists(config_path) else None,
+            sys.platform,
+            lm.computeMachineName(),
+        ]
+        for path in paths:
+            if not (path and os.path.exists(path) and lm.isLeoFile(path)):
+                parts.append(None)
+                continue
+            with open(path, 'rb') as f:
+                contents = f.read()
+            stat = os.stat(path)
+            parts.append((path, stat.st_mtime_ns, stat.st_size, hashlib.sha1(contents).hexdigest()))
+            if b'@ifenv' in contents:
+                parts.append(sorted(os.environ.items()))
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    #@+node:ekr.20261018160000.2: *5* LM.getCachedSettings & putCachedSettings
+    # Picklable ivars of g.app.config that @settings trees may set.
+    settings_config_ivars = (
+        'buttonsFileName', 'context_menus', 'enabledPluginsFileName', 'enabledPluginsString',
+        'menusFileName', 'menusList', 'modeCommandsDict',
+    )
+
+    def getCachedSettings(self, name: str, key: Optional[str]) -> Optional[tuple[g.SettingsDict, g.SettingsDict]]:
+        """
+        Return (settings_d, bindings_d) from g.app.db[name] if key matches the cached key.
+        Restore the ivars of g.app.config that the @settings trees set.
+        """
+        if not key:
+            return None
+        try:
+            d = g.app.db.get(name)
+            if not isinstance(d, dict) or d.get('key') != key:
+                return None
+            settings_d, bindings_d, config_d = pickle.loads(d['data'])
+        except Exception:
+            return None
+        for ivar, val in config_d.items():
+            setattr(g.app.config, ivar, val)
+        if 'startup' in g.app.debug:
+            g.trace('cached settings', len(settings_d), len(bindings_d))
+        return settings_d, bindings_d
+
+    def putCachedSettings(self,
+        name: str,
+        key: Optional[str],
+        state: tuple[int, int, bytes],
+        settings_d: g.SettingsDict,
+        bindings_d: g.SettingsDict,
+        config_ivars: tuple[str, ...] = settings_config_ivars,
+    ) -> None:
+        """
+        Cache settings_d and bindings_d, the settings computed from the
+        settings files, in g.app.db[name]. state is the state of g.app.config
+        before reading the files. config_ivars are the ivars of g.app.config
+        to restore when using the cache.
+
+        Do nothing if the files contain @button or @command nodes: the
+        scripts for those nodes contain positions in the settings files.
+        """
+        n_buttons, n_commands, junk_config_s = state
+        config = g.app.config
+        if not key or len(config.atCommonButtonsList) > n_buttons or len(config.atCommonCommandsList) > n_commands:
+            return
+        config_d = {z: getattr(config, z) for z in config_ivars if hasattr(config, z)}
+        try:
+            data = pickle.dumps((settings_d, bindings_d, config_d))
+            g.app.db[name] = {'key': key, 'data': data}
+        except Exception:
+            g.es_exception()
+    #@+node:ekr.20261018160000.3: *5* LM.getSettingsConfigState
+    def getSettingsConfigState(self) -> tuple[int, int, bytes]:
+        """Return a summary of the ivars of g.app.config that @settings trees may set."""
+        config = g.app.config
+        config_d = {z: getattr(config, z) for z in self.settings_config_ivars if hasattr(config, z)}
+        return len(config.atCommonButtonsList), len(config.atCommonCommandsList), pickle.dumps(config_d)
     #@+node:ekr.20120214165710.10838: *4* LM.traceSettingsDict
     def traceSettingsDict(self, d: dict[str, str], verbose: bool = False) -> None:
         if verbose:
@@ -5,6 +5,8 @@
 #@+node:ekr.20041005105605.2: ** << leoAtFile imports & annotations >>
 from __future__ import annotations
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import io
 import os
 import re
@@ -63,6 +65,9 @@ class AtFile:
         self.section_delim2 = '>>'
         # **Only** at.writeAll manages these flags.
         self.unchangedFiles = 0
+        # **Only** at.readAll manages this dict.
+        # Keys are full paths, values are tuples (contents as bytes, sha1 digest).
+        self.prefetched_files: dict[str, tuple[bytes, str]] = {}
         # promptForDangerousWrite sets cancelFlag and yesToAll only if canCancelFlag is True.
         self.canCancelFlag = False
         self.cancelFlag = False
@@ -71,6 +76,11 @@ class AtFile:
         self.checkPythonCodeOnWrite = False
         self.runFlake8OnWrite = False
         self.runPyFlakesOnWrite = False
+        # Keys are root gnxs, values are tuples (path, mtime, size, digest).
+        # See at.isUnchangedSinceLastWrite.
+        self.write_fingerprints: dict[str, tuple[str, int, int, str]] = {}
+        # (root.v, digest or None) while writeAll writes root. See at.getWriteFingerprint.
+        self.root_fingerprint: tuple[VNode, Optional[str]] = None
         self.reloadSettings()
     #@+node:ekr.20171113152939.1: *5* at.reloadSettings
     def reloadSettings(self) -> None:
@@ -82,6 +92,8 @@ class AtFile:
             'run-flake8-on-write', default=False)
         self.runPyFlakesOnWrite = c.config.getBool(
             'run-pyflakes-on-write', default=False)
+        # Settings may affect the contents of external files.
+        self.write_fingerprints = {}
     #@+node:ekr.20041005105605.10: *4* at.initCommonIvars
     def initCommonIvars(self) -> None:
         """
@@ -315,10 +327,46 @@ class AtFile:
         at.scanAllDirectives(root)
         gnx2vnode = c.fileCommands.gnxDict
         contents = fromString or file_s
-        FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root)
+        fast_at = FastAtRead(c, gnx2vnode)
+        prefetched = None if fromString else at.prefetched_files.get(fileName)
+        if prefetched:
+            ok = at.readWithParseCache(fast_at, contents, fileName, root, digest=prefetched[1])
+        else:
+            ok = fast_at.read_into_root(contents, fileName, root)
+        if ok:
+            # goto-global-line can use contents if root's tree doesn't change.
+            c.gotoCommands.remember_file_contents(root, contents)
         root.clearDirty()
         g.doHook('after-reading-external-file', c=c, p=root)
         return True
+    #@+node:ekr.20261018031522.1: *6* at.readWithParseCache
+    def readWithParseCache(self,
+        fast_at: FastAtRead,
+        contents: str,
+        fileName: str,
+        root: Position,
+        digest: str,
+    ) -> bool:
+        """
+        Read contents into root. Return True if there were no errors.
+
+        Use the parse result saved in g.app.db if the file's digest, encoding
+        and root gnx are unchanged. Otherwise, scan the file and save the
+        result for the next read.
+        """
+        at = self
+        key = f"fast-at-read:{fileName}"
+        signature = (digest, at.encoding, root.gnx)
+        data = g.app.db.get(key)
+        if data and data[0] == signature:
+            _signature, node_starts, bodies = data
+            fast_at.read_from_cache(node_starts, bodies, fileName, root)
+            return True
+        if not fast_at.read_into_root(contents, fileName, root):
+            return False
+        if fast_at.bodies is not None:
+            g.app.db[key] = (signature, fast_at.node_starts, fast_at.bodies)
+        return True
     #@+node:ekr.20071105164407: *6* at.deleteUnvisitedNodes
     def deleteUnvisitedNodes(self, root: Position) -> None:  # pragma: no cover
         """
@@ -342,8 +390,12 @@ class AtFile:
         t1 = time.time()
         c.init_error_dialogs()
         files = at.findFilesToRead(root, all=True)
-        for p in files:
-            at.readFileAtPosition(p)
+        at.prefetchFiles(files)
+        try:
+            for p in files:
+                at.readFileAtPosition(p)
+        finally:
+            at.prefetched_files = {}
         for p in files:
             p.v.clearDirty()
         if not g.unitTesting and files:  # pragma: no cover
@@ -389,6 +441,34 @@ class AtFile:
             else:
                 p.moveToThreadNext()
         return files
+    #@+node:ekr.20261018031522.2: *6* at.prefetchFiles
+    def prefetchFiles(self, files: list[Position]) -> None:
+        """
+        Read the external files of all @file and @thin nodes in files using a
+        thread pool, setting at.prefetched_files.
+
+        at.openFileHelper uses the prefetched bytes. at.read uses the digests
+        to find cached parse results in g.app.db.
+        """
+        at, c = self, self.c
+        paths = [c.fullPath(p) for p in files if p.isAtThinFileNode() or p.isAtFileNode()]
+        paths = list(dict.fromkeys(z for z in paths if z))  # Remove duplicates, retaining order.
+        if not paths:
+            return
+
+        def read_one(path: str) -> tuple[str, Optional[tuple[bytes, str]]]:
+            try:
+                with open(path, 'rb') as f:
+                    s = f.read()
+            except Exception:
+                # Let at.openFileHelper report the error.
+                return path, None
+            return path, (s, hashlib.sha1(s).hexdigest())
+
+        with ThreadPoolExecutor(max_workers=min(16, len(paths))) as executor:
+            for path, data in executor.map(read_one, paths):
+                if data:
+                    at.prefetched_files[path] = data
     #@+node:ekr.20190108054803.1: *6* at.readFileAtPosition
     def readFileAtPosition(self, p: Position) -> None:  # pragma: no cover
         """Read the @<file> node at p."""
@@ -757,6 +837,10 @@ class AtFile:
     def openFileHelper(self, fileName: str) -> bytes:  # *not* str!
         """Open a file, reporting all exceptions."""
         at = self
+        # Use the bytes read by at.prefetchFiles, if possible.
+        prefetched = at.prefetched_files.get(fileName)
+        if prefetched:
+            return prefetched[0]
         # #1798: return None as a flag on any error.
         s = None
         try:
@@ -994,15 +1078,22 @@ class AtFile:
         at.cancelFlag = False
         at.yesToAll = False
         files, root = at.findFilesToWrite(all)
-        for p in files:
-            try:
-                at.writeAllHelper(p, root)
-            except Exception:  # pragma: no cover
-                at.internalWriteError(p)
-        # Make *sure* these flags are cleared for other commands.
-        at.canCancelFlag = False
-        at.cancelFlag = False
-        at.yesToAll = False
+        callback = at.c.progressCallback
+        try:
+            for i, p in enumerate(files):
+                if callback:
+                    # The callback may cancel the command.
+                    callback(i, len(files))
+                try:
+                    at.writeAllHelper(p, root)
+                except Exception:  # pragma: no cover
+                    at.internalWriteError(p)
+        finally:
+            # Make *sure* these flags are cleared for other commands.
+            at.canCancelFlag = False
+            at.cancelFlag = False
+            at.yesToAll = False
+            at.root_fingerprint = None
         # Say the command is finished.
         at.reportEndOfWrite(files, all, dirty)
         # #2338: Never call at.saveOutlineIfPossible().
@@ -1035,6 +1126,9 @@ class AtFile:
                 if p.isAnyAtFileNode():
                     c.ignored_at_file_nodes.append(p.h)
                 p.moveToNodeAfterTree()
+            elif not force and not p.isDirty() and p.isAnyAtFileNode():
+                # Don't compute the paths of clean trees.
+                p.moveToNodeAfterTree()
             elif p.isAnyAtFileNode():
                 data = p.v, c.fullPath(p)
                 if data in seen:
@@ -1047,9 +1141,6 @@ class AtFile:
                 p.moveToNodeAfterTree()
             else:
                 p.moveToThreadNext()
-        # When scanning *all* nodes, we only actually write dirty nodes.
-        if not force:
-            files = [z for z in files if z.isDirty()]
         if trace:
             g.printObj([z.h for z in files], tag='Files to be saved')
         return files, root
@@ -1088,8 +1179,9 @@ class AtFile:
         This prevents the write-all command from needlessly updating
         the @persistence data, thereby annoyingly changing the .leo file.
         """
-        at = self
+        at, c = self, self.c
         at.root = root
+        at.root_fingerprint = (p.v, None)
         if p.isAtIgnoreNode():  # pragma: no cover
             # Should have been handled in findFilesToWrite.
             g.trace(f"Can not happen: {p.h} is an @ignore node")
@@ -1098,6 +1190,14 @@ class AtFile:
             at.writePathChanged(p)
         except IOError:  # pragma: no cover
             return
+        if at.isUnchangedSinceLastWrite(p):
+            at.unchangedFiles += 1
+            if not g.unitTesting and c.config.getBool(
+                'report-unchanged-files', default=True):
+                g.es(f"unchanged: {g.shortFileName(c.fullPath(p))}")  # pragma: no cover
+            for p2 in p.self_and_subtree(copy=False):
+                p2.v.clearDirty()
+            return
         table = (
             (p.isAtAsisFileNode, at.asisWrite),
             (p.isAtAutoNode, at.writeOneAtAutoNode),
@@ -1148,6 +1248,75 @@ class AtFile:
         if not ok:
             raise IOError
         at.setPathUa(p, newPath)  # Remember that we have changed paths.
+    #@+node:ekr.20261018034107.1: *6* at.write fingerprints
+    #@+node:ekr.20261018034107.2: *7* at.computeWriteFingerprint
+    def computeWriteFingerprint(self, root: Position) -> str:
+        """
+        Return a digest of everything in the outline that determines the
+        contents of root's external file:
+
+        - The gnxs, levels, headlines and bodies of root's subtree.
+        - The headlines and bodies of root's ancestors, which may contain directives.
+        """
+        h = hashlib.md5()
+        h.update(b'black' if g.app.write_black_sentinels else b'')
+        for p in root.parents(copy=False):
+            h.update(f"\0{p.h}\0{p.b}".encode('utf-8', 'replace'))
+        for p in root.self_and_subtree(copy=False):
+            h.update(f"\0{p.gnx}\0{p.level()}\0{p.h}\0{p.b}".encode('utf-8', 'replace'))
+        return h.hexdigest()
+    #@+node:ekr.20261018280000.25: *7* at.getWriteFingerprint
+    def getWriteFingerprint(self, root: Position) -> str:
+        """
+        Return the fingerprint of root's subtree.
+
+        Within writeAll, compute the fingerprint only once per root.
+        """
+        at = self
+        data = at.root_fingerprint
+        if not data or data[0] != root.v:
+            return at.computeWriteFingerprint(root)
+        if data[1] is None:
+            data = at.root_fingerprint = (root.v, at.computeWriteFingerprint(root))
+        return data[1]
+    #@+node:ekr.20261018034107.3: *7* at.isUnchangedSinceLastWrite
+    def isUnchangedSinceLastWrite(self, root: Position) -> bool:
+        """
+        Return True if at.replaceFile wrote (or compared) root's external file,
+        the file has not changed on disk since then, and the subtree that
+        generates the file has not changed.
+
+        at.writeAllHelper need not regenerate such files.
+        """
+        at, c = self, self.c
+        if not (root.isAtFileNode() or root.isAtThinFileNode() or root.isAtCleanNode()):
+            return False
+        data = at.write_fingerprints.get(root.gnx)
+        if not data:
+            return False
+        path, mtime, size, digest = data
+        if path != c.fullPath(root):
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (
+            (stat.st_mtime_ns, stat.st_size) == (mtime, size)
+            and digest == at.getWriteFingerprint(root)
+        )
+    #@+node:ekr.20261018034107.4: *7* at.rememberWriteFingerprint
+    def rememberWriteFingerprint(self, root: Position) -> None:
+        """Remember the fingerprint of root's subtree and external file."""
+        at, c = self, self.c
+        path = c.fullPath(root)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            at.write_fingerprints.pop(root.gnx, None)
+            return
+        at.write_fingerprints[root.gnx] = (
+            path, stat.st_mtime_ns, stat.st_size, at.getWriteFingerprint(root))
     #@+node:ekr.20190109172025.1: *5* at.writeAtAutoContents
     def writeAtAutoContents(self, fileName: str, root: Position) -> str:  # pragma: no cover
         """Common helper for atAutoToString and writeOneAtAutoNode."""
@@ -1459,6 +1628,8 @@ class AtFile:
             else:
                 contents = ''.join(at.outputList)
                 at.replaceFile(contents, at.encoding, fileName, root)
+                # goto-global-line can use contents if root's tree doesn't change.
+                c.gotoCommands.remember_file_contents(root, contents)
         except Exception:
             at.writeException(fileName, root)
     #@+node:ekr.20210501065352.1: *6* at.writeOneAtNosentNode
@@ -2594,6 +2765,7 @@ class AtFile:
                 if root:
                     # Fix bug 889175: Remember the full fileName.
                     at.rememberReadPath(fileName, root)
+                    at.rememberWriteFingerprint(root)
                     at.checkPythonCode(contents, fileName, root)
             else:
                 at.addToOrphanList(root)  # pragma: no cover
@@ -2616,6 +2788,8 @@ class AtFile:
                 g.es(f"{timestamp}unchanged: {sfn}")  # pragma: no cover
             # Check unchanged files.
             at.checkUnchangedFiles(contents, fileName, root)
+            if root:
+                at.rememberWriteFingerprint(root)
             return False  # No change to original file.
         #
         # Warn if we are only adjusting the line endings.
@@ -2633,6 +2807,8 @@ class AtFile:
             c.setFileTimeStamp(fileName)
             if not g.unitTesting:
                 g.es(f"{timestamp}wrote: {sfn}")  # pragma: no cover
+            if root:
+                at.rememberWriteFingerprint(root)
         else:  # pragma: no cover
             g.error('error writing', sfn)
             g.es('not written:', sfn)
@@ -3023,6 +3199,9 @@ class FastAtRead:
         self.gnx2vnode: dict[str, VNode] = gnx2vnode  # The global fc.gnxDict. Keys are gnx's, values are vnodes.
         self.path: str = None
         self.root: Position = None
+        # The results of scan_lines, for at.readWithParseCache.
+        self.bodies: Optional[dict[str, str]] = None  # Keys are gnxs, values are body texts.
+        self.node_starts: list[tuple[str, str, int]] = []  # Tuples are (gnx, headline, level).
         # compiled patterns...
         self.after_pat: re.Pattern = None
         self.all_pat: re.Pattern = None
@@ -3152,6 +3331,10 @@ class FastAtRead:
         root_v = parent_v  # Does not change.
         level_stack.append((root_v, None))
 
+        # Remember all node sentinels so read_from_cache can recreate the tree.
+        self.bodies = None
+        self.node_starts = node_starts = []
+
         # Init the gnx dict last.
         gnx2vnode = self.gnx2vnode  # Keys are gnx's, values are vnodes.
         gnx2body: dict[str, list[str]] = {}  # Keys are gnxs, values are list of body lines.
@@ -3265,6 +3448,7 @@ class FastAtRead:
                 gnx, head = m.group(2), m.group(5)
                 # m.group(3) is the level number, m.group(4) is the number of stars.
                 level = int(m.group(3)) if m.group(3) else 1 + len(m.group(4))
+                node_starts.append((gnx, head, level))
                 v = gnx2vnode.get(gnx)
 
                 # Case 1: The root @file node. Don't change the headline.
@@ -3583,6 +3767,7 @@ class FastAtRead:
             v = gnx2vnode.get(key)
             assert v, (key, v)
             v._bodyString = g.toUnicode(''.join(body))
+        self.bodies = {key: gnx2vnode[key]._bodyString for key in gnx2body}
         #@-<< post pass: set all body text>>
     #@+node:ekr.20180603170614.1: *3* fast_at.read_into_root
     def read_into_root(self, contents: str, path: str, root: Position) -> bool:
@@ -3604,6 +3789,65 @@ class FastAtRead:
         comment_delims, first_lines, start_i = data
         self.scan_lines(comment_delims, first_lines, lines, path, start_i)
         return True
+    #@+node:ekr.20261018031522.3: *3* fast_at.read_from_cache
+    def read_from_cache(self,
+        node_starts: list[tuple[str, str, int]],
+        bodies: dict[str, str],
+        path: str,
+        root: Position,
+    ) -> None:
+        """
+        Recreate the tree of vnodes anchored in root.v from the saved results
+        of scan_lines, without rescanning the file.
+
+        This code must link vnodes exactly as << handle node_start >> does.
+        """
+        self.path = path
+        self.root = root
+        root.v._deleteAllChildren()
+        context = self.c
+        gnx2vnode = self.gnx2vnode
+        root_v = root.v
+        gnx2vnode[root_v.gnx] = root_v
+        level_stack: list[tuple[VNode, VNode]] = [(root_v, None)]
+        root_seen = False
+        for gnx, head, level in node_starts:
+            v = gnx2vnode.get(gnx)
+            # Case 1: The root @file node. Don't change the headline.
+            if not root_seen:
+                root_seen = True
+                if root_v.gnx != gnx:
+                    gnx2vnode.pop(root_v.gnx, None)
+                    root_v.fileIndex = gnx
+                gnx2vnode[gnx] = root_v
+                root_v.children = []
+                continue
+            # Case 2: We are scanning the descendants of a clone.
+            parent_v, clone_v = level_stack[level - 2]
+            if v and clone_v:
+                v._headString = head
+                level_stack = level_stack[: level - 1]
+                level_stack.append((v, clone_v))
+                v.children = []
+                parent_v.children.append(v)
+                continue
+            # Case 3: we are not already scanning the descendants of a clone.
+            if v:
+                clone_v = v
+                v.children = []
+            else:
+                v = leoNodes.VNode(context=context, gnx=gnx)
+            gnx2vnode[gnx] = v
+            v._headString = head
+            level_stack = level_stack[: level - 1]
+            level_stack.append((v, clone_v))
+            parent_v.children.append(v)
+            v.parents.append(parent_v)
+        # Set the body text.
+        for gnx, body_s in bodies.items():
+            gnx2vnode[gnx]._bodyString = body_s
+        self.bodies = bodies
+        self.node_starts = node_starts
     #@-others
 #@+node:ekr.20240410111658.3: ** class LeoIOStatus
 class LeoIOStatus:
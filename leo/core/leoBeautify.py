@@ -4,10 +4,17 @@
 #@+<< leoBeautify imports & annotations >>
 #@+node:ekr.20220822114944.1: ** << leoBeautify imports & annotations >>
 from __future__ import annotations
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
 import sys
 import os
 import time
-from typing import Any, Union, TYPE_CHECKING
+import traceback
+from typing import Any, Generator, Iterable, Optional, Union, TYPE_CHECKING
 # Third-party tools.
 try:
     import black
@@ -45,24 +52,26 @@ def orange_diff_files(event: LeoKeyEvent) -> None:
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
+    t1 = time.perf_counter()
     tag = 'beautify-files-diff'
     g.es(f"{tag}...")
     settings = orange_settings(c)
     roots = g.findRootsWithPredicate(c, c.p)
+    results = run_root_jobs(c, 'beautify-diff', roots, settings)
     for root in roots:
         filename = c.fullPath(root)
-        if os.path.exists(filename):
+        if filename in results:
             print('')
             print(f"{tag}: {g.shortFileName(filename)}")
-            changed = leoAst.Orange(settings=settings).beautify_file_diff(filename)
+            changed, output = results[filename]
+            print(output, end='')
             changed_s = 'changed' if changed else 'unchanged'
             g.es(f"{changed_s:>9}: {g.shortFileName(filename)}")
         else:
             print('')
             print(f"{tag}: file not found:{filename}")
             g.es(f"file not found:\n{filename}")
-    t2 = time.process_time()
+    t2 = time.perf_counter()
     print('')
     g.es_print(f"{tag}: {len(roots)} file{g.plural(len(roots))} in {t2 - t1:5.2f} sec.")
 #@+node:ekr.20200107165603.1: *4* beautify-files
@@ -72,21 +81,23 @@ def orange_files(event: LeoKeyEvent) -> None:
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
+    t1 = time.perf_counter()
     tag = 'beautify-files'
     g.es(f"{tag}...")
     settings = orange_settings(c)
     roots = g.findRootsWithPredicate(c, c.p)
+    results = run_root_jobs(c, 'beautify', roots, settings)
     n_changed = 0
     for root in roots:
         filename = c.fullPath(root)
-        if os.path.exists(filename):
-            changed = leoAst.Orange(settings=settings).beautify_file(filename)
+        if filename in results:
+            changed, output = results[filename]
+            print(output, end='')
             if changed:
                 n_changed += 1
         else:
             g.es_print(f"file not found: {filename}")
-    t2 = time.process_time()
+    t2 = time.perf_counter()
     print('')
     g.es_print(
         f"total files: {len(roots)}, "
@@ -142,17 +153,19 @@ def fstringify_files(event: LeoKeyEvent) -> None:
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
+    t1 = time.perf_counter()
     tag = 'fstringify-files'
     g.es(f"{tag}...")
     roots = g.findRootsWithPredicate(c, c.p)
+    results = run_root_jobs(c, 'fstringify', roots)
     n_changed = 0
     for root in roots:
         filename = c.fullPath(root)
-        if os.path.exists(filename):
+        if filename in results:
             print('')
             print(g.shortFileName(filename))
-            changed = leoAst.Fstringify().fstringify_file(filename)
+            changed, output = results[filename]
+            print(output, end='')
             changed_s = 'changed' if changed else 'unchanged'
             if changed:
                 n_changed += 1
@@ -161,7 +174,7 @@ def fstringify_files(event: LeoKeyEvent) -> None:
             print('')
             print(f"File not found:{filename}")
             g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
+    t2 = time.perf_counter()
     print('')
     g.es_print(
         f"total files: {len(roots)}, "
@@ -178,23 +191,25 @@ def fstringify_diff_files(event: LeoKeyEvent) -> None:
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
+    t1 = time.perf_counter()
     tag = 'fstringify-files-diff'
     g.es(f"{tag}...")
     roots = g.findRootsWithPredicate(c, c.p)
+    results = run_root_jobs(c, 'fstringify-diff', roots)
     for root in roots:
         filename = c.fullPath(root)
-        if os.path.exists(filename):
+        if filename in results:
             print('')
             print(g.shortFileName(filename))
-            changed = leoAst.Fstringify().fstringify_file_diff(filename)
+            changed, output = results[filename]
+            print(output, end='')
             changed_s = 'changed' if changed else 'unchanged'
             g.es_print(f"{changed_s:>9}: {g.shortFileName(filename)}")
         else:
             print('')
             print(f"File not found:{filename}")
             g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
+    t2 = time.perf_counter()
     print('')
     g.es_print(f"{len(roots)} file{g.plural(len(roots))} in {t2 - t1:5.2f} sec.")
 #@+node:ekr.20200112060001.1: *4* fstringify-files-silent
@@ -205,22 +220,24 @@ def fstringify_files_silent(event: LeoKeyEvent) -> None:
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
+    t1 = time.perf_counter()
     tag = 'silent-fstringify-files'
     g.es(f"{tag}...")
     n_changed = 0
     roots = g.findRootsWithPredicate(c, c.p)
+    results = run_root_jobs(c, 'fstringify-silent', roots)
     for root in roots:
         filename = c.fullPath(root)
-        if os.path.exists(filename):
-            changed = leoAst.Fstringify().fstringify_file_silent(filename)
+        if filename in results:
+            changed, output = results[filename]
+            print(output, end='')
             if changed:
                 n_changed += 1
         else:
             print('')
             print(f"File not found:{filename}")
             g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
+    t2 = time.perf_counter()
     print('')
     n_tot = len(roots)
     g.es_print(
@@ -246,6 +263,192 @@ def orange_settings(c: Cmdr) -> dict[str, Any]:
         'max_split_line_length': max_split_line_length,
         'tab_width': abs(c.tab_width),
     }
+#@+node:ekr.20261018170000.1: *3* Beautify:parallel jobs
+#@+node:ekr.20261018170000.2: *4* function: beautify_job
+def beautify_job(kind: str, filename: str, settings: dict[str, Any], was_dirty: bool = False) -> tuple[Optional[bool], str]:
+    """
+    Beautify or fstringify one file, possibly in a worker process.
+
+    kind: one of beautify_kinds.
+
+    Return (changed, output). output is everything the job printed.
+    changed is None if the job raised an exception.
+    """
+    f = io.StringIO()
+    # g.pr and g.printObj write to sys.__stdout__ outside of unit tests.
+    old_stdout = sys.__stdout__
+    sys.__stdout__ = f  # type:ignore
+    try:
+        with contextlib.redirect_stdout(f):
+            changed = beautify_job_helper(kind, filename, settings, was_dirty)
+    finally:
+        sys.__stdout__ = old_stdout  # type:ignore
+    return changed, f.getvalue()
+
+def beautify_job_helper(kind: str, filename: str, settings: dict[str, Any], was_dirty: bool) -> Optional[bool]:
+    """Run one job of beautify_job. Return None if the job raised an exception."""
+    changed: Optional[bool]
+    try:
+        if kind == 'beautify':
+            changed = leoAst.Orange(settings=settings).beautify_file(filename)
+        elif kind == 'beautify-diff':
+            changed = leoAst.Orange(settings=settings).beautify_file_diff(filename)
+        elif kind == 'fstringify':
+            changed = leoAst.Fstringify().fstringify_file(filename)
+        elif kind == 'fstringify-diff':
+            changed = leoAst.Fstringify().fstringify_file_diff(filename)
+        elif kind == 'fstringify-silent':
+            changed = leoAst.Fstringify().fstringify_file_silent(filename)
+        elif kind == 'tbo':
+            from leo.core.leoTokens import TokenBasedOrange
+            changed = TokenBasedOrange(settings).beautify_file(filename, was_dirty)
+        else:
+            raise ValueError(f"unknown kind: {kind!r}")
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        changed = None
+    return changed
+
+beautify_kinds = (
+    'beautify', 'beautify-diff',
+    'fstringify', 'fstringify-diff', 'fstringify-silent',
+    'tbo',
+)
+#@+node:ekr.20261018170000.3: *4* function: run_beautify_jobs
+def run_beautify_jobs(
+    kind: str,
+    filenames: list[str],
+    settings: dict[str, Any] = None,
+    dirty_files: list[str] = None,
+    processes: int = None,
+    cache_path: str = None,
+) -> list[tuple[bool, str]]:
+    """
+    Run beautify_job for all the given files, using a pool of worker
+    processes if there is more than one file and more than one process.
+
+    Skip files whose contents have not changed since the last run of the same
+    job left them unchanged. cache_path is the path to the json file that
+    remembers the hashes of the files' contents. None: use
+    ~/.leo/beautify-cache.json if ~/.leo exists.
+
+    Return a list of (changed, output) tuples, in the order of filenames.
+    """
+    settings = settings or {}
+    dirty_files = dirty_files or []
+    processes = processes or os.cpu_count() or 1
+    cache_path = cache_path or beautify_cache_path()
+    cache = load_beautify_cache(cache_path)
+    # Changing the settings or the beautifier invalidates the cache.
+    if kind == 'tbo':
+        from leo.core import leoTokens
+        module_path = leoTokens.__file__
+    else:
+        module_path = leoAst.__file__
+    prefix = hashlib.sha1(
+        json.dumps([kind, settings, os.path.getmtime(module_path)], sort_keys=True, default=repr)
+        .encode('utf-8')).hexdigest()
+    results: list[tuple[bool, str]] = [(False, '')] * len(filenames)
+    todo: list[tuple[int, str, str]] = []  # (index, key, digest)
+    for i, filename in enumerate(filenames):
+        key = f"{prefix}:{int(filename in dirty_files)}:{os.path.abspath(filename)}"
+        try:
+            with open(filename, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            digest = None
+        entry = cache.get(key)
+        if digest and entry and entry[0] == digest:
+            results[i] = (False, entry[1])  # Unchanged.
+        else:
+            todo.append((i, key, digest))
+    args = (
+        [kind] * len(todo),
+        [filenames[i] for i, key, digest in todo],
+        [settings] * len(todo),
+        [filenames[i] in dirty_files for i, key, digest in todo],
+    )
+    job_results: Iterable[tuple[Optional[bool], str]]
+    if processes > 1 and len(todo) > 1:
+        # Spawn fresh interpreters: Leo's process may be running a gui.
+        context = multiprocessing.get_context('spawn')
+        n = min(processes, len(todo))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n, mp_context=context) as executor:
+            with worker_sys_path():
+                job_results = list(executor.map(beautify_job, *args, chunksize=max(1, len(todo) // (4 * n))))
+    else:
+        job_results = [beautify_job(*z) for z in zip(*args)]
+    for (i, key, digest), (changed, output) in zip(todo, job_results):
+        results[i] = (bool(changed), output)
+        if changed is False and digest:
+            cache[key] = [digest, output]
+        else:
+            cache.pop(key, None)
+    if todo:
+        save_beautify_cache(cache_path, cache)
+    return results
+#@+node:ekr.20261018170000.8: *4* function: worker_sys_path
+@contextlib.contextmanager
+def worker_sys_path() -> Generator[None, None, None]:
+    """
+    Remove Leo's own subdirectories from sys.path while starting worker processes.
+
+    Running scripts adds directories to sys.path. Modules in leo/plugins/writers,
+    for example, would shadow standard modules in the workers.
+    """
+    leo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    old_path = sys.path[:]
+    sys.path[:] = [z for z in old_path if not os.path.abspath(z or '.').startswith(leo_dir + os.sep)]
+    try:
+        yield
+    finally:
+        sys.path[:] = old_path
+#@+node:ekr.20261018170000.4: *4* functions: beautify cache
+def beautify_cache_path() -> Optional[str]:
+    """Return the path to the default cache file for run_beautify_jobs."""
+    home_dir = g.app and g.app.homeLeoDir or os.path.join(os.path.expanduser('~'), '.leo')
+    return os.path.join(home_dir, 'beautify-cache.json') if os.path.isdir(home_dir) else None
+
+def load_beautify_cache(path: Optional[str]) -> dict[str, list[str]]:
+    """Return the cache of run_beautify_jobs."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            d = json.load(f)
+        return d if isinstance(d, dict) else {}
+    except Exception:
+        return {}
+
+def save_beautify_cache(path: Optional[str], d: dict[str, list[str]]) -> None:
+    """Write the cache of run_beautify_jobs."""
+    if not path:
+        return
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(d, f)
+    except Exception:
+        g.es_exception()
+#@+node:ekr.20261018170000.5: *4* function: run_root_jobs
+def run_root_jobs(
+    c: Cmdr,
+    kind: str,
+    roots: list[Position],
+    settings: dict[str, Any] = None,
+) -> dict[str, tuple[bool, str]]:
+    """
+    Run beautify jobs for the external files of the given roots.
+
+    @int beautify-processes sets the number of worker processes.
+    The default is the number of cpus.
+
+    Return a dict whose keys are the paths of existing external files and
+    whose values are (changed, output) tuples.
+    """
+    filenames = list(dict.fromkeys(z for z in (c.fullPath(root) for root in roots) if os.path.exists(z)))
+    processes = c.config.getInt('beautify-processes')
+    results = run_beautify_jobs(kind, filenames, settings, processes=processes)
+    return dict(zip(filenames, results))
 #@+node:ekr.20191028140926.1: *3* Beautify:test functions
 #@+node:ekr.20191029184103.1: *4* function: show
 def show(obj: Any, tag: str, dump: bool) -> None:
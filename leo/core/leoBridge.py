@@ -44,15 +44,53 @@
 # - bridge.openLeoFile(path) returns a completely standard Leo commander.
 #   Host programs can use these commanders as described in Leo's scripting
 #   chapter.
+#
+# Bridge servers
+# --------------
+#
+# Creating the bridge controller takes much longer than most short jobs.
+# A **bridge server** is a warm Leo process that keeps its bridge controller
+# and recently used commanders. Host programs send jobs to bridge servers
+# with a BridgeClient::
+#
+#     from leo.core import leoBridge
+#     client = leoBridge.BridgeClient()
+#     n = client.run_script(path, 'result = len(list(c.all_positions()))')
+#     client.call(path, 'mymodule:check_outline', verbose=True)
+#
+# - The client starts servers as needed. Servers listen on local sockets
+#   (named pipes on Windows) in ~/.leo, protected by the key in
+#   ~/.leo/bridge.key.
+#
+# - Each server caches up to max_commanders commanders. A server reopens a
+#   commander when the .leo file or any of its external files change, and
+#   closes a commander whose job leaves it changed. Jobs must save the
+#   changes they want to keep.
+#
+# - A server exits after idle_timeout seconds without jobs and after
+#   max_jobs jobs. The client starts a fresh server for the next job.
+#
+# - With processes > 1, the client sends all jobs for a given .leo file to
+#   the same server.
 #@-<< about the leoBridge module >>
 #@+<< leoBridge imports & annotations >>
 #@+node:ekr.20220901084154.1: ** << leoBridge imports & annotations >>
 # This module must import *no* Leo modules at the outer level!
 from __future__ import annotations
+from collections import OrderedDict
+import contextlib
+import importlib
+import io
+from multiprocessing.connection import Client, Connection, Listener
 import os
+import secrets
+import subprocess
 import sys
+import threading
+import time
 import traceback
 from typing import Any, Optional, TYPE_CHECKING
+import zlib
 
 if TYPE_CHECKING:  # pragma: no cover
     from leo.core.leoCommands import Commands as Cmdr
@@ -319,5 +357,418 @@ class BridgeController:
             g.app.global_cacher = leoCache.GlobalCacher()
             g.app.db = g.app.global_cacher.db
     #@-others
+#@+node:ekr.20261018180000.1: ** class BridgeError
+class BridgeError(Exception):
+    """An error reported by a bridge server, or the failure to reach one."""
+#@+node:ekr.20261018180000.2: ** class BridgeServer
+class BridgeServer:
+    """
+    A warm Leo process that runs jobs for BridgeClients.
+
+    The server handles one job per connection, one connection at a time.
+    """
+    #@+others
+    #@+node:ekr.20261018180000.3: *3* server.ctor
+    def __init__(
+        self,
+        address: str,
+        authkey: bytes,
+        idle_timeout: float = 600.0,
+        loadPlugins: bool = True,
+        max_commanders: int = 8,
+        max_jobs: int = 1000,
+        readSettings: bool = True,
+        useCaches: bool = True,
+    ) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.idle_timeout = idle_timeout
+        self.max_commanders = max_commanders
+        self.max_jobs = max_jobs
+        self.bridge = controller(
+            gui='nullGui',
+            loadPlugins=loadPlugins,
+            readSettings=readSettings,
+            silent=True,
+            useCaches=useCaches,
+            verbose=False,
+        )
+        self.g = self.bridge.globals()
+        # Keys are absolute paths, values are g.Bunch(c, signature), most recently used last.
+        self.commanders: OrderedDict[str, Any] = OrderedDict()
+        self.busy = False
+        self.jobs = 0
+        self.last_time = time.monotonic()
+        self.stopped = False
+    #@+node:ekr.20261018180000.4: *3* server.serve
+    def serve(self) -> None:
+        """Handle jobs until the server is idle or has handled max_jobs jobs."""
+        if os.name != 'nt' and os.path.exists(self.address):
+            # Remove the socket of a server that has died.
+            if is_server_running(self.address, self.authkey):
+                return
+            os.remove(self.address)
+        with Listener(self.address, authkey=self.authkey) as listener:
+            threading.Thread(target=self.watchdog, daemon=True).start()
+            while not self.stopped:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    continue  # A client failed to authenticate.
+                with conn:
+                    self.handle_connection(conn)
+        for path in list(self.commanders):
+            self.close_commander(path)
+    #@+node:ekr.20261018180000.5: *3* server.watchdog
+    def watchdog(self) -> None:
+        """Stop the server when it has been idle for idle_timeout seconds."""
+        while not self.stopped:
+            time.sleep(min(1.0, self.idle_timeout))
+            if not self.busy and time.monotonic() - self.last_time > self.idle_timeout:
+                self.stopped = True
+                # Wake the listener.
+                with contextlib.suppress(Exception):
+                    Client(self.address, authkey=self.authkey).close()
+    #@+node:ekr.20261018180000.6: *3* server.handle_connection
+    def handle_connection(self, conn: Connection) -> None:
+        """Run the job sent on conn and send the response."""
+        if not conn.poll(10.0):
+            return  # The watchdog, or a client that sent nothing.
+        try:
+            request = conn.recv()
+        except Exception:
+            return
+        if self.stopped:
+            # The client will start another server.
+            conn.send({'ok': False, 'retry': True})
+            return
+        self.busy = True
+        try:
+            response = self.run_request(request)
+            try:
+                conn.send(response)
+            except Exception:
+                # The value could not be pickled.
+                response['value'] = repr(response['value'])
+                conn.send(response)
+        finally:
+            self.busy = False
+            self.last_time = time.monotonic()
+        if self.jobs >= self.max_jobs:
+            self.stopped = True
+    #@+node:ekr.20261018180000.7: *3* server.run_request
+    def run_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Run one request. Return the response."""
+        kind = request.get('kind')
+        if kind == 'stats':
+            return {'ok': True, 'value': self.stats(), 'output': ''}
+        if kind == 'shutdown':
+            self.stopped = True
+            return {'ok': True, 'value': None, 'output': ''}
+        self.jobs += 1
+        output = io.StringIO()
+        path = request.get('path')
+        value, error = None, None
+        old_cwd = os.getcwd()
+        # g.pr and g.es_print write to sys.__stdout__.
+        old_stdout, old_stderr = sys.__stdout__, sys.__stderr__
+        sys.__stdout__ = sys.__stderr__ = output  # type:ignore
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                os.chdir(request.get('cwd') or old_cwd)
+                c = self.get_commander(path) if path else None
+                value = self.run_job(c, request)
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            os.chdir(old_cwd)
+            sys.__stdout__, sys.__stderr__ = old_stdout, old_stderr  # type:ignore
+        if path and path in self.commanders:
+            c = self.commanders[path].c
+            if c.isChanged():
+                # Don't let the unsaved changes leak into later jobs.
+                self.close_commander(path)
+            else:
+                self.commanders[path].signature = self.get_signature(c)
+        return {'ok': error is None, 'value': value, 'output': output.getvalue(), 'error': error}
+    #@+node:ekr.20261018180000.8: *3* server.run_job
+    def run_job(self, c: Optional[Cmdr], request: dict[str, Any]) -> Any:
+        """
+        Run a job on c.
+
+        Scripts run with c, g, p and args predefined. Their value is the
+        value of the "result" variable.
+
+        Functions, given as "module:function", are called with c and the
+        request's args and kwargs.
+        """
+        args, kwargs = request.get('args', ()), request.get('kwargs', {})
+        if request.get('kind') == 'script':
+            d = {'args': args, 'c': c, 'g': self.g, 'p': c.p if c else None, 'result': None}
+            exec(compile(request['script'], '<bridge script>', 'exec'), d)
+            return d['result']
+        if request.get('kind') == 'function':
+            module_name, function_name = request['function'].split(':')
+            func = getattr(importlib.import_module(module_name), function_name)
+            return func(c, *args, **kwargs)
+        raise BridgeError(f"unknown request: {request.get('kind')!r}")
+    #@+node:ekr.20261018180000.9: *3* server.get_commander & helpers
+    def get_commander(self, path: str) -> Cmdr:
+        """
+        Return a commander for the given path, opening the file if necessary.
+        Reopen the file if it or any of its external files have changed.
+        """
+        bunch = self.commanders.get(path)
+        if bunch:
+            if bunch.signature == self.get_signature(bunch.c):
+                self.commanders.move_to_end(path)
+                return bunch.c
+            self.close_commander(path)
+        if not os.path.exists(path):
+            raise BridgeError(f"file not found: {path}")
+        c = self.bridge.openLeoFile(path)
+        if not c:
+            raise BridgeError(f"can not open: {path}")
+        self.commanders[path] = self.g.Bunch(c=c, signature=self.get_signature(c))
+        while len(self.commanders) > self.max_commanders:
+            self.close_commander(next(iter(self.commanders)))
+        return c
+    #@+node:ekr.20261018180000.10: *4* server.close_commander
+    def close_commander(self, path: str) -> None:
+        """Close the commander for the given path, discarding all changes."""
+        bunch = self.commanders.pop(path, None)
+        if bunch:
+            c = bunch.c
+            c.changed = False  # Don't prompt.
+            self.g.app.closeLeoWindow(c.frame, finish_quit=False)
+    #@+node:ekr.20261018180000.11: *4* server.get_signature
+    def get_signature(self, c: Cmdr) -> tuple:
+        """Return the mtimes of c's .leo file and of all its external files."""
+
+        def mtime(path: str) -> float:
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return -1.0
+
+        paths = {c.fullPath(p) for p in c.all_unique_positions() if p.isAnyAtFileNode()}
+        return tuple((z, mtime(z)) for z in sorted([c.fileName()] + list(paths)))
+    #@+node:ekr.20261018180000.12: *3* server.stats
+    def stats(self) -> dict[str, Any]:
+        """Return a dict describing the server."""
+        return {
+            'commanders': list(self.commanders),
+            'jobs': self.jobs,
+            'pid': os.getpid(),
+        }
+    #@-others
+#@+node:ekr.20261018180000.13: ** class BridgeClient
+class BridgeClient:
+    """Send jobs to bridge servers, starting the servers as needed."""
+    #@+others
+    #@+node:ekr.20261018180000.14: *3* client.ctor
+    def __init__(
+        self,
+        directory: str = None,
+        idle_timeout: float = 600.0,
+        loadPlugins: bool = True,
+        max_commanders: int = 8,
+        max_jobs: int = 1000,
+        processes: int = 1,
+        readSettings: bool = True,
+        start_timeout: float = 60.0,
+        useCaches: bool = True,
+    ) -> None:
+        """
+        Ctor for the BridgeClient class.
+
+        directory:  The directory containing the sockets, the key and the logs.
+                    The default is ~/.leo.
+        processes:  The number of servers.
+        The other arguments apply only to the servers that this client starts.
+        """
+        self.directory = os.path.abspath(directory or os.path.join(os.path.expanduser('~'), '.leo'))
+        self.idle_timeout = idle_timeout
+        self.loadPlugins = loadPlugins
+        self.max_commanders = max_commanders
+        self.max_jobs = max_jobs
+        self.processes = max(1, processes)
+        self.readSettings = readSettings
+        self.start_timeout = start_timeout
+        self.useCaches = useCaches
+        self.authkey = get_bridge_authkey(self.directory)
+    #@+node:ekr.20261018180000.15: *3* client.call & run_script
+    def call(self, path: Optional[str], function: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call function(c, *args, **kwargs) in a server, where c is the commander
+        for path. function has the form "module:function".
+
+        Return the function's value.
+        """
+        return self.send(path, {'kind': 'function', 'function': function, 'args': args, 'kwargs': kwargs})
+
+    def run_script(self, path: Optional[str], script: str, *args: Any) -> Any:
+        """
+        Run script in a server, with c set to the commander for path.
+
+        Return the value of the script's "result" variable.
+        """
+        return self.send(path, {'kind': 'script', 'script': script, 'args': args})
+    #@+node:ekr.20261018180000.16: *3* client.send & helpers
+    def send(self, path: Optional[str], request: dict[str, Any]) -> Any:
+        """Send a request to the server for path. Return the value of the response."""
+        path = os.path.abspath(path) if path else None
+        request = dict(request, path=path, cwd=os.getcwd())
+        address = self.get_address(path)
+        for _attempt in range(3):
+            conn = self.connect(address)
+            try:
+                with conn:
+                    conn.send(request)
+                    response = conn.recv()
+            except (EOFError, OSError):
+                raise BridgeError(f"bridge server failed: {address}")
+            if response.get('retry'):
+                continue  # The server was stopping.
+            if response.get('output'):
+                print(response['output'], end='')
+            if not response['ok']:
+                raise BridgeError(response.get('error') or 'unknown error')
+            return response['value']
+        raise BridgeError(f"bridge server is not accepting jobs: {address}")
+    #@+node:ekr.20261018180000.17: *4* client.connect
+    def connect(self, address: str) -> Connection:
+        """Connect to the server at address, starting the server if necessary."""
+        started = False
+        t1 = time.monotonic()
+        while True:
+            try:
+                return Client(address, authkey=self.authkey)
+            except (EOFError, OSError):
+                pass
+            if not started:
+                self.start_server(address)
+                started = True
+            if time.monotonic() - t1 > self.start_timeout:
+                raise BridgeError(f"can not start bridge server: {address}")
+            time.sleep(0.05)
+    #@+node:ekr.20261018180000.18: *4* client.get_address
+    def get_address(self, path: Optional[str]) -> str:
+        """Return the address of the server for the given path."""
+        n = zlib.crc32(path.encode('utf-8')) % self.processes if path else 0
+        return get_bridge_address(self.directory, n, self.get_options())
+    #@+node:ekr.20261018260000.3: *4* client.get_options
+    def get_options(self) -> str:
+        """
+        Return a string describing the options of this client's servers.
+
+        Servers started with other options have other addresses.
+        """
+        return ''.join(str(int(z)) for z in (self.loadPlugins, self.readSettings, self.useCaches))
+    #@+node:ekr.20261018180000.19: *4* client.start_server
+    def start_server(self, address: str) -> None:
+        """Start a server, in a new session, listening at the given address."""
+        leo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(z for z in (leo_root, env.get('PYTHONPATH')) if z)
+        args = [
+            sys.executable, '-m', 'leo.core.leoBridge',
+            '--serve', self.directory,
+            '--address', address,
+            '--idle-timeout', str(self.idle_timeout),
+            '--max-commanders', str(self.max_commanders),
+            '--max-jobs', str(self.max_jobs),
+        ]
+        for flag, option in (
+            (self.loadPlugins, '--no-plugins'),
+            (self.readSettings, '--no-settings'),
+            (self.useCaches, '--no-caches'),
+        ):
+            if not flag:
+                args.append(option)
+        kwargs: dict[str, Any] = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS  # type:ignore
+        else:
+            kwargs['start_new_session'] = True
+        with open(os.path.join(self.directory, 'bridge-server.log'), 'ab') as log:
+            subprocess.Popen(args, env=env, stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=log, **kwargs)
+    #@+node:ekr.20261018180000.20: *3* client.shutdown & stats
+    def shutdown(self) -> None:
+        """Stop all running servers."""
+        for n in range(self.processes):
+            address = get_bridge_address(self.directory, n, self.get_options())
+            if is_server_running(address, self.authkey):
+                with contextlib.suppress(EOFError, OSError):
+                    with Client(address, authkey=self.authkey) as conn:
+                        conn.send({'kind': 'shutdown'})
+                        conn.recv()
+
+    def stats(self, path: Optional[str] = None) -> dict[str, Any]:
+        """Return a dict describing the server for the given path."""
+        return self.send(path, {'kind': 'stats'})
+    #@-others
+#@+node:ekr.20261018180000.21: ** function: get_bridge_address
+def get_bridge_address(directory: str, n: int, options: str = '') -> str:
+    """
+    Return the address of bridge server n.
+
+    options: a string describing the server's options. See client.get_options.
+    """
+    if os.name == 'nt':
+        tag = zlib.crc32(directory.encode('utf-8'))
+        return rf"\\.\pipe\leo-bridge-{tag}-{n}-{options}"
+    return os.path.join(directory, f"bridge-{n}-{options}.sock")
+#@+node:ekr.20261018180000.22: ** function: get_bridge_authkey
+def get_bridge_authkey(directory: str) -> bytes:
+    """Return the key that clients and servers share, creating it if necessary."""
+    path = os.path.join(directory, 'bridge.key')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass  # Another client created the key.
+    with open(path, 'r') as f:
+        return f.read().strip().encode('ascii')
+#@+node:ekr.20261018180000.23: ** function: is_server_running
+def is_server_running(address: str, authkey: bytes) -> bool:
+    """Return True if a bridge server is listening at address."""
+    try:
+        Client(address, authkey=authkey).close()
+        return True
+    except Exception:
+        return False
+#@+node:ekr.20261018180000.24: ** function: main
+def main() -> None:
+    """Run a bridge server: python -m leo.core.leoBridge --serve DIRECTORY"""
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a Leo bridge server.')
+    parser.add_argument('--serve', metavar='DIRECTORY', required=True, help='the directory containing bridge.key')
+    parser.add_argument('--address', required=True, help='the address of the server')
+    parser.add_argument('--idle-timeout', type=float, default=600.0)
+    parser.add_argument('--max-commanders', type=int, default=8)
+    parser.add_argument('--max-jobs', type=int, default=1000)
+    parser.add_argument('--no-caches', action='store_true')
+    parser.add_argument('--no-plugins', action='store_true')
+    parser.add_argument('--no-settings', action='store_true')
+    args = parser.parse_args()
+    server = BridgeServer(
+        args.address,
+        get_bridge_authkey(args.serve),
+        idle_timeout=args.idle_timeout,
+        loadPlugins=not args.no_plugins,
+        max_commanders=args.max_commanders,
+        max_jobs=args.max_jobs,
+        readSettings=not args.no_settings,
+        useCaches=not args.no_caches,
+    )
+    server.serve()
 #@-others
+
+if __name__ == '__main__':
+    main()
 #@-leo
@@ -9,9 +9,15 @@
 #@+node:ekr.20140827092102.18575: ** << leoColorizer imports >>
 from __future__ import annotations
 from collections.abc import Callable
+import importlib.util
+import marshal
+import os
 import re
 import string
+import sys
+import threading
 import time
+import types
 from typing import Any, Generator, Sequence, Optional, Union, TYPE_CHECKING
 import warnings
 #
@@ -28,10 +34,10 @@ from leo.core.leoColor import leo_color_database
 #
 # Qt imports. May fail from the bridge.
 try:  # #1973
-    from leo.core.leoQt import Qsci, QtGui, QtWidgets
+    from leo.core.leoQt import Qsci, QtCore, QtGui, QtWidgets
     from leo.core.leoQt import UnderlineStyle, Weight  # #2330
 except Exception:
-    Qsci = QtGui = QtWidgets = None
+    Qsci = QtCore = QtGui = QtWidgets = None
     UnderlineStyle = Weight = None
 #@-<< leoColorizer imports >>
 #@+<< leoColorizer annotations >>
@@ -42,7 +48,7 @@ if TYPE_CHECKING:  # pragma: no cover
     from leo.core.leoGlobals import GeneralSetting
     Color = Any
     Font = Any
-    Mode = g.Bunch
+    Mode = Union[g.Bunch, types.ModuleType]  # A mode module or a g.Bunch.
     RuleSet = Any
     Widget = Any
 #@-<< leoColorizer annotations >>
@@ -70,6 +76,7 @@ class BaseColorizer:
         # Configuration dicts...
         self.configDict: dict[str, Any] = {}  # Keys are tags, values are colors (names or values).
         self.configUnderlineDict: dict[str, bool] = {}  # Keys are tags, values are bools.
+        self.format_cache: dict[tuple[str, str], Any] = {}  # Keys are (language, tag). Set by setTag.
         # Common state ivars...
         self.enabled = False  # Per-node enable/disable flag set by updateSyntaxColorer.
         self.highlighter: Any = g.NullObject()  # May be overridden in subclass...
@@ -91,6 +98,7 @@ class BaseColorizer:
     #@+node:ekr.20110605121601.18578: *4* BaseColorizer.configureTags & helpers
     def configureTags(self) -> None:
         """Configure all tags."""
+        self.format_cache = {}
         self.configure_fonts()
         self.configure_colors()
         self.configure_variable_tags()
@@ -692,7 +700,7 @@ class BaseColorizer:
         self.prev = None  # The previous token.
         self.fonts: dict[str, Font] = {}  # Keys are config names.  Values are actual fonts.
         self.keywords: dict[str, int] = {}  # Keys are keywords, values are 0..5.
-        self.modes: dict[str, Mode] = {}  # Keys are languages, values are modes.
+        self.modes: dict[str, g.Bunch] = {}  # Keys are languages, values are mode bunches.
         self.mode: Mode = None  # The mode object for the present language.
         self.modeBunch: g.Bunch = None  # A bunch fully describing a mode.
         self.modeStack: list[Mode] = []
@@ -746,6 +754,17 @@ class BaseColorizer:
             return
         if not tag.strip():
             return
+        # Use the cached format if possible.
+        key = (self.language, tag)
+        if key in self.format_cache and not trace:
+            cached = self.format_cache[key]
+            if cached:
+                format, font = cached
+                if font:
+                    self.configure_hard_tab_width(font)  # #1919.
+                self.tagCount += 1
+                self.highlighter.setFormat(i, j - i, format)
+            return
         tag = tag.lower().strip()
         # A hack to allow continuation dots on any tag.
         dots = tag.startswith('dots')
@@ -755,6 +774,7 @@ class BaseColorizer:
         d = self.configDict
         colorName = d.get(f"{self.language}.{tag}") or d.get(tag)
         if not colorName:
+            self.format_cache[key] = None
             return
         # New in Leo 5.8.1: allow symbolic color names here.
         #                   (All keys in leo_color_database are normalized.)
@@ -795,6 +815,7 @@ class BaseColorizer:
         else:
             format.setForeground(color)
             format.setUnderlineStyle(UnderlineStyle.NoUnderline)
+        self.format_cache[key] = (format, font)
         self.tagCount += 1
         if trace:
             report()  # A superb trace.
@@ -858,6 +879,131 @@ class BaseColorizer:
             d[word] = word
         return d
     #@-others
+#@+node:ekr.20261018240000.1: ** class ModeCache
+class ModeCache:
+    """
+    A cache of the compiled code of Leo's mode files, leo/modes/*.py.
+
+    Parsing and compiling big mode files such as latex.py takes much longer
+    than executing their code. The cache holds the compiled code of all
+    modes that Leo has used in a single marshal file, read once per process.
+
+    Modes loaded from the cache are ordinary modules in sys.modules, so all
+    commanders share their keyword tables and rule dicts.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.entries: dict[str, tuple[tuple[int, int], types.CodeType]] = None  # Set by load.
+        self.lock = threading.RLock()
+        self.path = path  # The path to the cache file. None: use ~/.leo/db.
+        self.preload_thread: threading.Thread = None
+    #@+others
+    #@+node:ekr.20261018240000.2: *3* ModeCache.cache_path
+    def cache_path(self) -> Optional[str]:
+        """
+        Return the path to the cache file, or None if there is no cache.
+
+        The marshal format depends on the python version.
+        """
+        if self.path:
+            return self.path
+        if g.unitTesting or not g.app.homeLeoDir:
+            return None
+        return os.path.join(g.app.homeLeoDir, 'db', f"mode_cache.{sys.implementation.cache_tag}")
+    #@+node:ekr.20261018240000.3: *3* ModeCache.get_code
+    def get_code(self, language: str) -> Optional[types.CodeType]:
+        """
+        Return the compiled code of leo/modes/<language>.py, updating the cache
+        if the file has changed.
+        """
+        path = os.path.join(g.app.loadDir, '..', 'modes', f"{language}.py")
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entries = self.load()
+            entry = entries.get(language)
+            if entry and entry[0] == key:
+                return entry[1]
+            with open(path, 'rb') as f:
+                code = compile(f.read(), path, 'exec', dont_inherit=True)
+            entries[language] = (key, code)
+            self.save()
+        return code
+    #@+node:ekr.20261018240000.4: *3* ModeCache.get_module
+    def get_module(self, language: str) -> Optional[types.ModuleType]:
+        """
+        Return the module leo.modes.<language>, executing its cached code if
+        the module has not been imported.
+        """
+        name = f"leo.modes.{language}"
+        module = sys.modules.get(name)
+        if module:
+            return module
+        if not self.cache_path():
+            return g.import_module(name=name)
+        with self.lock:
+            module = sys.modules.get(name)
+            if module:
+                return module
+            try:
+                code = self.get_code(language)
+                # The spec supports importlib.reload and introspection.
+                spec = importlib.util.spec_from_file_location(name, code.co_filename)
+                module = importlib.util.module_from_spec(spec)
+                exec(code, module.__dict__)
+            except Exception:
+                # Let the import machinery report any errors.
+                return g.import_module(name=name)
+            # Add the module only after executing its code, for the preload thread.
+            sys.modules[name] = module
+            setattr(importlib.import_module('leo.modes'), language, module)
+        return module
+    #@+node:ekr.20261018240000.5: *3* ModeCache.load & save
+    def load(self) -> dict[str, tuple[tuple[int, int], types.CodeType]]:
+        """Read the cache file, once."""
+        if self.entries is None:
+            self.entries = {}
+            try:
+                with open(self.cache_path(), 'rb') as f:
+                    d = marshal.loads(f.read())
+                if d.get('magic') == importlib.util.MAGIC_NUMBER:
+                    self.entries = d['modes']
+            except Exception:
+                pass  # A missing or damaged cache is empty.
+        return self.entries
+
+    def save(self) -> None:
+        """Write the cache file. The cache is optional: ignore all errors."""
+        path = self.cache_path()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        data = {'magic': importlib.util.MAGIC_NUMBER, 'modes': self.entries}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(marshal.dumps(data))
+            os.replace(temp_path, path)
+        except Exception:
+            if 'coloring' in g.app.debug:
+                g.es_exception()
+    #@+node:ekr.20261018240000.6: *3* ModeCache.preload
+    def preload(self, languages: list[str]) -> None:
+        """
+        Load the modes for the given languages in a background thread.
+        Do nothing if a preload has already started.
+        """
+        if self.preload_thread or not languages:
+            return
+
+        def preload_helper() -> None:
+            for language in languages:
+                path = os.path.join(g.app.loadDir, '..', 'modes', f"{language}.py")
+                if os.path.exists(path):
+                    self.get_module(language)
+
+        self.preload_thread = threading.Thread(
+            target=preload_helper, name='leo-preload-modes', daemon=True)
+        self.preload_thread.start()
+    #@-others
 #@+node:ekr.20110605121601.18569: ** class JEditColorizer(BaseColorizer)
 # This is c.frame.body.colorizer
 
@@ -898,8 +1044,29 @@ class JEditColorizer(BaseColorizer):
         self.section_delim1 = '<<'
         self.section_delim2 = '>>'
         #
+        # Incremental colorizing of huge bodies. See jedit.start_incremental.
+        self.colored_lines = 0  # Lines [0:colored_lines] have been colored in order.
+        self.force_range: tuple[int, int] = None  # Set by jedit.force_lines.
+        self.incremental_timer: Any = None  # An IdleTime instance.
+        self.incremental_v: VNode = None  # The vnode being colored incrementally.
+        self.line_state_cache: dict[VNode, g.Bunch] = {}  # An LRU cache of line states.
+        self.line_states: list[int] = None  # Cached end states of incremental_v's lines.
+        self.viewport_only = False  # True: never color lines outside the viewport.
+        self.viewport_pending = False  # True: the incremental timer must color the viewport.
+        self.viewport_range: tuple[int, int] = None  # The range of visible lines.
+        #
+        # Compiled rules. See jedit.compile_rules.
+        self.compiled_rules: g.Bunch = None
+        self.word_pattern: tuple[dict[str, str], int, re.Pattern] = None  # Set by match_keywords.
+        if isinstance(widget, QtWidgets.QTextEdit):
+            widget.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        #
         # Init common data...
         self.reloadSettings()
+        #
+        # Load the modes in @string colorizer-preload-languages in the background.
+        languages = c.config.getString('colorizer-preload-languages') or ''
+        self.mode_cache.preload(languages.replace(',', ' ').lower().split())
     #@+node:ekr.20110605121601.18580: *5* jedit.init
     def init(self) -> None:
         """Init the colorizer, but *not* state."""
@@ -928,6 +1095,7 @@ class JEditColorizer(BaseColorizer):
         self.restartDict = {}
         self.stateDict = {}
         self.stateNameDict = {}
+        self.start_incremental(v)
     #@+node:ekr.20211029073553.1: *5* jedit.init_section_delims
     def init_section_delims(self) -> None:
 
@@ -947,6 +1115,15 @@ class JEditColorizer(BaseColorizer):
         else:
             self.section_delim1 = '<<'
             self.section_delim2 = '>>'
+    #@+node:ekr.20261018120000.1: *5* jedit.reloadSettings
+    def reloadSettings(self) -> None:
+        """Reload the base settings, plus the incremental colorizing settings."""
+        getInt = self.c.config.getInt
+        # Bodies with more lines are colored incrementally.
+        self.incremental_lines = getInt('colorizer-incremental-lines') or 20_000
+        # Bodies with more lines are colored only in the viewport.
+        self.viewport_only_lines = getInt('colorizer-viewport-only-lines') or 500_000
+        super().reloadSettings()
     #@+node:ekr.20110605121601.18576: *4* jedit.addImportedRules
     def addImportedRules(self, mode: Mode, rulesDict: dict[str, Any], rulesetName: str) -> None:
         """Append any imported rules at the end of the rulesets specified in mode.importDict"""
@@ -969,6 +1146,7 @@ class JEditColorizer(BaseColorizer):
                             aList.extend(rules)
                             self.rulesDict[key] = aList
             self.initModeFromBunch(savedBunch)
+        self.compile_rules()
     #@+node:ekr.20110605121601.18577: *4* jedit.addLeoRules
     def addLeoRules(self, theDict: dict[str, Any]) -> None:
         """Put Leo-specific rules to theList."""
@@ -1014,6 +1192,9 @@ class JEditColorizer(BaseColorizer):
                     theList.append(rule)
                 theDict[ch] = theList
     #@+node:ekr.20110605121601.18581: *4* jedit.init_mode & helpers
+    # All colorizers share the cache of compiled mode files.
+    mode_cache = ModeCache()
+
     def init_mode(self, name: str) -> bool:
         """Name may be a language name or a delegate name."""
         if not name:
@@ -1032,7 +1213,7 @@ class JEditColorizer(BaseColorizer):
         path = g.os_path_join(g.app.loadDir, '..', 'modes')
         fn = g.os_path_join(path, f"{language}.py")
         if g.os_path_exists(fn):
-            mode = g.import_module(name=f"leo.modes.{language}")
+            mode = self.mode_cache.get_module(language)
         else:
             mode = None
         return self.init_mode_from_module(name, mode)
@@ -1094,6 +1275,7 @@ class JEditColorizer(BaseColorizer):
         )
         # Do this after 'officially' initing the mode, to limit recursion.
         self.addImportedRules(mode, self.rulesDict, rulesetName)
+        self.compile_rules()
         self.updateDelimsTables()
         initialDelegate = self.properties.get('initialModeDelegate')
         if initialDelegate:
@@ -1108,6 +1290,33 @@ class JEditColorizer(BaseColorizer):
         self.modeBunch.language = self.language
         self.modes[rulesetName] = self.modeBunch
         return True
+    #@+node:ekr.20261018230000.1: *5* jedit.compile_rules
+    def compile_rules(self) -> None:
+        """
+        Compile self.rulesDict, the rules of the present ruleset.
+
+        mainLoop skips all characters that start no rule with a single regex
+        search instead of looking up each character in self.rulesDict.
+        """
+        rulesDict = self.rulesDict
+        if not isinstance(rulesDict, dict):
+            # modes/plain.py defines a default rule for all characters.
+            self.compiled_rules = g.Bunch(
+                rulesDict=rulesDict, rule_start_pattern=None, source=rulesDict)
+            return
+        # These rules always fail: Qt shows invisibles.
+        noop_rules = (JEditColorizer.match_blanks, JEditColorizer.match_tabs)
+        d: dict[str, list[Callable]] = {}
+        for ch, aList in rulesDict.items():
+            rules = [z for z in aList if z not in noop_rules]
+            if rules and len(ch) == 1:
+                d[ch] = rules
+        chars = ''.join(re.escape(z) for z in sorted(d))
+        self.compiled_rules = g.Bunch(
+            rulesDict=d,
+            rule_start_pattern=re.compile(f"[{chars}]") if chars else None,
+            source=rulesDict,  # mainLoop recompiles if the rulesDict changes.
+        )
     #@+node:ekr.20110605121601.18582: *5* jedit.nameToRulesetName
     def nameToRulesetName(self, name: str) -> tuple[str, str]:
         """
@@ -1238,17 +1447,197 @@ class JEditColorizer(BaseColorizer):
                     aList.insert(0, wiki_rule)
                     d[ch] = aList
         self.rulesDict = d
+        self.compile_rules()
     #@+node:ekr.20240423042341.1: *3* jedit.colorize
     def colorize(self, p: Position) -> None:
         """jedit.Colorize: fully recolor p.b."""
         if not p:
             return
+        old_language = self.language
         self.updateSyntaxColorer(p)
+        if p.v == self.incremental_v and self.language == old_language:
+            # QSyntaxHighlighter has already recolored the changed lines,
+            # and jedit.defer_line has restarted the incremental timer.
+            return
         # Similar to code in jedit.recolor.
         self.init_all_state(p.v)
         self.init()
         # Force QSyntaxHighlighter to do a full recolor.
         self.highlighter.rehighlight()
+    #@+node:ekr.20261018120000.2: *3* jedit: Incremental colorizing
+    # QSyntaxHighlighter colors every line of a document whenever the
+    # document is reloaded. For huge bodies, jedit.recolor colors only the
+    # visible lines and lines [0:colored_lines], and marks all other lines
+    # with the deferred state. An IdleTime timer colors the viewport
+    # first, then extends colored_lines in time-sliced batches.
+
+    deferred_state = -2  # The state of lines that haven't been colored.
+    incremental_batch_lines = 200  # Lines colored by each call to force_lines.
+    incremental_time_slice = 0.05  # Seconds spent in each timer callback.
+    line_state_cache_size = 20  # The number of vnodes in line_state_cache.
+    #@+node:ekr.20261018120000.3: *4* jedit.start_incremental
+    def start_incremental(self, v: VNode) -> None:
+        """
+        Start incremental colorizing if v.b is huge.
+        Called from init_all_state.
+        """
+        self.incremental_v = None
+        if not isinstance(self.widget, QtWidgets.QTextEdit):
+            return
+        n_lines = v.b.count('\n') + 1
+        if n_lines <= self.incremental_lines:
+            return
+        self.incremental_v = v
+        self.colored_lines = 0
+        self.viewport_only = n_lines > self.viewport_only_lines
+        self.viewport_pending = True
+        self.viewport_range = self.visible_lines()
+        # Restore the cached line states, but only for the same text.
+        self.line_states = None
+        bunch = self.line_state_cache.get(v)
+        if bunch:
+            if bunch.body is v._bodyString and bunch.language == self.language:
+                self.line_state_cache[v] = self.line_state_cache.pop(v)  # Most recently used.
+                # Copy the state tables: coloring may add new states.
+                self.line_states = bunch.states
+                self.n2languageDict = dict(bunch.n2languageDict)
+                self.nextState = bunch.nextState
+                self.restartDict = dict(bunch.restartDict)
+                self.stateDict = dict(bunch.stateDict)
+                self.stateNameDict = dict(bunch.stateNameDict)
+            else:
+                del self.line_state_cache[v]
+        self.start_incremental_timer()
+    #@+node:ekr.20261018120000.4: *4* jedit.start_incremental_timer
+    def start_incremental_timer(self) -> None:
+        """Start the incremental colorizing timer if it isn't running."""
+        timer = self.incremental_timer
+        if timer and timer.enabled:
+            return
+        if not timer:
+            timer = self.incremental_timer = g.IdleTime(
+                self.on_incremental_timer, delay=10, tag='incremental-colorizer')
+        if timer:
+            timer.start()
+    #@+node:ekr.20261018120000.5: *4* jedit.on_incremental_timer
+    def on_incremental_timer(self, timer: Any) -> None:
+        """
+        The IdleTime handler for incremental colorizing.
+
+        Color the viewport if necessary. Otherwise, color lines in batches
+        until the time slice expires.
+        """
+        v = self.incremental_v
+        if not v or self.c.p.v != v:
+            timer.stop()
+            return
+        if self.viewport_pending:
+            self.viewport_pending = False
+            self.color_viewport()
+            return
+        if self.viewport_only:
+            timer.stop()
+            return
+        document = self.widget.document()
+        n_lines = document.blockCount()
+        t1 = time.perf_counter()
+        while self.colored_lines < n_lines:
+            i = self.colored_lines
+            j = min(n_lines, i + self.incremental_batch_lines)
+            self.force_lines(i, j)
+            self.colored_lines = j
+            if time.perf_counter() - t1 > self.incremental_time_slice:
+                return
+        timer.stop()
+        self.cache_line_states(v)
+    #@+node:ekr.20261018120000.6: *4* jedit.on_scroll
+    def on_scroll(self, value: int) -> None:
+        """Color the viewport of a huge body after scrolling."""
+        if self.incremental_v:
+            self.viewport_pending = True
+            self.start_incremental_timer()
+    #@+node:ekr.20261018120000.7: *4* jedit.color_viewport
+    def color_viewport(self) -> None:
+        """Color the uncolored visible lines."""
+        i, j = self.viewport_range = self.visible_lines()
+        document = self.widget.document()
+        block = document.findBlockByNumber(i)
+        while block.isValid() and block.blockNumber() < j:
+            if block.userState() == self.deferred_state:
+                n = block.blockNumber()
+                self.force_lines(n, n + 1)
+            block = block.next()
+    #@+node:ekr.20261018120000.8: *4* jedit.force_lines
+    def force_lines(self, i: int, j: int) -> None:
+        """Color lines [i:j] of the body, one at a time."""
+        document = self.widget.document()
+        block = document.findBlockByNumber(i)
+        try:
+            while block.isValid() and block.blockNumber() < j:
+                n = block.blockNumber()
+                self.force_range = n, n + 1
+                self.highlighter.rehighlightBlock(block)
+                block = block.next()
+        finally:
+            self.force_range = None
+    #@+node:ekr.20261018120000.9: *4* jedit.defer_line
+    def defer_line(self, block_n: int) -> bool:
+        """
+        Return True if jedit.recolor should not color the given line of the
+        body being colored incrementally.
+        """
+        if self.force_range:
+            i, j = self.force_range
+            if i <= block_n < j:
+                return False
+        elif block_n < self.colored_lines:
+            # The user has changed the line. Recolor all following lines.
+            self.colored_lines = block_n + 1
+            self.line_states = None
+            self.start_incremental_timer()
+            return False
+        i, j = self.viewport_range or (0, 0)
+        return not (i <= block_n < j)
+    #@+node:ekr.20261018120000.10: *4* jedit.deferred_prev_state
+    def deferred_prev_state(self, block_n: int) -> int:
+        """
+        Return the starting state for the given line when the previous line
+        has not been colored: the cached state if possible, or the initial state.
+        """
+        states = self.line_states
+        if states and 0 < block_n <= len(states):
+            return states[block_n - 1]
+        return self.initialStateNumber
+    #@+node:ekr.20261018120000.11: *4* jedit.cache_line_states
+    def cache_line_states(self, v: VNode) -> None:
+        """Cache the final state of all lines of v.b."""
+        document = self.widget.document()
+        states = []
+        block = document.firstBlock()
+        while block.isValid():
+            states.append(block.userState())
+            block = block.next()
+        d = self.line_state_cache
+        d.pop(v, None)
+        d[v] = g.Bunch(
+            body=v._bodyString,
+            language=self.language,
+            states=states,
+            n2languageDict=dict(self.n2languageDict),
+            nextState=self.nextState,
+            restartDict=dict(self.restartDict),
+            stateDict=dict(self.stateDict),
+            stateNameDict=dict(self.stateNameDict),
+        )
+        while len(d) > self.line_state_cache_size:
+            del d[next(iter(d))]
+    #@+node:ekr.20261018120000.12: *4* jedit.visible_lines
+    def visible_lines(self) -> tuple[int, int]:
+        """Return the range of lines visible in the body."""
+        w = self.widget
+        top = w.cursorForPosition(QtCore.QPoint(0, 0)).blockNumber()
+        bottom = w.cursorForPosition(QtCore.QPoint(0, w.viewport().height() - 1)).blockNumber()
+        return top, bottom + 1
     #@+node:ekr.20110605121601.18638: *3* jedit.mainLoop
     last_v = None
     tot_time = 0.0
@@ -1263,9 +1652,22 @@ class JEditColorizer(BaseColorizer):
                 g.trace(f"NEW NODE: {p.h}\n")
         t1 = time.process_time()
         i = f(s) if f else 0
+        compiled = self.compiled_rules
+        if not compiled or compiled.source is not self.rulesDict:
+            self.compile_rules()
+            compiled = self.compiled_rules
+        rulesDict, pattern = compiled.rulesDict, compiled.rule_start_pattern
         while i < len(s):
             progress = i
-            functions = self.rulesDict.get(s[i], [])
+            functions = rulesDict.get(s[i], None)
+            if not functions:
+                if pattern:
+                    # Skip to the next character that starts a rule.
+                    m = pattern.search(s, i)
+                    i = m.start() if m else len(s)
+                else:
+                    i += 1
+                continue
             for f in functions:
                 # g.trace(f"n: {n:<2} i: {i:<3} {f.__name__:30} {s.rstrip()}")
                 n = f(self, s, i)
@@ -1295,6 +1697,8 @@ class JEditColorizer(BaseColorizer):
         self.recolorCount += 1
         block_n = self.currentBlockNumber()
         n = self.prevState()
+        if n == self.deferred_state:
+            n = self.deferred_prev_state(block_n)
         if p.v == self.old_v:
             new_language = self.n2languageDict.get(n)
             if new_language != self.language:
@@ -1305,6 +1709,10 @@ class JEditColorizer(BaseColorizer):
             assert self.language
             self.init_all_state(p.v)
             self.init()
+        if p.v == self.incremental_v and self.defer_line(block_n):
+            # Don't color the line. Qt stops rehighlighting at unchanged states.
+            self.setState(self.deferred_state)
+            return
         if block_n == 0:
             n = self.initBlock0()
         n = self.setState(n)  # Required.
@@ -2004,8 +2412,12 @@ class JEditColorizer(BaseColorizer):
             chars["'"] = "'"
         if self.language == 'c':
             chars['_'] = '_'
-        while j < n and s[j] in chars:
-            j += 1
+        # The regex matches the longest run of word chars.
+        word_pattern = self.word_pattern
+        if not word_pattern or word_pattern[0] is not chars or word_pattern[1] != len(chars):
+            pattern = re.compile('[' + ''.join(re.escape(z) for z in chars) + ']*')
+            word_pattern = self.word_pattern = (chars, len(chars), pattern)
+        j = word_pattern[2].match(s, i, n).end()
         word = s[i:j]
         # Fix part of #585: A kludge for css.
         if self.language == 'css' and word.endswith(':'):
@@ -2133,6 +2545,9 @@ class JEditColorizer(BaseColorizer):
         # This match was causing most of the syntax-color problems.
         return 0  # 2009/6/23
     #@+node:ekr.20110605121601.18619: *4* jedit.match_regexp_helper
+    # Keys are (pattern, flags), values are compiled regexes. Shared by all colorizers.
+    regexp_cache: dict[tuple[str, int], re.Pattern] = {}
+
     def match_regexp_helper(self, s: str, i: int, pattern: Any) -> int:
         """
         Return the length of the matching text if
@@ -2140,18 +2555,21 @@ class JEditColorizer(BaseColorizer):
         """
         # Leo 6.7.6: Allow compiled regexes.
         if isinstance(pattern, str):
-            try:
-                flags = re.MULTILINE
-                if self.ignore_case:
-                    flags |= re.IGNORECASE
-                # Suppress a FutureWarning: possible nested set.
-                with warnings.catch_warnings():
-                    warnings.filterwarnings("ignore", category=FutureWarning)
-                    re_obj = re.compile(pattern, flags)
-            except Exception:
-                # Do not call g.es here!
-                g.trace(f"Invalid regular expression: {pattern}")
-                return 0
+            flags = re.MULTILINE
+            if self.ignore_case:
+                flags |= re.IGNORECASE
+            re_obj = self.regexp_cache.get((pattern, flags))
+            if not re_obj:
+                try:
+                    # Suppress a FutureWarning: possible nested set.
+                    with warnings.catch_warnings():
+                        warnings.filterwarnings("ignore", category=FutureWarning)
+                        re_obj = re.compile(pattern, flags)
+                except Exception:
+                    # Do not call g.es here!
+                    g.trace(f"Invalid regular expression: {pattern}")
+                    return 0
+                self.regexp_cache[(pattern, flags)] = re_obj
         else:
             re_obj = pattern
         # Match succeeds or fails more quickly than search.
@@ -235,6 +235,9 @@ class Commands:
         self.expansionNode = None  # The last node we expanded or contracted.
         self.nodeConflictList: list[Position] = []  # List of nodes with conflicting read-time data.
         self.nodeConflictFileName: Optional[str] = None  # The fileName for c.nodeConflictList.
+        self.outlineTrackers: list[Any] = []  # Objects notified by v.noteOutlineChange.
+        # Long batch commands call progressCallback(n, total). It may raise an exception to cancel them.
+        self.progressCallback: Optional[Callable[[int, int], None]] = None
         self.user_dict: dict[str, Any] = {}  # Non-persistent dictionary for free use by scripts and plugins.
     #@+node:ekr.20120217070122.10467: *5* c.initEventIvars
     def initEventIvars(self) -> None:
@@ -1304,10 +1307,21 @@ class Commands:
             yield p.v
 
     def all_unique_nodes(self) -> Generator:
-        """A generator returning each vnode of the outline."""
+        """
+        A generator returning each vnode of the outline, in outline order.
+
+        Unlike c.all_unique_positions, this generator follows v.children
+        directly, without creating positions.
+        """
         c = self
-        for p in c.all_unique_positions(copy=False):
-            yield p.v
+        seen: set[VNode] = set()
+        stack = list(reversed(c.hiddenRootNode.children))
+        while stack:
+            v = stack.pop()
+            if v not in seen:
+                seen.add(v)
+                yield v
+                stack.extend(reversed(v.children))
 
     # Compatibility with old code...
 
@@ -1913,8 +1927,10 @@ class Commands:
         Return the number of errors found.
         """
         c = self
-        # Keys are gnx's; values are lists of (id(v), v).
-        vnode_d: dict[str, list[tuple[int, VNode]]] = {}
+        # Keys are gnx's; values are the vnodes with that gnx.
+        vnode_d: dict[str, VNode] = {}
+        # Keys are gnx's; values are lists of *other* vnodes with that gnx.
+        duplicates_d: dict[str, list[VNode]] = {}
         ni = g.app.nodeIndices
         t1 = time.time()
 
@@ -1922,28 +1938,28 @@ class Commands:
             """Set v.fileIndex."""
             v.fileIndex = ni.getNewIndex(v)
 
+        # Check unique vnodes, not positions: clones don't matter.
         count, gnx_errors = 0, 0
-        for p in c.all_positions(copy=False):
+        for v in c.all_unique_nodes():
             count += 1
-            v = p.v
             gnx = v.fileIndex
-            if gnx:  # gnx must be a string.
-                aList = vnode_d.get(gnx, [])
-                aList.append((id(v), v))
+            if not gnx:  # gnx must be a string.
+                gnx_errors += 1
+                new_gnx(v)
+                g.es_print(f"empty v.fileIndex: {v} new: {v.gnx!r}", color='red')
+            elif gnx not in vnode_d:
+                vnode_d[gnx] = v
             else:
+                duplicates_d.setdefault(gnx, []).append(v)
+        for gnx in sorted(duplicates_d.keys()):
+            print('\nc.checkGnxs...')
+            g.es_print(f"multiple vnodes with gnx: {gnx!r}", color='red')
+            # Retain the gnx of the first vnode.
+            for v in [vnode_d[gnx]] + duplicates_d[gnx]:
+                g.es_print(f"id(v): {id(v)} gnx: {v.fileIndex} {v.h}", color='red')
+            for v in duplicates_d[gnx]:
                 gnx_errors += 1
                 new_gnx(v)
-                g.es_print(f"empty v.fileIndex: {v} new: {p.v.gnx!r}", color='red')
-        for gnx in sorted(vnode_d.keys()):
-            aList = list(vnode_d.get(gnx))
-            ids = [id_ for (id_, v) in aList]
-            if len(ids) > 1:
-                print('\nc.checkGnxs...')
-                g.es_print(f"multiple vnodes with gnx: {gnx!r}", color='red')
-                for (id_, v) in aList:
-                    gnx_errors += 1
-                    g.es_print(f"id(v): {id(v)} gnx: {v.fileIndex} {v.h}", color='red')
-                    new_gnx(v)
         ok = not gnx_errors
         t2 = time.time()
         if not ok:
@@ -2082,6 +2098,39 @@ class Commands:
         c = self
 
         #@+others  # Define helpers.
+        #@+node:ekr.20261018200000.1: *6* find_mismatches
+        def find_mismatches() -> Generator:
+            """
+            Yield (parent_v, child_v, children_n, parents_n) for every entry
+            child_v of parent_v.children such that:
+
+                children_n = parent_v.children.count(child_v)
+                parents_n = child_v.parents.count(parent_v)
+                children_n != parents_n
+
+            Count all links in two passes instead of calling list.count for
+            every link: list.count is quadratic for nodes with many children
+            or many clones.
+            """
+            vnodes = list(c.all_unique_nodes())  # Avoids recursion.
+            children_d: dict[tuple[int, int], int] = {}
+            parents_d: dict[tuple[int, int], int] = {}
+            for v in [c.hiddenRootNode] + vnodes:
+                for child_v in v.children:
+                    key = id(v), id(child_v)
+                    children_d[key] = children_d.get(key, 0) + 1
+            for v in vnodes:
+                for parent_v in v.parents:
+                    key = id(parent_v), id(v)
+                    parents_d[key] = parents_d.get(key, 0) + 1
+            if children_d == parents_d:
+                return  # The usual case.
+            for parent_v in vnodes:
+                for child_v in parent_v.children:
+                    key = id(parent_v), id(child_v)
+                    children_n, parents_n = children_d[key], parents_d.get(key, 0)
+                    if children_n != parents_n:
+                        yield parent_v, child_v, children_n, parents_n
         #@+node:ekr.20230728005934.1: *6* find_errors
         def find_errors() -> tuple[list[tuple[VNode, VNode]], list[str], int]:
             """
@@ -2092,17 +2141,13 @@ class Commands:
             error_list: list[tuple[VNode, VNode]] = []
             messages: list[str] = []
             n = 0
-            for parent_v in c.all_unique_nodes():  # Avoids recursion.
-                for child_v in parent_v.children:
-                    children_n = parent_v.children.count(child_v)
-                    parents_n = child_v.parents.count(parent_v)
-                    if children_n != parents_n:
-                        error_list.append((parent_v, child_v))
-                        messages.append(
-                            'Mismatch between parent.children and child.parents\n'
-                            f"parent: {parent_v.h:30} count(parent.children) = {children_n}\n"
-                            f" child: {child_v.h:30} count(child.parents = {parents_n}")
-                        n += 1
+            for parent_v, child_v, children_n, parents_n in find_mismatches():
+                error_list.append((parent_v, child_v))
+                messages.append(
+                    'Mismatch between parent.children and child.parents\n'
+                    f"parent: {parent_v.h:30} count(parent.children) = {children_n}\n"
+                    f" child: {child_v.h:30} count(child.parents = {parents_n}")
+                n += 1
             return error_list, messages, n
         #@+node:ekr.20230728010156.1: *6* fix_errors
         def fix_errors(error_list: list[tuple[VNode, VNode]]) -> None:
@@ -2126,6 +2171,7 @@ class Commands:
                         else:  # pragma: no cover
                             # This could delete the child.
                             parent_v.children.remove(child_v)
+                            parent_v.noteOutlineChange('children')
                             parents_n += 1
         #@+node:ekr.20230728010753.1: *6* undelete_nodes
         def undelete_nodes(error_list: list[tuple[VNode, VNode]]) -> None:
@@ -2138,6 +2184,7 @@ class Commands:
                     seen.append(child_v)
                     parent_v.children.append(child_v)
                     child_v.parents.append(parent_v)
+                    parent_v.noteOutlineChange('children')
         #@+node:ekr.20230728011151.1: *6* recheck
         def recheck() -> tuple[list[tuple[VNode, VNode]], list[str], int]:
             """
@@ -2148,17 +2195,13 @@ class Commands:
             error_list: list[tuple[VNode, VNode]] = []
             messages: list[str] = []
             n = 0
-            for parent_v in c.all_unique_nodes():  # Avoids recursion.
-                for child_v in parent_v.children:
-                    children_n = parent_v.children.count(child_v)
-                    parents_n = child_v.parents.count(parent_v)
-                    if children_n != parents_n:  # pragma: no cover
-                        error_list.append((parent_v, child_v))
-                        messages.append(
-                            'Error recovery failed!\n'
-                            f"parent: {parent_v.h:30} count(parent.children) = {children_n}\n"
-                            f" child: {child_v.h:30} count(child.parents = {parents_n}")
-                        n += 1
+            for parent_v, child_v, children_n, parents_n in find_mismatches():  # pragma: no cover
+                error_list.append((parent_v, child_v))
+                messages.append(
+                    'Error recovery failed!\n'
+                    f"parent: {parent_v.h:30} count(parent.children) = {children_n}\n"
+                    f" child: {child_v.h:30} count(child.parents = {parents_n}")
+                n += 1
             return error_list, messages, n
         #@-others
 
@@ -2231,6 +2274,62 @@ class Commands:
         for f in (c.checkVnodeLinks, c.checkGnxs):
             errors += f()
         return errors
+    #@+node:ekr.20261018200000.2: *4* c.getOutlineStats
+    def getOutlineStats(self) -> dict[str, Any]:
+        """
+        Return a dict of statistics about the outline.
+
+        This method visits each vnode once, so it is fast even for outlines
+        whose clones create millions of positions.
+
+        Keys:
+        "nodes":       The number of vnodes.
+        "positions":   The number of positions. See c.all_positions.
+        "clones":      The number of cloned vnodes.
+        "fan_out":     A dict. Keys are numbers of parent links > 1.
+                       Values are the number of vnodes with that many links.
+        "body_bytes":  The number of bytes in all bodies, encoded as utf-8.
+        "depths":      A dict. Keys are levels. Values are the number of positions at that level.
+        """
+        c = self
+        vnodes = list(c.all_unique_nodes())
+        # The number of entries in parent.children for each vnode, counting multiplicity.
+        in_degree: dict[VNode, int] = {}
+        for v in [c.hiddenRootNode] + vnodes:
+            for child in v.children:
+                in_degree[child] = in_degree.get(child, 0) + 1
+        # Propagate depth counts from parents to children, in topological order.
+        # Keys are vnodes. Values are dicts: keys are levels, values are counts of positions.
+        depths_d: dict[VNode, dict[int, int]] = {c.hiddenRootNode: {-1: 1}}
+        todo = [c.hiddenRootNode]
+        while todo:
+            v = todo.pop()
+            v_depths = depths_d[v]
+            for child in v.children:
+                child_depths = depths_d.setdefault(child, {})
+                for level, n in v_depths.items():
+                    child_depths[level + 1] = child_depths.get(level + 1, 0) + n
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    todo.append(child)
+        depths: dict[int, int] = {}
+        fan_out: dict[int, int] = {}
+        body_bytes = 0
+        for v in vnodes:
+            for level, n in depths_d.get(v, {}).items():
+                depths[level] = depths.get(level, 0) + n
+            n_parents = len(v.parents)
+            if n_parents > 1:
+                fan_out[n_parents] = fan_out.get(n_parents, 0) + 1
+            body_bytes += len(v._bodyString.encode('utf-8'))
+        return {
+            "nodes": len(vnodes),
+            "positions": sum(depths.values()),
+            "clones": sum(fan_out.values()),
+            "fan_out": dict(sorted(fan_out.items())),
+            "body_bytes": body_bytes,
+            "depths": dict(sorted(depths.items())),
+        }
     #@+node:ekr.20031218072017.1765: *4* c.validateOutline (compatibility only)
     # Makes sure all nodes are valid.
 
@@ -4570,6 +4669,7 @@ class Commands:
         for i, v in links_to_be_cut:
             ch = v.children.pop(i)
             ch.parents.remove(v)
+            ch.noteOutlineChange('delete', v, i)
             undodata.append((v.gnx, i, ch.gnx))
         if not c.positionExists(c.p):
             c.selectPosition(c.rootPosition())
@@ -4663,6 +4763,7 @@ class Commands:
                 ch = gnx2v[chgnx]
                 v.children.insert(i, ch)
                 ch.parents.append(v)
+                ch.noteOutlineChange('insert', v, i)
             if not c.positionExists(c.p):
                 c.setCurrentPosition(c.rootPosition())
 
@@ -4671,6 +4772,7 @@ class Commands:
                 v = gnx2v[pgnx]
                 ch = v.children.pop(i)
                 ch.parents.remove(v)
+                ch.noteOutlineChange('delete', v, i)
             if not c.positionExists(c.p):
                 c.setCurrentPosition(c.rootPosition())
 
@@ -966,7 +966,7 @@ class ActiveSettingsOutline:
         Open hidden commanders for leoSettings.leo, myLeoSettings.leo and theme.leo.
         """
         lm = g.app.loadManager
-        lm.readGlobalSettingsFiles()
+        lm.readGlobalSettingsFiles(use_cache=False)
         # Make sure to reload the local file.
         c = g.app.commanders()[0]
         fn = c.fileName()
@@ -3,11 +3,17 @@
 #@+<< leoExternalFiles imports & annotations >>
 #@+node:ekr.20220821202943.1: ** << leoExternalFiles imports & annotations >>
 from __future__ import annotations
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
+import ctypes
+import ctypes.util
+import errno
 import getpass
 import os
+import struct
 import subprocess
+import sys
 import tempfile
+import time
 from typing import Any, Optional, TYPE_CHECKING
 from leo.core import leoGlobals as g
 
@@ -66,6 +72,9 @@ class ExternalFilesController:
     def __init__(self, c: Cmdr = None) -> None:
         """Ctor for ExternalFiles class."""
         self.checksum_d: dict[str, str] = {}  # Keys are full paths, values are file checksums.
+        # For efc.get_at_file_paths.
+        # Keys are commanders. Values are tuples (signature, time, list of (path, position)).
+        self.at_file_paths_d: dict[Cmdr, tuple[Any, float, list[tuple[str, Position]]]] = {}
         # For efc.on_idle.
         # Keys are commanders.
         # Values are cached @bool check-for-changed-external-file settings.
@@ -83,6 +92,8 @@ class ExternalFilesController:
         # DO NOT alter directly, use set_time(path) and
         # get_time(path), see set_time() for notes.
         self._time_d: dict[str, float] = {}
+        # Keys are commanders, values are watchers created by efc.create_watcher.
+        self.watchers_d: dict[Cmdr, Any] = {}
         self.yesno_all_answer: str = None  # answer, 'yes-all', or 'no-all'
         g.app.idleTimeManager.add_callback(self.on_idle)
     #@+node:ekr.20150405105938.1: *3* efc.entries
@@ -109,6 +120,11 @@ class ExternalFilesController:
         for ef in files:
             self.destroy_temp_file(ef)
         self.files = [z for z in self.files if z.path not in paths]
+        # Stop watching the commander's external files.
+        for c in list(self.watchers_d):
+            if c.frame == frame:
+                self.watchers_d.pop(c).close()
+                self.at_file_paths_d.pop(c, None)
     #@+node:ekr.20150407141838.1: *4* efc.find_path_for_node (called from vim.py)
     def find_path_for_node(self, p: Position) -> Optional[str]:
         """
@@ -170,13 +186,21 @@ class ExternalFilesController:
         # #1240: Check the .leo file itself.
         self.idle_check_leo_file(c)
         #
-        # #1100: always scan the entire file for @<file> nodes.
-        # #1134: Nested @<file> nodes are no longer valid, but this will do no harm.
+        # Ask the watcher which of the commander's external files have changed.
+        # efc.has_changed still checks the mod times and checksums of those files.
+        watcher = self.watchers_d.get(c)
+        if not watcher:
+            watcher = self.watchers_d[c] = self.create_watcher(c)
+        entries = self.get_at_file_paths(c)
+        new_paths = watcher.watch(path for path, p in entries)
+        # efc.has_changed remembers the mod times and checksums of new paths.
+        changed_paths = watcher.changed_paths() | set(new_paths)
+        if not changed_paths:
+            return
         state = 'no'
-        for p in c.all_unique_positions():
-            if not p.isAnyAtFileNode():
+        for path, p in entries:
+            if path not in changed_paths or not c.positionExists(p):
                 continue
-            path = c.fullPath(p)
             if not self.has_changed(path):
                 continue
             # Prevent further checks for path.
@@ -194,6 +218,66 @@ class ExternalFilesController:
                 c.selectPosition(p)  # Required.
                 c.refreshFromDisk()
                 c.redraw(old_c)  # #3695: Don't change c.p!
+    #@+node:ekr.20261018041236.1: *5* efc.create_watcher
+    def create_watcher(self, c: Cmdr) -> Any:
+        """
+        Return a watcher for c's external files.
+
+        Plugins may override this method. Watchers must implement:
+
+        watch(paths): Watch exactly the given paths. Return a list of newly watched paths.
+        changed_paths(): Return the set of watched paths that may have changed.
+        close(): Release all resources.
+        """
+        if InotifyWatcher.is_available():
+            try:
+                return InotifyWatcher()
+            except OSError:
+                pass
+        return PollingWatcher()
+    #@+node:ekr.20261018041236.2: *5* efc.get_at_file_paths & helper
+    refresh_interval = 30.0  # Seconds between unconditional refreshes.
+
+    def get_at_file_paths(self, c: Cmdr) -> list[tuple[str, Position]]:
+        """
+        Return a list of tuples (path, p) for all @<file> nodes in c.
+
+        Recompute the list only if the outline may have changed.
+        """
+        signature = self.outline_signature(c)
+        now = time.time()
+        data = self.at_file_paths_d.get(c)
+        if data:
+            old_signature, old_time, entries = data
+            if old_signature == signature and now - old_time < self.refresh_interval:
+                return entries
+        # #1100: always scan the entire file for @<file> nodes.
+        # #1134: Nested @<file> nodes are no longer valid, but this will do no harm.
+        entries = []
+        for p in c.all_unique_positions():
+            if p.isAnyAtFileNode():
+                path = c.fullPath(p)
+                if path:
+                    entries.append((path, p.copy()))
+        self.at_file_paths_d[c] = (signature, now, entries)
+        return entries
+    #@+node:ekr.20261018041236.3: *6* efc.outline_signature
+    def outline_signature(self, c: Cmdr) -> tuple:
+        """
+        Return a tuple that changes whenever the paths of c's @<file> nodes
+        may have changed.
+
+        All outline operations are undoable, so they change the undo state.
+        Typing changes only body text, so 'Typing' beads don't count.
+        """
+        u = c.undoer
+        beads = [z for z in u.beads[: u.bead + 1] if getattr(z, 'undoType', None) != 'Typing']
+        return (
+            len(beads),
+            id(beads[-1]) if beads else None,
+            len(c.fileCommands.gnxDict),
+            c.hiddenRootNode.children[0] if c.hiddenRootNode.children else None,
+        )
     #@+node:ekr.20201207055713.1: *5* efc.idle_check_leo_file
     def idle_check_leo_file(self, c: Cmdr) -> None:
         """Check c's .leo file for external changes."""
@@ -490,6 +574,10 @@ class ExternalFilesController:
         for ef in self.files[:]:
             self.destroy_temp_file(ef)
         self.files = []
+        for watcher in self.watchers_d.values():
+            watcher.close()
+        self.watchers_d = {}
+        self.at_file_paths_d = {}
     #@+node:ekr.20150405110219.1: *3* efc.utilities
 
     #@+node:ekr.20150405200212.1: *4* efc.ask
@@ -649,6 +737,220 @@ class ExternalFilesController:
             title='External file changed',
         )
     #@-others
+#@+node:ekr.20261018041236.4: ** class PollingWatcher
+class PollingWatcher:
+    """
+    A watcher that stats all watched paths in a single batch.
+
+    This is the fallback for platforms without inotify.
+    """
+
+    def __init__(self) -> None:
+        # Keys are watched paths, values are tuples (mtime_ns, size) or None.
+        self.stat_d: dict[str, Optional[tuple[int, int]]] = {}
+
+    #@+others
+    #@+node:ekr.20261018041236.5: *3* PollingWatcher.changed_paths
+    def changed_paths(self) -> set[str]:
+        """Return the set of watched paths whose mod time or size has changed."""
+        result = set()
+        for path, old_stat in self.stat_d.items():
+            new_stat = self.stat(path)
+            if new_stat != old_stat:
+                self.stat_d[path] = new_stat
+                result.add(path)
+        return result
+    #@+node:ekr.20261018041236.6: *3* PollingWatcher.close
+    def close(self) -> None:
+        self.stat_d = {}
+    #@+node:ekr.20261018041236.7: *3* PollingWatcher.stat
+    def stat(self, path: str) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    #@+node:ekr.20261018041236.8: *3* PollingWatcher.watch
+    def watch(self, paths: Iterable[str]) -> list[str]:
+        """Watch exactly the given paths. Return the list of newly watched paths."""
+        paths = list(paths)
+        if len(paths) == len(self.stat_d) and all(z in self.stat_d for z in paths):
+            return []
+        old_d = self.stat_d
+        self.stat_d = {}
+        new_paths = []
+        for path in paths:
+            if path in old_d:
+                self.stat_d[path] = old_d[path]
+            elif path not in self.stat_d:
+                self.stat_d[path] = self.stat(path)
+                new_paths.append(path)
+        return new_paths
+    #@-others
+#@+node:ekr.20261018041236.9: ** class InotifyWatcher
+class InotifyWatcher:
+    """
+    A watcher using Linux's inotify api.
+
+    This class watches the *directories* containing the watched files, so
+    renames (as done by editors and git) are reported properly.
+    It polls only the files whose directories it can not watch. It watches
+    missing, deleted or unmounted directories again when they reappear.
+    """
+
+    # Flags from <sys/inotify.h>.
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    mask = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+        IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+    )
+    event_header = struct.Struct('iIII')  # wd, mask, cookie, len.
+    libc: Any = None
+
+    def __init__(self) -> None:
+        libc = self.get_libc()
+        self.fd: int = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.dir_to_wd: dict[str, int] = {}  # Keys are directories, values are watch descriptors.
+        self.wd_to_dir: dict[int, str] = {}
+        self.missing_dirs: set[str] = set()  # Polled directories that don't exist.
+        self.paths: set[str] = set()
+        self.poller = PollingWatcher()  # For paths in unwatchable directories.
+
+    #@+others
+    #@+node:ekr.20261018041236.10: *3* InotifyWatcher.changed_paths
+    def changed_paths(self) -> set[str]:
+        """Return the set of watched paths mentioned in all pending events."""
+        result = self.poller.changed_paths()
+        if self.fd < 0:
+            return result
+        # Watch missing directories that have reappeared.
+        rewatched = [z for z in list(self.missing_dirs) if os.path.isdir(z) and self.add_watch(z)]
+        if rewatched:
+            # The files may have changed before the watch started.
+            result |= self.paths_in(rewatched)
+            self.update_poller()
+        lost: list[str] = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            if not data:
+                break
+            i, header_size = 0, self.event_header.size
+            while i + header_size <= len(data):
+                wd, mask, _cookie, length = self.event_header.unpack_from(data, i)
+                i += header_size
+                name = data[i : i + length].rstrip(b'\0')
+                i += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost.
+                    result |= self.paths
+                    continue
+                if mask & self.IN_IGNORED:
+                    # The directory itself was deleted or unmounted.
+                    directory = self.wd_to_dir.pop(wd, None)
+                    if directory:
+                        self.dir_to_wd.pop(directory, None)
+                        self.missing_dirs.add(directory)
+                        lost.append(directory)
+                    continue
+                directory = self.wd_to_dir.get(wd)
+                if directory and name:
+                    path = os.path.join(directory, os.fsdecode(name))
+                    if path in self.paths:
+                        result.add(path)
+        if lost:
+            # Poll the lost directories' files until the directories reappear.
+            result |= self.paths_in(lost)
+            self.update_poller()
+        return result
+    #@+node:ekr.20261018041236.11: *3* InotifyWatcher.close
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)  # Removes all watches.
+            self.fd = -1
+        self.dir_to_wd, self.wd_to_dir = {}, {}
+        self.missing_dirs = set()
+        self.paths = set()
+        self.poller.close()
+    #@+node:ekr.20261018041236.12: *3* InotifyWatcher.get_libc & is_available
+    @classmethod
+    def get_libc(cls) -> Any:
+        if cls.libc is None:
+            name = ctypes.util.find_library('c') or 'libc.so.6'
+            cls.libc = ctypes.CDLL(name, use_errno=True)
+        return cls.libc
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Return True if the inotify api exists."""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            return hasattr(cls.get_libc(), 'inotify_init1')
+        except OSError:
+            return False
+    #@+node:ekr.20261018041236.13: *3* InotifyWatcher.watch
+    def watch(self, paths: Iterable[str]) -> list[str]:
+        """Watch exactly the given paths. Return the list of newly watched paths."""
+        libc = self.get_libc()
+        old_paths = self.paths
+        paths = set(paths)
+        if paths == old_paths:
+            return []
+        self.paths = paths
+        new_paths = [z for z in self.paths if z not in old_paths]
+        # Watch all needed directories.
+        directories = {os.path.dirname(z) for z in self.paths}
+        for directory in directories:
+            if directory not in self.dir_to_wd:
+                self.add_watch(directory)
+        # Stop watching unneeded directories.
+        for directory in list(self.dir_to_wd):
+            if directory not in directories:
+                wd = self.dir_to_wd.pop(directory)
+                self.wd_to_dir.pop(wd, None)
+                libc.inotify_rm_watch(self.fd, wd)
+        self.missing_dirs &= directories
+        self.update_poller()
+        return new_paths
+    #@+node:ekr.20261018270000.9: *3* InotifyWatcher.add_watch
+    def add_watch(self, directory: str) -> bool:
+        """Watch the given directory. Return True if the watch succeeded."""
+        wd = self.get_libc().inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+        if wd < 0:
+            # The directory doesn't exist, or we have hit the limit of watches.
+            if ctypes.get_errno() in (errno.ENOENT, errno.ENOTDIR):
+                self.missing_dirs.add(directory)
+            return False
+        self.missing_dirs.discard(directory)
+        self.dir_to_wd[directory] = wd
+        self.wd_to_dir[wd] = directory
+        return True
+    #@+node:ekr.20261018270000.10: *3* InotifyWatcher.paths_in & update_poller
+    def paths_in(self, directories: list[str]) -> set[str]:
+        """Return the watched paths in the given directories."""
+        return {z for z in self.paths if os.path.dirname(z) in directories}
+
+    def update_poller(self) -> None:
+        """Poll exactly the watched paths in unwatched directories."""
+        self.poller.watch(z for z in self.paths if os.path.dirname(z) not in self.dir_to_wd)
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -49,6 +49,19 @@ class FastRedraw:
                 print("  [%s]" % ',\n    '.join(gnxs))
             else:
                 print(z)
+    #@+node:ekr.20261018220000.1: ** FastRedraw.diff_rows
+    def diff_rows(self, a, b):
+        """
+        Diff the a (old) and b (new) lists of visible rows.
+
+        Return the opcodes of difflib.SequenceMatcher, a list of tuples
+        (tag, i1, i2, j1, j2). Rows are hashable keys, say "level:gnx".
+        """
+        if a == b:
+            return [('equal', 0, len(a), 0, len(b))] if a else []
+        # Rows are almost always unique, so junk heuristics would only hurt.
+        d = difflib.SequenceMatcher(None, a, b, autojunk=False)
+        return d.get_opcodes()
     #@+node:ekr.20181202060924.2: ** LeoGui.flatten_outline
     def flatten_outline(self, c):
         """Return a flat list of strings "level:gnx" for all *visible* positions."""
@@ -18,7 +18,8 @@ import shutil
 import sqlite3
 import tempfile
 import time
-from typing import Any, IO, Iterable, Optional, Union, TYPE_CHECKING
+import uuid
+from typing import Any, IO, Iterable, Optional, Sequence, Union, TYPE_CHECKING
 import zipfile
 import xml.etree.ElementTree as ElementTree
 import xml.sax
@@ -571,6 +572,170 @@ class FastRead:
         fc.descendentTnodeUaDictList.append(gnx2ua)
         return hidden_v
     #@-others
+#@+node:ekr.20261018150000.1: ** class LazyDbLoader
+class LazyDbLoader:
+    """
+    Fetch the bodies and uA's of LazyVNodes from the vnodes table of a .db file.
+
+    A bounded LRU cache holds recently used bodies. Changed bodies are
+    pinned in memory until the next save of the .db file.
+    """
+    #@+others
+    #@+node:ekr.20261018150000.2: *3* loader.__init__
+    def __init__(self, path: str, cache_size: int) -> None:
+        self.cache: dict[str, str] = {}  # Keys are gnx's, values are bodies, in LRU order.
+        self.cache_size = cache_size  # The maximum number of characters in the cache.
+        self.cached_chars = 0
+        self.conn: Conn = None
+        self.path: str = None
+        self.pinned: dict[str, LazyVNode] = {}  # Lazy vnodes whose bodies are in memory.
+        self.ua_gnxs: set[str] = set()  # The gnx's of rows with non-empty uA's.
+        self.vnodes: dict[str, LazyVNode] = {}  # All lazy vnodes.
+        self.open(path)
+    #@+node:ekr.20261018150000.3: *3* loader.open & close
+    def open(self, path: str) -> None:
+        """Fetch from the given .db file."""
+        self.close()
+        self.conn = sqlite3.connect(path)
+        self.path = path
+
+    def close(self) -> None:
+        if self.conn:
+            self.conn.close()
+        self.conn = None
+    #@+node:ekr.20261018150000.4: *3* loader.body
+    def body(self, gnx: str) -> str:
+        """Return the body of the given vnode, using the cache."""
+        cache = self.cache
+        s = cache.pop(gnx, None)
+        if s is None:
+            s = self.fetch_body(gnx)
+            self.cached_chars += len(s)
+            while cache and self.cached_chars > self.cache_size:
+                self.cached_chars -= len(cache.pop(next(iter(cache))))
+        cache[gnx] = s  # Most recently used.
+        return s
+    #@+node:ekr.20261018150000.5: *3* loader.fetch_body & fetch_ua
+    def fetch_body(self, gnx: str) -> str:
+        """Return the body of the given vnode, bypassing the cache."""
+        row = self.conn.execute('select body from vnodes where gnx = ?', (gnx,)).fetchone()
+        return row[0] if row and isinstance(row[0], str) else ''
+
+    def fetch_ua(self, gnx: str) -> bytes:
+        """Return the pickled uA of the given vnode."""
+        row = self.conn.execute('select ua from vnodes where gnx = ?', (gnx,)).fetchone()
+        if not row or not row[0]:
+            return FileCommands.empty_ua_pickle
+        return g.toEncodedString(row[0]) if isinstance(row[0], str) else row[0]
+    #@+node:ekr.20261018150000.6: *3* loader.pin & pin_all
+    def pin(self, v: LazyVNode) -> None:
+        """Called when v's body changes."""
+        self.pinned[v.gnx] = v
+        s = self.cache.pop(v.gnx, None)
+        if s is not None:
+            self.cached_chars -= len(s)
+
+    def pin_all(self, vnodes: Iterable[LazyVNode]) -> None:
+        """Load the bodies and uA's of the given vnodes into memory."""
+        for v in vnodes:
+            if not v.pinned:
+                v._bodyString = self.fetch_body(v.gnx)
+            getattr(v, 'unknownAttributes', None)
+    #@+node:ekr.20261018150000.7: *3* loader.saved
+    def saved(self, path: str, rows: dict[str, tuple]) -> None:
+        """
+        Called after saving the outline to the given .db file.
+
+        rows: the rows of the vnodes table, as returned by fc.dbRow.
+        Unpin the saved bodies and update rows to match.
+        """
+        if path != self.path:
+            self.open(path)
+        for gnx, v in list(self.pinned.items()):
+            row = rows.get(gnx)
+            if row and row[2] is not None:
+                del self.pinned[gnx]
+                v.unpin()
+                rows[gnx] = row[:2] + (None,) + row[3:]
+    #@-others
+#@+node:ekr.20261018150000.8: ** class LazyVNode
+class LazyVNode(leoNodes.VNode):
+    """
+    A VNode read from a .db file in lazy mode.
+
+    v._bodyString and v.unknownAttributes are properties that fetch their
+    values from the .db file on first access.
+    """
+
+    __slots__ = ['loader', 'pinned']
+
+    # The descriptors of VNode's slots.
+    body_slot = leoNodes.VNode.__dict__['_bodyString']
+    ua_slot = leoNodes.VNode.__dict__['unknownAttributes']
+
+    #@+others
+    #@+node:ekr.20261018150000.9: *3* LazyVNode.__init__
+    def __init__(self, context: Cmdr, gnx: str, loader: LazyDbLoader) -> None:
+        self.loader = loader
+        self.pinned = True  # Don't pin the body in the VNode ctor.
+        super().__init__(context=context, gnx=gnx)
+        self.unpin()
+        loader.vnodes[gnx] = self
+    #@+node:ekr.20261018150000.10: *3* LazyVNode._bodyString property
+    def __get_body(self) -> str:
+        if self.pinned:
+            return LazyVNode.body_slot.__get__(self)
+        return self.loader.body(self.fileIndex)
+
+    def __set_body(self, s: str) -> None:
+        LazyVNode.body_slot.__set__(self, s)
+        if not self.pinned:
+            self.pinned = True
+            self.loader.pin(self)
+
+    _bodyString = property(__get_body, __set_body)  # type:ignore
+    #@+node:ekr.20261018150000.11: *3* LazyVNode.unknownAttributes property
+    def __get_ua(self) -> dict:
+        try:
+            return LazyVNode.ua_slot.__get__(self)
+        except AttributeError:
+            if self.fileIndex not in self.loader.ua_gnxs:
+                raise
+        try:
+            ua = pickle.loads(self.loader.fetch_ua(self.fileIndex))
+        except Exception:
+            ua = None
+        self.loader.ua_gnxs.discard(self.fileIndex)
+        if not isinstance(ua, dict):
+            raise AttributeError('unknownAttributes')
+        LazyVNode.ua_slot.__set__(self, ua)
+        return ua
+
+    def __set_ua(self, ua: dict) -> None:
+        self.loader.ua_gnxs.discard(self.fileIndex)
+        LazyVNode.ua_slot.__set__(self, ua)
+
+    def __delete_ua(self) -> None:
+        if self.fileIndex in self.loader.ua_gnxs:
+            self.loader.ua_gnxs.discard(self.fileIndex)
+        else:
+            LazyVNode.ua_slot.__delete__(self)
+
+    unknownAttributes = property(__get_ua, __set_ua, __delete_ua)  # type:ignore
+    #@+node:ekr.20261018280000.21: *3* LazyVNode.isBodyInMemory
+    def isBodyInMemory(self) -> bool:
+        """Return True if v._bodyString won't read the .db file."""
+        return self.pinned or self.fileIndex in self.loader.cache
+    #@+node:ekr.20261018150000.13: *3* LazyVNode.unpin
+    def unpin(self) -> None:
+        """Free the body: the .db file contains it."""
+        if self.pinned:
+            try:
+                LazyVNode.body_slot.__delete__(self)
+            except AttributeError:
+                pass
+            self.pinned = False
+    #@-others
 #@+node:ekr.20160514120347.1: ** class FileCommands
 class FileCommands:
     """A class creating the FileCommands subcommander."""
@@ -616,6 +781,13 @@ class FileCommands:
         # fc.gnxDict is never re-inited.
         self.gnxDict: dict[str, VNode] = {}  # Keys are gnx strings.
         self.vnodesDict: dict[str, bool] = {}  # keys are gnx strings.
+        # For incremental saves of .db files...
+        self.db_path: str = None  # The .db file that db_rows describes.
+        self.db_rows: dict[str, tuple] = None  # Keys are gnx's, values are rows of the vnodes table.
+        self.db_state: tuple = None  # The result of fc.getDbState after the last read or write.
+        self.db_dirty: set[VNode] = set()  # Vnodes whose rows may differ from db_rows. See fc.note_change.
+        self.db_trees: set[VNode] = set()  # Vnodes whose entire subtrees may differ from db_rows.
+        self.lazy_loader: LazyDbLoader = None  # Not None: bodies are read lazily from .db files.
     #@+node:ekr.20210316042224.1: *3* fc: Commands
     #@+node:ekr.20031218072017.2012: *4* write-at-file-nodes
     @cmd('write-at-file-nodes')
@@ -932,9 +1104,11 @@ class FileCommands:
         try:
             c.loading = True  # disable c.changed
             conn = sqlite3.connect(path)
-            v = fc.retrieveVnodesFromDb(conn) or fc.initNewDb(conn, path)
+            v = fc.retrieveVnodesFromDb(conn, path) or fc.initNewDb(conn, path)
             if not v:
                 return None
+            if fc.db_rows is not None:
+                fc.db_path = path
 
             # Set timestamp and recovery node.
             c.setFileTimeStamp(path)
@@ -1080,13 +1254,18 @@ class FileCommands:
                 n2.setBodyString(b2)
         return root
     #@+node:vitalije.20170630152841.1: *5* fc.retrieveVnodesFromDb & helpers
-    def retrieveVnodesFromDb(self, conn: Conn) -> VNode:
+    def retrieveVnodesFromDb(self, conn: Conn, path: str = None) -> VNode:
         """
         Recreates tree from the data contained in table vnodes.
 
         This method follows behavior of readSaxFile.
+
+        If @bool db-lazy-bodies is True, read only the outline's structure and
+        headlines. LazyVNodes fetch bodies and uA's from the .db file at path.
         """
         c, fc = self.c, self
+        if path and c.config.getBool('db-lazy-bodies'):
+            return fc.retrieveLazyVnodesFromDb(conn, path)
         sql = '''select gnx, head,
              body,
              children,
@@ -1095,9 +1274,11 @@ class FileCommands:
              statusBits,
              ua from vnodes'''
         vnodes = []
+        rows = {}
         try:
             for row in conn.execute(sql):
                 (gnx, h, b, children, parents, iconVal, statusBits, ua) = row
+                rows[gnx] = row
                 try:
                     ua = pickle.loads(g.toEncodedString(ua))
                 except ValueError:
@@ -1118,6 +1299,60 @@ class FileCommands:
             # there is no vnodes table
             return None
 
+        return fc.linkDbVnodes(conn, vnodes, rows)
+
+    #@+node:ekr.20261018150000.14: *6* fc.retrieveLazyVnodesFromDb
+    def retrieveLazyVnodesFromDb(self, conn: Conn, path: str) -> VNode:
+        """
+        Recreate the tree from the vnodes table, without reading bodies or uA's.
+
+        The LazyVNodes fetch them from the .db file when first needed.
+        """
+        c, fc = self.c, self
+        sql = '''select gnx, head,
+             children,
+             parents,
+             iconVal,
+             statusBits from vnodes'''
+        empty_ua = fc.empty_ua_pickle
+        vnodes = []
+        rows = {}
+        try:
+            ua_gnxs = set(gnx for (gnx,) in conn.execute(
+                'select gnx from vnodes where ua is not null and ua != ? and ua != ?',
+                (empty_ua, b'')))
+            if fc.lazy_loader:
+                fc.lazy_loader.close()
+            cache_size = c.config.getInt('db-lazy-body-cache-size') or 10_000_000
+            loader = LazyDbLoader(path, cache_size)
+            loader.ua_gnxs = ua_gnxs
+            for row in conn.execute(sql):
+                (gnx, h, children, parents, iconVal, statusBits) = row
+                # Remember the rows as fc.dbRow will compute them.
+                rows[gnx] = (
+                    gnx, h, None, children, parents, iconVal, statusBits,
+                    None if gnx in ua_gnxs else empty_ua)
+                v = LazyVNode(context=c, gnx=gnx, loader=loader)
+                v._headString = h
+                v.children = children.split()
+                v.parents = parents.split()
+                v.iconVal = iconVal
+                v.statusBits = statusBits
+                vnodes.append(v)
+        except sqlite3.Error as er:
+            if er.args[0].find('no such table') < 0:
+                g.internalError(er)
+            return None
+        fc.lazy_loader = loader
+        return fc.linkDbVnodes(conn, vnodes, rows)
+    #@+node:ekr.20261018150000.15: *6* fc.linkDbVnodes
+    def linkDbVnodes(self, conn: Conn, vnodes: Sequence[VNode], rows: dict[str, tuple]) -> VNode:
+        """
+        Link the vnodes read from the vnodes table and restore the window's geometry.
+
+        Return the first top-level vnode.
+        """
+        c, fc = self.c, self
         rootChildren = [x for x in vnodes if 'hidden-root-vnode-gnx' in x.parents]
         if not rootChildren:
             g.trace('there should be at least one top level node!')
@@ -1136,6 +1371,10 @@ class FileCommands:
         c.frame.resizePanesToRatio(r1, r2)
         p = fc.decodePosition(encp)
         c.setCurrentPosition(p)
+        # Remember the rows for incremental saves.
+        fc.db_rows = rows
+        fc.db_state = fc.getDbState(conn)
+        fc.trackDbChanges()
         return rootChildren[0]
     #@+node:vitalije.20170815162307.1: *6* fc.initNewDb
     def initNewDb(self, conn: Conn, path: str = None) -> VNode:
@@ -1382,44 +1621,145 @@ class FileCommands:
     #@+node:ekr.20210316034237.1: *4* fc: Writing top-level
     #@+node:vitalije.20170630172118.1: *5* fc.exportToSqlite & helpers
     def exportToSqlite(self, fileName: str) -> bool:
-        """Dump all vnodes to sqlite database. Returns True on success."""
-        c, fc = self.c, self
-        conn = sqlite3.connect(fileName, isolation_level='DEFERRED')
-
-        def dump_u(v: VNode) -> bytes:
-            try:
-                s = pickle.dumps(v.u, protocol=1)
-            except pickle.PicklingError:
-                s = b''  # 2021/06/25: fixed via mypy complaint.
-                g.trace('unpickleable value', repr(v.u))
-            return s
-
-        def dbrow(v: VNode) -> tuple:
-            return (
-                v.gnx,
-                v.h,
-                v.b,
-                ' '.join(x.gnx for x in v.children),
-                ' '.join(x.gnx for x in v.parents),
-                v.iconVal,
-                # #3550: Clear the dirty bit.
-                v.statusBits & ~v.dirtyBit,
-                dump_u(v)
-            )
+        """
+        Dump all vnodes to sqlite database. Returns True on success.
 
+        Write only the changed rows of the vnodes table if the database has
+        not changed since fc last read or wrote it.
+        """
+        c, fc = self.c, self
+        conn = sqlite3.connect(fileName, isolation_level=None)
         ok = False
         try:
-            fc.prepareDbTables(conn)
-            fc.exportDbVersion(conn)
-            fc.exportVnodesToSqlite(conn, (dbrow(v) for v in c.all_unique_nodes()))
-            fc.exportGeomToSqlite(conn)
-            fc.exportHashesToSqlite(conn)
-            conn.commit()
-            conn.close()
+            conn.execute('pragma journal_mode=wal')
+            vnodes = {v.gnx: v for v in c.all_unique_nodes()}
+            loader = fc.lazy_loader
+            if loader:
+                # The saved file won't contain deleted lazy vnodes. Undo might restore them.
+                loader.pin_all(v for gnx, v in loader.vnodes.items() if gnx not in vnodes)
+            conn.execute('begin immediate')
+            try:
+                if fc.canSaveDbIncrementally(conn, fileName):
+                    rows = fc.exportChangedVnodesToSqlite(conn, vnodes)
+                else:
+                    rows = {gnx: fc.dbRow(v) for gnx, v in vnodes.items()}
+                    fc.prepareDbTables(conn)
+                    fc.exportVnodesToSqlite(conn, fc.resolveDbRows(rows.values()))
+                fc.exportDbVersion(conn)
+                fc.exportGeomToSqlite(conn)
+                fc.exportHashesToSqlite(conn)
+                fc.exportSaveIdToSqlite(conn)
+                conn.execute('commit')
+            except sqlite3.Error:
+                conn.execute('rollback')
+                raise
+            if loader:
+                loader.saved(fileName, rows)
+            fc.db_path, fc.db_rows = fileName, rows
+            fc.db_state = fc.getDbState(conn)
+            fc.trackDbChanges()
             ok = True
         except sqlite3.Error as e:
+            fc.db_path = fc.db_rows = fc.db_state = None
             g.internalError(e)
+        finally:
+            conn.close()
         return ok
+    #@+node:ekr.20261018140000.1: *6* fc.canSaveDbIncrementally
+    def canSaveDbIncrementally(self, conn: Conn, fileName: str) -> bool:
+        """
+        Return True if fc.db_rows describes the vnodes table of the database,
+        that is, if nobody else has written the database since fc read or
+        wrote it.
+        """
+        fc = self
+        if fc.db_rows is None or fc.db_path != fileName:
+            return False
+        try:
+            return fc.db_state == fc.getDbState(conn)
+        except sqlite3.Error:
+            return False
+    #@+node:ekr.20261018270000.7: *6* fc.trackDbChanges & note_change
+    def trackDbChanges(self) -> None:
+        """Start remembering the vnodes that change after setting fc.db_rows."""
+        c, fc = self.c, self
+        fc.db_dirty.clear()
+        fc.db_trees.clear()
+        if fc not in c.outlineTrackers:
+            c.outlineTrackers.append(fc)
+
+    def note_change(self, kind: str, v: VNode, parent_v: VNode, childIndex: int) -> None:
+        """
+        Called by v.noteOutlineChange.
+
+        Remember the vnodes whose rows in the vnodes table may have changed.
+        Changes to uA's mark vnodes dirty, which calls v.noteOutlineChange.
+        """
+        if self.db_rows is None:
+            return
+        self.db_dirty.add(v)
+        if parent_v:
+            self.db_dirty.add(parent_v)
+        if kind in ('children', 'tree'):
+            self.db_dirty.update(v.children)
+        if kind == 'tree':
+            self.db_trees.add(v)
+    #@+node:ekr.20261018140000.2: *6* fc.dbRow
+    empty_ua_pickle = pickle.dumps({}, protocol=1)
+
+    def dbRow(self, v: VNode) -> tuple:
+        """
+        Return the row of the vnodes table for v.
+
+        The body and ua columns are None if v is a LazyVNode whose body or uA
+        has not been loaded: the .db file already contains them.
+        """
+        lazy = isinstance(v, LazyVNode)
+        ua_s = self.dbUa(v)
+        return (
+            v.gnx,
+            v.h,
+            None if lazy and not v.pinned else v.b,
+            ' '.join(x.gnx for x in v.children),
+            ' '.join(x.gnx for x in v.parents),
+            v.iconVal,
+            # #3550: Clear the dirty bit.
+            v.statusBits & ~v.dirtyBit,
+            ua_s,
+        )
+    #@+node:ekr.20261018280000.26: *6* fc.dbUa
+    def dbUa(self, v: VNode) -> Optional[bytes]:
+        """
+        Return the ua column of v's row in the vnodes table.
+
+        Return None if v is a LazyVNode whose uA has not been loaded.
+        """
+        # Don't create v.unknownAttributes.
+        if isinstance(v, LazyVNode) and v.fileIndex in v.loader.ua_gnxs:
+            return None
+        ua = getattr(v, 'unknownAttributes', None)
+        if ua is None or ua == {}:
+            return self.empty_ua_pickle
+        try:
+            return pickle.dumps(ua, protocol=1)
+        except pickle.PicklingError:
+            g.trace('unpickleable value', repr(ua))
+            return b''  # 2021/06/25: fixed via mypy complaint.
+    #@+node:ekr.20261018140000.3: *6* fc.getDbState
+    def getDbState(self, conn: Conn) -> tuple:
+        """
+        Return a tuple that changes whenever another program writes the database.
+
+        Full saves recreate the vnodes table, changing the schema version.
+        Leo's saves also write a unique save_id.
+        """
+        schema_version = conn.execute('pragma schema_version').fetchone()[0]
+        try:
+            row = conn.execute(
+                "select value from extra_infos where name = 'save_id'").fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        return schema_version, row and row[0]
     #@+node:vitalije.20170705075107.1: *6* fc.decodePosition
     def decodePosition(self, s: str) -> Position:
         """Creates position from its string representation encoded by fc.encodePosition."""
@@ -1458,6 +1798,79 @@ class FileCommands:
         )
         conn.execute(
             '''create table if not exists extra_infos(name primary key, value)''')
+    #@+node:ekr.20261018140000.4: *6* fc.exportChangedVnodesToSqlite
+    def exportChangedVnodesToSqlite(self, conn: Conn, vnodes: dict[str, VNode]) -> dict[str, tuple]:
+        """
+        Update the vnodes table, which matches fc.db_rows, so that it matches
+        the given vnodes, and return the updated rows.
+
+        Only new vnodes, the vnodes in fc.db_dirty and fc.db_trees, and vnodes
+        whose uA's have changed get new rows. Changes to the outline's
+        structure change the children and parents columns.
+        """
+        fc = self
+        rows = fc.db_rows
+        # Add all vnodes of the trees in fc.db_trees.
+        dirty: set[VNode] = set()
+        stack = list(fc.db_trees)
+        while stack:
+            v = stack.pop()
+            if v not in dirty:
+                dirty.add(v)
+                stack.extend(v.children)
+        dirty |= fc.db_dirty
+        # Scripts may change v.u without calling v.setDirty.
+        for gnx, v in vnodes.items():
+            row = rows.get(gnx)
+            if row and v not in dirty and row[7] != fc.dbUa(v):
+                dirty.add(v)
+        changed = []
+        for v in dirty:
+            if v.gnx in rows and vnodes.get(v.gnx) is v:
+                row = fc.dbRow(v)
+                # Tuple comparisons compare unchanged strings by identity.
+                if rows.get(v.gnx) != row:
+                    changed.append(row)
+        changed.extend(fc.dbRow(v) for gnx, v in vnodes.items() if gnx not in rows)
+        deleted = [gnx for gnx in rows if gnx not in vnodes]
+        conn.executemany(
+            '''replace into vnodes
+            (gnx, head, body, children, parents,
+                iconVal, statusBits, ua)
+            values(?,?,?,?,?,?,?,?);''',
+            (row for row in changed if None not in row),
+        )
+        # Don't change the body or ua columns of unloaded LazyVNodes.
+        columns = ('head', 'body', 'children', 'parents', 'iconVal', 'statusBits', 'ua')
+        for row in changed:
+            if None in row:
+                values = [(name, value) for name, value in zip(columns, row[1:]) if value is not None]
+                conn.execute(
+                    f"update vnodes set {', '.join(f'{name} = ?' for name, value in values)} where gnx = ?",
+                    [value for name, value in values] + [row[0]],
+                )
+        conn.executemany('delete from vnodes where gnx = ?', ((gnx,) for gnx in deleted))
+        for gnx in deleted:
+            del rows[gnx]
+        for row in changed:
+            rows[row[0]] = row
+        return rows
+    #@+node:ekr.20261018150000.16: *6* fc.resolveDbRows
+    def resolveDbRows(self, rows: Iterable[tuple]) -> Iterable[tuple]:
+        """
+        Yield the given rows, fetching the bodies and uA's of unloaded
+        LazyVNodes from the .db file.
+        """
+        loader = self.lazy_loader
+        for row in rows:
+            if None in row:
+                gnx, body, ua_s = row[0], row[2], row[7]
+                if body is None:
+                    body = loader.fetch_body(gnx)
+                if ua_s is None:
+                    ua_s = loader.fetch_ua(gnx)
+                row = row[:2] + (body,) + row[3:7] + (ua_s,)
+            yield row
     #@+node:vitalije.20170701161851.1: *6* fc.exportVnodesToSqlite
     def exportVnodesToSqlite(self, conn: Conn, rows: Iterable) -> None:
         conn.executemany(
@@ -1488,6 +1901,12 @@ class FileCommands:
     def exportDbVersion(self, conn: Conn) -> None:
         conn.execute(
             "replace into extra_infos(name, value) values('dbversion', ?)", ('1.0',))
+    #@+node:ekr.20261018140000.5: *6* fc.exportSaveIdToSqlite
+    def exportSaveIdToSqlite(self, conn: Conn) -> None:
+        """Write a unique id for this save. See fc.getDbState."""
+        conn.execute(
+            "replace into extra_infos(name, value) values('save_id', ?)",
+            (uuid.uuid4().hex,))
     #@+node:vitalije.20170701162204.1: *6* fc.exportHashesToSqlite
     def exportHashesToSqlite(self, conn: Conn) -> None:
         c = self.c
@@ -2105,7 +2524,7 @@ class FileCommands:
     def setCachedBits(self) -> None:
         """
         Set the cached expanded and marked bits for *all* nodes.
-        Also cache the current position.
+        Also cache the current position and the search index.
         """
         trace = 'cache' in g.app.debug
         c = self.c
@@ -2117,6 +2536,7 @@ class FileCommands:
         c.db['expanded'] = ','.join(expanded)
         c.db['marked'] = ','.join(marked)
         c.db['current_position'] = ','.join(current)
+        c.findCommands.search_index.save()
         if trace:
             g.trace(f"\nset c.db for {c.shortFileName()}")
             print('expanded:', expanded)
@@ -5,7 +5,11 @@
 #@+node:ekr.20220415005856.1: ** << leoFind imports & annotations >>
 from __future__ import annotations
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import keyword
+import multiprocessing
+import os
 import re
 import sys
 import time
@@ -150,6 +154,10 @@ class LeoFind:
         self.minibuffer_mode: bool = None
         self.reverse_find_defs: bool = None
         self.prefer_nav_pane: bool = None
+        self.use_search_index: bool = None
+        self.worker_threshold: int = None  # Search in worker processes above this many characters.
+        # The trigram index used by find-all and clone-find-all.
+        self.search_index = SearchIndex(c)
         self.reload_settings()
     #@+node:ekr.20210110073117.6: *4* find.default_settings
     def default_settings(self) -> Settings:
@@ -226,6 +234,8 @@ class LeoFind:
         self.minibuffer_mode = getBool('minibuffer-find-mode', default=False)
         self.reverse_find_defs = getBool('reverse-find-defs', default=False)
         self.prefer_nav_pane = getBool('prefer-nav-pane', default=True)
+        self.use_search_index = getBool('use-search-index', default=True)
+        self.worker_threshold = c.config.getInt('find-worker-threshold') or 8_000_000
 
     reloadSettings = reload_settings  # Necessary alias.
     #@+node:ekr.20210108053422.1: *3* find.batch_change (script helper) & helpers
@@ -1136,36 +1146,39 @@ class LeoFind:
         else:
             positions = list(c.all_unique_positions())
         count = 0
-        for p in positions:
-            count_h, count_b = 0, 0
-            undoData = u.beforeChangeNodeContents(p)
-            if self.search_headline:
-                count_h, new_h = self._change_all_search_and_replace(p.h)
-                if count_h:
-                    count += count_h
-                    p.h = new_h
-            if self.search_body:
-                count_b, new_b = self._change_all_search_and_replace(p.b)
-                if count_b:
-                    count += count_b
-                    p.b = new_b
-            # Check if there was at least one change with either body or headline
-            if count_h or count_b:
-                u.afterChangeNodeContents(p, 'Replace All', undoData)
-                # Also check to honor 'Mark Changes' option
-                if self.mark_changes and not p.isMarked():  # pragma: no cover
-                    markUndoType = 'Mark Changes'
-                    bunch = u.beforeMark(p, markUndoType)
-                    p.setMarked()
-                    p.setDirty()
-                    u.afterMark(p, markUndoType, bunch)
-
-        # suboutline-only is a one-shot for batch commands.
-        self.ftm.set_radio_button('entire-outline')
-        self.root = None
-        self.node_only = self.suboutline_only = False
-        p = c.p
-        u.afterChangeGroup(p, undoType)
+        try:
+            for i, p in enumerate(positions):
+                self.report_progress(i, len(positions))
+                count_h, count_b = 0, 0
+                undoData = u.beforeChangeNodeContents(p)
+                if self.search_headline:
+                    count_h, new_h = self._change_all_search_and_replace(p.h)
+                    if count_h:
+                        count += count_h
+                        p.h = new_h
+                if self.search_body:
+                    count_b, new_b = self._change_all_search_and_replace(p.b)
+                    if count_b:
+                        count += count_b
+                        p.b = new_b
+                # Check if there was at least one change with either body or headline
+                if count_h or count_b:
+                    u.afterChangeNodeContents(p, 'Replace All', undoData)
+                    # Also check to honor 'Mark Changes' option
+                    if self.mark_changes and not p.isMarked():  # pragma: no cover
+                        markUndoType = 'Mark Changes'
+                        bunch = u.beforeMark(p, markUndoType)
+                        p.setMarked()
+                        p.setDirty()
+                        u.afterMark(p, markUndoType, bunch)
+        finally:
+            # Even if the command was cancelled, one undo undoes all changes.
+            # suboutline-only is a one-shot for batch commands.
+            self.ftm.set_radio_button('entire-outline')
+            self.root = None
+            self.node_only = self.suboutline_only = False
+            p = c.p
+            u.afterChangeGroup(p, undoType)
         t2 = time.process_time()
         if not g.unitTesting:  # pragma: no cover
             g.es_print(
@@ -1582,25 +1595,30 @@ class LeoFind:
             vnodes = list(set(z.v for z in c.p.self_and_subtree()))
         else:
             vnodes = list(c.all_unique_nodes())
+        if not self.node_only:
+            # Use the search index to skip vnodes that can't match.
+            find_s = self.replace_back_slashes(self.find_text)
+            candidates = self.get_candidate_vnodes(find_s)
+            if candidates is not None:
+                vnodes = [z for z in vnodes if z in candidates]
+        # Ignore @nosearch nodes.
+        vnodes = [
+            z for z in vnodes
+            if '@nosearch' not in z.b
+            or not any(line.startswith('@nosearch') for line in g.splitLines(z.b))
+        ]
         matches_dict: list[dict] = []
         distinct_body_lines, total_matches, total_nodes = 0, 0, 0
-        for v in vnodes:
-            body, head = [], []
-            # Ignore @nosearch nodes.
-            if any(z.startswith('@nosearch') for z in g.splitLines(v.b)):
-                continue
-            if self.search_body:
-                body = self.find_all_matches_in_string(v.b)
-                total_matches += len(body)
-                # Update the distinct line numbers in this body.
-                line_number_set = set()
-                for index in body:
-                    line_number, _unused = self.index_to_line_info(index, v.b)
-                    line_number_set.add(line_number)
-                distinct_body_lines += len(list(line_number_set))
-            if self.search_headline:
-                head = self.find_all_matches_in_string(v.h)
-                total_matches += len(head)
+        # Search each vnode just once, possibly in worker processes.
+        results = self.search_vnodes('find-all', vnodes)
+        for v, (body, head) in zip(vnodes, results):
+            total_matches += len(body) + len(head)
+            # Update the distinct line numbers in this body.
+            line_number_set = set()
+            for index in body:
+                line_number, _unused = self.index_to_line_info(index, v.b)
+                line_number_set.add(line_number)
+            distinct_body_lines += len(line_number_set)
             if body or head:
                 total_nodes += 1
                 matches_dict.append({'body': body, 'head': head, 'v': v})
@@ -1709,6 +1727,16 @@ class LeoFind:
             return
         unl = p.get_UNL()
         log.put(line.strip() + '\n', nodeLink=f"{unl}::{line_number - 1}")  # Local line.
+    #@+node:ekr.20261018073045.2: *7* find._find_all_in_node
+    def _find_all_in_node(self, h: str, b: str) -> tuple[list[int], list[int]]:
+        """
+        Find all matches in the body b and the headline h.
+
+        Return (body, head), lists of indices into b and h.
+        """
+        body = self.find_all_matches_in_string(b) if self.search_body else []
+        head = self.find_all_matches_in_string(h) if self.search_headline else []
+        return body, head
     #@+node:ekr.20230124101551.1: *7* find.find_all_matches_in_string & helpers
     def find_all_matches_in_string(self, s: str) -> list[int]:
         """
@@ -2064,13 +2092,31 @@ class LeoFind:
             after = None
         count, found = 0, None
         clones, skip = [], set()
+        # Search each vnode just once, possibly in worker processes.
+        vnodes: list[VNode]
+        if self.suboutline_only:
+            vnodes = list(dict.fromkeys(z.v for z in p.self_and_subtree(copy=False)))
+        else:
+            vnodes = list(c.all_unique_nodes())
+        # Use the search index to skip vnodes that can't match.
+        candidates = self.get_candidate_vnodes(self.find_text)
+        if candidates is not None:
+            vnodes = [z for z in vnodes if z in candidates]
+        results = self.search_vnodes('clone-find-all', vnodes)
+        matched = {v for v, result in zip(vnodes, results) if result}
+        if not matched:
+            p = after  # Don't traverse the outline.
+        # Map matched vnodes to positions.
         while p and p != after:
             progress = p.copy()
-            if g.inAtNosearch(p):
+            if p.v not in matched:
+                p.moveToThreadNext()
+            elif g.inAtNosearch(p):
                 p.moveToNodeAfterTree()
             elif p.v in skip:  # pragma: no cover (minor)
                 p.moveToThreadNext()
-            elif self._cfa_find_next_match(p):
+            else:
+                # p.v matches.
                 count += 1
                 if flatten:
                     skip.add(p.v)
@@ -2083,8 +2129,6 @@ class LeoFind:
                     for p2 in p.self_and_subtree(copy=False):
                         skip.add(p2.v)
                     p.moveToNodeAfterTree()
-            else:
-                p.moveToThreadNext()
             assert p != progress
         if clones:
             undoData = u.beforeInsertNode(c.p)
@@ -2135,11 +2179,17 @@ class LeoFind:
         Find the next batch match at p.
         """
         # Called only from unit tests.
+        return self._cfa_node_matches(p.h, p.b)
+    #@+node:ekr.20261018073045.1: *5* find._cfa_node_matches
+    def _cfa_node_matches(self, h: str, b: str) -> bool:
+        """
+        Return True if the headline h or the body b matches.
+        """
         table = []
         if self.search_headline:
-            table.append(p.h)
+            table.append(h)
         if self.search_body:
-            table.append(p.b)
+            table.append(b)
         for s in table:
             self.reverse = False
             pos, newpos = self.inner_search_helper(s, 0, len(s), self.find_text)
@@ -2204,6 +2254,99 @@ class LeoFind:
             p.setDirty()
             u.afterMark(p, undoType, bunch)
         return True
+    #@+node:ekr.20261018061512.14: *4* find.get_candidate_vnodes
+    def get_candidate_vnodes(self, find_s: str) -> Optional[set[VNode]]:
+        """
+        Use the search index to return the set of vnodes that might contain
+        find_s in their headlines or bodies.
+
+        Return None if the index can not narrow the search.
+        """
+        if not self.use_search_index:
+            return None
+        index = self.search_index
+        fragments = index.find_fragments(find_s, self.pattern_match)
+        return index.candidates(fragments) if fragments else None
+    #@+node:ekr.20261018073045.3: *4* find.search_vnodes & helper
+    def search_vnodes(self, kind: str, vnodes: list[VNode]) -> list[Any]:
+        """
+        Search the headline and body of each vnode exactly once.
+
+        kind is 'find-all' or 'clone-find-all'.
+
+        Return a list of results, one for each vnode:
+        - find-all: (body, head), lists of indices into v.b and v.h.
+        - clone-find-all: True if v.h or v.b matches.
+
+        Large outlines are searched in worker processes.
+        """
+        nodes = [(v.h, v.b) for v in vnodes]
+        results = self._search_nodes_in_workers(kind, nodes)
+        if results is None:
+            f = self._find_all_in_node if kind == 'find-all' else self._cfa_node_matches
+            results = []
+            for i, (h, b) in enumerate(nodes):
+                self.report_progress(i, len(nodes))
+                results.append(f(h, b))
+        return results
+    #@+node:ekr.20261018073045.4: *5* find._search_nodes_in_workers
+    def _search_nodes_in_workers(self, kind: str, nodes: list[tuple[str, str]]) -> Optional[list[Any]]:
+        """
+        Search nodes in a pool of worker processes, preserving the order of nodes.
+
+        Return None if the nodes are too small to be worth the overhead,
+        or if the worker processes fail.
+        """
+        size = sum(len(h) + len(b) for h, b in nodes)
+        n_workers = min(8, os.cpu_count() or 1)
+        if n_workers < 2 or len(nodes) < 2 or size < self.worker_threshold:
+            return None
+        settings = {
+            'find_text': self.find_text,
+            'ignore_case': self.ignore_case,
+            'pattern_match': self.pattern_match,
+            'search_body': self.search_body,
+            'search_headline': self.search_headline,
+            'whole_word': self.whole_word,
+        }
+        # Split the nodes into chunks of roughly equal size.
+        chunks: list[list[tuple[str, str]]] = [[]]
+        chunk_size, target = 0, max(1, size // (4 * n_workers))
+        for node in nodes:
+            if chunk_size >= target:
+                chunks.append([])
+                chunk_size = 0
+            chunks[-1].append(node)
+            chunk_size += len(node[0]) + len(node[1])
+        futures = []
+        try:
+            pool = get_search_pool(n_workers)
+            futures = [pool.submit(search_nodes, kind, settings, z) for z in chunks]
+            results: list[Any] = []
+            for future in futures:
+                self.report_progress(len(results), len(nodes))
+                results.extend(future.result())
+            return results
+        except Exception:
+            g.es_print(f"{kind}: worker processes failed. Searching serially")
+            g.es_exception()
+            shut_down_search_pool()
+            return None
+        finally:
+            # Don't search the remaining chunks if the command was cancelled.
+            for future in futures:
+                future.cancel()
+    #@+node:ekr.20261018280000.1: *4* find.report_progress
+    def report_progress(self, n: int, total: int) -> None:
+        """
+        Call c.progressCallback(n, total), if it exists.
+
+        Batch commands call this method as they search or change nodes.
+        The callback may raise an exception to cancel the command.
+        """
+        callback = getattr(self.c, 'progressCallback', None)
+        if callback:
+            callback(n, total)
     #@+node:ekr.20210110073117.31: *4* find.check_args
     def check_args(self, tag: str) -> bool:
         """Check the user arguments to a command."""
@@ -3082,6 +3225,371 @@ class LeoFind:
         if s not in self.findTextList:
             self.findTextList.append(s)
     #@-others
+#@+node:ekr.20261018073045.5: ** class BatchSearcher (LeoFind)
+class BatchSearcher(LeoFind):
+    """
+    A LeoFind that needs no commander.
+
+    Worker processes use this class to search headlines and bodies with
+    exactly the same code as the find-all and clone-find-all commands.
+    """
+
+    def __init__(self, settings: dict[str, Any]) -> None:
+        self.c = None
+        self.match_obj = None
+        self.re_obj = None
+        self.reverse = False
+        for key, value in settings.items():
+            setattr(self, key, value)
+        if self.pattern_match:
+            self.compile_pattern()
+#@+node:ekr.20261018280000.7: ** functions: search pool
+# Leo's persistent pool of worker processes for batch searches.
+search_pool: Optional[ProcessPoolExecutor] = None
+
+def get_search_pool(n_workers: int) -> ProcessPoolExecutor:
+    """
+    Return the search pool, creating it if necessary.
+
+    Forking a Qt process with live threads is unsafe, so the workers are
+    spawned. Spawning is slow, so the pool persists between searches.
+    """
+    global search_pool
+    if search_pool is None:
+        context = multiprocessing.get_context('spawn')
+        search_pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=context)
+    return search_pool
+
+def shut_down_search_pool() -> None:
+    """Shut down the search pool, if it exists."""
+    global search_pool
+    if search_pool is not None:
+        search_pool.shutdown(wait=False, cancel_futures=True)
+        search_pool = None
+#@+node:ekr.20261018073045.6: ** function: search_nodes
+def search_nodes(kind: str, settings: dict[str, Any], nodes: list[tuple[str, str]]) -> list[Any]:
+    """
+    Search the (headline, body) tuples in nodes. Worker processes call this function.
+
+    Return the list of results described in LeoFind.search_vnodes.
+    """
+    searcher = BatchSearcher(settings)
+    f = searcher._find_all_in_node if kind == 'find-all' else searcher._cfa_node_matches
+    return [f(h, b) for h, b in nodes]
+#@+node:ekr.20261018061512.1: ** class SearchIndex (LeoFind.py)
+class SearchIndex:
+    """
+    An inverted index mapping trigrams of the words in v.h and v.b to vnodes.
+
+    The index only narrows the vnodes that *might* match. The existing
+    matchers must still confirm each hit.
+
+    The index is built lazily. It doesn't keep references to headline or
+    body strings, so it doesn't pin lazily loaded bodies. Instead,
+    v.noteOutlineChange tells the index which vnodes to reindex. Scripts
+    that set v._bodyString directly must call v.noteOutlineChange('text').
+
+    The index never reads bodies from .db files. Vnodes whose bodies are
+    still in the .db file are *deferred*: they are candidates for every
+    search, and the index adds them when their bodies are in memory.
+
+    fc.setCachedBits saves the index in c.db.
+    """
+
+    db_key = 'search-index'
+    word_pattern = re.compile(r'\w+')
+
+    #@+others
+    #@+node:ekr.20261018061512.2: *3* index.__init__
+    def __init__(self, c: Cmdr) -> None:
+        self.c = c
+        self.changed = False  # True: the index differs from the saved index.
+        # Keys are lazy vnodes whose bodies are not in memory. Values are their saved entries or None.
+        self.deferred: dict[VNode, Optional[tuple[str, frozenset[str]]]] = {}
+        self.loaded = False  # True: the index has been built.
+        # Keys are vnodes. Values are (digest, trigrams). See index.digest.
+        self.entries: dict[VNode, tuple[str, frozenset[str]]] = {}
+        self.stale: set[VNode] = set()  # Vnodes whose headline or body may have changed.
+        self.stale_trees: set[VNode] = set()  # Vnodes whose entire subtrees may have changed.
+        self.structure_changed = False  # True: vnodes may have been inserted or deleted.
+        # Keys are trigrams. Values are sets of vnodes.
+        self.postings: dict[str, set[VNode]] = {}
+        # Keys are words. Values are the trigrams of the word.
+        self.word_cache: dict[str, frozenset[str]] = {}
+    #@+node:ekr.20261018061512.3: *3* index.candidates & helpers
+    def candidates(self, fragments: list[str]) -> Optional[set[VNode]]:
+        """
+        Return the set of vnodes whose headline or body might contain all the
+        given literal fragments, ignoring case.
+
+        Return None if the fragments don't narrow the search.
+        """
+        trigrams: set[str] = set()
+        for fragment in fragments:
+            for word in self.word_pattern.findall(fragment.casefold()):
+                trigrams |= self.word_trigrams(word)
+        if not trigrams:
+            return None
+        self.refresh()
+        postings = sorted(
+            (self.postings.get(z, set()) for z in trigrams), key=len)
+        result = set(postings[0])
+        for aSet in postings[1:]:
+            if not result:
+                break
+            result &= aSet
+        result.update(self.deferred)
+        return result
+    #@+node:ekr.20261018061512.4: *4* index.find_fragments
+    def find_fragments(self, find_s: str, pattern_match: bool) -> Optional[list[str]]:
+        """
+        Return the literal fragments that every match of find_s must contain.
+
+        Return None if there are no such fragments.
+        """
+        if pattern_match:
+            return self.regex_fragments(find_s)
+        return [find_s] if find_s else None
+    #@+node:ekr.20261018061512.5: *4* index.regex_fragments
+    verbose_pattern = re.compile(r'\(\?[a-zA-Z]*x')
+    escape_pattern = re.compile(
+        r'\\(x[0-9a-fA-F]{0,2}|u[0-9a-fA-F]{0,4}|U[0-9a-fA-F]{0,8}|N\{[^}]*\}?|g<[^>]*>?|[0-9]{1,3}|.)',
+        re.DOTALL)
+    quantifier_pattern = re.compile(r'\{[0-9]*(,[0-9]*)?\}')
+
+    def regex_fragments(self, pattern: str) -> Optional[list[str]]:
+        """
+        Return the literal runs of word characters that every match of the
+        regex pattern must contain.
+
+        This method is conservative. It ignores group contents, escapes,
+        character classes and the bounds of {m,n} quantifiers, and it gives up
+        on alternations and verbose patterns.
+        """
+        if '|' in pattern or self.verbose_pattern.search(pattern):
+            return None
+        fragments: list[str] = []
+        run: list[str] = []
+        depth, i, n = 0, 0, len(pattern)
+
+        def end_run() -> None:
+            if run and depth == 0:
+                fragments.append(''.join(run))
+            run.clear()
+
+        while i < n:
+            ch = pattern[i]
+            if ch == '\\':
+                end_run()
+                # Skip the escape, including the payload of \x, \u, \U, \N, \g,
+                # octal and backreference escapes.
+                m = self.escape_pattern.match(pattern, i)
+                i = m.end() if m else i + 2
+            elif ch == '[':
+                end_run()
+                # Skip the character class.
+                i += 1
+                if i < n and pattern[i] == '^':
+                    i += 1
+                if i < n and pattern[i] == ']':
+                    i += 1
+                while i < n and pattern[i] != ']':
+                    i += 2 if pattern[i] == '\\' else 1
+                i += 1
+            elif ch in '?*{':
+                # The previous character is optional or repeated.
+                if run:
+                    run.pop()
+                end_run()
+                m = self.quantifier_pattern.match(pattern, i) if ch == '{' else None
+                i = m.end() if m else i + 1
+            elif ch == '(':
+                end_run()
+                depth += 1
+                i += 1
+            elif ch == ')':
+                end_run()
+                depth = max(0, depth - 1)
+                i += 1
+            elif ch.isalnum() or ch == '_':
+                run.append(ch)
+                i += 1
+            else:
+                end_run()
+                i += 1
+        end_run()
+        return fragments or None
+    #@+node:ekr.20261018061512.6: *4* index.word_trigrams
+    def word_trigrams(self, word: str) -> frozenset[str]:
+        """Return the trigrams of the given (casefolded) word."""
+        trigrams = self.word_cache.get(word)
+        if trigrams is None:
+            trigrams = frozenset(word[i : i + 3] for i in range(len(word) - 2))
+            self.word_cache[word] = trigrams
+        return trigrams
+    #@+node:ekr.20261018270000.8: *3* index.note_change
+    def note_change(self, kind: str, v: VNode, parent_v: VNode, childIndex: int) -> None:
+        """Called by v.noteOutlineChange."""
+        if kind == 'text':
+            self.stale.add(v)
+        elif kind == 'tree':
+            self.stale_trees.add(v)
+            self.structure_changed = True
+        elif kind != 'node':
+            self.structure_changed = True
+    #@+node:ekr.20261018061512.7: *3* index.refresh & helpers
+    def refresh(self) -> None:
+        """Update the index for all changed, inserted and deleted vnodes."""
+        if not self.loaded:
+            self.load()
+            return
+        entries = self.entries
+        stale, self.stale = self.stale, set()
+        stack, self.stale_trees = list(self.stale_trees), set()
+        while stack:
+            v = stack.pop()
+            if v not in stale:
+                stale.add(v)
+                stack.extend(v.children)
+        if self.structure_changed:
+            self.structure_changed = False
+            vnodes = self.unique_vnodes()
+            for v in vnodes:
+                if v not in entries and v not in self.deferred:
+                    self.update(v)
+            for v in set(entries).difference(vnodes):
+                self.remove(v)
+            for v in set(self.deferred).difference(vnodes):
+                del self.deferred[v]
+                self.changed = True
+        for v in stale:
+            if v in entries:
+                self.update(v)
+        # Add the deferred vnodes whose bodies are now in memory.
+        for v in [z for z in self.deferred if not self.is_unloaded(z)]:
+            saved = self.deferred.pop(v)
+            digest = self.digest(v)
+            if saved and saved[0] == digest:
+                self.add(v, digest, saved[1])
+            else:
+                self.add(v, digest, self.compute_trigrams(v))
+                self.changed = True
+    #@+node:ekr.20261018061512.8: *4* index.compute_trigrams
+    def compute_trigrams(self, v: VNode) -> frozenset[str]:
+        """Return the trigrams of all the words in v.h and v.b."""
+        words = set(self.word_pattern.findall(v._headString.casefold()))
+        words.update(self.word_pattern.findall(v._bodyString.casefold()))
+        trigrams: set[str] = set()
+        for word in words:
+            if len(word) > 2:
+                trigrams |= self.word_trigrams(word)
+        return frozenset(trigrams)
+    #@+node:ekr.20261018061512.9: *4* index.digest
+    def digest(self, v: VNode) -> str:
+        """Return a digest of v.h and v.b."""
+        s = f"{v._headString}\x00{v._bodyString}"
+        return hashlib.md5(s.encode('utf-8', 'replace')).hexdigest()
+    #@+node:ekr.20261018061512.10: *4* index.load
+    def load(self) -> None:
+        """
+        Build the index, reusing the saved trigrams of all unchanged vnodes.
+        """
+        c = self.c
+        data = c.db.get(self.db_key)
+        if not isinstance(data, dict):
+            data = {}
+        self.entries, self.postings, self.deferred = {}, {}, {}
+        self.stale, self.stale_trees = set(), set()
+        self.structure_changed = False
+        self.changed = False
+        for v in self.unique_vnodes():
+            saved = data.get(v.gnx)
+            if self.is_unloaded(v):
+                self.deferred[v] = saved
+                continue
+            digest = self.digest(v)
+            if saved and saved[0] == digest:
+                self.add(v, digest, saved[1])
+            else:
+                self.add(v, digest, self.compute_trigrams(v))
+                self.changed = True
+        n_saved = len(self.entries) + sum(1 for z in self.deferred.values() if z)
+        self.changed = self.changed or len(data) != n_saved
+        self.loaded = True
+        if self not in c.outlineTrackers:
+            c.outlineTrackers.append(self)
+        # The word cache is only useful while building the index.
+        self.word_cache = {}
+    #@+node:ekr.20261018061512.11: *4* index.add, remove & update
+    def add(self, v: VNode, digest: str, trigrams: frozenset[str]) -> None:
+        """Add v to the index."""
+        self.entries[v] = (digest, trigrams)
+        postings = self.postings
+        for trigram in trigrams:
+            aSet = postings.get(trigram)
+            if aSet is None:
+                postings[trigram] = {v}
+            else:
+                aSet.add(v)
+
+    def remove(self, v: VNode) -> None:
+        """Remove v from the index."""
+        entry = self.entries.pop(v, None)
+        if entry is None:
+            return
+        self.changed = True
+        postings = self.postings
+        for trigram in entry[1]:
+            aSet = postings.get(trigram)
+            if aSet is not None:
+                aSet.discard(v)
+                if not aSet:
+                    del postings[trigram]
+
+    def update(self, v: VNode) -> None:
+        """Reindex v if its headline or body has changed."""
+        if self.is_unloaded(v):
+            # Defer v rather than reading its body.
+            entry = self.entries.get(v)
+            self.remove(v)
+            self.deferred[v] = entry
+            return
+        digest = self.digest(v)
+        entry = self.entries.get(v)
+        if entry and entry[0] == digest:
+            return
+        self.remove(v)
+        self.add(v, digest, self.compute_trigrams(v))
+        self.changed = True
+    #@+node:ekr.20261018280000.22: *4* index.is_unloaded
+    def is_unloaded(self, v: VNode) -> bool:
+        """Return True if v.b would be read from a .db file."""
+        isBodyInMemory = getattr(v, 'isBodyInMemory', None)
+        return bool(isBodyInMemory and not isBodyInMemory())
+    #@+node:ekr.20261018061512.12: *4* index.unique_vnodes
+    def unique_vnodes(self) -> list[VNode]:
+        """Return a list of all the vnodes of the outline, without duplicates."""
+        result: list[VNode] = []
+        seen: set[VNode] = set()
+        stack = list(reversed(self.c.hiddenRootNode.children))
+        while stack:
+            v = stack.pop()
+            if v not in seen:
+                seen.add(v)
+                result.append(v)
+                stack.extend(reversed(v.children))
+        return result
+    #@+node:ekr.20261018061512.13: *3* index.save
+    def save(self) -> None:
+        """Save the index in c.db if it has changed."""
+        if not self.loaded or not self.changed:
+            return
+        self.refresh()
+        data = {v.gnx: entry for v, entry in self.deferred.items() if entry}
+        data.update({v.gnx: entry for v, entry in self.entries.items()})
+        self.c.db[self.db_key] = data
+        self.changed = False
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -1219,6 +1219,7 @@ class Position:
         if parent_v.children[p._childIndex] == v:
             parent_v.children[p._childIndex] = v2
             v2.parents.append(parent_v)
+            parent_v.noteOutlineChange('children')
             # p.v no longer truly exists.
             # p.v = p2.v
         else:  # pragma: no cover
@@ -1684,6 +1685,8 @@ class Position:
         for child in children:
             child.parents.remove(p.v)
             child.parents.append(parent_v)
+        parent_v.noteOutlineChange('children')
+        p.v.noteOutlineChange('children')
     #@+node:ekr.20040303175026.13: *4* p.validateOutlineWithParent (compatibility only)
     # This routine checks the structure of the receiver's tree.
     def validateOutlineWithParent(self, pv: Position) -> bool:
@@ -2381,11 +2384,15 @@ class VNode:
     #@+node:ekr.20031218072017.3395: *5* v.contract/expand/initExpandedBit/isExpanded
     def contract(self) -> None:
         """Contract the node."""
-        self.statusBits &= ~self.expandedBit
+        if self.statusBits & self.expandedBit:
+            self.statusBits &= ~self.expandedBit
+            self.noteOutlineChange('node')
 
     def expand(self) -> None:
         """Expand the node."""
-        self.statusBits |= self.expandedBit
+        if not self.statusBits & self.expandedBit:
+            self.statusBits |= self.expandedBit
+            self.noteOutlineChange('node')
 
     def initExpandedBit(self) -> None:
         """Init self.statusBits."""
@@ -2436,6 +2443,24 @@ class VNode:
     #@+node:ville.20120502221057.7499: *4* v.childrenModified
     def childrenModified(self) -> None:
         g.childrenModifiedSet.add(self)
+    #@+node:ekr.20261018270000.1: *4* v.noteOutlineChange
+    def noteOutlineChange(self, kind: str, parent_v: VNode = None, childIndex: int = -1) -> None:
+        """
+        Tell all objects in c.outlineTrackers about a change to this vnode.
+
+        kind is one of:
+
+        'node':     v's headline, body, icons or status bits have changed.
+        'text':     v's headline or body has changed. Also noted as 'node'.
+        'insert':   v has been linked as parent_v.children[childIndex].
+        'delete':   v has been unlinked from parent_v.children[childIndex].
+        'children': v.children has been changed in some other way.
+        'tree':     any part of v's subtree may have changed.
+        """
+        trackers = getattr(self.context, 'outlineTrackers', None)
+        if trackers:
+            for tracker in trackers:
+                tracker.note_change(kind, self, parent_v, childIndex)
     #@+node:ekr.20031218072017.3385: *4* v.computeIcon & setIcon
     def computeIcon(self) -> int:  # pragma: no cover
         v = self
@@ -2456,6 +2481,7 @@ class VNode:
     def updateIcon(self) -> None:
         """Update any user icon."""
         c, v = self.context, self
+        v.noteOutlineChange('node')
         try:
             tree = c.frame.tree  # May not exist at startup.
             if not tree:
@@ -2539,10 +2565,12 @@ class VNode:
         v = self
         if isinstance(s, str):
             v._bodyString = s
+            v.noteOutlineChange('text')
             v.updateIcon()
             return
         else:  # pragma: no cover
             v._bodyString = g.toUnicode(s, reportErrors=True)
+            v.noteOutlineChange('text')
             self.contentModified()  # #1413.
             signal_manager.emit(self.context, 'body_changed', self)
             v.updateIcon()
@@ -2554,11 +2582,13 @@ class VNode:
         v = self
         if isinstance(s, str):
             v._headString = s.replace('\n', '')
+            v.noteOutlineChange('text')
             v.updateIcon()
             return
         else:  # pragma: no cover
             s = g.toUnicode(s, reportErrors=True)
             v._headString = s.replace('\n', '')  # type:ignore
+            v.noteOutlineChange('text')
             self.contentModified()  # #1413.
             v.updateIcon()
 
@@ -2603,6 +2633,7 @@ class VNode:
         # Update parent_v.children & v.parents.
         parent_v.children.insert(childIndex, v)
         v.parents.append(parent_v)
+        v.noteOutlineChange('insert', parent_v, childIndex)
         # Set zodb changed flags.
         v._p_changed = True
         parent_v._p_changed = True
@@ -2615,6 +2646,7 @@ class VNode:
         # Update parent_v.children & v.parents.
         parent_v.children.insert(childIndex, v)
         v.parents.append(parent_v)
+        v.noteOutlineChange('insert', parent_v, childIndex)
         # Set zodb changed flags.
         v._p_changed = True
         parent_v._p_changed = True
@@ -2647,6 +2679,7 @@ class VNode:
                 g.internalError(f"{parent_v} not in parents of {v}")
                 g.trace('v.parents:')
                 g.printObj(v.parents)
+        v.noteOutlineChange('delete', parent_v, childIndex)
         v._p_changed = True
         parent_v._p_changed = True
         # If v has no more parents, we adjust all
@@ -2672,6 +2705,7 @@ class VNode:
         It is not intended as a general replacement for p.doDelete().
         """
         v = self
+        v.noteOutlineChange('tree')  # Before changing v.children.
         for v2 in v.children:
             try:
                 v2.parents.remove(v)
@@ -2728,6 +2762,7 @@ class VNode:
             v.unknownAttributes = val
         else:
             raise ValueError  # pragma: no cover
+        v.noteOutlineChange('node')
 
     u = property(
         __get_u, __set_u,
@@ -5,8 +5,14 @@
 #@+node:ekr.20220901071118.1: ** << leoPlugins imports & annotations >>
 from __future__ import annotations
 from collections.abc import Callable
+import ast
+import importlib.util
+import io
+import re
 import sys
-from typing import Any, Iterator, TYPE_CHECKING
+import time
+import tokenize
+from typing import Any, Iterator, Optional, TYPE_CHECKING
 from leo.core import leoGlobals as g
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -32,6 +38,40 @@ def init() -> None:
 def registerHandler(tags: Tag_List, fn: Callable) -> None:
     """A wrapper so plugins can still call leoPlugins.registerHandler."""
     return g.app.pluginsController.registerHandler(tags, fn)
+#@+node:ekr.20261018170000.1: ** function: getPluginDeclarations
+def getPluginDeclarations(moduleName: str) -> Optional[dict[str, list[str]]]:
+    """
+    Return a dict containing the __plugin_commands__ and __plugin_hooks__
+    lists of the given plugin *without* importing the plugin.
+
+    Return None if the plugin declares neither list.
+    """
+    try:
+        spec = importlib.util.find_spec(moduleName)
+        path = spec and spec.origin
+        if not path or not path.endswith('.py'):
+            return None
+        with open(path, 'rb') as f:
+            source = g.toUnicode(f.read())
+    except Exception:
+        return None
+    d: dict[str, list[str]] = {}
+    for kind in ('commands', 'hooks'):
+        m = re.search(rf"^__plugin_{kind}__\s*=", source, re.MULTILINE)
+        if not m:
+            continue
+        # Find the end of the assignment, which may span several lines.
+        tail = source[m.end():]
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(tail).readline):
+                if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                    break
+            row = token.end[0]
+            aList = ast.literal_eval(''.join(g.splitLines(tail)[:row]).strip())
+            d[kind] = [z for z in aList if isinstance(z, str)]
+        except Exception:
+            g.es_print(f"bad __plugin_{kind}__ in {moduleName}")
+    return d or None
 #@+node:ville.20090222141717.2: ** TryNext (Exception)
 class TryNext(Exception):
     """Try next hook exception.
@@ -285,6 +325,13 @@ class LeoPluginsController:
         self.loadedModulesFilesDict: dict[str, str] = {}
         # Keys are regularized module names, values are modules.
         self.loadedModules: dict[str, Any] = {}
+        # Keys are regularized module names of plugins that have not been loaded yet.
+        # Values are g.Bunches describing the commands and hooks that load the plugin.
+        self.lazyPlugins: dict[str, g.Bunch] = {}
+        # Keys are regularized module names, values are g.Bunches describing import times.
+        self.importTimes: dict[str, g.Bunch] = {}
+        # The stack of the import times of plugins imported by the plugin being loaded.
+        self.importTimeStack: list[float] = []
         # The stack of module names. The top is the module being loaded.
         self.loadingModuleNameStack: list[str] = []
         self.signonModule = None  # A hack for plugin_signon.
@@ -379,6 +426,10 @@ class LeoPluginsController:
     #@+node:ekr.20100908125007.6020: *4* plugins.getPluginModule
     def getPluginModule(self, moduleName: str) -> Any:
         return self.loadedModules.get(moduleName)
+    #@+node:ekr.20261018170000.3: *4* plugins.isLazy
+    def isLazy(self, fn: str) -> bool:
+        """Return True if the plugin will be loaded when first used."""
+        return self.regularizeName(fn) in self.lazyPlugins
     #@+node:ekr.20100908125007.6021: *4* plugins.isLoaded
     def isLoaded(self, fn: str) -> bool:
         return self.regularizeName(fn) in self.loadedModules
@@ -439,6 +490,32 @@ class LeoPluginsController:
             data.append((moduleName, fileName),)
         lines = ["%*s %s\n" % (-n, s1, s2) for (s1, s2) in data]
         g.es('', ''.join(lines), tabName=tabName)
+    #@+node:ekr.20261018170000.4: *4* plugins.printImportTimes
+    def printImportTimes(self, c: Cmdr = None) -> None:
+        """
+        Print the time taken to import and init each plugin.
+
+        self:    the time spent in the plugin, excluding other plugins.
+        total:   the time spent in the plugin, including other plugins.
+        modules: the number of modules imported by the plugin.
+        """
+        tabName = 'Plugins'
+        if c:
+            c.frame.log.selectTab(tabName)
+        d = self.importTimes
+        lines = ['plugin import times...\n', f"{'self':>6} {'total':>6} {'modules':>7} plugin\n"]
+        for name in sorted(d, key=lambda z: -d[z].self_time):
+            b = d[name]
+            lines.append(f"{b.self_time:6.3f} {b.total_time:6.3f} {b.modules:7} {name}\n")
+        total = sum(z.self_time for z in d.values())
+        lines.append(f"{total:6.3f} total for {len(d)} plugin{g.plural(len(d))}\n")
+        if self.lazyPlugins:
+            lines.append('not yet loaded...\n')
+            lines.extend(f"{z}\n" for z in sorted(self.lazyPlugins))
+        if c:
+            g.es('', ''.join(lines), tabName=tabName)
+        else:
+            g.es_print(''.join(lines))
     #@+node:ekr.20100909065501.5949: *4* plugins.regularizeName
     def regularizeName(self, moduleOrFileName: str) -> str:
         """
@@ -475,9 +552,15 @@ class LeoPluginsController:
             if 0:
                 s2 = f"@enabled-plugins found in {g.app.config.enabledPluginsFileName}"
                 g.blue(s2)
+        lazy = g.app.config.getBool('lazy-load-plugins', default=False)
         for plugin in s.splitlines():
             if plugin.strip() and not plugin.lstrip().startswith('#'):
-                self.loadOnePlugin(plugin.strip(), tag=tag)
+                if not (lazy and self.registerLazyPlugin(plugin.strip())):
+                    self.loadOnePlugin(plugin.strip(), tag=tag)
+        if tag == 'start1' and (
+            'plugins' in g.app.debug or g.app.config.getBool('print-plugin-import-times', default=False)
+        ):
+            self.printImportTimes()
     #@+node:ekr.20100908125007.6024: *4* plugins.loadOnePlugin & helper functions
     def loadOnePlugin(self, moduleOrFileName: Any, tag: str = 'open0', verbose: bool = False) -> Any:
         """
@@ -581,8 +664,12 @@ class LeoPluginsController:
         if self.isLoaded(moduleName):
             module = self.loadedModules.get(moduleName)
             return module
+        if moduleName in self.lazyPlugins:
+            return self.loadLazyPlugin(moduleName)
         assert g.app.loadDir
         moduleName = g.toUnicode(moduleName)
+        t1, n_modules = time.perf_counter(), len(sys.modules)
+        self.importTimeStack.append(0.0)
         #
         # Try to load the plugin.
         try:
@@ -591,6 +678,7 @@ class LeoPluginsController:
         finally:
             self.loadingModuleNameStack.pop()
         if not result:
+            self.recordImportTime(moduleName, t1, n_modules)
             if trace:
                 reportFailedImport()
             return None
@@ -601,6 +689,7 @@ class LeoPluginsController:
             result = finishImport(result)
         finally:
             self.loadingModuleNameStack.pop()
+            self.recordImportTime(moduleName, t1, n_modules)
         if result:
             # #1688: Plugins can update globalDirectiveList.
             #        Recalculate g.directives_pat.
@@ -618,6 +707,21 @@ class LeoPluginsController:
             g.es(f"...{m.__name__}.py v{m.__version__}: {g.plugin_date(m)}")
             g.pr(m.__name__, m.__version__)
         self.signonModule = None  # Prevent double signons.
+    #@+node:ekr.20261018170000.5: *4* plugins.recordImportTime
+    def recordImportTime(self, moduleName: str, t1: float, n_modules: int) -> None:
+        """
+        Record the time taken to load the plugin, starting at time t1.
+        Charge the time to the plugin, not to the plugin that loaded it.
+        """
+        total_time = time.perf_counter() - t1
+        child_time = self.importTimeStack.pop()
+        if self.importTimeStack:
+            self.importTimeStack[-1] += total_time
+        self.importTimes[moduleName] = g.Bunch(
+            modules=len(sys.modules) - n_modules,
+            self_time=total_time - child_time,
+            total_time=total_time,
+        )
     #@+node:ekr.20100908125007.6030: *4* plugins.unloadOnePlugin
     def unloadOnePlugin(self, moduleOrFileName: str, verbose: bool = False) -> None:
         moduleName = self.regularizeName(moduleOrFileName)
@@ -625,10 +729,118 @@ class LeoPluginsController:
             if verbose:
                 g.pr('unloading', moduleName)
             del self.loadedModules[moduleName]
+        self.unregisterLazyPlugin(moduleName)
         for tag in self.handlers:
             bunches = self.handlers.get(tag)
             bunches = [bunch for bunch in bunches if bunch.moduleName != moduleName]
             self.handlers[tag] = bunches
+    #@+node:ekr.20261018170000.6: *3* plugins.Lazy loading
+    #@+node:ekr.20261018170000.7: *4* plugins.loadLazyPlugin
+    def loadLazyPlugin(self, moduleName: str) -> Any:
+        """
+        Load a plugin registered by registerLazyPlugin.
+
+        Call the plugin's after-create-leo-frame handlers for all existing
+        commanders, just as if the plugin had been loaded at startup.
+        """
+        if moduleName not in self.lazyPlugins:
+            return self.loadedModules.get(moduleName)
+        self.unregisterLazyPlugin(moduleName)
+        result = self.loadOnePlugin(moduleName, tag='lazy-load')
+        if not result:
+            g.es_print(f"can not load plugin: {moduleName}")
+            return None
+        for c in g.app.commanders():
+            keywords: Any = {'c': c}
+            for tag in ('after-create-leo-frame', 'after-create-leo-frame2'):
+                for bunch in self.handlers.get(tag, []):
+                    if bunch.moduleName == moduleName:
+                        self.callTagHandler(bunch, tag, keywords)
+        return result
+    #@+node:ekr.20261018170000.8: *4* plugins.registerLazyPlugin
+    def registerLazyPlugin(self, moduleOrFileName: str) -> bool:
+        """
+        Register commands and hooks that load the plugin when first used.
+
+        Plugins declare these commands and hooks in __plugin_commands__ and
+        __plugin_hooks__, module-level lists of strings. Leo finds these lists
+        without importing the plugin.
+
+        Return True if the plugin will be loaded later.
+        """
+        if not g.app.enablePlugins or moduleOrFileName.startswith('@'):
+            return False
+        moduleName = g.toUnicode(self.regularizeName(moduleOrFileName))
+        if moduleName in self.lazyPlugins:
+            return True
+        if self.isLoaded(moduleName):
+            return False
+        d = getPluginDeclarations(moduleName)
+        if not d:
+            return False
+        bunch = g.Bunch(commands={}, hooks={})
+        self.lazyPlugins[moduleName] = bunch
+        for commandName in d.get('commands', []):
+            func = bunch.commands[commandName] = self.makeLazyCommand(moduleName, commandName)
+            g.global_commands_dict[commandName] = func
+            for c in g.app.commanders():
+                c.k.registerCommand(commandName, func)
+        self.loadingModuleNameStack.append(moduleName)
+        try:
+            for tag in d.get('hooks', []):
+                func = bunch.hooks[tag] = self.makeLazyHook(moduleName)
+                self.registerOneHandler(tag, func)
+        finally:
+            self.loadingModuleNameStack.pop()
+        if 'plugins' in g.app.debug:
+            g.es_print(f"lazy plugin: {moduleName}")
+        return True
+    #@+node:ekr.20261018170000.9: *4* plugins.makeLazyCommand & makeLazyHook
+    def makeLazyCommand(self, moduleName: str, commandName: str) -> Callable:
+        """Return a command that loads the plugin, then executes the plugin's command."""
+
+        def lazy_plugin_command(event: Any = None) -> Any:
+            self.loadLazyPlugin(moduleName)
+            c = event.get('c') if event else None
+            func = c.commandsDict.get(commandName) if c else g.global_commands_dict.get(commandName)
+            if not func or func == lazy_plugin_command:
+                g.es_print(f"{moduleName} does not define {commandName}")
+                return None
+            return func(event)
+
+        lazy_plugin_command.__doc__ = f"Load the {moduleName} plugin, then execute {commandName}."
+        lazy_plugin_command.__func_name__ = lazy_plugin_command.__name__  # type:ignore
+        lazy_plugin_command.is_command = True  # type:ignore
+        lazy_plugin_command.command_name = commandName  # type:ignore
+        return lazy_plugin_command
+
+    def makeLazyHook(self, moduleName: str) -> Callable:
+        """Return a hook handler that loads the plugin, then calls the plugin's handlers."""
+
+        def lazy_plugin_hook(tag: str, keywords: Keywords) -> Any:
+            self.loadLazyPlugin(moduleName)
+            for bunch in self.handlers.get(tag, []):
+                if bunch.moduleName == moduleName:
+                    val = self.callTagHandler(bunch, tag, keywords)
+                    if val is not None:
+                        return val
+            return None
+
+        return lazy_plugin_hook
+    #@+node:ekr.20261018170000.10: *4* plugins.unregisterLazyPlugin
+    def unregisterLazyPlugin(self, moduleName: str) -> None:
+        """Remove the commands and hooks created by registerLazyPlugin."""
+        bunch = self.lazyPlugins.pop(moduleName, None)
+        if not bunch:
+            return
+        for commandName, func in bunch.commands.items():
+            if g.global_commands_dict.get(commandName) == func:
+                del g.global_commands_dict[commandName]
+            for c in g.app.commanders():
+                if c.commandsDict.get(commandName) == func:
+                    del c.commandsDict[commandName]
+        for tag, func in bunch.hooks.items():
+            self.unregisterOneHandler(tag, func)
     #@+node:ekr.20100909065501.5951: *3* plugins.Registration
     #@+node:ekr.20100908125007.6028: *4* plugins.registerExclusiveHandler
     def registerExclusiveHandler(self, tags: Tag_List, fn: Callable) -> None:
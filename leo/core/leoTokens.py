@@ -30,6 +30,7 @@ import difflib
 import glob
 import keyword
 import io
+import multiprocessing
 import os
 import re
 import textwrap
@@ -97,6 +98,9 @@ def input_tokens_to_string(tokens: list[InputToken]) -> str:  # pragma: no cover
 #@+node:ekr.20240105140814.121: *3* function: main (leoTokens.py)
 def main() -> None:  # pragma: no cover
     """Run commands specified by sys.argv."""
+    if multiprocessing.parent_process():
+        # A worker process of run_beautify_jobs imported this module.
+        return
     args, settings_dict, arg_files = scan_args()
     cwd = os.getcwd()
 
@@ -142,24 +146,28 @@ def orange_command(
     to_be_checked_files: list[str],
     settings: Optional[Settings] = None,
 ) -> None:  # pragma: no cover
-    """The outer level of the 'tbo/orange' command."""
-    t1 = time.process_time()
-    # n_tokens = 0
+    """
+    The outer level of the 'tbo/orange' command.
+
+    Beautify the files in a pool of worker processes. Skip unchanged files.
+    """
+    from leo.core.leoBeautify import run_beautify_jobs
+    t1 = time.perf_counter()
     n_beautified = 0
     if settings is None:
         settings = {}
+    filenames = [z for z in to_be_checked_files if os.path.exists(z)]
+    results = dict(zip(filenames, run_beautify_jobs('tbo', filenames, settings, dirty_files)))
     for filename in to_be_checked_files:
-        if os.path.exists(filename):
-            was_dirty = filename in dirty_files
-            tbo = TokenBasedOrange(settings)
-            beautified = tbo.beautify_file(filename, was_dirty)
+        if filename in results:
+            beautified, output = results[filename]
+            print(output, end='')
             if beautified:
                 n_beautified += 1
-            # n_tokens += len(tbo.input_tokens)
         else:
             print(f"file not found: {filename}")
     # Report the results.
-    t2 = time.process_time()
+    t2 = time.perf_counter()
     if n_beautified or settings.get('report'):
         print(
             f"tbo: {t2-t1:4.2f} sec. "
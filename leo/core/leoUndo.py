@@ -46,7 +46,12 @@
 #@+node:ekr.20220821074023.1: ** << leoUndo imports & annotations >>
 from __future__ import annotations
 from collections.abc import Callable
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
+import bisect
+import collections
+import difflib
+import time
+import zlib
 from leo.core import leoGlobals as g
 from leo.core.leoFileCommands import FastRead
 from leo.core.leoNodes import Position, VNode
@@ -62,6 +67,157 @@ def cmd(name: str) -> Callable:
     return g.new_cmd_decorator(name, ['c', 'undoer',])
 
 #@+others
+#@+node:ekr.20261018081204.1: ** class BodyDiff
+class BodyDiff:
+    """
+    The old and new body text of an undo bead, stored compactly.
+
+    The new text is stored whole, compressed if it is large, so undo and
+    redo never depend on the node's present body text. The old text is
+    stored as the runs of lines that differ from the new text.
+    """
+
+    __slots__ = ('changes', 'new')
+
+    #@+others
+    #@+node:ekr.20261018081204.2: *3* BodyDiff.__init__
+    def __init__(self, old: str, new: str) -> None:
+        self.new = compress_text(new)
+        # A list of tuples (j1, j2, s): the old text replaces new_lines[j1:j2] by s.
+        self.changes: list[tuple[int, int, str | CompressedText]] = []
+        old_lines, new_lines = old.splitlines(True), new.splitlines(True)
+        for i1, i2, j1, j2 in diff_lines(old_lines, new_lines):
+            self.changes.append((j1, j2, compress_text(''.join(old_lines[i1:i2]))))
+    #@+node:ekr.20261018081204.4: *3* BodyDiff.expand
+    def expand(self) -> tuple[str, str]:
+        """Return (old, new), the old and new body text."""
+        new = expand_text(self.new)
+        if not self.changes:
+            return new, new
+        lines = new.splitlines(True)
+        result: list[str] = []
+        j = 0
+        for j1, j2, s in self.changes:
+            result.extend(lines[j:j1])
+            result.append(expand_text(s))
+            j = j2
+        result.extend(lines[j:])
+        return ''.join(result), new
+    #@+node:ekr.20261018081204.5: *3* BodyDiff.size
+    def size(self) -> int:
+        """Return the approximate size of this diff in bytes."""
+        return text_size(self.new) + sum(text_size(z[2]) for z in self.changes)
+    #@-others
+#@+node:ekr.20261018280000.6: ** undo diff functions
+# Use difflib only for at most this many lines.
+max_difflib_lines = 2000
+
+def diff_lines(a: list[str], b: list[str]) -> list[tuple[int, int, int, int]]:
+    """
+    Return a list of tuples (i1, i2, j1, j2), in order: a[i1:i2] differs from b[j1:j2].
+
+    difflib is quadratic, so large inputs are first split at lines that
+    appear exactly once in both a and b, as in patience diff.
+    """
+    # Skip the common leading and trailing lines.
+    n = min(len(a), len(b))
+    prefix = 0
+    while prefix < n and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a, b = a[prefix : len(a) - suffix], b[prefix : len(b) - suffix]
+    if not a and not b:
+        return []
+    result: list[tuple[int, int, int, int]] = []
+    if len(a) + len(b) <= max_difflib_lines:
+        matcher = difflib.SequenceMatcher(None, a, b)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != 'equal':
+                result.append((prefix + i1, prefix + i2, prefix + j1, prefix + j2))
+        return result
+    # Match the unique lines of a and b, keeping the matches in order.
+    count_a, count_b = collections.Counter(a), collections.Counter(b)
+    b_index = {line: j for j, line in enumerate(b) if count_b[line] == 1}
+    pairs = [(i, b_index[line]) for i, line in enumerate(a) if count_a[line] == 1 and line in b_index]
+    anchors = longest_increasing_pairs(pairs)
+    if not anchors:
+        return [(prefix, prefix + len(a), prefix, prefix + len(b))]
+    # Diff the lines between the anchors.
+    i0 = j0 = 0
+    for i, j in anchors + [(len(a), len(b))]:
+        for i1, i2, j1, j2 in diff_lines(a[i0:i], b[j0:j]):
+            result.append((prefix + i0 + i1, prefix + i0 + i2, prefix + j0 + j1, prefix + j0 + j2))
+        i0, j0 = i + 1, j + 1
+    return result
+
+def longest_increasing_pairs(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    pairs is a list of tuples (i, j), sorted by i.
+
+    Return the longest sublist of pairs whose j values also increase.
+    """
+    tails: list[int] = []  # tails[k]: the smallest final j of an increasing run of length k + 1.
+    tail_indices: list[int] = []  # The index into pairs of each tail.
+    previous: list[int] = []  # The index into pairs of the preceding pair of each pair.
+    for index, (i, j) in enumerate(pairs):
+        k = bisect.bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_indices.append(index)
+        else:
+            tails[k] = j
+            tail_indices[k] = index
+        previous.append(tail_indices[k - 1] if k > 0 else -1)
+    result = []
+    index = tail_indices[-1] if tail_indices else -1
+    while index >= 0:
+        result.append(pairs[index])
+        index = previous[index]
+    result.reverse()
+    return result
+#@+node:ekr.20261018081204.6: ** class CompressedText
+class CompressedText:
+    """A zlib-compressed string in an undo bead."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, s: str) -> None:
+        self.data = zlib.compress(s.encode('utf-8', 'surrogatepass'), 1)
+
+    def size(self) -> int:
+        return len(self.data)
+
+    def text(self) -> str:
+        return zlib.decompress(self.data).decode('utf-8', 'surrogatepass')
+#@+node:ekr.20261018081204.7: ** undo text functions
+# Compress strings in undo beads that are at least this long.
+compress_threshold = 16384
+
+def compress_text(s: str) -> str | CompressedText:
+    """Return s, compressed if it is large."""
+    return CompressedText(s) if len(s) >= compress_threshold else s
+
+def expand_text(val: str | CompressedText) -> str:
+    """Return the string represented by val."""
+    return val.text() if isinstance(val, CompressedText) else val
+
+def text_size(val: str | CompressedText) -> int:
+    """Return the approximate size of val in bytes."""
+    return val.size() if isinstance(val, CompressedText) else len(val)
+
+# Keys of beads whose values are lists of g.Bunch(v, head, body).
+tree_keys = ('afterTree', 'beforeTree')
+
+def expand_tree(tree: list[g.Bunch]) -> list[g.Bunch]:
+    """Return a copy of tree, a list of g.Bunch(v, head, body), with all strings expanded."""
+    result = []
+    for bunch in tree:
+        d = {key: expand_text(val) if isinstance(val, CompressedText) else val
+            for key, val in bunch.__dict__.items()}
+        result.append(g.Bunch(**d))
+    return result
 #@+node:ekr.20031218072017.3605: ** class Undoer
 class Undoer:
     """A class that implements unlimited undo and redo."""
@@ -73,6 +229,14 @@ class Undoer:
         self.p: Position = None  # The position/node being operated upon for undo and redo.
         self.granularity = None  # Set in reloadSettings.
         self.max_undo_stack_size = c.config.getInt('max-undo-stack-size') or 0
+        # The approximate maximum size of all beads, in bytes.
+        self.max_undo_memory = c.config.getInt('max-undo-memory') or 100_000_000
+        # The longest time, in seconds, that an open group delays limitUndoMemory.
+        self.max_open_group_time = 10.0
+        # The beads counted in undo_memory, their sizes, and the sum of their sizes.
+        self.sized_beads: list[g.Bunch] = []
+        self.bead_sizes: list[int] = []
+        self.undo_memory = 0
         # State ivars...
         self.beads = []  # List of undo nodes.
         self.bead = -1  # Index of the present bead: -1:len(beads)
@@ -163,12 +327,138 @@ class Undoer:
                 if hasattr(bunch, 'kind') and bunch.kind == 'beforeGroup':
                     return
                 i -= 1
-            # This work regardless of how many items appear after bead n.
-                # g.trace('Cutting undo stack to %d entries' % (n))
-            u.beads = u.beads[-n:]
-            u.bead = n - 1
+            # Never delete the present bead.
+            u.dropOldestBeads(min(len(u.beads) - n, u.bead))
         if 'undo' in g.app.debug and 'verbose' in g.app.debug:  # pragma: no cover
             print(f"u.cutStack: {len(u.beads):3}")
+    #@+node:ekr.20261018081204.8: *4* u.compactBead & helpers
+    def compactBead(self, bunch: g.Bunch) -> None:
+        """
+        Reduce the memory used by bunch and all the beads in its group:
+
+        - Replace large old and new body text by a BodyDiff.
+        - Compress all other large strings, including the headlines and
+          bodies in bunch.beforeTree and bunch.afterTree.
+
+        u.setIvarsFromBunch reverses these changes.
+        """
+        u = self
+        for key in bunch.keys():
+            val = bunch.get(key)
+            if key in ('items',) + tree_keys and isinstance(val, list):
+                for item in val:
+                    u.compactBead(item)
+            elif isinstance(val, str) and len(val) >= compress_threshold:
+                if key in ('oldBody', 'newBody') and bunch.get('kind') in ('body', 'node'):
+                    continue  # Handled below.
+                bunch[key] = CompressedText(val)
+        old, new = bunch.get('oldBody'), bunch.get('newBody')
+        if (
+            bunch.get('kind') in ('body', 'node')
+            and isinstance(old, str) and isinstance(new, str)
+            and len(old) + len(new) >= compress_threshold
+        ):
+            bunch.bodyDiff = BodyDiff(old, new)
+            del bunch.__dict__['oldBody']
+            del bunch.__dict__['newBody']
+    #@+node:ekr.20261018081204.9: *5* u.beadSize
+    def beadSize(self, bunch: g.Bunch) -> int:
+        """Return the approximate size of the text in bunch, in bytes."""
+        n = 0
+        for val in bunch.__dict__.values():
+            if isinstance(val, str):
+                n += len(val)
+            elif isinstance(val, (BodyDiff, CompressedText)):
+                n += val.size()
+            elif isinstance(val, list):
+                for z in val:
+                    if isinstance(z, str):
+                        n += len(z)
+                    elif isinstance(z, g.Bunch):
+                        n += self.beadSize(z)
+        return n
+    #@+node:ekr.20261018081204.10: *5* u.expandBodyDiff
+    def expandBodyDiff(self, bunch: g.Bunch) -> None:
+        """Set u.oldBody and u.newBody from bunch.bodyDiff."""
+        u = self
+        u.oldBody, u.newBody = bunch.bodyDiff.expand()
+        for key in ('oldBody', 'newBody'):
+            if key not in u.optionalIvars:
+                u.optionalIvars.append(key)
+    #@+node:ekr.20261018270000.12: *5* u.dropOldestBeads
+    def dropOldestBeads(self, n: int) -> None:
+        """Delete the n oldest beads, keeping u.undo_memory up to date."""
+        u = self
+        if n <= 0:
+            return
+        u.updateUndoMemory()
+        u.undo_memory -= sum(u.bead_sizes[:n])
+        del u.beads[:n]
+        del u.sized_beads[:n]
+        del u.bead_sizes[:n]
+        u.bead -= n
+    #@+node:ekr.20261018081204.11: *5* u.limitUndoMemory
+    def limitUndoMemory(self) -> None:
+        """
+        Compact the present bead, then delete the oldest beads until the
+        approximate size of all beads is at most u.max_undo_memory.
+        """
+        u = self
+        present = u.beads[u.bead] if 0 <= u.bead < len(u.beads) else None
+        if present:
+            u.compactBead(present)
+        u.updateUndoMemory()
+        if u.undo_memory <= u.max_undo_memory:
+            return
+        # Wait a while if a command is creating a group.
+        if (
+            present and getattr(present, 'kind', None) == 'beforeGroup'
+            and time.monotonic() - getattr(present, 'openTime', 0) < u.max_open_group_time
+        ):
+            return
+        # Never delete the present bead. Groups use only their own items,
+        # so deleting older beads is safe even if a group is still open.
+        n, total = 0, u.undo_memory
+        while total > u.max_undo_memory and n < u.bead:
+            total -= u.bead_sizes[n]
+            n += 1
+        u.dropOldestBeads(n)
+        if 'undo' in g.app.debug:  # pragma: no cover
+            print(f"u.limitUndoMemory: {len(u.beads):3} beads {u.undo_memory} bytes")
+    #@+node:ekr.20261018081204.12: *5* u.undoMemory
+    def undoMemory(self) -> int:
+        """Return the approximate size of all beads, in bytes."""
+        u = self
+        u.updateUndoMemory()
+        return u.undo_memory
+    #@+node:ekr.20261018270000.13: *5* u.updateUndoMemory
+    def updateUndoMemory(self) -> None:
+        """
+        Make u.undo_memory the approximate size of all beads.
+
+        Beads are pushed and removed only at the end of u.beads, so this
+        measures only new beads and the present bead, which may still grow.
+        """
+        u = self
+        beads, sized, sizes = u.beads, u.sized_beads, u.bead_sizes
+        # Forget the beads that are no longer in u.beads.
+        n = min(len(beads), len(sized))
+        while n > 0 and sized[n - 1] is not beads[n - 1]:
+            n -= 1
+        while len(sized) > n:
+            sized.pop()
+            u.undo_memory -= sizes.pop()
+        # Measure the new beads.
+        for bunch in beads[n:]:
+            size = u.beadSize(bunch)
+            sized.append(bunch)
+            sizes.append(size)
+            u.undo_memory += size
+        # Measure the present bead again.
+        if 0 <= u.bead < n:
+            size = u.beadSize(beads[u.bead])
+            u.undo_memory += size - sizes[u.bead]
+            sizes[u.bead] = size
     #@+node:ekr.20080623083646.10: *4* u.dumpBead
     def dumpBead(self, n: int) -> str:  # pragma: no cover
         u = self
@@ -244,9 +534,15 @@ class Undoer:
         # bunch is not a dict, so bunch.keys() is required.
         for key in list(bunch.keys()):
             val = bunch.get(key)
+            if isinstance(val, CompressedText):
+                val = val.text()
+            elif key in tree_keys and isinstance(val, list):
+                val = expand_tree(val)
             setattr(u, key, val)
             if key not in u.optionalIvars:
                 u.optionalIvars.append(key)
+        if isinstance(bunch.get('bodyDiff'), BodyDiff):
+            u.expandBodyDiff(bunch)
     #@+node:ekr.20031218072017.3614: *4* u.setRedoType
     # These routines update both the ivar and the menu label.
 
@@ -316,6 +612,7 @@ class Undoer:
         else:
             u.setRedoType("Can't Redo")
         u.cutStack()
+        u.limitUndoMemory()
     #@+node:ekr.20050525151449: *4* u.trace
     def trace(self) -> None:  # pragma: no cover
         ivars = ('kind', 'undoType')
@@ -741,6 +1038,7 @@ class Undoer:
         bunch = u.createCommonBunch(p)
         # Set types.
         bunch.kind = 'beforeGroup'
+        bunch.openTime = time.monotonic()  # For limitUndoMemory.
         bunch.undoType = command
         bunch.verboseUndoGroup = verboseUndoGroup
         # Set helper only for redo:
@@ -935,6 +1233,7 @@ class Undoer:
         u.setUndoType(undoType)
         u.beads = []  # List of undo nodes.
         u.bead = -1  # Index of the present bead: -1:len(beads)
+        u.sized_beads, u.bead_sizes, u.undo_memory = [], [], 0
     #@+node:ekr.20031218072017.1490: *4* u.doTyping & helper
     def doTyping(
         self,
@@ -1526,6 +1825,8 @@ class Undoer:
         for v in u.followingSibs:
             v.parents.remove(parent_v)
             v.parents.append(u.p.v)
+        parent_v.noteOutlineChange('children')
+        u.p.v.noteOutlineChange('children')
         u.p.setDirty()
         c.setCurrentPosition(u.p)
     #@+node:ekr.20050318085432.6: *4* u.redoGroup
@@ -1620,12 +1921,14 @@ class Undoer:
         # Adjust the children arrays of the old parent.
         assert u.oldParent_v.children[u.oldN] == v
         del u.oldParent_v.children[u.oldN]
+        v.noteOutlineChange('delete', u.oldParent_v, u.oldN)
         u.oldParent_v.setDirty()
         # Adjust the children array of the new parent.
         parent_v = u.newParent_v
         parent_v.children.insert(u.newN, v)
         v.parents.append(u.newParent_v)
         v.parents.remove(u.oldParent_v)
+        v.noteOutlineChange('insert', parent_v, u.newN)
         u.newParent_v.setDirty()
         #
         u.updateMarks('new')
@@ -1684,6 +1987,8 @@ class Undoer:
         for child in u.children:
             child.parents.remove(u.p.v)
             child.parents.append(parent_v)
+        parent_v.noteOutlineChange('children')
+        u.p.v.noteOutlineChange('children')
         u.p.setDirty()
         c.setCurrentPosition(u.p)
     #@+node:ekr.20080425060424.4: *4* u.redoSort
@@ -1692,9 +1997,11 @@ class Undoer:
         p = u.p
         if u.sortChildren:
             p.v.children = u.newChildren[:]
+            p.v.noteOutlineChange('children')
         else:
             parent_v = p._parentVnode()
             parent_v.children = u.newChildren[:]
+            parent_v.noteOutlineChange('children')
             # Only the child index of new position changes!
             for i, v in enumerate(parent_v.children):
                 if v.gnx == p.v.gnx:
@@ -1724,6 +2031,15 @@ class Undoer:
         if u.yview:
             c.bodyWantsFocus()
             w.setYScrollPosition(u.yview)
+    #@+node:ekr.20261018081204.13: *3* u.showUndoMemory
+    @cmd('show-undo-memory')
+    def showUndoMemory(self, event: LeoKeyEvent = None) -> None:
+        """Report the approximate memory used by the undo stack."""
+        u = self
+        n, limit = u.undoMemory(), u.max_undo_memory
+        g.es_print(
+            f"undo memory: {len(u.beads)} beads, "
+            f"{n / 1000000:.2f} MB of {limit / 1000000:.2f} MB")
     #@+node:ekr.20031218072017.2039: *3* u.undo
     @cmd('undo')
     def undo(self, event: LeoKeyEvent = None) -> None:
@@ -1896,6 +2212,8 @@ class Undoer:
         for sib in u.followingSibs:
             sib.parents.remove(u.p.v)
             sib.parents.append(parent_v)
+        parent_v.noteOutlineChange('children')
+        u.p.v.noteOutlineChange('children')
         u.p.setAllAncestorAtFileNodesDirty()
         c.setCurrentPosition(u.p)
     #@+node:ekr.20050318085713: *4* u.undoGroup
@@ -1991,10 +2309,12 @@ class Undoer:
         # Adjust the children arrays.
         assert u.newParent_v.children[u.newN] == v
         del u.newParent_v.children[u.newN]
+        v.noteOutlineChange('delete', u.newParent_v, u.newN)
         u.oldParent_v.children.insert(u.oldN, v)
         # Recompute the parent links.
         v.parents.append(u.oldParent_v)
         v.parents.remove(u.newParent_v)
+        v.noteOutlineChange('insert', u.oldParent_v, u.oldN)
         u.updateMarks('old')
         u.p.setDirty()
         c.selectPosition(u.p)
@@ -2089,6 +2409,8 @@ class Undoer:
         for child in u.children:
             child.parents.remove(parent_v)
             child.parents.append(u.p.v)
+        parent_v.noteOutlineChange('children')
+        u.p.v.noteOutlineChange('children')
         u.p.setAllAncestorAtFileNodesDirty()
         c.setCurrentPosition(u.p)
     #@+node:ekr.20031218072017.1493: *4* u.undoRedoText
@@ -2145,9 +2467,11 @@ class Undoer:
         p = u.p
         if u.sortChildren:
             p.v.children = u.oldChildren[:]
+            p.v.noteOutlineChange('children')
         else:
             parent_v = p._parentVnode()
             parent_v.children = u.oldChildren[:]
+            parent_v.noteOutlineChange('children')
             # Only the child index of new position changes!
             for i, v in enumerate(parent_v.children):
                 if v.gnx == p.v.gnx:
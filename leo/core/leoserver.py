@@ -14,7 +14,9 @@ To run externally, do `python -m leo.core.leoserver`.
 # pylint: disable=raise-missing-from
 import argparse
 import asyncio
+from collections import deque
 from collections.abc import Callable
+import concurrent.futures
 import fnmatch
 import inspect
 import itertools
@@ -23,12 +25,19 @@ import os
 import re
 import sys
 import socket
+import struct
 import textwrap
+import threading
 import time
 from typing import Any, Generator, Iterable, Iterator, Optional, Union
 import warnings
+import zlib
 
 # Third-party.
+try:
+    import msgpack
+except Exception:
+    msgpack = None
 try:
     import tkinter as Tk
 except Exception:
@@ -60,13 +69,13 @@ Match_Iter = Iterator[re.Match[str]]
 Package = dict[str, Any]
 Param = dict[str, Any]
 RegexFlag = Union[int, re.RegexFlag]  # re.RegexFlag does not define 0
-Response = str  # See _make_response.
+Response = Union[str, bytes]  # See _make_response and WireFormat.
 Socket = Any
 
 #@-<< leoserver annotations >>
 #@+<< leoserver version >>
 #@+node:ekr.20220820160619.1: ** << leoserver version >>
-version_tuple = (1, 0, 11)
+version_tuple = (1, 0, 14)
 # Version History
 # 1.0.1 Initial commit.
 # 1.0.2 July 2022: Adding ui-scroll, undo/redo, chapters, ua's & node_tags info.
@@ -79,6 +88,9 @@ version_tuple = (1, 0, 11)
 # 1.0.9 January 2024: Added support for UNL and specific commander targeting for any command.
 # 1.0.10 Febuary 2024: Added support getting UNL for a specific node (for status bar display, etc.)
 # 1.0.11 May 2024: Added get_is_valid and current commander info to get_ui_states for detached body support.
+# 1.0.12 October 2026: Added get_structure_chunk: paged, breadth-first, compact outline structure.
+# 1.0.13 October 2026: Added set_tree_sync: responses may contain outline deltas.
+# 1.0.14 October 2026: Added set_wire_format: optional binary messages with compression.
 v1, v2, v3 = version_tuple
 __version__ = f"leoserver.py version {v1}.{v2}.{v3}"
 #@-<< leoserver version >>
@@ -120,6 +132,283 @@ class SetEncoder(json.JSONEncoder):
         if isinstance(obj, VNode):
             return {'gnx': obj.gnx}
         return json.JSONEncoder.default(self, obj)  # otherwise, return default
+#@+node:ekr.20261018190000.1: ** class WireFormat
+class WireFormat:
+    """
+    Encode and decode the messages of one connection. See set_wire_format.
+
+    Formats:
+    - "json":    (The default) json text, as in all previous versions.
+    - "binary":  Binary messages. Long strings are raw utf-8 blobs, without json escaping.
+    - "msgpack": Binary messages containing MessagePack. Requires the msgpack package.
+
+    Binary messages start with b'LEO' and a flags byte:
+    - wire_msgpack: The payload is MessagePack. Otherwise, it is a blob payload.
+    - wire_zlib:    The payload is compressed with zlib.
+
+    A blob payload is a sequence of chunks. Each chunk starts with its
+    length, a 4-byte big-endian unsigned int. The first chunk is json.
+    In that json, {"$blob": n} stands for the utf-8 string in chunk n + 1.
+    """
+
+    formats = ('json', 'binary', 'msgpack')
+    prefix = b'LEO'
+    wire_msgpack = 1
+    wire_zlib = 2
+
+    def __init__(self, name: str = 'json', blob_size: int = 1024, compress_size: int = 0) -> None:
+        """
+        blob_size:      Send strings with at least this many characters as blobs.
+        compress_size:  Compress binary messages with at least this many bytes.
+                        0: never compress.
+        """
+        if name not in self.formats:
+            raise ValueError(f"unknown wire format: {name!r}")
+        if name == 'msgpack' and not msgpack:
+            raise ValueError("the msgpack format requires the msgpack package")
+        self.name = name
+        self.blob_size = max(1, blob_size)
+        self.compress_size = max(0, compress_size)
+        self.encoder = SetEncoder(separators=(',', ':'))
+
+    #@+others
+    #@+node:ekr.20261018190000.2: *3* WireFormat.encode
+    def encode(self, package: Any) -> Response:
+        """Return the message for package: a str for json, bytes otherwise."""
+        if self.name == 'json':
+            return self.encoder.encode(package)
+        flags = 0
+        if self.name == 'msgpack':
+            flags |= self.wire_msgpack
+            payload = msgpack.packb(package, default=self.encoder.default)
+        else:
+            blobs: list[bytes] = []
+            header = self.encoder.encode(self._to_blobs(package, blobs)).encode('utf-8')
+            chunks = [header] + blobs
+            payload = b''.join(struct.pack('>I', len(z)) + z for z in chunks)
+        if self.compress_size and len(payload) >= self.compress_size:
+            flags |= self.wire_zlib
+            payload = zlib.compress(payload, 1)  # Favor speed.
+        return self.prefix + bytes([flags]) + payload
+    #@+node:ekr.20261018190000.3: *3* WireFormat.decode
+    def decode(self, message: Union[str, bytes]) -> Any:
+        """
+        Return the python object described by message.
+
+        message may use any wire format, regardless of self.name.
+        """
+        if isinstance(message, str) or not message.startswith(self.prefix):
+            return json.loads(message)
+        flags = message[len(self.prefix)]
+        payload = message[len(self.prefix) + 1 :]
+        if flags & self.wire_zlib:
+            payload = zlib.decompress(payload)
+        if flags & self.wire_msgpack:
+            if not msgpack:
+                raise ValueError("the msgpack format requires the msgpack package")
+            return msgpack.unpackb(payload, raw=False)
+        chunks: list[bytes] = []
+        i = 0
+        while i < len(payload):
+            (n,) = struct.unpack_from('>I', payload, i)
+            chunks.append(payload[i + 4 : i + 4 + n])
+            i += 4 + n
+        if not chunks:
+            raise ValueError("empty binary message")
+        blobs = [z.decode('utf-8') for z in chunks[1:]]
+        return self._from_blobs(json.loads(chunks[0]), blobs)
+    #@+node:ekr.20261018190000.4: *3* WireFormat._to_blobs & _from_blobs
+    def _to_blobs(self, obj: Any, blobs: list[bytes]) -> Any:
+        """
+        Return obj, replacing long strings with {"$blob": n} dicts.
+        Append the utf-8 encoding of the strings to blobs.
+        """
+        if isinstance(obj, str):
+            if len(obj) < self.blob_size:
+                return obj
+            blobs.append(obj.encode('utf-8'))
+            return {'$blob': len(blobs) - 1}
+        if isinstance(obj, dict):
+            return {key: self._to_blobs(value, blobs) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [self._to_blobs(z, blobs) for z in obj]
+        return obj
+
+    def _from_blobs(self, obj: Any, blobs: list[str]) -> Any:
+        """Return obj, replacing {"$blob": n} dicts with blobs[n]."""
+        if isinstance(obj, dict):
+            if len(obj) == 1 and '$blob' in obj:
+                return blobs[obj['$blob']]
+            return {key: self._from_blobs(value, blobs) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self._from_blobs(z, blobs) for z in obj]
+        return obj
+    #@-others
+#@+node:ekr.20261018270000.2: ** class TreeSyncTracker
+class TreeSyncTracker:
+    """
+    Record the changes to one commander's outline. See set_tree_sync.
+
+    v.noteOutlineChange calls note_change for all changes to the outline.
+    get_delta describes the changes since the previous call. Its cost is
+    proportional to the size of the changes, not the size of the outline.
+    """
+
+    flags = ('hasBody', 'cloned', 'dirty', 'expanded', 'marked', 'atFile')
+
+    def __init__(self, c: Cmdr) -> None:
+        self.c = c
+        # Keys are gnxs of all vnodes the client knows about.
+        # Values are the (headline, flags, icons) tuples last sent.
+        self.known: dict[str, tuple] = {}
+        self.dirty: set[VNode] = set()  # Vnodes whose headline, flags or icons may have changed.
+        self.changed: set[VNode] = set()  # Vnodes whose children lists must be sent in full.
+        self.ops: list[tuple[str, VNode, int, VNode]] = []  # (kind, parent_v, childIndex, v).
+        self.trees: set[VNode] = {c.hiddenRootNode}  # The first delta describes the entire outline.
+
+    #@+others
+    #@+node:ekr.20261018270000.3: *3* TreeSyncTracker.note_change
+    def note_change(self, kind: str, v: VNode, parent_v: VNode, childIndex: int) -> None:
+        """Called by v.noteOutlineChange."""
+        if kind in ('node', 'text'):
+            self.dirty.add(v)
+        elif kind in ('insert', 'delete'):
+            self.ops.append((kind, parent_v, childIndex, v))
+        elif kind == 'children':
+            self.changed.add(v)
+        elif kind == 'tree':
+            self.trees.add(v)
+        else:  # pragma: no cover
+            g.trace('unknown kind', kind)
+    #@+node:ekr.20261018270000.4: *3* TreeSyncTracker.get_delta
+    def get_delta(self) -> Package:
+        """
+        Return a compact description of the changes since the last call.
+        Keys are present only if not empty:
+
+        - "nodes": A dict. Keys are gnxs of new or changed vnodes.
+                   Values are [headline, flags]. See TreeSyncTracker.flags.
+        - "icons": A dict. Keys are gnxs of vnodes whose user icons have changed.
+                   Values are the lists of icons in v.u['icons'].
+        - "children": A dict. Keys are gnxs of new vnodes, or of vnodes whose
+                      children have changed wholesale, including the hidden root.
+                      Values are lists of the children's gnxs, in order.
+        - "ops": A list of [kind, parent_gnx, index, gnx] lists, to be applied
+                 in order after "children". kind is "insert" or "delete".
+                 Ops never refer to parents in the "children" dict.
+        - "deleted": A list of gnxs of vnodes no longer in the outline.
+        """
+        known = self.known
+        dirty, self.dirty = self.dirty, set()
+        changed, self.changed = self.changed, set()
+        ops, self.ops = self.ops, []
+        trees, self.trees = self.trees, set()
+        nodes: dict[str, list] = {}
+        icons: dict[str, list] = {}
+        children: dict[str, list[str]] = {}
+        deleted: list[str] = []
+
+        def send(v: VNode) -> None:
+            """Send v's data if the client does not already have it."""
+            state = self.get_state(v)
+            old_state = known.get(v.gnx)
+            if old_state == state:
+                return
+            known[v.gnx] = state
+            h, flags, v_icons = state
+            nodes[v.gnx] = [h, flags]
+            if v_icons or (old_state and old_state[2]):
+                icons[v.gnx] = v_icons or []
+
+        def send_tree(v: VNode, all_nodes: bool) -> None:
+            """Send v's subtree: all of it, or only the vnodes the client doesn't know."""
+            stack = [v]
+            while stack:
+                v = stack.pop()
+                if v.gnx in children or (not all_nodes and v.gnx in known):
+                    continue
+                send(v)
+                children[v.gnx] = [z.gnx for z in v.children]
+                stack.extend(v.children)
+
+        # Send whole subtrees.
+        for v in trees:
+            if v == self.c.hiddenRootNode:
+                old_gnxs = set(known)
+                send_tree(v, all_nodes=True)
+                deleted.extend(z for z in old_gnxs if z not in children)
+                for gnx in deleted:
+                    del known[gnx]
+            elif v.gnx in known:
+                send_tree(v, all_nodes=True)
+        # Send the children lists of changed vnodes, and any new children.
+        for v in changed:
+            if v.gnx in known and v.gnx not in children:
+                children[v.gnx] = [z.gnx for z in v.children]
+                for child in v.children:
+                    send_tree(child, all_nodes=False)
+        # Send inserted vnodes that the client doesn't know.
+        for kind, parent_v, i, v in ops:
+            if kind == 'insert' and parent_v.gnx in known:
+                send_tree(v, all_nodes=False)
+        # Send the ops for the remaining parents.
+        ops_list: list[list] = []
+        for kind, parent_v, i, v in ops:
+            if parent_v.gnx in known and parent_v.gnx not in children:
+                ops_list.append([kind, parent_v.gnx, i, v.gnx])
+                dirty.add(v)  # The clone bit may have changed.
+        # Find the vnodes deleted by the ops.
+        gone: set[VNode] = set()
+        for kind, parent_v, i, v in ops:
+            if kind == 'delete' and not v.parents:
+                stack = [v]
+                while stack:
+                    v = stack.pop()
+                    if v not in gone and v.gnx in known and all(z in gone for z in v.parents):
+                        gone.add(v)
+                        stack.extend(v.children)
+        for v in gone:
+            del known[v.gnx]
+            nodes.pop(v.gnx, None)
+            icons.pop(v.gnx, None)
+            deleted.append(v.gnx)
+        # Send changed headlines, flags and icons.
+        for v in dirty:
+            if v.gnx in known:
+                send(v)
+        delta: Package = {}
+        for key, value in (
+            ("nodes", nodes),
+            ("icons", icons),
+            ("children", children),
+            ("ops", ops_list),
+            ("deleted", deleted),
+        ):
+            if value:
+                delta[key] = value
+        return delta
+    #@+node:ekr.20261018270000.5: *3* TreeSyncTracker.get_state
+    def get_state(self, v: VNode) -> tuple[str, int, Optional[list]]:
+        """
+        Return (headline, flags, icons) for v.
+
+        Bit i of flags is set if TreeSyncTracker.flags[i] is true for the vnode.
+        """
+        flags = 0
+        for i, flag in enumerate((
+            bool(v._bodyString),
+            len(v.parents) > 1,
+            v.isDirty(),
+            v.isExpanded(),
+            v.isMarked(),
+            v.isAnyAtFileNode(),
+        )):
+            if flag:
+                flags |= 1 << i
+        uA = getattr(v, 'unknownAttributes', None)
+        v_icons = uA.get('icons') if uA else None
+        return v._headString, flags, list(v_icons) if v_icons else None
+    #@-others
 #@+node:felix.20210621233316.3: ** Exception classes
 class InternalServerError(Exception):  # pragma: no cover
     """The server violated its own coding conventions."""
@@ -132,6 +421,15 @@ class ServerError(Exception):  # pragma: no cover
 class TerminateServer(Exception):  # pragma: no cover
     """Ask the server to terminate."""
     pass
+
+class RequestCancelled(BaseException):
+    """
+    A client cancelled the running request.
+
+    Like KeyboardInterrupt, this is not an Exception, so Leo's many
+    "except Exception" clauses can't swallow it.
+    """
+    pass
 #@+node:felix.20210626222905.1: ** class ServerExternalFilesController
 class ServerExternalFilesController(ExternalFilesController):
     """EFC Modified from Leo's sources"""
@@ -160,7 +458,7 @@ class ServerExternalFilesController(ExternalFilesController):
         self.lastPNode: Position = None  # last p node that was asked for if not set to "AllYes\AllNo"
         self.lastCommander: Cmdr = None
     #@+node:felix.20210626222905.6: *3* sefc.clientResult
-    def clientResult(self, p_result: Response) -> None:
+    def clientResult(self, p_result: str) -> None:
         """Received result from connected client that was 'asked' yes/no/... """
         # Got the result to an asked question/warning from the client
         if not self.waitingForAnswer:
@@ -507,8 +805,11 @@ class QuickSearchController:
             bNodes = [c.p]
 
         if not hitBase:
-            # hNodes = list(hNodes)
-            # bNodes = list(bNodes)
+            # Use the search index to skip nodes that can't match.
+            candidates = self.get_candidate_vnodes(pat)
+            if candidates is not None:
+                hNodes = [z for z in hNodes if z.v in candidates]
+                bNodes = [z for z in bNodes if z.v in candidates]
             hm = self.find_h(hpat, list(hNodes), flags)  # Returns a list of positions.
             bm = self.find_b(bpat, list(bNodes), flags)  # Returns a list of positions.
             bm_keys = [match[0].key() for match in bm]
@@ -535,6 +836,26 @@ class QuickSearchController:
         else:
             if combo == "File":
                 self.lw.insert(0, 'External file directive not found during search')
+    #@+node:ekr.20261018061512.15: *5* QSC.get_candidate_vnodes
+    glob_class_pattern = re.compile(r'\[!?\]?[^\]]*\]')
+
+    def get_candidate_vnodes(self, pat: str) -> Optional[set[VNode]]:
+        """
+        Use the search index to return the set of vnodes whose headline or
+        body might match pat.
+
+        Return None if the index can not narrow the search.
+        """
+        find = self.c.findCommands
+        if not find.use_search_index:
+            return None
+        index = find.search_index
+        if pat.startswith('r:'):
+            fragments = index.regex_fragments(pat[2:])
+        else:
+            # Remove glob wildcards and character classes.
+            fragments = re.split(r'[*?]', self.glob_class_pattern.sub('*', pat))
+        return index.candidates(fragments) if fragments else None
     #@+node:ekr.20220818083736.1: *5* QSC.pushSearchHistory
     def pushSearchHistory(self, pat: str) -> None:
         if pat in self._search_patterns:
@@ -634,18 +955,17 @@ class QuickSearchController:
             # No pattern! list all tags as string
             c = self.c
             self.clear()
-            d: dict[str, Any] = {}
-            for p in c.all_unique_positions():
-                u = p.v.u
-                tags = set(u.get('__node_tags', set([])))
-                for tag in tags:
-                    aList = d.get(tag, [])
-                    aList.append(p.h)
-                    d[tag] = aList
-            if d:
-                for key in sorted(d):
-                    # key is unique tag
-                    self.addTag(key)
+            tc = getattr(c, 'theTagController', None)
+            tags: set[str] = set()
+            if tc:
+                # Use the controller's tag index.
+                tags.update(tc.get_all_tags())
+            else:
+                for p in c.all_unique_positions():
+                    tags.update(p.v.u.get('__node_tags', set([])))
+            for key in sorted(tags):
+                # key is unique tag
+                self.addTag(key)
             return
         # else: non empty pattern, so find tag!
         hm = self.find_tag(pat)
@@ -876,6 +1196,32 @@ class LeoServer:
         self.current_id = 0  # Id of action being processed.
         self.log_flag = False  # set by "log" key
         #
+        # For get_structure_chunk.
+        # Keys are continuation tokens. Values are tuples (c, undo state, row iterator).
+        self.structure_streams: dict[str, tuple[Cmdr, tuple, Iterator]] = {}
+        self.structure_stream_count = 0
+        #
+        # For set_tree_sync.
+        # Keys are commanders, values are TreeSyncTrackers.
+        self.tree_sync_d: dict[Cmdr, TreeSyncTracker] = {}
+        #
+        # For _do_message_async.
+        # Leo's core is not thread safe: all requests of all clients run,
+        # one at a time, in leo_executor's single thread.
+        self.leo_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='leo')
+        self.cancel_event = threading.Event()  # Set to cancel the running request.
+        self.cancelled_keys: set[tuple] = set()  # Keys of requests to be cancelled.
+        self.pending_requests: dict[tuple, str] = {}  # Keys are (id(client), id), values are actions.
+        self.running_key: Optional[tuple] = None  # The key of the request running in the leo thread.
+        self.request_progress: Optional[tuple[int, int]] = None  # (n, total) for the running request.
+        self.progress_delay = 0.5  # Seconds before the first progress message.
+        self.progress_interval = 2.0  # Seconds between progress messages.
+        #
+        # For set_wire_format. Keys are id(client).
+        self.json_wire = WireFormat()
+        self.wire_formats: dict[int, WireFormat] = {}
+        self.current_client = id(None)  # id(client) for the running request.
+        #
         # Start the bridge.
         self.bridge = leoBridge.controller(
             gui='nullGui',
@@ -1090,13 +1436,21 @@ class LeoServer:
     async def _asyncIdleLoop(self, seconds: Union[int, float], func: Callable) -> None:
         while True:
             await asyncio.sleep(seconds)
-            func(self)
+            if self.loop:
+                # Don't run Leo's code while a request runs in the leo thread.
+                await self.loop.run_in_executor(self.leo_executor, func, self)
+            else:
+                func(self)
     #@+node:felix.20210627004039.1: *4* LeoServer._idleTime
     def _idleTime(self, fn: Callable, delay: Union[int, float], tag: str) -> None:
 
         warnings.simplefilter("ignore")
 
-        asyncio.get_event_loop().create_task(self._asyncIdleLoop(delay / 1000, fn))
+        coro = self._asyncIdleLoop(delay / 1000, fn)
+        if self.loop and not self._in_loop_thread():
+            self.loop.call_soon_threadsafe(self.loop.create_task, coro)
+        else:
+            asyncio.get_event_loop().create_task(coro)
     #@+node:felix.20210626003327.1: *4* LeoServer._show_find_success
     def _show_find_success(self,
         c: Cmdr,
@@ -1360,6 +1714,7 @@ class LeoServer:
             if forced or not c.changed:
                 # c.close() # Stops too much if last file closed
                 g.app.closeLeoWindow(c.frame, finish_quit=False)
+                self._stop_tree_sync(c)
             else:
                 # Cannot close, return empty response without 'total'
                 # (ask to save, ignore or cancel)
@@ -2388,10 +2743,130 @@ class LeoServer:
         result = []
         p = c.rootPosition()  # first child of hidden root node as first item in top array
         while p:
+            self._check_cancel()
             result.append(self._get_position_d(p, c, includeChildren=True))
             p.moveToNodeAfterTree()
         # return selected node either ways
         return self._make_minimal_response({"structure": result})
+    #@+node:felix.20261018044512.1: *5* server.get_structure_chunk
+    structure_flags = (
+        'hasBody', 'hasChildren', 'cloned', 'dirty',
+        'expanded', 'marked', 'atFile', 'selected',
+    )
+    structure_fields = ('parent', 'childIndex', 'gnx', 'headline', 'flags', 'nodeTags')
+
+    def get_structure_chunk(self, param: Param) -> Response:
+        """
+        Return the outline's structure in bounded chunks.
+
+        Unlike get_structure, this command sends nodes *breadth first*, so
+        clients can render the top levels of huge outlines immediately.
+
+        param keys:
+        - "token": The continuation token of the previous chunk.
+                   Omit this key to start a new stream.
+        - "maxNodes": The maximum number of nodes in the chunk (default 5000).
+        - "compact": True (the default): Each node is an array whose items are
+                     given by the "fields" key of the first chunk.
+                     "flags" is a bit set. Bit i is set if structure_flags[i] is true.
+                     False: Each node is the dict returned by _get_position_d,
+                     with an added 'parent' key.
+
+        In both formats, 'parent' is the index of the parent's node in the
+        stream, or -1 for top-level nodes.
+
+        The response's "token" key is the continuation token, or None if
+        this is the last chunk. Tokens expire when the outline changes.
+        """
+        tag = 'get_structure_chunk'
+        c = self._check_c(param)
+        token = param.get('token')
+        max_nodes = max(1, int(param.get('maxNodes') or 5000))
+        package: Package = {}
+        if token:
+            data = self.structure_streams.pop(token, None)
+            if not data:
+                raise ServerError(f"{tag}: unknown token: {token!r}")
+            stream_c, undo_state, rows = data
+            if stream_c != c or undo_state != self._get_undo_state(c):
+                raise ServerError(f"{tag}: the outline has changed. Restart the stream.")
+        else:
+            # Start a new stream, discarding previous streams for c.
+            for key in [k for k, v in self.structure_streams.items() if v[0] == c]:
+                del self.structure_streams[key]
+            compact = param.get('compact', True)
+            rows = self._yield_structure_rows(c, compact)
+            if compact:
+                package['fields'] = list(self.structure_fields)
+                package['flags'] = list(self.structure_flags)
+        chunk = list(itertools.islice(rows, max_nodes))
+        next_token = None
+        if len(chunk) == max_nodes:
+            # Don't create a token if the stream is exactly exhausted.
+            try:
+                first = next(rows)
+            except StopIteration:
+                pass
+            else:
+                self.structure_stream_count += 1
+                next_token = f"{id(c)}-{self.structure_stream_count}"
+                rows = itertools.chain([first], rows)
+                self.structure_streams[next_token] = (c, self._get_undo_state(c), rows)
+        package['rows'] = chunk
+        package['token'] = next_token
+        return self._make_minimal_response(package)
+    #@+node:felix.20261018044512.2: *6* server._yield_structure_rows
+    def _yield_structure_rows(self, c: Cmdr, compact: bool) -> Generator:
+        """
+        Yield one row for every position of c's outline, breadth first.
+
+        See get_structure_chunk for the format of the rows.
+        """
+        queue: deque[tuple[int, Position]] = deque()
+        for p in c.rootPosition().self_and_siblings():
+            queue.append((-1, p))
+        index = 0
+        while queue:
+            self._check_cancel()
+            parent, p = queue.popleft()
+            if compact:
+                yield self._get_compact_position_row(p, c, parent)
+            else:
+                d = self._get_position_d(p, c)
+                d['parent'] = parent
+                yield d
+            if p.hasChildren():
+                for child in p.children():
+                    queue.append((index, child))
+            index += 1
+    #@+node:felix.20261018044512.3: *6* server._get_compact_position_row
+    def _get_compact_position_row(self, p: Position, c: Cmdr, parent: int) -> list:
+        """
+        Return the compact equivalent of _get_position_d, as described by
+        the structure_fields and structure_flags class constants.
+        """
+        v = p.v
+        flags = 0
+        for i, flag in enumerate((
+            bool(v._bodyString),
+            bool(v.children),
+            p.isCloned(),
+            v.isDirty(),
+            p.isExpanded(),
+            v.isMarked(),
+            p.isAnyAtFileNode(),
+            p == c.p,
+        )):
+            if flag:
+                flags |= 1 << i
+        tags = len(v.u.get('__node_tags', [])) if v.u else 0
+        return [parent, p._childIndex, v.gnx, v._headString, flags, tags]
+    #@+node:felix.20261018044512.4: *6* server._get_undo_state
+    def _get_undo_state(self, c: Cmdr) -> tuple:
+        """Return a tuple that changes when c's undo state changes."""
+        u = c.undoer
+        bead = u.beads[u.bead] if 0 <= u.bead < len(u.beads) else None
+        return u.bead, len(u.beads), id(bead)
 
     #@+node:felix.20210621233316.38: *5* server.get_all_gnx
     def get_all_gnx(self, param: Param) -> Response:
@@ -3394,6 +3869,62 @@ class LeoServer:
         """Got auto-reload's config from client"""
         self.leoServerConfig = param  # PARAM IS THE CONFIG-DICT
         return self._make_response()
+    #@+node:felix.20261018051003.1: *5* server.set_tree_sync
+    def set_tree_sync(self, param: Param) -> Response:
+        """
+        Enable or disable delta-based tree sync for the selected commander.
+
+        When enabled, every response created by _make_response for this
+        commander contains a "delta" key describing all outline changes
+        since the previous response. Clients need not call get_children or
+        get_structure after most commands. See TreeSyncTracker.get_delta.
+
+        When enabling sync, the response's "delta" key describes the entire
+        outline, and the "root" key is the gnx of the hidden root node.
+        """
+        c = self._check_c(param)
+        self._stop_tree_sync(c)
+        if not param.get("enabled", True):
+            return self._make_minimal_response()
+        tracker = TreeSyncTracker(c)
+        c.outlineTrackers.append(tracker)
+        self.tree_sync_d[c] = tracker
+        return self._make_minimal_response({
+            "delta": tracker.get_delta(),
+            "flags": list(TreeSyncTracker.flags),
+            "root": c.hiddenRootNode.gnx,
+        })
+    #@+node:ekr.20261018190000.7: *5* server.set_wire_format
+    def set_wire_format(self, param: Param) -> Response:
+        """
+        Set the format of all later messages sent to this client.
+        The response itself uses the previous format.
+
+        param keys:
+        - "format": "json" (the default), "binary" or "msgpack".
+        - "blobSize": The binary format sends strings with at least this
+                      many characters as raw utf-8 blobs (default 1024).
+        - "compressSize": Compress binary messages with at least this many
+                          bytes with zlib (default 0: never compress).
+
+        Clients may send requests in any format. See WireFormat.
+        """
+        tag = 'set_wire_format'
+        name = param.get("format") or "json"
+        try:
+            wire = WireFormat(
+                name,
+                blob_size=int(param.get("blobSize") or 1024),
+                compress_size=int(param.get("compressSize") or 0),
+            )
+        except ValueError as e:
+            raise ServerError(f"{tag}: {e}")
+        response = self._make_minimal_response({"format": name})
+        if name == 'json' and not wire.compress_size:
+            self.wire_formats.pop(self.current_client, None)
+        else:
+            self.wire_formats[self.current_client] = wire
+        return response
     #@+node:felix.20210621233316.71: *5* server.error
     def error(self, param: Param) -> None:
         """For unit testing. Raise ServerError"""
@@ -4498,6 +5029,7 @@ class LeoServer:
             'new',
 
             'open-outline',
+            'outline-stats',
 
             'parse-body',
             'parse-json',
@@ -4575,6 +5107,23 @@ class LeoServer:
             'chapter-select-main'
         ]
         return good_list
+    #@+node:ekr.20261018180000.7: *5* server.cancel_request
+    def cancel_request(self, param: Param) -> Response:
+        """
+        Cancel the request whose id is param["id"].
+
+        Requests that haven't started never run. Running requests stop at the
+        next call to _check_cancel or c.progressCallback. Their response
+        contains a ServerError. A cancelled replace-all keeps the changes it
+        has made, as one undoable group. A cancelled save writes no .leo file.
+
+        The response's "cancelled" key is True if the request was pending.
+
+        Note: _do_message_async handles this action in the asyncio loop.
+        Calling this method directly can't cancel anything.
+        """
+        cancelled = self._cancel_request(None, param.get('id'))
+        return self._make_minimal_response({"cancelled": cancelled})
     #@+node:felix.20210621233316.75: *5* server.get_all_server_commands & helpers
     def get_all_server_commands(self, param: Param) -> Response:
         """
@@ -4726,6 +5275,8 @@ class LeoServer:
         # Still not found?
         if not c:  # pragma: no cover
             raise ServerError(f"{tag}: no open commander")
+        # Report the progress of c's batch commands.
+        c.progressCallback = self._report_progress
         return c
     #@+node:felix.20210621233316.81: *4* server._check_outline
     def _check_outline(self, c: Cmdr) -> None:
@@ -4907,6 +5458,149 @@ class LeoServer:
         if result is None:  # pragma: no cover
             raise ServerError(f"{tag}: no response: {action!r}")
         return result
+    #@+node:ekr.20261018180000.1: *4* server._do_message_async & helpers
+    async def _do_message_async(self, d: dict[str, Any], client: Any = None) -> Response:
+        """
+        Handle d as _do_message does, without blocking the asyncio loop.
+
+        Leo's core is not thread safe, so requests run one at a time, in the
+        order received, in the single thread of self.leo_executor. This queue
+        is global, not per commander: a long request delays all later requests
+        of all clients, even cheap ones such as get_ui_states.
+
+        Meanwhile, the loop stays free. It answers websocket pings, receives
+        later requests, sends progress messages and handles "!cancel_request".
+        Cancelling a long request is the way to unblock the queue.
+
+        Requests that take longer than self.progress_delay send
+        {"async": "progress"} messages to all clients. The "state" key is
+        "queued", "running", "done", "cancelled" or "error". While batch
+        commands run, the "done" and "total" keys count nodes or files.
+
+        The "!cancel_request" action runs in the loop itself. See cancel_request.
+        """
+        tag = '_do_message_async'
+        id_ = d.get("id")
+        action = d.get("action")
+        if id_ is None:  # pragma: no cover
+            raise ServerError(f"{tag}: no id")
+        if action is None:  # pragma: no cover
+            raise ServerError(f"{tag}: no action")
+        if action == '!cancel_request':
+            # Don't touch the current_id and action ivars: they belong to the leo thread.
+            param = d.get('param') or {}
+            cancelled = self._cancel_request(client, param.get('id'))
+            return self._get_wire(id(client)).encode({"id": id_, "cancelled": cancelled})
+        key = (id(client), id_)
+        self.pending_requests[key] = action
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.leo_executor, self._run_request, d, key)
+        t1 = time.perf_counter()
+        delay = self.progress_delay
+        progress = False
+        state = 'error'
+        try:
+            while True:
+                done, pending = await asyncio.wait([future], timeout=delay)
+                if done:
+                    break
+                progress = True
+                state = 'running' if self.running_key == key else 'queued'
+                self._send_progress(id_, action, state, t1)
+                delay = self.progress_interval
+            result = future.result()
+            state = 'done'
+            return result
+        except Exception:
+            if key in self.cancelled_keys:
+                state = 'cancelled'
+            raise
+        finally:
+            if progress:
+                self._send_progress(id_, action, state, t1)
+            self.pending_requests.pop(key, None)
+            self.cancelled_keys.discard(key)
+    #@+node:ekr.20261018180000.2: *5* server._cancel_request
+    def _cancel_request(self, client: Any, id_: Optional[int]) -> bool:
+        """
+        Cancel the pending request of the given client with the given id.
+        Return True if the request was pending.
+        """
+        key = (id(client), id_)
+        if key not in self.pending_requests:
+            return False
+        self.cancelled_keys.add(key)
+        if self.running_key == key:
+            self.cancel_event.set()
+        return True
+    #@+node:ekr.20261018180000.3: *5* server._check_cancel
+    def _check_cancel(self) -> None:
+        """
+        Raise RequestCancelled if a client has cancelled the running request.
+
+        Long loops of the server should call this method often.
+        """
+        if self.cancel_event.is_set():
+            raise RequestCancelled()
+    #@+node:ekr.20261018180000.4: *5* server._in_loop_thread
+    def _in_loop_thread(self) -> bool:
+        """Return True if the caller runs in the thread of self.loop."""
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+    #@+node:ekr.20261018180000.5: *5* server._run_request
+    def _run_request(self, d: dict[str, Any], key: tuple) -> Response:
+        """
+        Run _do_message(d) in the leo thread.
+
+        Leo's batch commands (find-all, replace-all, clone-find-all and
+        writing external files) call c.progressCallback as they work.
+        _check_c sets c.progressCallback to self._report_progress.
+        """
+        self.running_key = key
+        self.current_client = key[0]
+        self.request_progress = None
+        self.cancel_event.clear()
+        try:
+            if key in self.cancelled_keys:
+                # Cancelled before it could start.
+                self.current_id = d.get("id")
+                self.action = d.get("action")
+                raise RequestCancelled()
+            return self._do_message(d)
+        except RequestCancelled:
+            raise ServerError(f"request {self.current_id} cancelled")
+        finally:
+            self.running_key = None
+            self.request_progress = None
+            self.cancel_event.clear()
+    #@+node:ekr.20261018280000.2: *5* server._report_progress
+    def _report_progress(self, n: int, total: int) -> None:
+        """
+        The c.progressCallback of all commanders used by requests.
+
+        Remember the progress of the running request for _send_progress,
+        then raise RequestCancelled if a client has cancelled the request.
+        """
+        if self.running_key is None:
+            return  # Not called from _run_request.
+        self.request_progress = (n, total)
+        self._check_cancel()
+    #@+node:ekr.20261018180000.6: *5* server._send_progress
+    def _send_progress(self, id_: int, action: str, state: str, t1: float) -> None:
+        """Tell all clients about the progress of a slow request."""
+        package = {
+            "async": "progress",
+            "id": id_,
+            "action": action,
+            "state": state,
+            "elapsed": round(time.perf_counter() - t1, 3),
+        }
+        progress = self.request_progress
+        if state == 'running' and progress:
+            package["done"], package["total"] = progress
+        self._send_async_output(package, toAll=True)
     #@+node:felix.20210621233316.86: *4* server._do_server_command
     def _do_server_command(self, action: str, param: Param) -> Response:
         tag = '_do_server_command'
@@ -5081,6 +5775,7 @@ class LeoServer:
             d['hasChildren'] = True
             # includeChildren flag is used by get_structure
             if includeChildren:
+                self._check_cancel()
                 d['children'] = [
                     self._get_position_d(child, c, includeChildren=True) for child in p.children()
                 ]
@@ -5117,6 +5812,24 @@ class LeoServer:
         except Exception:
             print("Error retrieving current focused widget selection range.")
             return 0, 0
+    #@+node:ekr.20261018270000.6: *4* server._stop_tree_sync
+    def _stop_tree_sync(self, c: Cmdr) -> None:
+        """Stop tracking the changes to c's outline."""
+        tracker = self.tree_sync_d.pop(c, None)
+        if tracker and tracker in c.outlineTrackers:
+            c.outlineTrackers.remove(tracker)
+    #@+node:felix.20261018051003.4: *4* server._update_tree_sync
+    def _update_tree_sync(self, c: Cmdr) -> Package:
+        """
+        Return the changes to c's outline since the last call, or an empty dict.
+        """
+        tracker = self.tree_sync_d.get(c)
+        if tracker is None:
+            return {}
+        if c not in g.app.commanders():
+            self._stop_tree_sync(c)
+            return {}
+        return tracker.get_delta()
     #@+node:felix.20210705211625.1: *4* server._is_jsonable
     def _is_jsonable(self, x: Any) -> bool:
         """
@@ -5129,7 +5842,7 @@ class LeoServer:
         except(TypeError, OverflowError):
             return False
     #@+node:felix.20210621233316.94: *4* server._make_minimal_response
-    def _make_minimal_response(self, package: Package = None) -> str:
+    def _make_minimal_response(self, package: Package = None) -> Response:
         """
         Return a json string representing a response dict.
 
@@ -5153,9 +5866,9 @@ class LeoServer:
         # Always add id.
         package["id"] = self.current_id
 
-        return json.dumps(package, separators=(',', ':'), cls=SetEncoder)
+        return self._get_wire(self.current_client).encode(package)
     #@+node:felix.20210621233316.93: *4* server._make_response
-    def _make_response(self, package: Package = None) -> str:
+    def _make_response(self, package: Package = None) -> Response:
         """
         Return a json string representing a response dict.
 
@@ -5220,6 +5933,11 @@ class LeoServer:
             # - All the *cheap* redraw data for p.
             redraw_d = self._get_position_d(p, c)
             package["node"] = redraw_d
+            # Add the outline changes if the client has called set_tree_sync.
+            if c in self.tree_sync_d:
+                delta = self._update_tree_sync(c)
+                if delta:
+                    package["delta"] = delta
 
         # Handle traces.
         if trace and verbose:  # pragma: no cover
@@ -5230,7 +5948,7 @@ class LeoServer:
             keys_s = ', '.join(keys)
             print(f"response {self.current_id:<4} {keys_s}", flush=True)
 
-        return json.dumps(package, separators=(',', ':'), cls=SetEncoder)
+        return self._get_wire(self.current_client).encode(package)
     #@+node:felix.20210621233316.95: *4* server._p_to_ap
     def _p_to_ap(self, p: Position) -> dict:
         """
@@ -5261,34 +5979,56 @@ class LeoServer:
         Send data asynchronously to the client
         """
         tag = "send async output"
-        jsonPackage = json.dumps(package, separators=(',', ':'), cls=SetEncoder)
         if "async" not in package:
-            raise InternalServerError(f"\n{tag}: async member missing in package {jsonPackage} \n")
+            raise InternalServerError(f"\n{tag}: async member missing in package {package!r} \n")
         if self.loop:
-            self.loop.create_task(self._async_output(jsonPackage, toAll))
+            # Encode now: package may contain positions.
+            clients = list(connectionsPool) if toAll else [self.web_socket]
+            messages = self._encode_for_clients(package, [z for z in clients if z])
+            coro = self._async_output(messages, toAll)
+            if self._in_loop_thread():
+                self.loop.create_task(coro)
+            else:
+                # Called from the leo thread.
+                self.loop.call_soon_threadsafe(self.loop.create_task, coro)
         elif not g.unitTesting:
-            raise InternalServerError(f"\n{tag}: loop not ready {jsonPackage} \n")
+            raise InternalServerError(f"\n{tag}: loop not ready {package!r} \n")
     #@+node:felix.20210621233316.89: *5* server._async_output
     async def _async_output(self,
-        json: str,
+        messages: list[tuple[Socket, Response]],
         toAll: bool = False,
     ) -> None:  # pragma: no cover (tested in server)
-        """Output json string to the web_socket"""
+        """Output the messages created by _encode_for_clients."""
         global connectionsTotal
         tag = '_async_output'
-        outputBytes = bytes(json, 'utf-8')
-        if toAll:
-            if connectionsPool:  # asyncio.wait doesn't accept an empty list
-                await asyncio.wait([
-                    asyncio.create_task(client.send(outputBytes)) for client in connectionsPool
-                ])
-            else:
-                g.trace(f"{tag}: no web socket. json: {json!r}")
-        else:
-            if self.web_socket:
-                await self.web_socket.send(outputBytes)
-            else:
-                g.trace(f"{tag}: no web socket. json: {json!r}")
+        if not messages:  # asyncio.wait doesn't accept an empty list
+            g.trace(f"{tag}: no web socket. toAll: {toAll}")
+            return
+        sends = []
+        for client, message in messages:
+            # Json travels in binary frames, as always.
+            data = bytes(message, 'utf-8') if isinstance(message, str) else message
+            sends.append(asyncio.create_task(client.send(data)))
+        await asyncio.wait(sends)
+    #@+node:ekr.20261018190000.5: *5* server._encode_for_clients
+    def _encode_for_clients(self, package: Package, clients: list[Socket]) -> list[tuple[Socket, Response]]:
+        """
+        Return a list of tuples (client, message), encoding package once
+        for each distinct wire format.
+        """
+        cache: dict[tuple, Response] = {}
+        result = []
+        for client in clients:
+            wire = self._get_wire(id(client))
+            key = (wire.name, wire.blob_size, wire.compress_size)
+            if key not in cache:
+                cache[key] = wire.encode(package)
+            result.append((client, cache[key]))
+        return result
+    #@+node:ekr.20261018190000.6: *5* server._get_wire
+    def _get_wire(self, client_id: int) -> WireFormat:
+        """Return the WireFormat of the client whose id is client_id."""
+        return self.wire_formats.get(client_id, self.json_wire)
     #@+node:felix.20210621233316.97: *4* server._test_round_trip_positions
     def _test_round_trip_positions(self, c: Cmdr) -> None:  # pragma: no cover (tested in client).
         """Test the round tripping of p_to_ap and ap_to_p."""
@@ -5576,18 +6316,19 @@ def main() -> None:  # pragma: no cover (tested in client)
         global connectionsTotal
         if connectionsPool:  # asyncio.wait doesn't accept an empty list
             opened = bool(controller.c)  # c can be none if no files opened
-            m = json.dumps({
+            package = {
                 "async": "refresh",
                 "action": action,
                 "opened": opened,
-            }, separators=(',', ':'), cls=SetEncoder)
+            }
             clientSetCopy = connectionsPool.copy()
             if excludedConn:
                 clientSetCopy.discard(excludedConn)
             if clientSetCopy:
                 # if still at least one to notify
+                messages = controller._encode_for_clients(package, list(clientSetCopy))
                 await asyncio.wait([
-                    asyncio.create_task(client.send(m)) for client in clientSetCopy
+                    asyncio.create_task(client.send(m)) for client, m in messages
                 ])
     #@+node:felix.20210803174312.2: *3* function: register_client
     async def register_client(websocket: Socket) -> None:
@@ -5610,7 +6351,54 @@ def main() -> None:  # pragma: no cover (tested in client)
     async def unregister_client(websocket: Socket) -> None:
         global connectionsTotal
         connectionsPool.remove(websocket)
+        controller.wire_formats.pop(id(websocket), None)
         await notify_clients("unregister")
+    #@+node:ekr.20261018180000.8: *3* function: ws_handle_message (server)
+    async def ws_handle_message(websocket: Socket, json_message: Any) -> None:
+        """Handle one message of the websocket and send the answer."""
+        tag = 'server'
+        trace = False
+        d = None
+        try:
+            d = controller.json_wire.decode(json_message)
+            if trace:
+                print(f"{tag}: got: {d}", flush=True)
+            answer = await controller._do_message_async(d, client=websocket)
+        except TerminateServer as e:
+            await websocket.close(websockets.frames.CloseCode.NORMAL_CLOSURE, e.__str__())
+            return
+        except ServerError as e:
+            data = f"{d}" if d else f"json syntax error: {json_message!r}"
+            error = f"{tag}:  ServerError: {e}...\n{tag}:  {data}"
+            print("", flush=True)
+            print(error, flush=True)
+            print("", flush=True)
+            is_dict = isinstance(d, dict)
+            package = {
+                "id": d.get("id") if is_dict else controller.current_id,
+                "action": d.get("action") if is_dict else controller.action,
+                "request": data,
+                "ServerError": f"{e}",
+            }
+            answer = controller._get_wire(id(websocket)).encode(package)
+        except InternalServerError as e:  # pragma: no cover
+            print(f"{tag}: InternalServerError {e}", flush=True)
+            await websocket.close()
+            return
+        except Exception as e:  # pragma: no cover
+            print(f"{tag}: Unexpected Exception! {e}", flush=True)
+            g.print_exception()
+            print('', flush=True)
+            await websocket.close()
+            return
+        try:
+            await websocket.send(answer)
+        except websockets.exceptions.ConnectionClosed:
+            return
+        # If not a 'getter' send refresh signal to other clients
+        action = d.get("action") if isinstance(d, dict) else None
+        if action and action[0:5] != "!get_" and action not in ("!do_nothing", "!cancel_request"):
+            await notify_clients(action, websocket)
     #@+node:felix.20210621233316.106: *3* function: ws_handler (server)
     async def ws_handler(websocket: Socket, path: str) -> None:
         """
@@ -5620,8 +6408,6 @@ def main() -> None:  # pragma: no cover (tested in client)
         """
         global connectionsTotal, wsLimit
         tag = 'server'
-        trace = False
-        verbose = False
         connected = False
 
         try:
@@ -5638,49 +6424,25 @@ def main() -> None:  # pragma: no cover (tested in client)
             await register_client(websocket)
             # Start by sending empty as 'ok'.
             n = 0
-            await websocket.send(controller._make_response({"leoID": g.app.leoID}))
+
+            def make_first_response() -> Response:
+                # Runs in the leo thread. New clients use the json wire format.
+                controller.current_client = id(websocket)
+                return controller._make_response({"leoID": g.app.leoID})
+
+            loop = asyncio.get_running_loop()
+            await websocket.send(await loop.run_in_executor(controller.leo_executor, make_first_response))
             controller._emit_signon()
 
-            # Websocket connection message handling loop
+            # Websocket connection message handling loop.
+            # Each message runs in its own task so that this loop can receive
+            # "!cancel_request" messages while Leo handles previous requests.
+            tasks: set[asyncio.Task] = set()
             async for json_message in websocket:
-                try:
-                    n += 1
-                    d = None
-                    d = json.loads(json_message)
-                    if trace and verbose:
-                        print(f"{tag}: got: {d}", flush=True)
-                    elif trace:
-                        print(f"{tag}: got: {d}", flush=True)
-                    answer = controller._do_message(d)
-                except TerminateServer as e:
-                    rcvd = websockets.frames.Close(websockets.frames.CloseCode.NORMAL_CLOSURE, e.__str__())
-                    raise websockets.exceptions.ConnectionClosed(rcvd, None, None)
-                except ServerError as e:
-                    data = f"{d}" if d else f"json syntax error: {json_message!r}"
-                    error = f"{tag}:  ServerError: {e}...\n{tag}:  {data}"
-                    print("", flush=True)
-                    print(error, flush=True)
-                    print("", flush=True)
-                    package = {
-                        "id": controller.current_id,
-                        "action": controller.action,
-                        "request": data,
-                        "ServerError": f"{e}",
-                    }
-                    answer = json.dumps(package, separators=(',', ':'), cls=SetEncoder)
-                except InternalServerError as e:  # pragma: no cover
-                    print(f"{tag}: InternalServerError {e}", flush=True)
-                    break
-                except Exception as e:  # pragma: no cover
-                    print(f"{tag}: Unexpected Exception! {e}", flush=True)
-                    g.print_exception()
-                    print('', flush=True)
-                    break
-                await websocket.send(answer)
-
-                # If not a 'getter' send refresh signal to other clients
-                if controller.action[0:5] != "!get_" and controller.action != "!do_nothing":
-                    await notify_clients(controller.action, websocket)
+                n += 1
+                task = asyncio.create_task(ws_handle_message(websocket, json_message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
 
         except websockets.exceptions.ConnectionClosedError as e:  # pragma: no cover
             print(f"{tag}: connection closed error: {e}")
@@ -5749,6 +6511,8 @@ def main() -> None:  # pragma: no cover (tested in client)
     finally:
         # Execution continues here after server is interrupted (e.g. with ctrl+c)
         realtime_server.close()
+        # Let the running request finish. Don't start queued requests.
+        controller.leo_executor.shutdown(wait=True, cancel_futures=True)
         if not wsSkipDirty:
             print("Checking for changed commanders...", flush=True)
             save_dirty()
@@ -54,6 +54,8 @@ except ImportError:
 g.assertUi('qt')  # May raise g.UiTypeException, caught by the plugins manager.
 #@-<< imports >>
 index_error_given = False
+# Leo loads this plugin when the global-search command is first used.
+__plugin_commands__ = ['global-search']
 #@+others
 #@+node:ville.20120225144051.3580: ** top-level functions
 #@+node:ekr.20140920041848.17924: *3* global-search command (bigdash.py)
@@ -10,6 +10,8 @@
 #@+<< version >>
 #@+node:bob.20170311140807.2: ** << version >>
 __version__ = '1.0.0'
+# Leo loads this plugin when one of these commands is first used.
+__plugin_commands__ = ['babel-exec-p', 'babel-menu-p']
 #@-<< version >>
 #@+<< imports >>
 #@+node:bob.20170311140940.1: ** << imports >>
@@ -18,6 +18,9 @@ the following API::
         automatically updated to be consistent
     tc.get_tagged_nodes('foo')
         return a list of positions tagged 'foo'
+    tc.get_tag_counts()
+        return a dict whose keys are tags and whose values are
+        the number of nodes with that tag
     tc.get_tags(p)
         return a list of tags applied to the node at position p.
         returns [] if node has no tags
@@ -28,6 +31,11 @@ the following API::
 
 Internally, tags are stored in `p.v.unknownAttributes['__node_tags']` as a set.
 
+The controller keeps an index of all tags. Queries do not scan the outline.
+The index is rebuilt after changes to the outline's structure, undo, redo
+and file reads. Scripts that change `p.v.u['__node_tags']` directly should
+call tc.initialize_taglist().
+
 UI
 ==
 
@@ -99,12 +107,12 @@ whitespace (calling .strip()).
 from __future__ import annotations
 from collections.abc import Callable
 import re
-from typing import Any, Generator, TYPE_CHECKING
+from typing import Any, Generator, Iterable, TYPE_CHECKING
 from leo.core import leoGlobals as g
 from leo.core import leoNodes
 try:
     from leo.core.leoQt import QtCore, QtWidgets
-    from leo.core.leoQt import MouseButton
+    from leo.core.leoQt import ItemDataRole, MouseButton
 except Exception:
     QtCore = QtWidgets = None
 
@@ -152,8 +160,13 @@ class TagController:
 
         self.c = c
         self.taglist: list[str] = []
+        # The tag index. See initialize_taglist.
+        self.tag_index: dict[str, set[VNode]] = {}  # Keys are tags, values are sets of tagged vnodes.
+        self.node_tags: dict[VNode, set[str]] = {}  # Keys are tagged vnodes, values are sets of tags.
+        self.index_generation: int = None  # The tree's generation when the index was valid.
         self.initialize_taglist()
         c.theTagController = self
+        g.registerHandler(('after-reading-external-file', 'command2', 'open2'), self.invalidate_hook)
         # #2031: Init the widgets only if we are using Qt.
         if g.app.gui.guiName().startswith('qt'):
             self.ui = LeoTagWidget(c)
@@ -161,31 +174,88 @@ class TagController:
             self.ui.update_all()
     #@+node:peckj.20140804103733.9263: *3* tag_c.initialize_taglist
     def initialize_taglist(self) -> None:
-        taglist = []
-        for p in self.c.all_unique_positions():
-            for tag in self.get_tags(p):
-                if tag not in taglist:
-                    taglist.append(tag)
-        self.taglist = taglist
-
+        """Rebuild the tag index and the taglist from all nodes of the outline."""
+        self.tag_index = {}
+        self.node_tags = {}
+        for v in self.c.all_unique_nodes():
+            tags = v.u.get(self.TAG_LIST_KEY)
+            if tags:
+                self.index_node(v, tags)
+        self.taglist = list(self.tag_index)
+        self.index_generation = self.get_generation()
+    #@+node:ekr.20261018250000.1: *3* tag_c.index
+    #@+node:ekr.20261018250000.2: *4* tag_c.check_index
+    def check_index(self) -> None:
+        """Rebuild the index if the outline's structure has changed."""
+        if self.index_generation is None or self.index_generation != self.get_generation():
+            self.initialize_taglist()
+    #@+node:ekr.20261018250000.3: *4* tag_c.get_generation
+    def get_generation(self) -> int:
+        """
+        Return the generation count of the outline's structure.
+        Low-level vnode methods increment this count.
+        """
+        tree = getattr(self.c.frame, 'tree', None)
+        return getattr(tree, 'generation', 0)
+    #@+node:ekr.20261018250000.4: *4* tag_c.index_node & unindex_node
+    def index_node(self, v: VNode, tags: Iterable[str]) -> None:
+        """Add v and its tags to the index."""
+        tags = set(tags)
+        if not tags:
+            return
+        self.node_tags[v] = tags
+        for tag in tags:
+            self.tag_index.setdefault(tag, set()).add(v)
+
+    def unindex_node(self, v: VNode) -> None:
+        """Remove v and its tags from the index."""
+        for tag in self.node_tags.pop(v, set()):
+            vnodes = self.tag_index.get(tag)
+            if vnodes is not None:
+                vnodes.discard(v)
+                if not vnodes:
+                    del self.tag_index[tag]
+    #@+node:ekr.20261018250000.5: *4* tag_c.invalidate_hook
+    def invalidate_hook(self, tag: str, keywords: Any) -> None:
+        """
+        Invalidate the index after file reads, undo and redo.
+        These may change v.u without changing the outline's structure.
+        """
+        if keywords.get('c') != self.c:
+            return
+        if tag == 'command2' and keywords.get('label') not in ('redo', 'undo'):
+            return
+        self.index_generation = None
+    #@+node:ekr.20261018250000.6: *4* tag_c.match_vnodes
+    def match_vnodes(self, tag: str) -> set[VNode]:
+        """Return the set of vnodes containing the tag, with * as a wildcard."""
+        self.check_index()
+        # replace * with .* for regex compatibility
+        regex = re.compile(tag.replace('*', '.*'))
+        result: set[VNode] = set()
+        for key, vnodes in self.tag_index.items():
+            if regex.match(key):
+                result |= vnodes
+        return result
     #@+node:peckj.20140804103733.9264: *3* tag_c.outline-level
     #@+node:peckj.20140804103733.9268: *4* tag_c.get_all_tags
     def get_all_tags(self) -> list[str]:
         """ return a list of all tags in the outline """
+        self.check_index()
         return self.taglist
+    #@+node:ekr.20261018250000.7: *4* tag_c.get_tag_counts
+    def get_tag_counts(self) -> dict[str, int]:
+        """ return a dict whose keys are tags and whose values are the number of nodes with that tag """
+        self.check_index()
+        return {tag: len(vnodes) for tag, vnodes in self.tag_index.items()}
     #@+node:ekr.20201030095446.1: *4* tag_c.show_all_tags
     def show_all_tags(self) -> None:
         """Show all tags, organized by node."""
-        c, tc = self.c, self
-        aList: list[str]
-        d: dict[str, list[str]] = {}
-        for p in c.all_unique_positions():
-            u = p.v.u
-            tags = set(u.get(tc.TAG_LIST_KEY, set([])))
-            for tag in tags:
-                aList = d.get(tag, [])
-                aList.append(p.h)
-                d[tag] = aList
+        c = self.c
+        self.check_index()
+        d: dict[str, list[str]] = {
+            tag: [v.h for v in vnodes] for tag, vnodes in self.tag_index.items()
+        }
         # Print all tags.
         if d:
             for key in sorted(d):
@@ -199,35 +269,25 @@ class TagController:
     #@+node:peckj.20140804103733.9267: *4* tag_c.update_taglist
     def update_taglist(self, tag: str) -> None:
         """ ensures the outline's taglist is consistent with the state of the nodes in the outline """
-        if tag not in self.taglist:
-            self.taglist.append(tag)
-        nodelist = self.get_tagged_nodes(tag)
-        if not nodelist:
+        if tag in self.tag_index:
+            if tag not in self.taglist:
+                self.taglist.append(tag)
+        elif tag in self.taglist:
             self.taglist.remove(tag)
         if hasattr(self, 'ui'):
             self.ui.update_all()
     #@+node:peckj.20140804103733.9258: *4* tag_c.get_tagged_nodes
     def get_tagged_nodes(self, tag: str) -> list[Position]:
         """ return a list of *positions* of nodes containing the tag, with * as a wildcard """
-        nodelist: list[Position] = []
-        # replace * with .* for regex compatibility
-        tag = tag.replace('*', '.*')
-        regex = re.compile(tag)
-        for p in self.c.all_unique_positions():
-            for tag in self.get_tags(p):
-                if regex.match(tag):
-                    nodelist.append(p.copy())
-                    break
-        return nodelist
+        vnodes = self.match_vnodes(tag)
+        if not vnodes:
+            return []
+        # One pass over the outline finds the positions in outline order.
+        return [p.copy() for p in self.c.all_unique_positions() if p.v in vnodes]
     #@+node:vitalije.20170811150914.1: *4* tag_c.get_tagged_gnxes
     def get_tagged_gnxes(self, tag: str) -> Generator:
-        c = self.c
-        tag = tag.replace('*', '.*')
-        regex = re.compile(tag)
-        for p in c.all_unique_positions():
-            for t in self.get_tags(p):
-                if regex.match(t):
-                    yield p.v.gnx
+        for v in self.match_vnodes(tag):
+            yield v.gnx
     #@+node:peckj.20140804103733.9265: *3* tag_c.individual nodes
     #@+node:peckj.20140804103733.9259: *4* tag_c.get_tags
     def get_tags(self, p: Position) -> list[str]:
@@ -240,14 +300,18 @@ class TagController:
     def add_tag(self, p: Position, tag: str) -> None:
         """ adds 'tag' to the taglist of v """
         # cast to set() incase JSON storage (leo_cloud plugin) converted to list
+        self.check_index()
         tags = set(p.v.u.get(self.TAG_LIST_KEY, set([])))
         tags.add(tag)
         p.v.u[self.TAG_LIST_KEY] = tags
+        self.unindex_node(p.v)
+        self.index_node(p.v, tags)
         self.c.setChanged()
         self.update_taglist(tag)
     #@+node:peckj.20140804103733.9261: *4* tag_c.remove_tag
     def remove_tag(self, p: Position, tag: str) -> None:
         """ removes 'tag' from the taglist of position p. """
+        self.check_index()
         v = p.v
         # In case JSON storage (leo_cloud plugin) converted to list.
         tags = set(v.u.get(self.TAG_LIST_KEY, set([])))
@@ -258,6 +322,8 @@ class TagController:
         else:
             # prevent a few corner cases, and conserve disk space
             del v.u[self.TAG_LIST_KEY]
+        self.unindex_node(v)
+        self.index_node(v, tags)
         self.c.setChanged()
         self.update_taglist(tag)
     #@-others
@@ -406,6 +472,10 @@ if QtWidgets:
             self.comboBox.clear()
             tags = self.tc.get_all_tags()
             self.comboBox.addItems(tags)
+            counts = self.tc.get_tag_counts()
+            for i, tag in enumerate(tags):
+                n = counts.get(tag, 0)
+                self.comboBox.setItemData(i, f"{n} node{g.plural(n)}", ItemDataRole.ToolTipRole)
             self.comboBox.addItems(self.custom_searches)
 
         #@+node:peckj.20140804114520.15207: *4* tag_w.update_list
@@ -1315,7 +1315,7 @@ class LeoQtGui(leoGui.LeoGui):
             'viewrendered.py',
         )
         for name in table:
-            if pc.isLoaded(name):
+            if pc.isLoaded(name) or pc.isLazy(name):
                 vr = pc.loadOnePlugin(name)
                 break
         else:
@@ -9,8 +9,9 @@ import re
 import time
 from typing import Any, TYPE_CHECKING
 from leo.core.leoQt import QtCore, QtGui, QtWidgets
-from leo.core.leoQt import EndEditHint, Format, ItemFlag, KeyboardModifier
+from leo.core.leoQt import EndEditHint, Format, ItemDataRole, ItemFlag, KeyboardModifier
 from leo.core import leoGlobals as g
+from leo.core import leoFastRedraw
 from leo.core import leoFrame
 from leo.core import leoPlugins  # Uses leoPlugins.TryNext.
 from leo.plugins import qt_text
@@ -53,6 +54,13 @@ class LeoQtTree(leoFrame.LeoTree):
         self.position2itemDict: dict[str, Item] = {}  # Keys are gnxs.
         self.vnode2itemsDict: dict[VNode, list[Item]] = {}  # values are lists of items.
         self.editWidgetsDict: dict[Editor, Wrapper] = {}  # keys are native edit widgets, values are wrappers.
+        # Items drawn by drawTopTree before they are added to the tree widget.
+        self.detached_top_items: list[Item] = []
+        self.detached_expanded_items: list[Item] = []
+        self.item_flags: Any = None  # The flags of new items, computed once by createTreeItem.
+        # Incremental redraw. One tuple (key, item, headline, icon value) per drawn row.
+        self.fast_redrawer = leoFastRedraw.FastRedraw()
+        self.visible_rows: list[tuple[str, Item, str, int]] = []
         self.reloadSettings()
         # Components...
         self.canvas = self  # An official ivar used by Leo's core.
@@ -121,11 +129,13 @@ class LeoQtTree(leoFrame.LeoTree):
         c = self.c
         self.auto_edit = c.config.getBool('single-click-auto-edits-headline', False)
         self.enable_drag_messages = c.config.getBool("enable-drag-messages")
+        self.incremental_redraw_threshold = c.config.getInt('tree-incremental-redraw-threshold') or 500
         self.select_all_text_when_editing_headlines = c.config.getBool(
             'select_all_text_when_editing_headlines')
         self.stayInTree = c.config.getBool('stayInTreeAfterSelect')
         self.use_chapters = c.config.getBool('use-chapters')
         self.use_declutter = c.config.getBool('tree-declutter', default=False)
+        self.use_incremental_redraw = c.config.getBool('tree-incremental-redraw', default=True)
         self.use_mouse_expand_gestures = c.config.getBool('use-mouse-expand-gestures',
                                                            default=False)
     #@+node:ekr.20110605121601.17940: *4* qtree.wrapQLineEdit
@@ -153,11 +163,14 @@ class LeoQtTree(leoFrame.LeoTree):
         """Clear all widgets in the tree."""
         w = self.treeWidget
         w.clear()
+        self.visible_rows = []
     #@+node:ekr.20110605121601.17873: *4* qtree.full_redraw & helpers
-    def full_redraw(self, p: Position = None) -> Position:
+    def full_redraw(self, p: Position = None, incremental: bool = False) -> Position:
         """
         Redraw all visible nodes of the tree.
         Preserve the vertical scrolling unless scroll is True.
+
+        incremental: Redraw only the rows that have changed, if possible.
         """
         c = self.c
         if g.app.disable_redraw:
@@ -178,19 +191,24 @@ class LeoQtTree(leoFrame.LeoTree):
             c.setCurrentPosition(p)
         assert not self.busy, g.callers()
         self.redrawCount += 1
-        self.initData()
         try:
             self.busy = True
-            self.drawTopTree(p)
+            if not (incremental and self.drawTopTreeIncrementally()):
+                self.initData()
+                self.drawTopTree(p)
         finally:
             self.busy = False
         self.setItemForCurrentPosition()
         return p  # Return the position, which may have changed.
 
+    def incremental_redraw(self, p: Position = None) -> Position:
+        """Redraw only the rows of the tree that have changed since the last redraw."""
+        return self.full_redraw(p, incremental=self.use_incremental_redraw)
+
     # Compatibility
 
     # mypy complains that there is a mismatch with the base redraw method.
-    redraw = full_redraw  # type:ignore
+    redraw = incremental_redraw  # type:ignore
     redraw_now = full_redraw  #type:ignore
     #@+node:vitalije.20200329160945.1: *5* tree declutter code
     #@+node:tbrown.20150807090639.1: *6* qtree.declutter_node & helpers
@@ -430,9 +448,10 @@ class LeoQtTree(leoFrame.LeoTree):
                 for child in p.children():
                     self.drawTree(child, parent_item)
             else:
-                # Draw only the hidden *direct* children.
-                for child in p.children():
-                    self.drawNode(child, parent_item)
+                # Don't draw the hidden children: show the expansion box instead.
+                # onItemExpanded redraws the tree.
+                ChildIndicatorPolicy = QtWidgets.QTreeWidgetItem.ChildIndicatorPolicy
+                parent_item.setChildIndicatorPolicy(ChildIndicatorPolicy.ShowIndicator)
                 self.contractItem(parent_item)
         else:
             self.contractItem(parent_item)
@@ -440,32 +459,22 @@ class LeoQtTree(leoFrame.LeoTree):
     def drawNode(self, p: Position, parent_item: Item) -> Item:
         """Draw the node p."""
         c = self.c
-        v = p.v
         # Allocate the QTreeWidgetItem.
         item = self.createTreeItem(p, parent_item)
         # Update the data structures.
-        itemHash = self.itemHash(item)
-        self.position2itemDict[p.key()] = item
-        self.item2positionDict[itemHash] = p.copy()  # was item
-        self.item2vnodeDict[itemHash] = v  # was item
-        d = self.vnode2itemsDict
-        aList = d.get(v, [])
-        if item not in aList:
-            aList.append(item)
-        d[v] = aList
+        self.rememberItem(p, item)
+        self.visible_rows.append((self.rowKey(p), item, p.h, p.v.computeIcon()))
         # Set the headline and maybe the icon.
         self.setItemText(item, p.h)
-        # #1310: Add a tool tip.
-        item.setToolTip(0, p.h)
         if self.use_declutter:
+            # #1310: Add a tool tip.
+            item.setToolTip(0, p.h)
             icon = self.declutter_node(c, p.v, item)
             if icon:
                 item.setIcon(0, icon)
             return item
-        # Draw the icon: **Slow**, but allows per-vnode icons.
-        icon = self.getCompositeIconImage(p.v)
-        if icon:
-            item.setIcon(0, icon)
+        # LeoTreeWidgetItem computes the tool tip and the (slow) icon
+        # only when the item becomes visible.
         return item
     #@+node:ekr.20110605121601.17876: *5* qtree.drawTopTree
     def drawTopTree(self, p: Position) -> None:
@@ -473,28 +482,198 @@ class LeoQtTree(leoFrame.LeoTree):
         trace = 'drawing' in g.app.debug and not g.unitTesting
         if trace:
             t1 = time.process_time()
-        c = self.c
+        w = self.treeWidget
         self.clear()
+        # Draw all items while they are detached from the tree widget.
+        # Adding them all at once is much faster than adding them one by one.
+        self.detached_top_items = []
+        self.detached_expanded_items = []
         # Draw all top-level nodes and their visible descendants.
+        for p2 in self.topPositions():
+            self.drawTree(p2)
+        w.setUpdatesEnabled(False)
+        try:
+            w.addTopLevelItems(self.detached_top_items)
+            for item in self.detached_expanded_items:
+                w.expandItem(item)
+        finally:
+            self.detached_top_items = []
+            self.detached_expanded_items = []
+            w.setUpdatesEnabled(True)
+        if trace:
+            t2 = time.process_time()
+            g.trace(f"{t2 - t1:5.2f} sec.", g.callers(5))
+    #@+node:ekr.20261018220000.2: *5* qtree.drawTopTreeIncrementally & helpers
+    def drawTopTreeIncrementally(self) -> bool:
+        """
+        Diff the rows drawn by the previous redraw against the rows that
+        should be visible now. Insert, delete and update only the changed
+        items, reusing all other items.
+
+        Return False if the caller must redraw the entire tree.
+        """
+        trace = 'drawing' in g.app.debug and not g.unitTesting
+        w = self.treeWidget
+        old_rows = self.visible_rows
+        if not old_rows or g.app.gui.isNullGui:
+            return False
+        if trace:
+            t1 = time.process_time()
+        positions = self.visiblePositions()
+        new_keys = [self.rowKey(p) for p in positions]
+        opcodes = self.fast_redrawer.diff_rows([z[0] for z in old_rows], new_keys)
+        n_changed = sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+        if n_changed > self.incremental_redraw_threshold:
+            return False
+        # Reuse the item of an unchanged row only if its parent item is also reused.
+        reused_rows: list[tuple[str, Item, str, int]] = [None] * len(positions)
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                reused_rows[j1:j2] = old_rows[i1:i2]
+        stack: list[tuple[int, int]] = []  # (level, row index)
+        for j, p in enumerate(positions):
+            level = p.level()
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            row = reused_rows[j]
+            if row:
+                parent_row = reused_rows[stack[-1][1]] if stack else None
+                parent_item = parent_row[1] if parent_row else None
+                if (stack and not parent_row) or row[1].parent() is not parent_item:
+                    reused_rows[j] = None
+            stack.append((level, j))
+        w.setUpdatesEnabled(False)
+        try:
+            # Delete the roots of all unused subtrees.
+            reused = {id(z[1]) for z in reused_rows if z}
+            for row in old_rows:
+                item = row[1]
+                if id(item) not in reused:
+                    parent_item = item.parent()
+                    if not parent_item:
+                        w.takeTopLevelItem(w.indexOfTopLevelItem(item))
+                    elif id(parent_item) in reused:
+                        parent_item.removeChild(item)
+            # Insert the new items and update the reused items.
+            self.initData()
+            self.visible_rows = []
+            self.detached_top_items = []
+            expanded_items: list[Item] = []
+            n_children: dict[int, int] = {}  # Keys are ids of parent items.
+            item_stack: list[tuple[int, Item]] = []  # (level, item)
+            for p, row in zip(positions, reused_rows):
+                level = p.level()
+                while item_stack and item_stack[-1][0] >= level:
+                    item_stack.pop()
+                parent_item = item_stack[-1][1] if item_stack else None
+                n = n_children.get(id(parent_item), 0)
+                n_children[id(parent_item)] = n + 1
+                if row:
+                    # The row key includes the expansion state.
+                    item = row[1]
+                    self.rememberItem(p, item)
+                    self.visible_rows.append(row)
+                    self.updateRow(p, len(self.visible_rows) - 1)
+                else:
+                    item = self.drawNode(p, parent_item)
+                    # drawNode appends the item. Move it to its proper place.
+                    if not parent_item:
+                        self.detached_top_items.pop()
+                        w.insertTopLevelItem(n, item)
+                    elif n < parent_item.childCount() - 1:
+                        parent_item.takeChild(parent_item.childCount() - 1)
+                        parent_item.insertChild(n, item)
+                    if self.updateItemExpansion(p, item):
+                        expanded_items.append(item)
+                item_stack.append((level, item))
+            # Expand items only after adding all their children.
+            for item in expanded_items:
+                w.expandItem(item)
+        finally:
+            self.detached_top_items = []
+            w.setUpdatesEnabled(True)
+        if trace:
+            t2 = time.process_time()
+            g.trace(f"{n_changed} changed rows {t2 - t1:5.2f} sec.", g.callers(5))
+        return True
+    #@+node:ekr.20261018220000.8: *6* qtree.rowKey
+    def rowKey(self, p: Position) -> str:
+        """
+        Return the key of p's row: p's level, gnx and expansion state.
+        Rows with equal keys can share items.
+        """
+        if not p.v.children:
+            state = ' '
+        elif p.isExpanded():
+            state = '-'
+        else:
+            state = '+'
+        return f"{p.level()}:{state}:{p.gnx}"
+    #@+node:ekr.20261018220000.3: *6* qtree.topPositions & visiblePositions
+    def topPositions(self) -> list[Position]:
+        """Return the list of positions drawn as top-level items."""
+        c = self.c
         if c.hoistStack:
             bunch = c.hoistStack[-1]
             p = bunch.p
             h = p.h
             if len(c.hoistStack) == 1 and h.startswith('@chapter') and p.hasChildren():
-                p = p.firstChild()
-                while p:
-                    self.drawTree(p)
-                    p.moveToNext()
-            else:
-                self.drawTree(p)
+                return list(p.firstChild().self_and_siblings())
+            return [p.copy()]
+        return list(c.rootPosition().self_and_siblings())
+
+    def visiblePositions(self) -> list[Position]:
+        """Return the list of all positions that the tree draws, in outline order."""
+        result: list[Position] = []
+
+        def add(p: Position) -> None:
+            result.append(p)
+            if p.isExpanded():
+                for child in p.children():
+                    add(child)
+
+        for p in self.topPositions():
+            add(p)
+        return result
+    #@+node:ekr.20261018220000.4: *6* qtree.updateItemExpansion
+    def updateItemExpansion(self, p: Position, item: Item) -> bool:
+        """
+        Update the expansion box and the expansion state of p's item.
+        Return True if the caller should expand the item.
+        """
+        ChildIndicatorPolicy = QtWidgets.QTreeWidgetItem.ChildIndicatorPolicy
+        if p.hasChildren() and not p.isExpanded():
+            # drawChildren doesn't draw hidden children.
+            policy = ChildIndicatorPolicy.ShowIndicator
         else:
-            p = c.rootPosition()
-            while p:
-                self.drawTree(p)
-                p.moveToNext()
-        if trace:
-            t2 = time.process_time()
-            g.trace(f"{t2 - t1:5.2f} sec.", g.callers(5))
+            policy = ChildIndicatorPolicy.DontShowIndicatorWhenChildless
+        if item.childIndicatorPolicy() != policy:
+            item.setChildIndicatorPolicy(policy)
+        expand = p.hasChildren() and p.isExpanded()
+        if item.isExpanded() and not expand:
+            self.treeWidget.collapseItem(item)
+        return expand and not item.isExpanded()
+    #@+node:ekr.20261018220000.5: *6* qtree.updateRow
+    def updateRow(self, p: Position, i: int) -> None:
+        """Update the headline and icon of the reused item of visible row i."""
+        c = self.c
+        key, item, h, icon_val = self.visible_rows[i]
+        new_icon_val = p.v.computeIcon()
+        if h == p.h and icon_val == new_icon_val:
+            return
+        self.visible_rows[i] = (key, item, p.h, new_icon_val)
+        if h != p.h:
+            self.setItemText(item, p.h)
+            if not getattr(item, 'lazy_tool_tip', False):
+                item.setToolTip(0, p.h)
+        if self.use_declutter:
+            item.setIcon(0, self.declutter_node(c, p.v, item))
+        elif getattr(item, 'lazy_icon', None) is not None:
+            # Compute the icon when Qt next asks for it.
+            item.lazy_icon = True
+            item.emitDataChanged()
+        else:
+            item.setIcon(0, self.getCompositeIconImage(p.v))
     #@+node:ekr.20110605121601.17877: *5* qtree.drawTree
     def drawTree(self, p: Position, parent_item: Item = None) -> None:
         if g.app.gui.isNullGui:
@@ -510,6 +689,19 @@ class LeoQtTree(leoFrame.LeoTree):
         self.position2itemDict = {}
         self.vnode2itemsDict = {}
         self.editWidgetsDict = {}
+    #@+node:ekr.20261018220000.6: *5* qtree.rememberItem
+    def rememberItem(self, p: Position, item: Item) -> None:
+        """Associate the item with p and p.v."""
+        v = p.v
+        itemHash = self.itemHash(item)
+        self.position2itemDict[p.key()] = item
+        self.item2positionDict[itemHash] = p.copy()  # was item
+        self.item2vnodeDict[itemHash] = v  # was item
+        d = self.vnode2itemsDict
+        aList = d.get(v, [])
+        if item not in aList:
+            aList.append(item)
+        d[v] = aList
     #@+node:ekr.20110605121601.17880: *4* qtree.redraw_after_contract
     def redraw_after_contract(self, p: Position) -> None:
 
@@ -524,7 +716,7 @@ class LeoQtTree(leoFrame.LeoTree):
             c.selectPosition(p)
             self.update_expansion(p)
         else:
-            self.full_redraw(p)  # Don't try to shortcut this!
+            self.incremental_redraw(p)  # Don't try to shortcut this!
     #@+node:ekr.20110605121601.17882: *4* qtree.redraw_after_head_changed
     def redraw_after_head_changed(self) -> None:
         """Redraw all Qt outline items cloned to c.p."""
@@ -544,7 +736,7 @@ class LeoQtTree(leoFrame.LeoTree):
         """Redraw the entire tree when an invisible node is selected."""
         if self.busy:
             return
-        self.full_redraw(p)
+        self.incremental_redraw(p)
         # c.redraw_after_select calls tree.select indirectly.
         # Do not call it again here.
     #@+node:ekr.20140907201613.18986: *4* qtree.repaint (not used)
@@ -939,10 +1131,16 @@ class LeoQtTree(leoFrame.LeoTree):
         return None
     #@+node:ekr.20110605121601.18419: *4* qtree.contractItem & expandItem
     def contractItem(self, item: Item) -> None:
-        self.treeWidget.collapseItem(item)
+        # Detached items are always contracted.
+        if item.treeWidget():
+            self.treeWidget.collapseItem(item)
 
     def expandItem(self, item: Item) -> None:
-        self.treeWidget.expandItem(item)
+        if item.treeWidget():
+            self.treeWidget.expandItem(item)
+        else:
+            # drawTopTree expands the item after adding it to the tree widget.
+            self.detached_expanded_items.append(item)
     #@+node:ekr.20110605121601.18420: *4* qtree.createTreeEditorForItem
     def createTreeEditorForItem(self, item: Item) -> tuple[Editor, Wrapper]:
 
@@ -960,12 +1158,17 @@ class LeoQtTree(leoFrame.LeoTree):
     #@+node:ekr.20110605121601.18421: *4* qtree.createTreeItem
     def createTreeItem(self, p: Position, parent_item: Item) -> Item:
 
-        w = self.treeWidget
-        itemOrTree = parent_item or w
-        item = QtWidgets.QTreeWidgetItem(itemOrTree)
-        item.setFlags(item.flags() | ItemFlag.ItemIsEditable)
-        ChildIndicatorPolicy = QtWidgets.QTreeWidgetItem.ChildIndicatorPolicy
-        item.setChildIndicatorPolicy(ChildIndicatorPolicy.DontShowIndicatorWhenChildless)
+        item = LeoTreeWidgetItem(self, p.v)
+        if parent_item:
+            parent_item.addChild(item)
+        else:
+            # drawTopTree adds the item to the tree widget.
+            self.detached_top_items.append(item)
+        # Combining Qt enums is surprisingly slow, so do it only once.
+        if self.item_flags is None:
+            self.item_flags = item.flags() | ItemFlag.ItemIsEditable
+        item.setFlags(self.item_flags)
+        item.setChildIndicatorPolicy(LeoTreeWidgetItem.childless_policy)
         try:
             g.visit_tree_item(self.c, p, item)
         except leoPlugins.TryNext:
@@ -1262,6 +1465,53 @@ class LeoQtTree(leoFrame.LeoTree):
         if item:
             item.setSelected(False)
     #@-others
+#@+node:ekr.20261018210000.1: ** class LeoTreeWidgetItem
+class LeoTreeWidgetItem(QtWidgets.QTreeWidgetItem):  # type:ignore
+    """
+    An item of Leo's outline pane.
+
+    The item computes its icon and tool tip only when Qt first asks for
+    them, that is, when the item becomes visible. Drawing a tree with many
+    visible nodes no longer computes an icon for each node.
+
+    Explicit calls to setIcon and setToolTip disable the lazy data.
+
+    Leo still creates one item for every visible row, including all the
+    children of an expanded node: expanding a node with 20,000 children
+    takes about 0.7 seconds. The data override also has a cost: Qt calls it
+    about seven times per row on every paint. Repainting 45 rows takes about
+    3.0 msec. instead of 1.7 msec. for items without the override.
+    """
+
+    childless_policy = QtWidgets.QTreeWidgetItem.ChildIndicatorPolicy.DontShowIndicatorWhenChildless
+
+    def __init__(self, tree: LeoQtTree, v: VNode) -> None:
+        super().__init__()
+        self.leo_tree = tree
+        self.leo_v = v
+        self.lazy_icon: Icon = True  # True, None or the computed icon.
+        self.lazy_tool_tip = True
+
+    def data(self, column: int, role: Any) -> Any:
+        if column == 0:
+            if role == ItemDataRole.DecorationRole and self.lazy_icon is not None:
+                if self.lazy_icon is True:
+                    self.lazy_icon = self.leo_tree.getCompositeIconImage(self.leo_v)
+                return self.lazy_icon
+            if role == ItemDataRole.ToolTipRole and self.lazy_tool_tip:
+                # #1310: The tool tip is the headline.
+                return self.leo_v.h
+        return super().data(column, role)
+
+    def setIcon(self, column: int, icon: Icon) -> None:
+        if column == 0:
+            self.lazy_icon = None
+        super().setIcon(column, icon)
+
+    def setToolTip(self, column: int, s: str) -> None:
+        if column == 0:
+            self.lazy_tool_tip = False
+        super().setToolTip(column, s)
 #@-others
 #@@language python
 #@@tabwidth -4
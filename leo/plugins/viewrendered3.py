@@ -923,6 +923,16 @@ Enhancements to the RsT stylesheets were adapted from Peter Mills' stylesheet.
 #@-<< vr3 docstring >>
 """
 
+# Leo loads this plugin when one of these commands or hooks is first used.
+__plugin_commands__ = [
+    'vr3', 'vr3-execute', 'vr3-export-rst-html', 'vr3-freeze', 'vr3-help-plot-2d',
+    'vr3-hide', 'vr3-lock', 'vr3-lock-unlock-tree', 'vr3-open-markup-in-editor',
+    'vr3-pause-play-movie', 'vr3-plot-2d', 'vr3-render-html-from-clip', 'vr3-show',
+    'vr3-shrink-view', 'vr3-tab', 'vr3-toggle', 'vr3-toggle-tab', 'vr3-unfreeze',
+    'vr3-unlock', 'vr3-update', 'vr3-use-default-layout', 'vr3-zoom-view',
+]
+__plugin_hooks__ = ['scrolledMessage']
+
 #@+<< imports >>
 #@+node:TomP.20191215195433.4: ** << imports >>
 #
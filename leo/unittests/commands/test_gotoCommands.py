@@ -157,6 +157,69 @@ class TestGotoCommands(LeoUnitTest):
         test1()
         test2()
         test3()
+    #@+node:ekr.20261018160000.7: *3* TestGotoCommands.test_line_maps
+    def test_line_maps(self):
+
+        c = self.c
+        x = GoToCommands(c)
+        self.clean_tree()
+        self.create_test_paste_outline()
+        c.demote()
+        root = c.rootPosition()
+        root.h = '@file test.py'
+        for v in c.all_unique_nodes():
+            v.b += f"{v.h} line 0\n{v.h} line 1\n"
+        root.b = '@language python\nbefore\n@others\nafter\n'
+        calls = []
+        get_external_file = x.get_external_file_with_sentinels
+
+        def get_external_file_with_sentinels(root):
+            calls.append(root.h)
+            return get_external_file(root)
+
+        x.get_external_file_with_sentinels = get_external_file_with_sentinels
+        for sentinels in (True, False):
+            root.h = '@file test.py' if sentinels else '@clean test.py'
+            lines = g.splitLines(get_external_file(root))
+            calls.clear()
+            # The map matches the linear scan.
+            for n in range(len(lines) + 2):
+                expected = (
+                    x.scan_sentinel_lines(lines, n, root) if sentinels
+                    else x.scan_nonsentinel_lines(lines, n, root))
+                self.assertEqual(x.get_line_map(root).find(n), expected, msg=n)
+            # The map is computed once.
+            self.assertEqual(calls, [root.h])
+            # Changing the tree recomputes the map.
+            child = root.firstChild()
+            child.b = child.b + 'new line\n'
+            p, offset = x.find_file_line(3, root)
+            self.assertTrue(p)
+            self.assertEqual(calls, [root.h, root.h])
+        # Writing or reading an @file node remembers the contents.
+        root.h = '@file test.py'
+        calls.clear()
+        x.remember_file_contents(root, get_external_file(root))
+        x.get_line_map(root)
+        self.assertEqual(calls, [])
+        # Only changes to root's tree recompute the map.
+        other = root.insertAfter()
+        other.b = 'other\n'
+        x.get_line_map(root)
+        self.assertEqual(calls, [])
+        grandchild = root.firstChild().firstChild()
+        self.assertTrue(grandchild)
+        grandchild.h = 'new headline'
+        x.get_line_map(root)
+        self.assertEqual(calls, [root.h])
+        # The new subtree of a 'tree' change may contain nodes of root's tree.
+        calls.clear()
+        other.v.noteOutlineChange('tree')
+        other.v.children.append(grandchild.v)
+        grandchild.v.parents.append(other.v)
+        grandchild.v._bodyString = 'new body\n'
+        x.get_line_map(root)
+        self.assertEqual(calls, [root.h])
     #@-others
 #@-others
 #@-leo
@@ -3,6 +3,7 @@
 """Tests of leoApp.py"""
 import os
 import sys
+import tempfile
 from leo.core import leoGlobals as g
 from leo.core.leoTest2 import LeoUnitTest
 #@+others
@@ -121,6 +122,45 @@ class TestApp(LeoUnitTest):
         finally:
             sys.argv = old_argv
             sys.stdout = old_stdout
+    #@+node:ekr.20261018160000.4: *3* TestApp.test_LM_settings_cache
+    def test_LM_settings_cache(self):
+        lm = g.app.loadManager
+        config = g.app.config
+        old = g.app.db, lm.files, lm.options, lm.globalSettingsDict, lm.globalBindingsDict
+        try:
+            g.app.db = {}
+            lm.files, lm.options = [], {'theme_path': None}
+            # The first read opens the settings files.
+            lm.readGlobalSettingsFiles()
+            self.assertTrue(lm.leo_settings_c)
+            self.assertTrue('lm.global-settings' in g.app.db)
+            settings_d, bindings_d = lm.globalSettingsDict, lm.globalBindingsDict
+            menus = config.menusList
+            config.menusList = []
+            # The second read uses the cache.
+            lm.readGlobalSettingsFiles()
+            self.assertIsNone(lm.leo_settings_c)
+            self.assertEqual(sorted(lm.globalSettingsDict), sorted(settings_d))
+            self.assertEqual(sorted(lm.globalBindingsDict), sorted(bindings_d))
+            self.assertEqual(lm.globalBindingsDict.name(), 'lm.globalBindingsDict')
+            for key, gs in settings_d.items():
+                self.assertEqual(lm.globalSettingsDict[key].val, gs.val, msg=key)
+            self.assertEqual(config.menusList, menus)
+            # The active settings outline needs the commanders.
+            lm.readGlobalSettingsFiles(use_cache=False)
+            self.assertTrue(lm.leo_settings_c)
+            # The key depends on the contents of the settings files.
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'myLeoSettings.leo')
+                with open(path, 'w') as f:
+                    f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+                key = lm.computeSettingsCacheKey([path])
+                self.assertEqual(lm.computeSettingsCacheKey([path]), key)
+                with open(path, 'a') as f:
+                    f.write('<leo_file/>\n')
+                self.assertNotEqual(lm.computeSettingsCacheKey([path]), key)
+        finally:
+            g.app.db, lm.files, lm.options, lm.globalSettingsDict, lm.globalBindingsDict = old
     #@-others
 #@-others
 #@-leo
@@ -459,6 +459,47 @@ class TestAtFile(LeoUnitTest):
         at.putRefLine(s, 0, n1, n2, name, p)
 
 
+    #@+node:ekr.20261018031522.4: *3* TestAtFile.test_readAll_uses_parse_cache
+    def test_readAll_uses_parse_cache(self):
+        c, at = self.c, self.c.atFileCommands
+        old_db = g.app.db
+        g.app.db = {}
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                # Create and write two @file trees.
+                roots = []
+                for i in (1, 2):
+                    root = c.rootPosition().insertAfter()
+                    root.h = f"@file {temp_dir}{os.sep}test{i}.py"
+                    root.b = f"# root {i}\n@others\n"
+                    child = root.insertAsLastChild()
+                    child.h = f"child {i}"
+                    child.b = f"a = {i}\n"
+                    roots.append(root)
+                    with open(c.fullPath(root), 'w') as f:
+                        f.write(at.atFileToString(root))
+                # The first read populates the cache.
+                at.readAll(c.rootPosition())
+                for i, root in enumerate(roots):
+                    key = f"fast-at-read:{c.fullPath(root)}"
+                    self.assertTrue(key in g.app.db, msg=key)
+                    self.assertEqual(root.firstChild().b, f"a = {i + 1}\n")
+                # Prove that the second read uses the cache.
+                key = f"fast-at-read:{c.fullPath(roots[0])}"
+                signature, node_starts, bodies = g.app.db[key]
+                child_gnx = roots[0].firstChild().gnx
+                bodies[child_gnx] = 'cached\n'
+                g.app.db[key] = (signature, node_starts, bodies)
+                at.readAll(c.rootPosition())
+                self.assertEqual(roots[0].firstChild().b, 'cached\n')
+                self.assertEqual(roots[1].firstChild().b, 'a = 2\n')
+                # Changing the external file invalidates the cache.
+                with open(c.fullPath(roots[0]), 'a') as f:
+                    f.write('\n')
+                at.readAll(c.rootPosition())
+                self.assertEqual(roots[0].firstChild().b, 'a = 1\n')
+        finally:
+            g.app.db = old_db
     #@+node:ekr.20210905052021.24: *3* TestAtFile.test_remove
     def test_remove(self):
 
@@ -585,6 +626,73 @@ class TestAtFile(LeoUnitTest):
         # Just test the last line.
         at.sentinels = False
         at.validInAtOthers(p)
+    #@+node:ekr.20261018034107.5: *3* TestAtFile.test_writeAll_skips_unchanged_trees
+    def test_writeAll_skips_unchanged_trees(self):
+        c, at = self.c, self.c.atFileCommands
+        put_roots = []
+        old_putFile = at.putFile
+
+        def putFile(root, fromString='', sentinels=True):
+            put_roots.append(root.h)
+            old_putFile(root, fromString, sentinels)
+
+        at.putFile = putFile
+        fingerprints = []
+        old_computeWriteFingerprint = at.computeWriteFingerprint
+
+        def computeWriteFingerprint(root):
+            fingerprints.append(root.h)
+            return old_computeWriteFingerprint(root)
+
+        at.computeWriteFingerprint = computeWriteFingerprint
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = c.rootPosition()
+            root.h = f"@file {temp_dir}{os.sep}test.py"
+            root.b = '@others\n'
+            child = root.insertAsLastChild()
+            child.h = 'child'
+            child.b = 'a = 1\n'
+            # The first write generates the file.
+            root.setDirty()
+            at.writeAll()
+            self.assertEqual(len(put_roots), 1)
+            self.assertTrue(root.gnx in at.write_fingerprints)
+            # Writing an unchanged (but dirty) tree does nothing.
+            root.setDirty()
+            at.writeAll()
+            self.assertEqual(len(put_roots), 1)
+            self.assertEqual(at.unchangedFiles, 1)
+            self.assertFalse(root.isDirty())
+            # Changing the subtree regenerates the file.
+            child.b = 'a = 2\n'
+            root.setDirty()
+            fingerprints.clear()
+            at.writeAll()
+            self.assertEqual(len(put_roots), 2)
+            # Each write computes the fingerprint once.
+            self.assertEqual(fingerprints, [root.h])
+            # writeAll doesn't compute the paths of clean trees.
+            clean = root.insertAfter()
+            clean.h = f"@file {temp_dir}{os.sep}clean.py"
+            clean.v.clearDirty()
+            root.setDirty()
+            paths = []
+            old_fullPath = c.fullPath
+            c.fullPath = lambda p: paths.append(p.h) or old_fullPath(p)
+            try:
+                files, junk = at.findFilesToWrite(False)
+            finally:
+                del c.fullPath
+            self.assertEqual([z.h for z in files], [root.h])
+            self.assertFalse(clean.h in paths)
+            # Changing the external file regenerates the file.
+            with open(c.fullPath(root), 'a') as f:
+                f.write('\n')
+            root.setDirty()
+            at.writeAll()
+            self.assertEqual(len(put_roots), 3)
+            with open(c.fullPath(root)) as f:
+                self.assertEqual(f.read(), at.atFileToString(root))
     #@-others
 #@+node:ekr.20211031085414.1: ** class TestFastAtRead(LeoUnitTest)
 class TestFastAtRead(LeoUnitTest):
@@ -1415,6 +1523,57 @@ class TestFastAtRead(LeoUnitTest):
                 g.printObj(g.splitLines(expected), tag='expected')
 
             self.assertEqual(results, expected)
+    #@+node:ekr.20261018031522.5: *3* TestFastAtRead.test_read_from_cache
+    def test_read_from_cache(self):
+
+        c, x = self.c, self.x
+        h = '@file /test/test_read_from_cache.py'
+        root = c.rootPosition()
+        root.h = h  # To match contents.
+        #@+<< define contents >>
+        #@+node:ekr.20261018031522.6: *4* << define contents >> (test_read_from_cache)
+        # Be careful: no line should look like a Leo sentinel!
+        contents = self.prep(
+        f'''
+            #AT+leo-ver=5-thin
+            #AT+node:{root.gnx}: * {h}
+            #AT@language python
+
+            a = 1
+
+            #AT+others
+            #AT+node:ekr.20211101152631.1: ** cloned node
+            a = 2
+            #AT+node:ekr.20211101153300.1: *3* child
+            a = 3
+            #AT+node:ekr.20211101152631.1: ** cloned node
+            a = 2
+            #AT+node:ekr.20211101153300.1: *3* child
+            a = 3
+            #AT+node:ekr.20261018031522.7: ** last node
+            a = 4
+            #AT-others
+            #AT-leo
+        ''').replace('AT', '@')
+        #@-<< define contents >>
+
+        x.read_into_root(contents, path='test', root=root)
+        node_starts, bodies = x.node_starts, x.bodies
+        self.assertEqual(len(node_starts), 6)
+        expected = c.atFileCommands.atFileToString(root, sentinels=True)
+        self.assertEqual(expected, contents)
+
+        # Recreate the tree using a pristine gnx dict.
+        root.v._deleteAllChildren()
+        x2 = leoAtFile.FastAtRead(c, gnx2vnode={})
+        x2.read_from_cache(node_starts, bodies, path='test', root=root)
+        results = c.atFileCommands.atFileToString(root, sentinels=True)
+        self.assertEqual(results, expected)
+        child1 = root.firstChild()
+        child2 = child1.next()
+        self.assertTrue(child1.isCloned())
+        self.assertEqual(child1.v, child2.v)
+        self.assertEqual(child2.next().h, 'last node')
     #@+node:ekr.20211101180354.1: *3* TestFastAtRead.test_verbatim
     def test_verbatim(self):
 
@@ -2,7 +2,11 @@
 #@+node:ekr.20210903153138.1: * @file ../unittests/core/test_leoBridge.py
 """Tests of leoBridge.py"""
 
+import contextlib
+import io
 import os
+import shutil
+import tempfile
 from leo.core.leoTest2 import LeoUnitTest
 import leo.core.leoBridge as leoBridge
 
@@ -29,6 +33,44 @@ class TestBridge(LeoUnitTest):
         self.assertTrue(os.path.exists(test_dot_leo), msg=test_dot_leo)
         c = controller.openLeoFile(test_dot_leo)
         self.assertTrue(c)
+    #@+node:ekr.20261018180000.25: *3* TestBridge.test_bridge_server
+    def test_bridge_server(self):
+        unittest_dir = os.path.abspath(os.path.dirname(__file__))
+        test_dot_leo = os.path.join(unittest_dir, '..', '..', 'test', 'test.leo')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.leo')
+            shutil.copy(test_dot_leo, path)
+            client = leoBridge.BridgeClient(
+                directory=directory, loadPlugins=False, max_jobs=4, readSettings=False, useCaches=False)
+            try:
+                script = 'c.p.h = args[0]; c.save(); result = [z.h for z in c.p.self_and_siblings()]'
+                headlines = client.run_script(path, script, 'changed')
+                self.assertEqual(headlines[0], 'changed')
+                stats = client.stats(path)
+                self.assertEqual(stats['commanders'], [path])
+                self.assertEqual(stats['jobs'], 1)
+                # The server reuses the commander.
+                self.assertEqual(client.run_script(path, 'result = c.p.h'), 'changed')
+                # The client echoes everything the job prints, including g.es_print.
+                f = io.StringIO()
+                with contextlib.redirect_stdout(f):
+                    client.run_script(path, "print('from-print'); g.es_print('from-es-print')")
+                self.assertIn('from-print', f.getvalue())
+                self.assertIn('from-es-print', f.getvalue())
+                # Clients with other options use other servers.
+                client2 = leoBridge.BridgeClient(
+                    directory=directory, loadPlugins=True, readSettings=False, useCaches=False)
+                self.assertNotEqual(client2.get_address(path), client.get_address(path))
+                # Functions get the commander.
+                self.assertTrue(client.call(path, 'builtins:hasattr', 'fileCommands'))
+                # Errors in jobs raise BridgeError.
+                with self.assertRaises(leoBridge.BridgeError):
+                    client.run_script(path, '1 / 0')
+                # The server has done max_jobs jobs. The client starts another server.
+                self.assertEqual(client.run_script(path, 'result = c.p.h'), 'changed')
+                self.assertNotEqual(client.stats(path)['pid'], stats['pid'])
+            finally:
+                client.shutdown()
     #@-others
 #@-others
 #@-leo
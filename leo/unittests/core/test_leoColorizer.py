@@ -1549,6 +1549,104 @@ class TestColorizer(LeoUnitTest):
                     assert n == len(s), (n, len(s), s)
                 else:
                     assert n == len(s) + 1, (n, len(s), s)
+    #@+node:ekr.20261018230000.2: *3* TestColorizer.test_compiled_rules
+    def test_compiled_rules(self):
+        # Compiled rules must color exactly as the original dispatch loop does.
+        c, p = self.c, self.c.p
+
+        class ReferenceColorizer(leoColorizer.JEditColorizer):
+
+            def mainLoop(self, n, s):
+                f = self.restartDict.get(n)
+                i = f(s) if f else 0
+                while i < len(s):
+                    for f in self.rulesDict.get(s[i], []):
+                        n = f(self, s, i)
+                        if n > 0:
+                            i += n
+                            break
+                        if n < 0:
+                            i += -n
+                            break
+                    else:
+                        i += 1
+
+        def color(cls, language, text):
+            """Return the list of tags that the colorizer sets."""
+            p.b = f"@language {language}\n{text}"
+            x = cls(c, None)
+            tags = []
+            x.setTag = lambda tag, s, i, j: tags.append((tag, s[i:j], i, j))
+            x.language = language
+            x.enabled = True
+            x.init()
+            x.init_all_state(p.v)
+            n = x.initBlock0()
+            for s in g.splitLines(text):
+                x.mainLoop(n, s)
+            return tags
+
+        with open(leoColorizer.__file__, encoding='utf-8') as f:
+            text = ''.join(f.readlines()[:400])
+        text += self.prep(
+        """
+            \\section{Title} Some \\textbf{bold} text, $x^2 + y_1$ % A comment.
+            <html><body class="x">A <b>tag</b> &amp; <!-- A comment --></body></html>
+            # A heading: **bold** `code` [link](http://leo-editor.github.io)\t\t
+        """)
+        languages = (
+            'c', 'css', 'elisp', 'haskell', 'html', 'java', 'javascript', 'julia', 'lua',
+            'matlab', 'md', 'perl', 'php', 'plain', 'python', 'r', 'rest', 'rust', 'tex', 'xml',
+        )
+        for language in languages:
+            expected = color(ReferenceColorizer, language, text)
+            self.assertTrue(expected, msg=language)
+            self.assertEqual(color(leoColorizer.JEditColorizer, language, text), expected, msg=language)
+    #@+node:ekr.20261018240000.7: *3* TestColorizer.test_mode_cache
+    def test_mode_cache(self):
+        import importlib
+        import marshal
+        import os
+        import sys
+        import tempfile
+        languages = ['lua', 'matlab']
+        names = [f"leo.modes.{z}" for z in languages]
+        saved = {z: sys.modules.pop(z, None) for z in names}
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'mode_cache')
+                cache = leoColorizer.ModeCache(path)
+                module = cache.get_module('lua')
+                self.assertIs(sys.modules['leo.modes.lua'], module)
+                self.assertIs(cache.get_module('lua'), module)
+                self.assertTrue(module.keywordsDictDict['lua_main'])
+                self.assertTrue(module.rulesDict1)
+                # The module has a spec, so reload works.
+                self.assertEqual(module.__spec__.name, 'leo.modes.lua')
+                self.assertEqual(module.__file__, module.__spec__.origin)
+                self.assertIs(importlib.reload(module), module)
+                # Preload the other language in the background.
+                cache.preload(languages + ['no-such-language'])
+                cache.preload_thread.join()
+                self.assertIn('leo.modes.matlab', sys.modules)
+                # Another process reads all modes with one read.
+                with open(path, 'rb') as f:
+                    self.assertEqual(sorted(marshal.loads(f.read())['modes']), languages)
+                cache2 = leoColorizer.ModeCache(path)
+                code = cache2.get_code('matlab')
+                self.assertIs(cache2.get_code('matlab'), code)
+                self.assertEqual(code.co_code, cache.get_code('matlab').co_code)
+                # The modes work as usual.
+                sys.modules.pop('leo.modes.lua')
+                x = leoColorizer.JEditColorizer(self.c, None)
+                x.mode_cache = cache2
+                self.assertTrue(x.init_mode('lua'))
+                self.assertEqual(x.keywordsDict, sys.modules['leo.modes.lua'].lua_main_keywords_dict)
+        finally:
+            for name, module in saved.items():
+                if module:
+                    sys.modules[name] = module
+                    setattr(sys.modules['leo.modes'], name.split('.')[-1], module)
     #@+node:ekr.20210905170507.39: *3* TestColorizer.test_scanColorDirectives
     def test_scanColorDirectives(self):
         c = self.c
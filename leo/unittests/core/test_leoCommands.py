@@ -86,6 +86,52 @@ class TestCommands(LeoUnitTest):
     def test_c_checkOutline(self):
         c = self.c
         self.assertEqual(0, c.checkOutline())
+    #@+node:ekr.20261018200000.4: *3* TestCommands.test_c_checkOutline_errors
+    def test_c_checkOutline_errors(self):
+        c = self.c
+        self.clean_tree()
+        root = c.rootPosition()
+        child1 = root.insertAsLastChild()
+        child2 = root.insertAsLastChild()
+        self.assertEqual(c.checkOutline(), 0)
+        # Remove a parent link. checkVnodeLinks restores it.
+        child1.v.parents.remove(root.v)
+        self.assertEqual(c.checkOutline(), 0)
+        self.assertEqual(child1.v.parents, [root.v])
+        # Duplicate gnxs. checkGnxs retains the first gnx.
+        gnx = child1.gnx
+        child2.v.fileIndex = gnx
+        self.assertEqual(c.checkGnxs(), 1)
+        self.assertEqual(child1.gnx, gnx)
+        self.assertNotEqual(child2.gnx, gnx)
+        self.assertEqual(c.checkGnxs(), 0)
+    #@+node:ekr.20261018200000.5: *3* TestCommands.test_c_getOutlineStats
+    def test_c_getOutlineStats(self):
+        c = self.c
+        self.clean_tree()
+        root = c.rootPosition()
+        root.b = 'ü\n'
+        a = root.insertAsLastChild()
+        b = a.insertAsLastChild()
+        b.insertAsLastChild()
+        organizer = root.insertAfter()
+        for p in (b, a):
+            clone = p.clone()
+            clone.moveToLastChildOf(organizer)
+        self.assertEqual(
+            list(c.all_unique_nodes()),
+            [p.v for p in c.all_unique_positions()])
+        d = c.getOutlineStats()
+        depths: dict[int, int] = {}
+        for p in c.all_positions():
+            depths[p.level()] = depths.get(p.level(), 0) + 1
+        self.assertEqual(d['nodes'], len(list(c.all_unique_positions())))
+        self.assertEqual(d['positions'], len(list(c.all_positions())))
+        self.assertEqual(d['depths'], depths)
+        self.assertEqual(d['clones'], 2)
+        self.assertEqual(d['fan_out'], {2: 2})
+        self.assertEqual(d['body_bytes'], sum(len(v.b.encode('utf-8')) for v in c.all_unique_nodes()))
+        c.doCommandByName('outline-stats')
     #@+node:ekr.20230727044355.1: *3* TestCommands.test_c_check_links
     def check_c_checkVnodeLinks(self):
         c = self.c
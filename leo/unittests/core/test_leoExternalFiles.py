@@ -2,6 +2,11 @@
 #@+node:ekr.20210911052754.1: * @file ../unittests/core/test_leoExternalFiles.py
 """Tests of leoExternalFiles.py"""
 
+import os
+import shutil
+import tempfile
+import time
+import unittest
 from leo.core import leoGlobals as g
 import leo.core.leoApp as leoApp
 from leo.core.leoTest2 import LeoUnitTest
@@ -29,6 +34,115 @@ class TestExternalFiles(LeoUnitTest):
         efc = g.app.externalFilesController
         for i in range(100):
             efc.on_idle()
+    #@+node:ekr.20261018041236.14: *3* TestExternalFiles.test_get_at_file_paths
+    def test_get_at_file_paths(self):
+        c = self.c
+        efc = g.app.externalFilesController
+        root = c.rootPosition()
+        root.h = '@file test1.py'
+        entries = efc.get_at_file_paths(c)
+        self.assertEqual([p.h for path, p in entries], ['@file test1.py'])
+        # The cached list is used until the outline changes.
+        self.assertTrue(efc.get_at_file_paths(c) is entries)
+        # Create an undoable @file node.
+        u = c.undoer
+        undoData = u.beforeInsertNode(root)
+        p = root.insertAfter()
+        p.h = '@clean test2.py'
+        u.afterInsertNode(p, 'Insert Node', undoData)
+        entries = efc.get_at_file_paths(c)
+        self.assertEqual(
+            [p.h for path, p in entries],
+            ['@file test1.py', '@clean test2.py'])
+    #@+node:ekr.20261018041236.15: *3* TestExternalFiles.test_idle_check_commander
+    def test_idle_check_commander(self):
+        c = self.c
+        efc = g.app.externalFilesController
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.py')
+            with open(path, 'w') as f:
+                f.write('a = 1\n')
+            c.rootPosition().h = f"@clean {path}"
+            efc.idle_check_commander(c)
+            self.assertTrue(efc.watchers_d.get(c))
+            self.assertTrue(efc.get_time(path))
+            self.assertEqual(efc.watchers_d[c].changed_paths(), set())
+            efc.shut_down()
+            self.assertEqual(efc.watchers_d, {})
+    #@+node:ekr.20261018041236.16: *3* TestExternalFiles.test_watchers
+    def test_watchers(self):
+        classes = [leoExternalFiles.PollingWatcher]
+        if leoExternalFiles.InotifyWatcher.is_available():
+            classes.append(leoExternalFiles.InotifyWatcher)
+        for cls in classes:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                path1 = os.path.join(temp_dir, 'a.py')
+                path2 = os.path.join(temp_dir, 'b.py')
+                for path in (path1, path2):
+                    with open(path, 'w') as f:
+                        f.write('a = 1\n')
+                watcher = cls()
+                try:
+                    self.assertEqual(sorted(watcher.watch([path1, path2])), [path1, path2])
+                    self.assertEqual(watcher.watch([path1, path2]), [])
+                    self.assertEqual(watcher.changed_paths(), set(), msg=cls.__name__)
+                    time.sleep(0.01)  # Make sure the mod time changes.
+                    with open(path1, 'w') as f:
+                        f.write('a = 22\n')
+                    self.assertEqual(watcher.changed_paths(), {path1}, msg=cls.__name__)
+                    self.assertEqual(watcher.changed_paths(), set(), msg=cls.__name__)
+                    # Replace path2, as editors and git do.
+                    os.remove(path2)
+                    with open(path2, 'w') as f:
+                        f.write('b = 333\n')
+                    self.assertEqual(watcher.changed_paths(), {path2}, msg=cls.__name__)
+                finally:
+                    watcher.close()
+    #@+node:ekr.20261018041236.17: *3* TestExternalFiles.test_inotify_watcher_unwatchable_directory
+    @unittest.skipIf(
+        not leoExternalFiles.InotifyWatcher.is_available(), 'Requires inotify')
+    def test_inotify_watcher_unwatchable_directory(self):
+        watcher = leoExternalFiles.InotifyWatcher()
+        try:
+            path = os.path.join(tempfile.gettempdir(), 'no-such-directory', 'a.py')
+            self.assertEqual(watcher.watch([path]), [path])
+            # The watcher polls the path.
+            self.assertEqual(list(watcher.poller.stat_d), [path])
+            self.assertEqual(watcher.changed_paths(), set())
+        finally:
+            watcher.close()
+    #@+node:ekr.20261018270000.11: *3* TestExternalFiles.test_inotify_watcher_deleted_directory
+    @unittest.skipIf(
+        not leoExternalFiles.InotifyWatcher.is_available(), 'Requires inotify')
+    def test_inotify_watcher_deleted_directory(self):
+        watcher = leoExternalFiles.InotifyWatcher()
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                directory = os.path.join(temp_dir, 'sub')
+                path = os.path.join(directory, 'a.py')
+                os.mkdir(directory)
+                with open(path, 'w') as f:
+                    f.write('a = 1\n')
+                self.assertEqual(watcher.watch([path]), [path])
+                self.assertTrue(directory in watcher.dir_to_wd)
+                # Deleting the directory switches to polling.
+                shutil.rmtree(directory)
+                self.assertEqual(watcher.changed_paths(), {path})
+                self.assertFalse(directory in watcher.dir_to_wd)
+                self.assertEqual(list(watcher.poller.stat_d), [path])
+                self.assertEqual(watcher.changed_paths(), set())
+                # Recreating the directory restores the watch.
+                os.mkdir(directory)
+                with open(path, 'w') as f:
+                    f.write('a = 22\n')
+                self.assertEqual(watcher.changed_paths(), {path})
+                self.assertTrue(directory in watcher.dir_to_wd)
+                self.assertEqual(watcher.poller.stat_d, {})
+                with open(path, 'w') as f:
+                    f.write('a = 333\n')
+                self.assertEqual(watcher.changed_paths(), {path})
+        finally:
+            watcher.close()
     #@-others
 #@-others
 #@-leo
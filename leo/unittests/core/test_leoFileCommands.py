@@ -2,6 +2,11 @@
 #@+node:ekr.20210910065135.1: * @file ../unittests/core/test_leoFileCommands.py
 """Tests of leoFileCommands.py."""
 
+import os
+import sqlite3
+import tempfile
+from leo.core import leoGlobals as g
+import leo.core.leoCommands as leoCommands
 import leo.core.leoFileCommands as leoFileCommands
 from leo.core.leoTest2 import LeoUnitTest
 
@@ -98,6 +103,201 @@ class TestFileCommands(LeoUnitTest):
         d = leoFileCommands.FastRead(c, {}).translate_dict
         s2 = s.translate(d)
         self.assertEqual(s2, 'ab\t\r\nc')
+    #@+node:ekr.20261018140000.6: *3* TestFileCommands.test_incremental_db_save
+    def test_incremental_db_save(self):
+        c = self.c
+        fc = c.fileCommands
+        self.clean_tree()
+        root = c.rootPosition()
+        root.h = 'root'
+        for i in range(3):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = f"body {i}\n"
+
+        def read_db(path):
+            c2 = leoCommands.Commands(fileName=path, gui=g.app.gui)
+            fc2 = c2.fileCommands
+            v = fc2.getAnyLeoFileByName(path, checkOpenFiles=False, readAtFileNodesFlag=False)
+            self.assertTrue(v)
+            # Reading remembers the rows.
+            self.assertEqual(fc2.db_path, path)
+            for v in c2.all_unique_nodes():
+                self.assertEqual(fc2.db_rows[v.gnx], fc2.dbRow(v))
+            return [(p.h, p.b) for p in c2.all_positions()]
+
+        built_rows = set()  # The gnxs of the vnodes passed to fc.dbRow.
+        incremental = []
+        canSave, dbRow = fc.canSaveDbIncrementally, fc.dbRow
+
+        def canSaveDbIncrementally(conn, fileName):
+            val = canSave(conn, fileName)
+            incremental.append(val)
+            built_rows.clear()
+            return val
+
+        def dbRowSpy(v):
+            built_rows.add(v.gnx)
+            return dbRow(v)
+
+        fc.canSaveDbIncrementally = canSaveDbIncrementally
+        fc.dbRow = dbRowSpy
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.db')
+            # The first save writes everything.
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(incremental, [False])
+            # Change a body.
+            child1 = root.getNthChild(1)
+            child1.b = 'changed\n'
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(incremental, [False, True])
+            self.assertEqual(built_rows, {child1.gnx})
+            self.assertEqual(read_db(path), [(p.h, p.b) for p in c.all_positions()])
+            # Delete a node.
+            child0 = root.firstChild()
+            child0.doDelete()
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(built_rows, {root.gnx})
+            self.assertFalse(child0.gnx in fc.db_rows)
+            # Insert a node with a child.
+            child = root.insertAsLastChild()
+            grandchild = child.insertAsLastChild()
+            grandchild.b = 'grandchild\n'
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(built_rows, {root.gnx, child.gnx, grandchild.gnx})
+            self.assertEqual(read_db(path), [(p.h, p.b) for p in c.all_positions()])
+            # Change a uA.
+            child.v.u['key'] = 'value'
+            child.setDirty()
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(built_rows, {child.gnx})
+            self.assertEqual(fc.db_rows[child.gnx], dbRow(child.v))
+            self.assertEqual(read_db(path), [(p.h, p.b) for p in c.all_positions()])
+            # Change a uA without calling setDirty.
+            child.v.u['key'] = 'value2'
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(incremental[-1], True)
+            self.assertEqual(built_rows, {child.gnx})
+            conn = sqlite3.connect(path)
+            row = conn.execute('select ua from vnodes where gnx = ?', (child.gnx,)).fetchone()
+            conn.close()
+            self.assertEqual(row[0], dbRow(child.v)[7])
+            self.assertEqual(read_db(path), [(p.h, p.b) for p in c.all_positions()])
+            # Another program changes the file.
+            conn = sqlite3.connect(path)
+            conn.execute("replace into extra_infos(name, value) values('save_id', 'xyzzy')")
+            conn.commit()
+            conn.close()
+            self.assertTrue(fc.exportToSqlite(path))
+            self.assertEqual(incremental[-1], False)
+            self.assertEqual(read_db(path), [(p.h, p.b) for p in c.all_positions()])
+    #@+node:ekr.20261018150000.17: *3* TestFileCommands.test_lazy_db_bodies
+    def test_lazy_db_bodies(self):
+        c = self.c
+        self.clean_tree()
+        root = c.rootPosition()
+        root.h = 'root'
+        for i in range(4):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = f"body {i}\n"
+        root.firstChild().v.u = {'key': 'value'}
+        expected = [(p.h, p.b, p.v.u) for p in c.all_positions()]
+
+        def read_db(path, lazy):
+            c2 = leoCommands.Commands(fileName=path, gui=g.app.gui)
+            c2.config.set(p=None, kind='bool', name='db-lazy-bodies', val=lazy)
+            c2.fileCommands.getAnyLeoFileByName(path, checkOpenFiles=False, readAtFileNodesFlag=False)
+            return c2
+
+        def contents(c2):
+            return [(p.h, p.b, p.v.u) for p in c2.all_positions()]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.db')
+            self.assertTrue(c.fileCommands.exportToSqlite(path))
+            c2 = read_db(path, lazy=True)
+            fc2 = c2.fileCommands
+            loader = fc2.lazy_loader
+            self.assertTrue(loader)
+            vnodes = list(c2.all_unique_nodes())
+            self.assertTrue(all(isinstance(v, leoFileCommands.LazyVNode) for v in vnodes))
+            self.assertFalse(any(v.pinned for v in vnodes))
+            # Only bodies that have been used are in memory.
+            self.assertTrue(len(loader.cache) < len(vnodes))
+            # The cache is bounded.
+            loader.cache_size = 10
+            self.assertEqual(contents(c2), expected)
+            self.assertEqual(len(loader.cache), 1)
+            self.assertTrue(loader.cached_chars <= 10)
+            # Edits pin bodies until the next save.
+            root2 = c2.rootPosition()
+            child1 = root2.getNthChild(1)
+            child1.b = 'changed\n'
+            self.assertTrue(child1.v.pinned)
+            child0 = root2.firstChild()
+            deleted_v = root2.getNthChild(2).v
+            root2.getNthChild(2).doDelete()
+            expected = contents(c2)
+            self.assertTrue(fc2.exportToSqlite(path))
+            self.assertFalse(child1.v.pinned)
+            self.assertEqual(child1.b, 'changed\n')
+            self.assertEqual(child0.v.u, {'key': 'value'})
+            # Deleted lazy vnodes keep their bodies.
+            self.assertTrue(deleted_v.pinned)
+            self.assertEqual(deleted_v.b, 'body 2\n')
+            self.assertEqual(contents(read_db(path, lazy=False)), expected)
+            # Saving to another file writes all bodies.
+            path2 = os.path.join(directory, 'test2.db')
+            self.assertTrue(fc2.exportToSqlite(path2))
+            self.assertEqual(loader.path, path2)
+            self.assertEqual(contents(read_db(path2, lazy=False)), expected)
+            # Closing the outline closes the .db file.
+            c2.clearChanged()
+            old_log = g.app.log
+            try:
+                self.assertTrue(g.app.closeLeoWindow(c2.frame, finish_quit=False))
+            finally:
+                g.app.log = old_log
+            self.assertEqual(loader.conn, None)
+    #@+node:ekr.20261018280000.23: *3* TestFileCommands.test_lazy_db_search_index
+    def test_lazy_db_search_index(self):
+        c = self.c
+        self.clean_tree()
+        root = c.rootPosition()
+        root.h = 'root'
+        for i, word in enumerate(('apple', 'banana', 'cherry')):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = f"{word}\n"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.db')
+            self.assertTrue(c.fileCommands.exportToSqlite(path))
+            c2 = leoCommands.Commands(fileName=path, gui=g.app.gui)
+            c2.config.set(p=None, kind='bool', name='db-lazy-bodies', val=True)
+            c2.fileCommands.getAnyLeoFileByName(path, checkOpenFiles=False, readAtFileNodesFlag=False)
+            loader = c2.fileCommands.lazy_loader
+            loader.cache.clear()
+            loader.cached_chars = 0
+            fetched = []
+            fetch_body = loader.fetch_body
+            loader.fetch_body = lambda gnx: fetched.append(gnx) or fetch_body(gnx)
+            try:
+                # The index doesn't read bodies from the .db file.
+                index = c2.findCommands.search_index
+                vnodes = set(c2.all_unique_nodes())
+                self.assertEqual(index.candidates(['banana']), vnodes)
+                self.assertEqual(fetched, [])
+                # The index adds vnodes when their bodies are in memory.
+                children = list(c2.rootPosition().children())
+                self.assertEqual(children[0].b, 'apple\n')
+                self.assertEqual(index.candidates(['banana']), vnodes - {children[0].v})
+                self.assertEqual(fetched, [children[0].gnx])
+                children[1].b = 'date\n'
+                self.assertEqual(index.candidates(['date']), {children[1].v, c2.rootPosition().v, children[2].v})
+            finally:
+                loader.close()
     #@-others
 #@-others
 #@-leo
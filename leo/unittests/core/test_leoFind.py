@@ -138,6 +138,34 @@ class TestFind(LeoUnitTest):
         root.h = '@file xyzzy'
         settings.find_text = settings.change_text = 'child1'
         x.do_change_all(settings)
+    #@+node:ekr.20261018280000.4: *4* TestFind.test_change_all_cancelled
+    def test_change_all_cancelled(self):
+        c, settings, u, x = self.c, self.settings, self.c.undoer, self.x
+        self.make_test_tree()
+        settings.find_text = 'def'
+        settings.change_text = '_DEF_'
+        settings.node_only = settings.suboutline_only = False
+        bodies = [p.b for p in c.all_unique_positions()]
+
+        def cancel(n, total):
+            if n == 3:
+                raise KeyboardInterrupt
+
+        u.clearUndoState()
+        c.progressCallback = cancel
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                x.do_change_all(settings)
+        finally:
+            c.progressCallback = None
+        # The changes made so far form one closed undo group.
+        changed = [z.b for z in c.all_unique_positions()]
+        self.assertNotEqual(changed[:3], bodies[:3])
+        self.assertEqual(changed[3:], bodies[3:])
+        self.assertEqual(len(u.beads), 1)
+        self.assertEqual(u.beads[0].kind, 'afterGroup')
+        u.undo()
+        self.assertEqual([z.b for z in c.all_unique_positions()], bodies)
     #@+node:ekr.20210220091434.1: *4* TestFind.test_change-all (@file node)
     def test_change_all_with_at_file_node(self):
         c, settings, x = self.c, self.settings, self.x
@@ -949,6 +977,168 @@ class TestFind(LeoUnitTest):
         for s, expected in table:
             got = x.replace_back_slashes(s)
             self.assertEqual(expected, got, msg=s)
+    #@+node:ekr.20261018061512.16: *4* TestFind.test_search_index
+    def test_search_index(self):
+        c, x = self.c, self.x
+        index = x.search_index
+        root = c.rootPosition()
+        child2 = g.findNodeAnywhere(c, 'child 2')
+        self.assertEqual(index.candidates(['va2: int']), {child2.v})
+        self.assertEqual(index.candidates(['CHILD']), {p.v for p in c.all_positions() if 'child' in p.b})
+        # Fragments shorter than three characters don't narrow the search.
+        self.assertEqual(index.candidates(['va']), None)
+        # The index tracks changes, including undo.
+        u = c.undoer
+        bunch = u.beforeChangeBody(root)
+        root.b = 'xyzzy = 1\n'
+        u.afterChangeBody(root, 'Change Body', bunch)
+        self.assertEqual(index.candidates(['xyzzy']), {root.v})
+        u.undo()
+        self.assertEqual(index.candidates(['xyzzy']), set())
+        child2.h = 'plugh'
+        self.assertEqual(index.candidates(['plugh']), {child2.v})
+        child2.doDelete()
+        self.assertEqual(index.candidates(['plugh']), set())
+        # Queries reindex only the changed vnodes, and the index holds no strings.
+        digests = []
+        digest = index.digest
+        index.digest = lambda v: digests.append(v) or digest(v)
+        try:
+            index.candidates(['plugh'])
+            self.assertEqual(digests, [])
+            root.b = 'plugh\n'
+            self.assertEqual(index.candidates(['plugh']), {root.v})
+            self.assertEqual(digests, [root.v])
+        finally:
+            del index.digest
+        for entry in index.entries.values():
+            self.assertEqual(len(entry), 2)
+        # The index persists in c.db.
+        old_db = g.app.db
+        try:
+            g.app.db = {}
+            c.db.db = g.app.db
+            index.save()
+            saved = g.app.db.get(f"{c.mFileName}:::{index.db_key}")
+            self.assertEqual(set(saved), {v.gnx for v in index.entries})
+            index2 = leoFind.SearchIndex(c)
+            index2.load()
+            self.assertFalse(index2.changed)
+            self.assertEqual(index2.postings, index.postings)
+        finally:
+            g.app.db = old_db
+            c.db.db = old_db
+    #@+node:ekr.20261018061512.17: *4* TestFind.test_search_index_find_all
+    def test_search_index_find_all(self):
+        settings, x = self.settings, self.x
+        for find_text, pattern_match, ignore_case, whole_word, expected in (
+            ('blabla', False, False, False, 16),
+            ('BLABLA', False, True, False, 16),
+            ('second', False, False, True, 16),
+            (r'sec(o)nd\s+blabla', True, False, False, 8),
+            (r'v[a]4: int', True, False, False, 1),
+        ):
+            for use_search_index in (True, False):
+                self.make_test_tree()
+                x.use_search_index = use_search_index
+                settings.find_text = find_text
+                settings.ignore_case = ignore_case
+                settings.pattern_match = pattern_match
+                settings.whole_word = whole_word
+                result_dict = x.do_find_all(settings)
+                self.assertEqual(result_dict['total_matches'], expected, msg=find_text)
+    #@+node:ekr.20261018061512.18: *4* TestFind.test_search_index_regex_fragments
+    def test_search_index_regex_fragments(self):
+        index = self.x.search_index
+        table = (
+            (r'abc', ['abc']),
+            (r'^def\s+(\w+)', ['def']),
+            (r'colou?r', ['colo', 'r']),
+            (r'ab+c', ['ab', 'c']),
+            (r'x[abc]yz', ['x', 'yz']),
+            (r'[]xyz]abc', ['abc']),
+            (r'(abc)?def', ['def']),
+            (r'\bword\b', ['word']),
+            (r'abc|def', None),
+            (r'(?x) a b c', None),
+            (r'.*', None),
+            # Quantifier bounds and escape payloads are not literals.
+            (r'a{100}', None),
+            (r'x{2,100}', None),
+            (r'ab{2,}cde', ['a', 'cde']),
+            (r'\x41BC', ['BC']),
+            (r'\x41BCdef', ['BCdef']),
+            (r'abc\u0041xyz', ['abc', 'xyz']),
+            (r'abc\U00000041xyz', ['abc', 'xyz']),
+            (r'\N{LATIN CAPITAL LETTER A}BC', ['BC']),
+            (r'(a)\1bcd', ['bcd']),
+            (r'abc\101def', ['abc', 'def']),
+            (r'abc\g<name>def', ['abc', 'def']),
+        )
+        for pattern, expected in table:
+            self.assertEqual(index.regex_fragments(pattern), expected, msg=pattern)
+    #@+node:ekr.20261018260000.1: *4* TestFind.test_search_index_find_all_escapes
+    def test_search_index_find_all_escapes(self):
+        c, settings, x = self.c, self.settings, self.x
+        for find_text in (r'a{100}', r'x{2,100}', r'\x41BC', r'\N{LATIN CAPITAL LETTER A}BC'):
+            for use_search_index in (True, False):
+                self.make_test_tree()
+                c.rootPosition().b = f"{'a' * 100}\nxx\nABC\n"
+                x.use_search_index = use_search_index
+                settings.find_text = find_text
+                settings.ignore_case = False
+                settings.pattern_match = True
+                settings.whole_word = False
+                result_dict = x.do_find_all(settings)
+                self.assertEqual(result_dict['total_matches'], 1, msg=(find_text, use_search_index))
+    #@+node:ekr.20261018073045.7: *4* TestFind.test_search_vnodes
+    def test_search_vnodes(self):
+        c, settings, x = self.c, self.settings, self.x
+        # Clone a node many times.
+        child2 = g.findNodeAnywhere(c, 'child 2')
+        for i in range(5):
+            child2.clone()
+        settings.find_text = 'blabla'
+        calls = []
+
+        def matches(h, b):
+            calls.append(h)
+            return 'blabla' in b
+
+        x._cfa_node_matches = matches
+        x.use_search_index = False
+        count = x.do_clone_find_all_flattened(settings)
+        self.assertEqual(count, 4)
+        # Each vnode was searched exactly once.
+        self.assertEqual(sorted(calls), sorted(set(calls)))
+        self.assertEqual(calls.count('child 2'), 1)
+    #@+node:ekr.20261018073045.8: *4* TestFind.test_search_vnodes_in_workers
+    def test_search_vnodes_in_workers(self):
+        c, x = self.c, self.x
+        vnodes = list(c.all_unique_nodes())
+        for find_text, pattern_match, whole_word in (
+            ('second', False, True),
+            (r'^def\b', True, False),
+        ):
+            x.find_text = find_text
+            x.pattern_match = pattern_match
+            x.whole_word = whole_word
+            x.ignore_case = False
+            x.search_body = x.search_headline = True
+            if pattern_match:
+                x.compile_pattern()
+            for kind in ('find-all', 'clone-find-all'):
+                x.worker_threshold = 10**9
+                expected = x.search_vnodes(kind, vnodes)
+                x.worker_threshold = 1
+                results = x._search_nodes_in_workers(kind, [(v.h, v.b) for v in vnodes])
+                if results is None:
+                    self.skipTest('Requires multiple cpus')
+                self.assertEqual(results, expected, msg=(kind, find_text))
+                # All searches share one pool of spawned processes.
+                pool = leoFind.search_pool
+                self.assertTrue(pool)
+                self.assertIs(leoFind.get_search_pool(2), pool)
     #@+node:ekr.20210110073117.89: *4* TestFind.test_switch_style
     def test_switch_style(self):
         x = self.x
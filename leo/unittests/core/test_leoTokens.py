@@ -5,6 +5,7 @@
 #@+node:ekr.20240105151507.2: ** << test_leoTokens imports >>
 import os
 import sys
+import tempfile
 import textwrap
 import unittest
 import warnings
@@ -18,6 +19,7 @@ except Exception:  # pragma: no cover
     black = None
 
 from leo.core import leoGlobals as g
+from leo.core import leoBeautify
 
 # Classes to test.
 from leo.core.leoTokens import InputToken, Tokenizer, TokenBasedOrange
@@ -170,6 +172,77 @@ class Optional_TestFiles(BaseTest):
 
         self.make_file_data('runLeo.py')
     #@-others
+#@+node:ekr.20261018170000.6: ** class TestBeautifyJobs (BaseTest)
+class TestBeautifyJobs(BaseTest):
+    """Tests of leoBeautify.run_beautify_jobs."""
+    #@+others
+    #@+node:ekr.20261018170000.7: *3* TestBeautifyJobs.test_run_beautify_jobs
+    def test_run_beautify_jobs(self):
+
+        settings = {'beautified': True, 'write': True}
+        contents = ['a=1\n', 'b = 2\n', 'c=[1,2]\n']
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, 'cache.json')
+
+            def run(processes, subdirectory):
+                filenames = []
+                for i, s in enumerate(contents):
+                    filename = os.path.join(directory, subdirectory, f"test{i}.py")
+                    os.makedirs(os.path.dirname(filename), exist_ok=True)
+                    if not os.path.exists(filename):
+                        with open(filename, 'w') as f:
+                            f.write(s)
+                    filenames.append(filename)
+                return leoBeautify.run_beautify_jobs(
+                    'tbo', filenames, settings, processes=processes, cache_path=cache_path)
+
+            # Results are in the order of the files.
+            results = run(1, 'serial')
+            self.assertEqual([changed for changed, output in results], [True, False, True])
+            self.assertEqual(results[0][1], 'tbo: beautified: test0.py\n')
+            self.assertEqual(results[1][1], '')
+            # The second run leaves all files unchanged, then caches the results.
+            self.assertEqual(run(1, 'serial'), [(False, '')] * 3)
+            beautify_job = leoBeautify.beautify_job
+            try:
+                leoBeautify.beautify_job = None
+                self.assertEqual(run(1, 'serial'), [(False, '')] * 3)
+            finally:
+                leoBeautify.beautify_job = beautify_job
+            # A process pool gives the same results.
+            self.assertEqual(run(2, 'pool'), results)
+            with open(os.path.join(directory, 'pool', 'test2.py')) as f:
+                self.assertEqual(f.read(), 'c = [1, 2]\n')
+    #@+node:ekr.20261018260000.2: *3* TestBeautifyJobs.test_beautify_diff_output
+    def test_beautify_diff_output(self):
+
+        contents = ['a=1\n', 'b=2\n', 'c=3\n']
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = []
+            for i, s in enumerate(contents):
+                filename = os.path.join(directory, f"test{i}.py")
+                with open(filename, 'w') as f:
+                    f.write(s)
+                filenames.append(filename)
+            old_unit_testing = g.unitTesting
+            try:
+                # Outside of unit tests, g.pr writes to sys.__stdout__.
+                g.unitTesting = False
+                for processes in (1, 2):
+                    results = leoBeautify.run_beautify_jobs(
+                        'beautify-diff', filenames, processes=processes,
+                        cache_path=os.path.join(directory, 'cache.json'))
+                    # Each job's output contains its own diffs.
+                    for i, (changed, output) in enumerate(results):
+                        self.assertTrue(changed)
+                        self.assertIn(f"test{i}.py", output, msg=processes)
+                        self.assertIn(f"'-{contents[i].strip()}", output, msg=processes)
+                        for j, s in enumerate(contents):
+                            if j != i:
+                                self.assertNotIn(f"'-{s.strip()}", output, msg=processes)
+            finally:
+                g.unitTesting = old_unit_testing
+    #@-others
 #@+node:ekr.20240105153425.85: ** class TestTokens (BaseTest) (delete)
 class TestTokens(BaseTest):
     """Unit tests for tokenizing."""
@@ -3,6 +3,7 @@
 """Tests of leoUndo.py"""
 
 from leo.core import leoGlobals as g
+from leo.core import leoUndo
 from leo.core.leoTest2 import LeoUnitTest
 assert g
 
@@ -343,6 +344,123 @@ class TestUndo(LeoUnitTest):
             u.redo()
             self.assertEqual(p.b, newText)
             self.assertEqual(p.isMarked(), oldMarked)
+    #@+node:ekr.20261018081204.14: *3* TestUndo.test_body_diff
+    def test_body_diff(self):
+        c, p, u = self.c, self.c.p, self.c.undoer
+        lines = [f"line {i} {'x' * 40}\n" for i in range(2000)]
+        original = p.b = ''.join(lines)
+        u.clearUndoState()
+        expected = [original]
+        for changed in ([10], [500, 501], [0, 1999]):
+            bunch = u.beforeChangeBody(p)
+            for i in changed:
+                lines[i] = f"changed line {i}\n"
+            p.b = ''.join(lines)
+            u.afterChangeBody(p, 'Change Body', bunch)
+            expected.append(p.b)
+            # The bead contains the compressed new text and the changed old lines.
+            bead = u.beads[u.bead]
+            self.assertTrue(bead.bodyDiff)
+            self.assertFalse('oldBody' in bead)
+            self.assertLess(u.beadSize(bead), len(original) // 4)
+            self.assertLess(sum(len(z[2]) for z in bead.bodyDiff.changes), 200)
+        # An edit at both ends of the body stores two runs of lines.
+        self.assertEqual(len(bead.bodyDiff.changes), 2)
+        # Undo and redo are exact.
+        for s in reversed(expected[:-1]):
+            u.undo()
+            self.assertEqual(p.b, s)
+        for s in expected[1:]:
+            u.redo()
+            self.assertEqual(p.b, s)
+        # Undo restores the old text even after a change outside of undo.
+        p.b = 'changed'
+        u.undo()
+        self.assertEqual(p.b, expected[-2])
+    #@+node:ekr.20261018081204.15: *3* TestUndo.test_max_undo_memory
+    def test_max_undo_memory(self):
+        c, p, u = self.c, self.c.p, self.c.undoer
+        u.clearUndoState()
+        u.max_undo_memory = 100000
+        for i in range(10):
+            bunch = u.beforeChangeBody(p)
+            p.b = f"{i}\n" * 5000  # Different text: no common prefix.
+            u.afterChangeBody(p, 'Change Body', bunch)
+            self.assertLessEqual(u.undoMemory(), u.max_undo_memory)
+        # The oldest beads were deleted.
+        self.assertLess(len(u.beads), 10)
+        self.assertEqual(u.bead, len(u.beads) - 1)
+        n = len(u.beads)
+        for i in range(n):
+            u.undo()
+        self.assertEqual(p.b, f"{9 - n}\n" * 5000)
+        self.assertFalse(u.canUndo())
+        c.undoer.showUndoMemory()
+    #@+node:ekr.20261018270000.14: *3* TestUndo.test_undo_memory_total
+    def test_undo_memory_total(self):
+        c, p, u = self.c, self.c.p, self.c.undoer
+        u.clearUndoState()
+        sizes = []
+        beadSize = u.beadSize
+
+        def spy(bunch):
+            sizes.append(bunch)
+            return beadSize(bunch)
+
+        u.beadSize = spy
+        try:
+            for i in range(10):
+                sizes.clear()
+                bunch = u.beforeChangeBody(p)
+                p.b = f"{i}\n" * 5000  # Different text: no common prefix.
+                u.afterChangeBody(p, 'Change Body', bunch)
+                # Only the present bead is measured.
+                self.assertTrue(all(z is u.beads[u.bead] for z in sizes), msg=i)
+                self.assertEqual(u.undoMemory(), sum(beadSize(z) for z in u.beads))
+        finally:
+            u.beadSize = beadSize
+        # An open group delays the deletion of the oldest beads, but not forever.
+        u.beforeChangeGroup(p, 'Open Group')
+        u.max_undo_memory = 100000
+        u.limitUndoMemory()
+        self.assertEqual(len(u.beads), 11)
+        u.beads[u.bead].openTime -= u.max_open_group_time
+        u.limitUndoMemory()
+        self.assertLess(len(u.beads), 11)
+        self.assertEqual(u.beads[u.bead].kind, 'beforeGroup')
+        self.assertLessEqual(u.undoMemory(), u.max_undo_memory)
+        self.assertEqual(u.undoMemory(), sum(beadSize(z) for z in u.beads))
+    #@+node:ekr.20261018280000.5: *3* TestUndo.test_compact_tree_bead
+    def test_compact_tree_bead(self):
+        c, p, u = self.c, self.c.p, self.c.undoer
+        parent = p.insertAfter()
+        parent.h = 'parent'
+        bodies = []
+        for i in range(3):
+            child = parent.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = ''.join(f"line {j} of child {i}\n" for j in range(2000))
+            bodies.append(child.b)
+        s = c.fileCommands.outline_to_clipboard_string(parent)
+        c.selectPosition(parent)
+        u.clearUndoState()
+        pasted = c.pasteOutlineRetainingClones(s=s)
+        self.assertTrue(pasted)
+        bunch = u.beads[u.bead]
+        # The large bodies in both tree lists are compressed.
+        self.assertLess(u.beadSize(bunch), sum(len(z) for z in bodies) // 2)
+        for tree in (bunch.beforeTree, bunch.afterTree):
+            self.assertTrue(any(isinstance(z.body, leoUndo.CompressedText) for z in tree))
+        # Undo and redo restore the bodies from the tree lists.
+        children = list(parent.children())
+        for z in children:
+            z.b = 'changed'
+        u.undo()
+        self.assertEqual([z.b for z in children], bodies)
+        for z in children:
+            z.b = 'changed'
+        u.redo()
+        self.assertEqual([z.b for z in children], bodies)
     #@+node:ekr.20210906172626.17: *3* TestUndo.test_undo_group
     def test_undo_group(self):
         # Test an off-by-one error in c.undoer.bead.
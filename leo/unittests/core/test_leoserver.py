@@ -2,8 +2,11 @@
 #@+node:ekr.20210820203000.1: * @file ../unittests/core/test_leoserver.py
 """Tests of leoserver.py"""
 
+import asyncio
 import json
 import os
+import threading
+import time
 import leo.core.leoserver as leoserver
 from leo.core.leoTest2 import LeoUnitTest
 
@@ -212,6 +215,269 @@ class TestLeoServer(LeoUnitTest):
             if log:
                 g.printObj(answer, tag=f"{tag}:{method}: answer")  # pragma: no cover
 
+    #@+node:felix.20261018044512.5: *3* TestLeoServer.test_get_structure_chunk
+    def test_get_structure_chunk(self):
+
+        test_dot_leo = g.finalize_join(g.app.loadDir, '..', 'test', 'test.leo')
+        assert os.path.exists(test_dot_leo), repr(test_dot_leo)
+        self._request("!open_file", {"log": False, "filename": test_dot_leo})
+        try:
+            c = self.server.c
+            expected = [p.gnx for p in c.all_positions()]
+            for compact in (True, False):
+                rows, token, n_chunks = [], None, 0
+                while True:
+                    param = {"maxNodes": 7, "compact": compact}
+                    if token:
+                        param["token"] = token
+                    answer = self._request("!get_structure_chunk", param)
+                    self.assertTrue(len(answer["rows"]) <= 7)
+                    if compact and not token:
+                        self.assertEqual(answer["fields"][0], "parent")
+                    rows.extend(answer["rows"])
+                    n_chunks += 1
+                    token = answer["token"]
+                    if not token:
+                        break
+                self.assertEqual(n_chunks, (len(expected) + 6) // 7)
+                if compact:
+                    rows = [dict(zip(leoserver.LeoServer.structure_fields, z)) for z in rows]
+                # All top-level nodes come first.
+                n_top = len(list(c.rootPosition().self_and_siblings()))
+                self.assertEqual([z["parent"] for z in rows[:n_top]], [-1] * n_top)
+                # Parents precede their children.
+                for i, row in enumerate(rows):
+                    self.assertTrue(row["parent"] < i)
+                self.assertEqual(sorted(z["gnx"] for z in rows), sorted(expected))
+            # Changing the outline invalidates tokens.
+            answer = self._request("!get_structure_chunk", {"maxNodes": 1})
+            c.undoer.beads.append(g.Bunch(undoType='test'))
+            c.undoer.bead += 1
+            with self.assertRaises(leoserver.ServerError):
+                self._request("!get_structure_chunk", {"maxNodes": 1, "token": answer["token"]})
+            c.undoer.beads.pop()
+            c.undoer.bead -= 1
+        finally:
+            self._request("!close_file", {"forced": True})
+    #@+node:felix.20261018051003.5: *3* TestLeoServer.test_set_tree_sync
+    def test_set_tree_sync(self):
+
+        test_dot_leo = g.finalize_join(g.app.loadDir, '..', 'test', 'test.leo')
+        assert os.path.exists(test_dot_leo), repr(test_dot_leo)
+        self._request("!open_file", {"log": False, "filename": test_dot_leo})
+        try:
+            c = self.server.c
+            # The first delta describes the whole outline.
+            answer = self._request("!set_tree_sync", {"enabled": True})
+            root_gnx = answer["root"]
+            delta = answer["delta"]
+            self.assertEqual(
+                sorted(delta["nodes"]),
+                sorted(set(p.gnx for p in c.all_unique_positions())) + [root_gnx])
+            self.assertEqual(
+                delta["children"][root_gnx],
+                [p.gnx for p in c.rootPosition().self_and_siblings()])
+            # A response without outline changes contains no delta.
+            self._request("!contract_node", {})
+            answer = self._request("!contract_node", {})
+            self.assertFalse("delta" in answer)
+            # Changing a headline.
+            answer = self._request("!set_headline", {"name": "new headline"})
+            self.assertEqual(list(answer["delta"]["nodes"]), [c.p.gnx])
+            self.assertEqual(answer["delta"]["nodes"][c.p.gnx][0], "new headline")
+            self.assertFalse("children" in answer["delta"])
+            # Inserting a node sends one op, not the parent's children.
+            parent_gnx = c.p.parent().gnx if c.p.parent() else root_gnx
+            answer = self._request("!insert_node", {})
+            delta = answer["delta"]
+            self.assertTrue(c.p.gnx in delta["nodes"])
+            self.assertEqual(delta["children"], {c.p.gnx: []})
+            self.assertEqual(delta["ops"], [["insert", parent_gnx, c.p.childIndex(), c.p.gnx]])
+            # Deleting the node.
+            gnx, n = c.p.gnx, c.p.childIndex()
+            answer = self._request("!delete_node", {})
+            delta = answer["delta"]
+            self.assertEqual(delta["deleted"], [gnx])
+            self.assertEqual(delta["ops"], [["delete", parent_gnx, n, gnx]])
+            self.assertFalse("children" in delta)
+            # Undoing the delete sends the node again.
+            answer = self._request("!undo", {})
+            delta = answer["delta"]
+            self.assertTrue(gnx in delta["nodes"])
+            self.assertEqual(delta["ops"], [["insert", parent_gnx, n, gnx]])
+            # Inserting a child of a wide parent.
+            wide = c.lastTopLevel().insertAfter()
+            for i in range(2000):
+                wide.insertAsLastChild().h = f"child {i}"
+            self._request("!contract_node", {})
+            c.selectPosition(wide.firstChild())
+            answer = self._request("!insert_node", {})
+            delta = answer["delta"]
+            self.assertFalse("children" in delta and wide.gnx in delta["children"])
+            self.assertEqual(delta["ops"], [["insert", wide.gnx, 1, c.p.gnx]])
+            # Changing icons.
+            c.editCommands.setIconList(c.p, [{'type': 'file', 'file': 'x.png', 'where': 'beforeHeadline'}])
+            answer = self._request("!contract_node", {})
+            self.assertEqual(answer["delta"]["icons"][c.p.gnx][0]["file"], "x.png")
+            c.editCommands.setIconList(c.p, [])
+            answer = self._request("!contract_node", {})
+            self.assertEqual(answer["delta"]["icons"], {c.p.gnx: []})
+            # Disabling sync.
+            self._request("!set_tree_sync", {"enabled": False})
+            answer = self._request("!insert_node", {})
+            self.assertFalse("delta" in answer)
+        finally:
+            self._request("!close_file", {"forced": True})
+    #@+node:ekr.20261018180000.9: *3* TestLeoServer.test_do_message_async
+    def test_do_message_async(self):
+        server = self.server
+        started = threading.Event()
+        packages = []
+
+        def wait_for_cancel(param):
+            started.set()
+            t1 = time.perf_counter()
+            while time.perf_counter() - t1 < 5:
+                server._check_cancel()
+                time.sleep(0.01)
+            return server._make_response()  # pragma: no cover
+
+        def request(id_, action, param=None):
+            return server._do_message_async({"id": id_, "action": action, "param": param or {}})
+
+        async def run():
+            task1 = asyncio.create_task(request(1, "!wait_for_cancel"))
+            task2 = asyncio.create_task(request(2, "!do_nothing"))
+            await asyncio.sleep(0.2)
+            self.assertTrue(started.is_set())
+            # The loop is free while the leo thread runs request 1.
+            states = {(d["id"], d["state"]) for d in packages}
+            self.assertEqual(states, {(1, "running"), (2, "queued")})
+            # Cancel the queued request, then the running request.
+            for id_ in (2, 1):
+                answer = json.loads(await request(3, "!cancel_request", {"id": id_}))
+                self.assertEqual(answer, {"id": 3, "cancelled": True})
+            for task in (task1, task2):
+                with self.assertRaises(g_leoserver.ServerError):
+                    await task
+            self.assertEqual(
+                [(d["id"], d["state"]) for d in packages[-2:]],
+                [(1, "cancelled"), (2, "cancelled")])
+            answer = json.loads(await request(4, "!cancel_request", {"id": 1}))
+            self.assertFalse(answer["cancelled"])
+            # Later requests run normally.
+            answer = json.loads(await request(5, "!do_nothing"))
+            self.assertEqual(answer["id"], 5)
+            self.assertFalse(server.pending_requests)
+
+        old_delay = server.progress_delay
+        try:
+            server.wait_for_cancel = wait_for_cancel
+            server._send_async_output = lambda package, toAll=False: packages.append(package)
+            server.progress_delay = 0.05
+            # Don't use asyncio.run: it would clear the current event loop.
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(run())
+            loop.close()
+        finally:
+            del server.wait_for_cancel
+            del server._send_async_output
+            server.progress_delay = old_delay
+    #@+node:ekr.20261018280000.3: *3* TestLeoServer.test_cancel_find_all
+    def test_cancel_find_all(self):
+        server = self.server
+        test_dot_leo = g.finalize_join(g.app.loadDir, '..', 'test', 'test.leo')
+        assert os.path.exists(test_dot_leo), repr(test_dot_leo)
+        self._request("!open_file", {"log": False, "filename": test_dot_leo})
+        c = server.c
+        fc = c.findCommands
+        n_nodes = len(list(c.all_unique_nodes()))
+        searched = []
+        packages = []
+
+        def slow_find_all_in_node(h, b):
+            searched.append(h)
+            time.sleep(0.01)
+            return [], []
+
+        def request(id_, action, param=None):
+            return server._do_message_async({"id": id_, "action": action, "param": param or {}})
+
+        async def run():
+            task = asyncio.create_task(request(1, "!find_all"))
+            t1 = time.perf_counter()
+            while not any(d.get("done") for d in packages) and time.perf_counter() - t1 < 5:
+                await asyncio.sleep(0.01)
+            answer = json.loads(await request(2, "!cancel_request", {"id": 1}))
+            self.assertTrue(answer["cancelled"])
+            with self.assertRaises(g_leoserver.ServerError):
+                await task
+            self.assertEqual(packages[-1]["state"], "cancelled")
+
+        old_delay = server.progress_delay
+        old_threshold, old_use_index = fc.worker_threshold, fc.use_search_index
+        try:
+            fc._find_all_in_node = slow_find_all_in_node
+            fc.worker_threshold, fc.use_search_index = 10**9, False
+            settings = {'find_text': 'def', 'search_body': True, 'search_headline': True}
+            self._request("!set_search_settings", {"searchSettings": settings})
+            server._send_async_output = lambda package, toAll=False: packages.append(package)
+            server.progress_delay = server.progress_interval = 0.05
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(run())
+            loop.close()
+            # The search stopped early, and the progress messages counted nodes.
+            self.assertLess(len(searched), n_nodes)
+            self.assertTrue(all(d["total"] == n_nodes for d in packages if "total" in d))
+        finally:
+            del fc._find_all_in_node
+            del server._send_async_output
+            fc.worker_threshold, fc.use_search_index = old_threshold, old_use_index
+            server.progress_delay, server.progress_interval = old_delay, 2.0
+            self._request("!close_file", {"forced": True})
+    #@+node:ekr.20261018190000.8: *3* TestLeoServer.test_wire_formats
+    def test_wire_formats(self):
+        server = self.server
+        WireFormat = g_leoserver.WireFormat
+        body = 'line "1"\n\tü\n' * 1000
+        package = {"id": 1, "body": body, "list": ["short", body], "n": None}
+        # The json format is unchanged.
+        json_wire = WireFormat()
+        message = json_wire.encode(package)
+        self.assertEqual(message, json.dumps(package, separators=(',', ':'), cls=g_leoserver.SetEncoder))
+        self.assertEqual(json_wire.decode(message), package)
+        # Binary formats.
+        for compress_size in (0, 100):
+            wire = WireFormat('binary', blob_size=100, compress_size=compress_size)
+            message = wire.encode(package)
+            self.assertTrue(isinstance(message, bytes))
+            self.assertEqual(message[3] & WireFormat.wire_zlib, WireFormat.wire_zlib if compress_size else 0)
+            # Any wire format decodes any message.
+            self.assertEqual(json_wire.decode(message), package)
+        self.assertTrue(len(message) < len(json_wire.encode(package)) / 10)
+        if g_leoserver.msgpack:
+            wire = WireFormat('msgpack')
+            self.assertEqual(json_wire.decode(wire.encode(package)), package)
+        else:
+            with self.assertRaises(ValueError):
+                WireFormat('msgpack')
+        # Negotiating a format.
+        test_dot_leo = g.finalize_join(g.app.loadDir, '..', 'test', 'test.leo')
+        self._request("!open_file", {"log": False, "filename": test_dot_leo})
+        try:
+            c = self.server.c
+            c.p.b = body
+            answer = self._request("!set_wire_format", {"format": "binary", "compressSize": 1000})
+            self.assertEqual(answer["format"], "binary")
+            message = server._do_message({"id": 100, "action": "!get_body", "param": {"gnx": c.p.gnx}})
+            self.assertTrue(isinstance(message, bytes))
+            self.assertEqual(json_wire.decode(message), {"id": 100, "body": body})
+            with self.assertRaises(g_leoserver.ServerError):
+                server._do_message({"id": 101, "action": "!set_wire_format", "param": {"format": "xml"}})
+        finally:
+            server._do_message({"id": 102, "action": "!set_wire_format", "param": {}})
+            self._request("!close_file", {"forced": True})
+        self.assertFalse(server.wire_formats)
     #@-others
 #@-others
 
@@ -0,0 +1,50 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261018130000.40: * @file ../unittests/misc_tests/test_benchmarks.py
+"""Tests of leo/benchmarks."""
+
+import tempfile
+from leo.benchmarks.outlines import make_outline, make_python_source
+from leo.benchmarks.run_benchmarks import Benchmarks, compare_results
+from leo.core.leoTest2 import LeoUnitTest
+
+#@+others
+#@+node:ekr.20261018130000.41: ** class TestBenchmarks(LeoUnitTest)
+class TestBenchmarks(LeoUnitTest):
+    """Tests of leo/benchmarks."""
+    #@+others
+    #@+node:ekr.20261018130000.42: *3* TestBenchmarks.test_make_outline
+    def test_make_outline(self):
+        c = self.c
+        at_files = make_outline(c, nodes=100, clones=0.1, files=4, seed=2)
+        self.assertEqual([p.h for p in at_files], [f"@file benchmark_{i}.py" for i in range(4)])
+        n_nodes = sum(len(list(p.self_and_subtree())) for p in at_files)
+        self.assertEqual(n_nodes, 100)
+        n_clones = sum(1 for p in c.all_positions() if p.isCloned())
+        self.assertEqual(n_clones, 20)
+        self.assertEqual(c.checkOutline(), 0)
+        # The outline depends only on the arguments.
+        bodies = [p.b for p in c.all_positions()]
+        make_outline(c, nodes=100, clones=0.1, files=4, seed=2)
+        self.assertEqual([p.b for p in c.all_positions()], bodies)
+        compile(make_python_source(20), 'benchmark', 'exec')
+    #@+node:ekr.20261018130000.43: *3* TestBenchmarks.test_run_and_compare
+    def test_run_and_compare(self):
+        names = ['all_positions', 'fast_read', 'read_all', 'write_all']
+        with tempfile.TemporaryDirectory() as directory:
+            benchmarks = Benchmarks(directory, nodes=50, files=2, repeat=2)
+            results = benchmarks.run(names)
+        self.assertEqual(sorted(results), names)
+        for d in results.values():
+            self.assertEqual(len(d['runs']), 2)
+            self.assertEqual(d['min'], min(d['runs']))
+        baseline = {'results': {'a': {'min': 1.0}, 'b': {'min': 1.0}, 'c': {'min': 1.0}}}
+        new = {'results': {'a': {'min': 1.05}, 'b': {'min': 1.5}}}
+        self.assertEqual(compare_results(baseline, new, threshold=0.1), [
+            ('a', 1.0, 1.05, False),
+            ('b', 1.0, 1.5, True),
+        ])
+        with self.assertRaises(ValueError):
+            benchmarks.run(['no-such-benchmark'])
+    #@-others
+#@-others
+#@-leo
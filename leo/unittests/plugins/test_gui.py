@@ -174,6 +174,202 @@ class TestQtGui(LeoUnitTest):
         # g.trace(wrapper.getAllText())
         wrapper.delete(6, 0)
         # g.trace(wrapper.getAllText())
+    #@+node:ekr.20261018120000.13: *3* TestQtGui.test_incremental_colorizing
+    def test_incremental_colorizing(self):
+        c, p = self.c, self.c.p
+        colorizer = c.frame.body.colorizer
+        document = c.frame.body.wrapper.widget.document()
+
+        def line_states():
+            states = []
+            block = document.firstBlock()
+            while block.isValid():
+                states.append(colorizer.stateDict.get(block.userState(), block.userState()))
+                block = block.next()
+            return states
+
+        def run_timer():
+            # Don't use g.IdleTime: LeoServer replaces it.
+            timer = g.app.gui.idleTimeClass(colorizer.on_incremental_timer)
+            timer.enabled = True
+            while timer.enabled:
+                colorizer.on_incremental_timer(timer)
+
+        p.b = '@language python\n' + ''.join(
+            f'"""doc{i}\nmore"""\nx = {i}  # comment\n' for i in range(200))
+        # Color everything at once.
+        colorizer.incremental_lines = 1_000_000
+        colorizer.colorize(p)
+        self.assertIsNone(colorizer.incremental_v)
+        expected = line_states()
+        self.assertFalse(colorizer.deferred_state in expected)
+        # Color incrementally.
+        colorizer.incremental_lines = 100
+        colorizer.old_v = None
+        colorizer.colorize(p)
+        self.assertEqual(colorizer.incremental_v, p.v)
+        self.assertTrue(colorizer.deferred_state in line_states())
+        run_timer()
+        self.assertEqual(line_states(), expected)
+        # The line states are cached.
+        self.assertTrue(p.v in colorizer.line_state_cache)
+        colorizer.colorize(p)  # Does not recolor.
+        self.assertEqual(line_states(), expected)
+        colorizer.incremental_v = None
+        colorizer.colorize(p)
+        self.assertTrue(colorizer.line_states)
+        # Color only the viewport.
+        colorizer.viewport_only_lines = 100
+        colorizer.incremental_v = None
+        colorizer.colorize(p)
+        run_timer()
+        self.assertTrue(colorizer.deferred_state in line_states())
+    #@+node:ekr.20261018210000.2: *3* TestQtGui.test_lazy_tree_items
+    def test_lazy_tree_items(self):
+        from leo.core.leoQt import ItemDataRole
+        from leo.core.leoPlugins import CommandChainDispatcher
+        from leo.plugins.qt_tree import LeoTreeWidgetItem
+        if not hasattr(g, 'visit_tree_item'):
+            g.visit_tree_item = CommandChainDispatcher()
+        c, p = self.c, self.c.p
+        tree = c.frame.tree
+        w = tree.treeWidget
+        parent = p.insertAsLastChild()
+        parent.h = 'parent'
+        for i in range(100):
+            child = parent.insertAsLastChild()
+            child.h = f"child {i}"
+        # Hidden children have no items.
+        p.expand()
+        parent.contract()
+        c.redraw(p)
+        parent_item = tree.position2item(parent)
+        self.assertTrue(isinstance(parent_item, LeoTreeWidgetItem))
+        self.assertEqual(parent_item.childCount(), 0)
+        self.assertEqual(
+            parent_item.childIndicatorPolicy(),
+            parent_item.ChildIndicatorPolicy.ShowIndicator)
+        # Expanding the parent draws the children.
+        parent.expand()
+        c.redraw(p)
+        parent_item = tree.position2item(parent)
+        self.assertEqual(parent_item.childCount(), 100)
+        self.assertTrue(parent_item.isExpanded())
+        self.assertEqual(parent_item.treeWidget(), w)
+        # Icons and tool tips are computed on demand.
+        item = tree.position2item(parent.firstChild())
+        self.assertTrue(isinstance(item, LeoTreeWidgetItem))
+        item = LeoTreeWidgetItem(tree, parent.firstChild().v)
+        self.assertIs(item.lazy_icon, True)
+        self.assertEqual(item.data(0, ItemDataRole.ToolTipRole), 'child 0')
+        self.assertFalse(item.icon(0).isNull())
+        self.assertIsNot(item.lazy_icon, True)
+        # Explicit icons override lazy icons.
+        icon = tree.getCompositeIconImage(parent.v)
+        item.setIcon(0, icon)
+        self.assertIsNone(item.lazy_icon)
+        self.assertEqual(item.icon(0).cacheKey(), icon.cacheKey())
+    #@+node:ekr.20261018220000.7: *3* TestQtGui.test_incremental_redraw
+    def test_incremental_redraw(self):
+        from leo.core.leoPlugins import CommandChainDispatcher
+        if not hasattr(g, 'visit_tree_item'):
+            g.visit_tree_item = CommandChainDispatcher()
+        c = self.c
+        tree = c.frame.tree
+        w = tree.treeWidget
+        tree.use_incremental_redraw = True
+        self.clean_tree()
+        root = c.rootPosition()
+        root.h = 'root'
+        root.expand()
+        for i in range(5):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            child.expand()
+            for j in range(3):
+                grand_child = child.insertAsLastChild()
+                grand_child.h = f"grand child {i}.{j}"
+
+        def items():
+            """Return the list of (level, headline, item) of all items."""
+            result = []
+
+            def add(item, level):
+                result.append((level, item.text(0), item))
+                if item.childCount():
+                    self.assertTrue(item.isExpanded())
+                for i in range(item.childCount()):
+                    add(item.child(i), level + 1)
+
+            for i in range(w.topLevelItemCount()):
+                add(w.topLevelItem(i), 0)
+            return result
+
+        def check():
+            """Check the items and the item dicts."""
+            positions = tree.visiblePositions()
+            aList = items()
+            level0 = positions[0].level()
+            self.assertEqual([z[:2] for z in aList], [(p.level() - level0, p.h) for p in positions])
+            for p, (level, h, item) in zip(positions, aList):
+                self.assertEqual(tree.position2item(p), item)
+                self.assertEqual(tree.item2position(item), p)
+            return [z[2] for z in aList]
+
+        def ids(items):
+            return {id(z) for z in items}
+
+        c.redraw(root)
+        old_items = check()
+        # Change a headline.
+        p = root.getNthChild(2)
+        p.h = 'changed'
+        c.redraw(root)
+        self.assertEqual(check(), old_items)
+        # Change an icon.
+        item = tree.position2item(p)
+        icon_key = item.icon(0).cacheKey()
+        p.setMarked()
+        c.redraw(root)
+        self.assertEqual(check(), old_items)
+        self.assertNotEqual(item.icon(0).cacheKey(), icon_key)
+        # Insert a node.
+        p = root.getNthChild(1).insertAfter()
+        p.h = 'inserted'
+        c.redraw(p)
+        new_items = check()
+        self.assertEqual(len(new_items), len(old_items) + 1)
+        self.assertEqual(len(ids(new_items) & ids(old_items)), len(old_items))
+        # Move, clone, contract and delete nodes.
+        p = root.getNthChild(3)
+        p.moveToFirstChildOf(root)
+        c.redraw(p)
+        check()
+        clone = root.getNthChild(4).clone()
+        clone.moveToLastChildOf(root.firstChild())
+        c.redraw(root)
+        check()
+        root.getNthChild(4).contract()
+        c.redraw(root)
+        check()
+        root.getNthChild(2).doDelete()
+        c.redraw(root)
+        check()
+        # Hoist and dehoist.
+        c.selectPosition(root.firstChild())
+        c.hoist()
+        check()
+        c.dehoist()
+        check()
+        # Large changes redraw the entire tree.
+        old_items = check()
+        tree.incremental_redraw_threshold = 0
+        try:
+            root.firstChild().insertAfter().h = 'inserted again'
+            c.redraw(root)
+            self.assertFalse(ids(check()) & ids(old_items))
+        finally:
+            tree.reloadSettings()
     #@-others
 #@+node:ekr.20220911100525.1: ** class TestAPIClasses(LeoUnitTest)
 class TestAPIClasses(LeoUnitTest):
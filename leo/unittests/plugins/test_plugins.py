@@ -5,9 +5,11 @@
 import glob
 import os
 import re
+import sys
+import tempfile
 from leo.core import leoGlobals as g
 from leo.core.leoTest2 import LeoUnitTest
-from leo.core.leoPlugins import LeoPluginsController
+from leo.core.leoPlugins import LeoPluginsController, getPluginDeclarations
 from leo.plugins import indented_languages
 
 #@+others
@@ -116,6 +118,126 @@ class TestPlugins(LeoUnitTest):
 
         # Instantiating this class caused the crash.
         cursesGui2.LeoTreeData()
+    #@+node:ekr.20261018170000.11: *3* TestPlugins.test_lazy_plugins
+    def test_lazy_plugins(self):
+        c = self.c
+        source = self.prep(
+            """
+            from leo.core import leoGlobals as g
+
+            __plugin_commands__ = [
+                'lazy-test-global',  # A global command.
+                'lazy-test-local',
+            ]
+            __plugin_hooks__ = ['lazy-test-hook']
+
+            def init():
+                g.registerHandler('after-create-leo-frame', onCreate)
+                g.registerHandler('lazy-test-hook', onHook)
+                return True
+
+            def onCreate(tag, keys):
+                keys.get('c').k.registerCommand('lazy-test-local', lambda event: 'local')
+
+            def onHook(tag, keys):
+                return 'hook'
+
+            @g.command('lazy-test-global')
+            def lazy_test_global(event):
+                return 'global'
+            """)
+        moduleName = 'lazy_test_plugin'
+        pc = LeoPluginsController()
+        old_pc, old_windows = g.app.pluginsController, g.app.windowList
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, f"{moduleName}.py"), 'w') as f:
+                f.write(source)
+            try:
+                sys.path.insert(0, directory)
+                g.app.pluginsController, g.app.windowList = pc, [c.frame]
+                self.assertEqual(getPluginDeclarations(moduleName), {
+                    'commands': ['lazy-test-global', 'lazy-test-local'],
+                    'hooks': ['lazy-test-hook'],
+                })
+                self.assertIsNone(getPluginDeclarations('leo.plugins.mod_scripting'))
+                self.assertTrue(pc.registerLazyPlugin(moduleName))
+                self.assertTrue(pc.isLazy(moduleName))
+                self.assertFalse(moduleName in sys.modules)
+                # The first command loads the plugin.
+                event = {'c': c}
+                self.assertEqual(c.commandsDict['lazy-test-local'](event), 'local')
+                self.assertTrue(moduleName in sys.modules)
+                self.assertTrue(pc.isLoaded(moduleName))
+                self.assertFalse(pc.isLazy(moduleName))
+                self.assertEqual(c.commandsDict['lazy-test-global'](event), 'global')
+                self.assertEqual(pc.doHandlersForTag('lazy-test-hook', event), 'hook')
+                self.assertTrue(moduleName in pc.importTimes)
+                # A lazy hook loads the plugin.
+                pc.unloadOnePlugin(moduleName)
+                del sys.modules[moduleName]
+                self.assertTrue(pc.registerLazyPlugin(moduleName))
+                self.assertEqual(pc.doHandlersForTag('lazy-test-hook', event), 'hook')
+                self.assertTrue(pc.isLoaded(moduleName))
+                self.assertEqual(len(pc.handlers['lazy-test-hook']), 1)
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop(moduleName, None)
+                g.global_commands_dict.pop('lazy-test-global', None)
+                g.app.pluginsController, g.app.windowList = old_pc, old_windows
+    #@+node:ekr.20261018250000.8: *3* TestPlugins.test_nodetags_index
+    def test_nodetags_index(self):
+        from leo.plugins.nodetags import TagController
+        c = self.c
+        self.clean_tree()
+        root = c.rootPosition()
+        a, b, parent = [root.insertAsLastChild() for i in range(3)]
+        child = parent.insertAsLastChild()
+        b.clone().moveToLastChildOf(parent)
+        old_pc = g.app.pluginsController
+        try:
+            g.app.pluginsController = LeoPluginsController()
+            tc = TagController(c)
+
+            def scan(tag):
+                # The tagged vnodes, found by scanning the outline.
+                regex = re.compile(tag.replace('*', '.*'))
+                return [
+                    p.v for p in c.all_unique_positions()
+                    if any(regex.match(z) for z in tc.get_tags(p))
+                ]
+
+            tc.add_tag(a, 'work/one')
+            tc.add_tag(b, 'work/two')
+            tc.add_tag(child, 'home')
+            tc.add_tag(child, 'work/one')
+            self.assertEqual(tc.get_all_tags(), ['work/one', 'work/two', 'home'])
+            self.assertEqual(tc.get_tag_counts(), {'work/one': 2, 'work/two': 1, 'home': 1})
+            for tag in ('work/*', 'work/one', 'home', 'h', 'xyzzy'):
+                self.assertEqual([p.v for p in tc.get_tagged_nodes(tag)], scan(tag), msg=tag)
+                self.assertEqual(set(tc.get_tagged_gnxes(tag)), set(v.gnx for v in scan(tag)))
+            tc.remove_tag(b, 'work/two')
+            self.assertEqual(tc.get_all_tags(), ['work/one', 'home'])
+            # Deleting a node changes the index. Undo restores it.
+            c.selectPosition(child)
+            c.deleteOutline()
+            self.assertEqual(tc.get_tag_counts(), {'work/one': 1})
+            c.undoer.undo()
+            self.assertEqual(tc.get_tag_counts(), {'work/one': 2, 'home': 1})
+            # Hooks invalidate the index.
+            a.v.u[tc.TAG_LIST_KEY] = {'new'}
+            tc.invalidate_hook('command2', {'c': c, 'label': 'insert-node'})
+            self.assertEqual(tc.get_tag_counts(), {'work/one': 2, 'home': 1})
+            tc.invalidate_hook('command2', {'c': c, 'label': 'undo'})
+            self.assertEqual(tc.get_tag_counts(), {'new': 1, 'work/one': 1, 'home': 1})
+            # Tag many children of a wide parent.
+            wide = root.insertAsLastChild()
+            children = [wide.insertAsLastChild() for i in range(2000)]
+            for p in children[::2]:
+                tc.add_tag(p, 'wide')
+            self.assertEqual(tc.get_tagged_nodes('wide'), children[::2])
+            self.assertEqual([p.v for p in tc.get_tagged_nodes('wide')], scan('wide'))
+        finally:
+            g.app.pluginsController = old_pc
     #@+node:ekr.20210909194336.57: *3* TestPlugins.test_regularizeName
     def test_regularizeName(self):
         pc = LeoPluginsController()